@@ -0,0 +1,276 @@
+"""Content-addressed cache for AI agent results.
+
+Students press Run repeatedly, /submit re-runs the sample input /run just
+ran and /efficiency re-analyses code /submit already analysed. The agents
+are called at temperature=0.1, so an identical request gets an equivalent
+answer; paying Groq for it again only adds latency.
+
+Results are keyed by a SHA-256 of the agent name, the question content
+(description and, for evaluation, its test cases), the language, the
+normalised code and stdin. Hashing the question content rather than its id
+means editing a question naturally invalidates its entries.
+
+Two tiers:
+
+    memory      TTLCache per worker process (AGENT_CACHE_MAXSIZE entries)
+    persistent  optional, shared by workers and restarts:
+                  sqlite     a local file at AGENT_CACHE_SQLITE_PATH
+                  firestore  the agent_cache collection of the app database
+
+Only successful results are cached, so a Groq outage is never replayed.
+Per-agent TTLs come from AGENT_CACHE_TTLS; a TTL of 0 disables caching for
+that agent.
+
+Misses go through single-flight coalescing (singleflight.py): concurrent
+callers with the same key share one in-flight agent call, whether or not
+the agent's results are cached.
+"""
+import copy
+import hashlib
+import json
+import logging
+import threading
+from datetime import datetime, timedelta, timezone
+
+from cache import TTLCache, MISSING
+from config import (
+    AGENT_CACHE_ENABLED, AGENT_CACHE_MAXSIZE, AGENT_CACHE_PERSISTENT,
+    AGENT_CACHE_SQLITE_PATH, AGENT_CACHE_TTLS, COLLECTION_AGENT_CACHE,
+    AGENT_SINGLEFLIGHT_CROSS_WORKER, AGENT_SINGLEFLIGHT_LOCK_DIR, AGENT_SINGLEFLIGHT_WAIT_SECONDS
+)
+from singleflight import SingleFlight
+
+logger = logging.getLogger(__name__)
+
+# Bump to invalidate every entry after a prompt or result-format change
+CACHE_KEY_VERSION = 1
+
+
+def normalize_code(code):
+    """Normalise source so formatting-only differences share a cache entry.
+
+    Line endings are unified and trailing whitespace and blank lines are
+    dropped. Indentation is kept, since it is significant in Python.
+    """
+    lines = (code or "").replace("\r\n", "\n").replace("\r", "\n").split("\n")
+    return "\n".join(line.rstrip() for line in lines).strip("\n")
+
+
+def normalize_stdin(text):
+    """Normalise stdin line endings and trailing whitespace."""
+    return (text or "").replace("\r\n", "\n").replace("\r", "\n").rstrip()
+
+
+def make_key(agent, **parts):
+    """Return the content address for an agent call.
+
+    Args:
+        agent: Agent name ("run", "evaluate", "efficiency", "testcases")
+        **parts: JSON-serialisable request parts (question, code, stdin...)
+
+    Returns:
+        str: Hex SHA-256 digest
+    """
+    payload = json.dumps(
+        {"v": CACHE_KEY_VERSION, "agent": agent, "parts": parts},
+        sort_keys=True, separators=(",", ":"), default=str
+    )
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+class PersistentTier:
+    """Agent results stored as documents in a Firestore-compatible client.
+
+    The sqlite option reuses the local document store from the storage
+    package, so both options share this one implementation. Each document
+    holds the agent, the result and an ``expires_at`` timestamp (usable as a
+    Firestore TTL policy field); expired documents read as misses.
+    """
+
+    def __init__(self, client, name):
+        self.client = client
+        self.name = name
+
+    def _doc(self, key):
+        return self.client.collection(COLLECTION_AGENT_CACHE).document(key)
+
+    def get(self, key):
+        snapshot = self._doc(key).get()
+        if not snapshot.exists:
+            return MISSING
+        doc = snapshot.to_dict()
+        if doc.get("expires_at") is None or doc["expires_at"] <= datetime.now(timezone.utc):
+            return MISSING
+        return doc.get("value")
+
+    def set(self, key, agent, value, ttl):
+        self._doc(key).set({
+            "agent": agent,
+            "value": value,
+            "expires_at": datetime.now(timezone.utc) + timedelta(seconds=ttl)
+        })
+
+
+def _create_persistent_tier(kind):
+    if kind == "sqlite":
+        from storage import create_backend
+
+        client, _ = create_backend("sqlite", AGENT_CACHE_SQLITE_PATH)
+        return PersistentTier(client, "sqlite")
+    if kind == "firestore":
+        from firebase_init import get_db
+
+        return PersistentTier(get_db(), "firestore")
+    if kind not in ("", "none"):
+        logger.warning(f"Unknown AGENT_CACHE_PERSISTENT '{kind}', persistent tier disabled")
+    return None
+
+
+class AgentResultCache:
+    """Two-tier cache of agent results with per-agent hit-rate counters."""
+
+    def __init__(self, ttls=None, maxsize=AGENT_CACHE_MAXSIZE, persistent=None, enabled=True,
+                 singleflight=None):
+        """Initialize cache.
+
+        Args:
+            ttls: {agent: seconds}; agents missing or at 0 are not cached
+            maxsize: Entries kept in the in-memory tier
+            persistent: PersistentTier or None
+            enabled: Master switch
+            singleflight: SingleFlight coalescing misses (defaults to an
+                in-process one)
+        """
+        self.ttls = dict(AGENT_CACHE_TTLS if ttls is None else ttls)
+        self.enabled = enabled
+        self.memory = TTLCache(maxsize=maxsize, ttl=max(self.ttls.values() or [0]), name="agent_results")
+        self.persistent = persistent
+        self.singleflight = singleflight or SingleFlight()
+
+        self._lock = threading.Lock()
+        self._counters = {}
+
+    def _count(self, agent, field):
+        with self._lock:
+            counters = self._counters.setdefault(
+                agent, {"memory_hits": 0, "persistent_hits": 0, "misses": 0, "stores": 0, "errors": 0}
+            )
+            counters[field] += 1
+
+    def is_cacheable(self, agent):
+        return self.enabled and self.ttls.get(agent, 0) > 0
+
+    def get(self, agent, key):
+        """Return the cached result for key, or MISSING."""
+        if not self.is_cacheable(agent):
+            return MISSING
+
+        value = self.memory.get(key)
+        if value is not MISSING:
+            self._count(agent, "memory_hits")
+            return value
+
+        if self.persistent is not None:
+            try:
+                value = self.persistent.get(key)
+            except Exception as e:
+                self._count(agent, "errors")
+                logger.warning(f"Agent cache read failed ({agent}): {e}")
+                value = MISSING
+            if value is not MISSING:
+                # Promote into this worker's memory tier
+                self.memory.set(key, value, ttl=self.ttls[agent])
+                self._count(agent, "persistent_hits")
+                return value
+
+        self._count(agent, "misses")
+        return MISSING
+
+    def set(self, agent, key, value):
+        """Store a result in both tiers."""
+        if not self.is_cacheable(agent):
+            return
+        ttl = self.ttls[agent]
+        self.memory.set(key, value, ttl=ttl)
+        self._count(agent, "stores")
+        if self.persistent is not None:
+            try:
+                self.persistent.set(key, agent, value, ttl)
+            except Exception as e:
+                self._count(agent, "errors")
+                logger.warning(f"Agent cache write failed ({agent}): {e}")
+
+    def get_or_compute(self, agent, key, compute, should_store=lambda result: True):
+        """Return the cached result for key, computing and storing it on a miss.
+
+        Args:
+            agent: Agent name (selects TTL and counters)
+            key: Content address from make_key()
+            compute: Zero-argument callable producing the result
+            should_store: Predicate deciding whether a computed result is cached
+
+        Returns:
+            The cached or freshly computed result (a copy on a hit, so
+            callers may mutate it)
+        """
+        cached = self.get(agent, key)
+        if cached is not MISSING:
+            return copy.deepcopy(cached)
+
+        def compute_and_store():
+            result = compute()
+            if self.is_cacheable(agent) and should_store(result):
+                self.set(agent, key, copy.deepcopy(result))
+            return result
+
+        def recheck():
+            # Another worker may have stored the result while we waited
+            if self.persistent is None or not self.is_cacheable(agent):
+                return None
+            try:
+                value = self.persistent.get(key)
+            except Exception:
+                return None
+            return None if value is MISSING else copy.deepcopy(value)
+
+        return self.singleflight.do((agent, key), compute_and_store, recheck)
+
+    def clear(self):
+        """Drop the in-memory tier (the persistent tier expires on its own)."""
+        self.memory.clear()
+
+    def stats(self):
+        """Return per-agent counters and hit rates.
+
+        Returns:
+            dict: enabled, persistent, ttls, memory (TTLCache stats),
+                singleflight (SingleFlight stats) and agents: {agent: {memory_hits, persistent_hits, misses,
+                stores, errors, hit_rate}}
+        """
+        with self._lock:
+            agents = {}
+            for agent, counters in self._counters.items():
+                hits = counters["memory_hits"] + counters["persistent_hits"]
+                lookups = hits + counters["misses"]
+                agents[agent] = dict(
+                    counters, hit_rate=round(hits / lookups, 4) if lookups else 0.0
+                )
+        return {
+            "enabled": self.enabled,
+            "persistent": self.persistent.name if self.persistent else None,
+            "ttls": dict(self.ttls),
+            "memory": self.memory.stats(),
+            "singleflight": self.singleflight.stats(),
+            "agents": agents
+        }
+
+
+agent_cache = AgentResultCache(
+    persistent=_create_persistent_tier(AGENT_CACHE_PERSISTENT) if AGENT_CACHE_ENABLED else None,
+    enabled=AGENT_CACHE_ENABLED,
+    singleflight=SingleFlight(
+        cross_worker=AGENT_SINGLEFLIGHT_CROSS_WORKER,
+        lock_dir=AGENT_SINGLEFLIGHT_LOCK_DIR,
+        wait_seconds=AGENT_SINGLEFLIGHT_WAIT_SECONDS
+    )
+)
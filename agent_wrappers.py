@@ -1,13 +1,42 @@
-"""AI Agent integration wrapper functions."""
+"""AI Agent integration wrapper functions.
+
+Agent results are served from the content-addressed cache in agent_cache.py
+when an identical request was answered before. Agents report Groq failures
+inside otherwise normal-looking results, so each wrapper only stores
+results that are free of those failure markers.
+"""
+import contextvars
 import logging
-from agents.compiler_agent import run_code_with_agent
+import queue
+import threading
+from agent_cache import agent_cache, make_key, normalize_code, normalize_stdin
+from agents.compiler_agent import run_code_with_agent, EnvelopeFieldStream
+from agents.sandbox import is_available as sandbox_available, run_in_sandbox
 from agents.evaluator_agent import evaluate_submission
+from agents.judge import judge_submission
 from agents.efficiency_agent import analyze_efficiency
 from agents.testcase_agent import generate_testcases_for_question
 from config import MAX_CODE_SIZE_KB
 
 logger = logging.getLogger(__name__)
 
+# Reasons evaluate_submission() gives when the model call itself failed
+EVALUATOR_FAILURE_PREFIXES = (
+    "Evaluation error:", "Groq API error", "Unexpected evaluation error", "No test cases"
+)
+
+
+def _run_succeeded(result):
+    return "error" not in result
+
+
+def _evaluation_succeeded(result):
+    return not str(result.get("reason", "")).startswith(EVALUATOR_FAILURE_PREFIXES)
+
+
+def _efficiency_succeeded(feedback):
+    return feedback.get("time_complexity") not in ("unknown", "error")
+
 
 def generate_hidden_testcases(description, sample_input, sample_output):
     """Wrapper to generate hidden test cases for a question.
@@ -34,7 +63,15 @@ def generate_hidden_testcases(description, sample_input, sample_output):
                 "testcases": []
             }
         
-        testcases = generate_testcases_for_question(description, sample_input, sample_output)
+        key = make_key(
+            "testcases", description=description,
+            sample_input=normalize_stdin(sample_input), sample_output=normalize_stdin(sample_output)
+        )
+        testcases = agent_cache.get_or_compute(
+            "testcases", key,
+            lambda: generate_testcases_for_question(description, sample_input, sample_output),
+            should_store=lambda result: isinstance(result, list) and bool(result)
+        )
         
         if not isinstance(testcases, list):
             logger.error(f"Invalid testcase return type: {type(testcases)}")
@@ -69,14 +106,16 @@ def generate_hidden_testcases(description, sample_input, sample_output):
         }
 
 
-def compile_and_run_code(question_description, code, language, test_input=None):
+def compile_and_run_code(question_description, code, language, test_input=None, on_delta=None):
     """Wrapper to compile and run code.
     
     Args:
         question_description: Problem description for context
         code: Source code
-        language: Programming language (python, cpp, java, javascript)
+        language: Programming language (python, c, cpp, java, javascript)
         test_input: Input to run code with (optional)
+        on_delta: Called with raw completion chunks when the LLM runner
+            streams its answer (optional; see stream_agent_call)
     
     Returns:
         {
@@ -84,9 +123,14 @@ def compile_and_run_code(question_description, code, language, test_input=None):
             "error": str or None,
             "data": {
                 "output": str,
-                "execution_time": float
+                "execution_time": float (seconds; 0.0 when simulated),
+                "peak_memory_kb": int or None,
+                "engine": "local" or "llm"
             }
         }
+    
+    Code runs in the local sandbox (agents/sandbox.py) when the language's
+    toolchain is installed, otherwise through the LLM runner.
     """
     try:
         # Validate inputs
@@ -113,7 +157,20 @@ def compile_and_run_code(question_description, code, language, test_input=None):
                 "data": None
             }
         
-        result = run_code_with_agent(question_description, code, language, test_input)
+        if sandbox_available(language):
+            # Real execution takes milliseconds; no need to cache it
+            result = run_in_sandbox(code, language, test_input)
+        else:
+            # Sandbox not isolated or toolchain missing: fall back to LLM-simulated execution
+            key = make_key(
+                "run", question=question_description, language=language.lower(),
+                code=normalize_code(code), stdin=normalize_stdin(test_input)
+            )
+            result = agent_cache.get_or_compute(
+                "run", key,
+                lambda: run_code_with_agent(question_description, code, language, test_input, on_delta),
+                should_store=_run_succeeded
+            )
         
         if "error" in result:
             return {
@@ -127,7 +184,9 @@ def compile_and_run_code(question_description, code, language, test_input=None):
             "error": None,
             "data": {
                 "output": result.get("output", ""),
-                "execution_time": 0.0  # Could add actual timing in future
+                "execution_time": result.get("execution_time", 0.0),
+                "peak_memory_kb": result.get("peak_memory_kb"),
+                "engine": result.get("engine", "llm")
             }
         }
     
@@ -157,9 +216,12 @@ def evaluate_code_against_testcases(question_description, code, language, testca
             "data": {
                 "is_correct": bool,
                 "reason": str,
-                "test_results": list
+                "test_results": list (per-test verdicts; empty when judged by the LLM)
             }
         }
+    
+    Test cases are executed by the deterministic judge (agents/judge.py)
+    when the language has a local toolchain, otherwise judged by the LLM.
     """
     try:
         if not testcases:
@@ -169,7 +231,18 @@ def evaluate_code_against_testcases(question_description, code, language, testca
                 "data": None
             }
         
-        result = evaluate_submission(question_description, testcases, code, language)
+        if sandbox_available(language):
+            result = judge_submission(code, language, testcases)
+        else:
+            key = make_key(
+                "evaluate", question=question_description, testcases=testcases,
+                language=language.lower(), code=normalize_code(code)
+            )
+            result = agent_cache.get_or_compute(
+                "evaluate", key,
+                lambda: evaluate_submission(question_description, testcases, code, language),
+                should_store=_evaluation_succeeded
+            )
         
         return {
             "success": True,
@@ -177,7 +250,7 @@ def evaluate_code_against_testcases(question_description, code, language, testca
             "data": {
                 "is_correct": result.get("is_correct", False),
                 "reason": result.get("reason", ""),
-                "test_results": []
+                "test_results": result.get("test_results", [])
             }
         }
     
@@ -191,12 +264,13 @@ def evaluate_code_against_testcases(question_description, code, language, testca
         }
 
 
-def get_efficiency_feedback(problem_description, code):
+def get_efficiency_feedback(problem_description, code, on_delta=None):
     """Wrapper to get efficiency feedback.
     
     Args:
         problem_description: Problem description for context
         code: Source code
+        on_delta: Called with raw completion chunks as they stream (optional)
     
     Returns:
         {
@@ -219,7 +293,12 @@ def get_efficiency_feedback(problem_description, code):
                 "data": None
             }
         
-        feedback = analyze_efficiency(problem_description, code)
+        key = make_key("efficiency", question=problem_description, code=normalize_code(code))
+        feedback = agent_cache.get_or_compute(
+            "efficiency", key,
+            lambda: analyze_efficiency(problem_description, code, on_delta),
+            should_store=_efficiency_succeeded
+        )
         
         return {
             "success": True,
@@ -235,3 +314,47 @@ def get_efficiency_feedback(problem_description, code):
             "error": error_msg[:100],
             "data": None
         }
+
+
+def stream_agent_call(wrapper, *args, envelope_field=False):
+    """Run an agent wrapper, yielding its output as it is generated.
+    
+    The wrapper runs on a helper thread with an on_delta callback, so LLM
+    output can be forwarded (e.g. as server-sent events) while the
+    completion is still streaming. Sandbox runs and cache hits produce no
+    deltas, just the result.
+    
+    Args:
+        wrapper: compile_and_run_code or get_efficiency_feedback
+        *args: Wrapper arguments
+        envelope_field: Forward only the decoded "output"/"error" string of
+            the runner's JSON envelope instead of raw chunks
+    
+    Yields:
+        ("delta", str) for each piece of output, then ("result", dict) with
+        the wrapper's usual {"success", "error", "data"} result
+    """
+    events = queue.Queue()
+    reader = EnvelopeFieldStream() if envelope_field else None
+    
+    def on_delta(chunk):
+        text = reader.feed(chunk) if reader else chunk
+        if text:
+            events.put(("delta", text))
+    
+    def target():
+        try:
+            result = wrapper(*args, on_delta=on_delta)
+        except Exception as e:
+            logger.error(f"Streaming agent call failed: {e}", exc_info=True)
+            result = {"success": False, "error": f"{type(e).__name__}: {e}"[:100], "data": None}
+        events.put(("result", result))
+    
+    # Run in a copy of the caller's context so its llm_tenant() applies
+    context = contextvars.copy_context()
+    threading.Thread(target=context.run, args=(target,), name="agent-stream", daemon=True).start()
+    while True:
+        event = events.get()
+        yield event
+        if event[0] == "result":
+            return
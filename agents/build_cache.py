@@ -0,0 +1,205 @@
+"""On-disk cache of compiled submissions.
+
+A student iterating on inputs resubmits unchanged source, and the judge
+runs many test cases per submission; both should compile once. Build
+outputs (the C/C++ binary, Java class files) are stored under
+BUILD_CACHE_DIR keyed by a hash of the language, the compiler command line,
+the compiler binary and the source.
+
+Entries are published atomically: artifacts are copied into a private
+temporary directory inside the cache and renamed into place, so a reader
+never sees a half-written entry and concurrent workers publishing the same
+key simply let the first rename win. Hits refresh the entry's mtime, and
+when the directory grows past BUILD_CACHE_MAX_MB the least recently used
+entries are renamed aside and deleted.
+
+Cached artifacts are executed without further checks, so the cache must be
+writable by the service alone: sandboxed code that could plant a binary
+there would have it run by other students' submissions. The directory
+defaults to the service user's home (not the shared temp dir), is created
+0700, and is only used while it is a real directory owned by the service
+user with no group or other permissions. The sandbox must run code as a
+different user (SANDBOX_USER) or in a mount namespace that hides it.
+"""
+import hashlib
+import json
+import os
+import shutil
+import stat
+import tempfile
+import threading
+import time
+import logging
+
+from config import BUILD_CACHE_ENABLED, BUILD_CACHE_DIR, BUILD_CACHE_MAX_MB
+
+logger = logging.getLogger(__name__)
+
+TMP_PREFIX = ".tmp-"
+
+
+def _tree_size(path):
+    total = 0
+    for root, _, files in os.walk(path):
+        for name in files:
+            try:
+                total += os.path.getsize(os.path.join(root, name))
+            except OSError:
+                pass
+    return total
+
+
+class BuildCache:
+    """Size-bounded LRU directory of build artifacts shared by worker processes."""
+
+    def __init__(self, root=BUILD_CACHE_DIR, max_bytes=BUILD_CACHE_MAX_MB * 1024 * 1024):
+        """Initialize cache.
+
+        Args:
+            root: Cache directory (created on first publish)
+            max_bytes: Total artifact size kept before LRU eviction
+        """
+        self.root = root
+        self.max_bytes = max_bytes
+
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.publishes = 0
+        self.evictions = 0
+
+    @staticmethod
+    def make_key(language, compile_argv, compiler_path, code):
+        """Return the cache key for a build.
+
+        compiler_path's mtime and size stand in for the compiler version, so
+        upgrading the toolchain invalidates old binaries.
+        """
+        try:
+            stat = os.stat(compiler_path)
+            compiler = [compiler_path, stat.st_mtime_ns, stat.st_size]
+        except (OSError, TypeError):
+            compiler = [compiler_path]
+        payload = json.dumps([language, compile_argv, compiler, code], separators=(",", ":"))
+        return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+    def _is_private(self):
+        """Return True if root is a real directory only this user can access."""
+        try:
+            info = os.lstat(self.root)
+        except OSError:
+            return False
+        if not stat.S_ISDIR(info.st_mode) or info.st_uid != os.geteuid() or info.st_mode & 0o077:
+            logger.warning(f"Build cache {self.root} is not a private directory of this user; not using it")
+            return False
+        return True
+
+    def _count(self, field):
+        with self._lock:
+            setattr(self, field, getattr(self, field) + 1)
+
+    def fetch(self, key, dest):
+        """Copy a cached entry's artifacts into dest.
+
+        Returns:
+            bool: True on a hit
+        """
+        entry = os.path.join(self.root, key)
+        if not self._is_private():
+            self._count("misses")
+            return False
+        try:
+            names = os.listdir(entry)
+            for name in names:
+                shutil.copy2(os.path.join(entry, name), os.path.join(dest, name))
+            os.utime(entry)
+        except OSError:
+            # Missing, or evicted while we were copying
+            self._count("misses")
+            return False
+        self._count("hits")
+        return True
+
+    def publish(self, key, src, names):
+        """Atomically store the named files from src under key."""
+        entry = os.path.join(self.root, key)
+        if os.path.isdir(entry):
+            return
+        try:
+            os.makedirs(self.root, mode=0o700, exist_ok=True)
+        except OSError as e:
+            logger.warning(f"Build cache unavailable: {e}")
+            return
+        if not self._is_private():
+            return
+        try:
+            staging = tempfile.mkdtemp(prefix=TMP_PREFIX, dir=self.root)
+        except OSError as e:
+            logger.warning(f"Build cache unavailable: {e}")
+            return
+        try:
+            for name in names:
+                shutil.copy2(os.path.join(src, name), os.path.join(staging, name))
+            os.rename(staging, entry)
+        except OSError:
+            # Another worker published the same key first, or the copy failed
+            shutil.rmtree(staging, ignore_errors=True)
+            return
+        self._count("publishes")
+        self.evict()
+
+    def evict(self):
+        """Remove least recently used entries until the cache fits max_bytes."""
+        entries = []
+        try:
+            with os.scandir(self.root) as it:
+                for item in it:
+                    if not item.is_dir(follow_symlinks=False):
+                        continue
+                    if item.name.startswith(TMP_PREFIX):
+                        # Staging left behind by a crashed worker
+                        if time.time() - item.stat().st_mtime > 3600:
+                            shutil.rmtree(item.path, ignore_errors=True)
+                        continue
+                    entries.append((item.stat().st_mtime, _tree_size(item.path), item.path))
+        except OSError:
+            return
+
+        total = sum(size for _, size, _ in entries)
+        for _, size, path in sorted(entries):
+            if total <= self.max_bytes:
+                break
+            # Rename first so readers never copy from a half-deleted entry
+            doomed = os.path.join(
+                self.root, f"{TMP_PREFIX}evict-{os.path.basename(path)}-{os.getpid()}-{threading.get_ident()}"
+            )
+            try:
+                os.rename(path, doomed)
+            except OSError:
+                continue
+            shutil.rmtree(doomed, ignore_errors=True)
+            total -= size
+            self._count("evictions")
+
+    def stats(self):
+        """Return counters for this process.
+
+        Returns:
+            dict: enabled, root, max_bytes, hits, misses, publishes,
+                evictions, hit_rate
+        """
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "enabled": BUILD_CACHE_ENABLED,
+                "root": self.root,
+                "max_bytes": self.max_bytes,
+                "hits": self.hits,
+                "misses": self.misses,
+                "publishes": self.publishes,
+                "evictions": self.evictions,
+                "hit_rate": round(self.hits / lookups, 4) if lookups else 0.0
+            }
+
+
+build_cache = BuildCache()
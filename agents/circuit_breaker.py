@@ -1,66 +1,168 @@
 """Circuit breaker pattern for Groq API resilience."""
 import time
 import logging
+from collections import deque
 from threading import Lock
 
 logger = logging.getLogger(__name__)
 
 
+class RollingWindow:
+    """Latency and outcome of the last N calls.
+    
+    Not thread-safe on its own; callers hold their own lock.
+    """
+    
+    def __init__(self, size=50):
+        self.samples = deque(maxlen=size)
+    
+    def add(self, latency, ok=True):
+        """Record a call (latency in seconds, or None if it failed)."""
+        self.samples.append((latency, ok))
+    
+    def clear(self):
+        self.samples.clear()
+    
+    def __len__(self):
+        return len(self.samples)
+    
+    def percentile(self, pct):
+        """Return the pct-th percentile latency of successful calls, or None."""
+        latencies = sorted(latency for latency, ok in self.samples if ok and latency is not None)
+        if not latencies:
+            return None
+        index = min(len(latencies) - 1, max(0, round(pct / 100 * len(latencies)) - 1))
+        return latencies[index]
+    
+    def error_rate(self):
+        if not self.samples:
+            return 0.0
+        return sum(1 for _, ok in self.samples if not ok) / len(self.samples)
+    
+    def summary(self):
+        """Return {"samples", "p50", "p95", "error_rate"} (latencies in seconds)."""
+        p50, p95 = self.percentile(50), self.percentile(95)
+        return {
+            "samples": len(self.samples),
+            "p50": round(p50, 3) if p50 is not None else None,
+            "p95": round(p95, 3) if p95 is not None else None,
+            "error_rate": round(self.error_rate(), 3)
+        }
+
+
 class CircuitBreaker:
     """Circuit breaker for fault tolerance.
     
     States:
         CLOSED: Normal operation, requests pass through
         OPEN: Service unavailable, requests fail immediately
-        HALF_OPEN: Testing if service recovered, allow single request
+        HALF_OPEN: Testing if service recovered, allow up to
+            half_open_max_probes requests at a time
+    
+    The circuit opens after failure_threshold consecutive failures, or, with
+    a latency_threshold, once the rolling p95 latency of successful calls
+    exceeds it (a provider that answers in 30s is as good as down).
     """
     
-    def __init__(self, failure_threshold=5, recovery_timeout=60, name="CircuitBreaker"):
+    def __init__(self, failure_threshold=5, recovery_timeout=60, name="CircuitBreaker",
+                 latency_threshold=None, half_open_max_probes=1, window_size=50, min_samples=10):
         """Initialize circuit breaker.
         
         Args:
             failure_threshold: Number of failures before opening circuit
             recovery_timeout: Seconds before attempting recovery
             name: Name for logging
+            latency_threshold: p95 latency (seconds) that opens the circuit;
+                None disables latency tripping
+            half_open_max_probes: Concurrent requests admitted in HALF_OPEN
+            window_size: Calls kept for the rolling latency/error window
+            min_samples: Calls needed before latency can trip the circuit
         """
         self.failure_threshold = failure_threshold
         self.recovery_timeout = recovery_timeout
         self.name = name
+        self.latency_threshold = latency_threshold
+        self.half_open_max_probes = half_open_max_probes
+        self.min_samples = min_samples
         
         self.failure_count = 0
         self.last_failure_time = None
         self.state = 'CLOSED'
+        self.probes_in_flight = 0
+        self.window = RollingWindow(window_size)
         self.lock = Lock()
     
-    def record_success(self):
-        """Record successful request."""
+    def _open(self, reason):
+        old_state = self.state
+        self.state = 'OPEN'
+        self.last_failure_time = time.time()
+        self.probes_in_flight = 0
+        if old_state != 'OPEN':
+            logger.warning(f"[{self.name}] Circuit breaker OPEN ({reason})")
+            logger.warning(f"[{self.name}] State changed: {old_state} → OPEN")
+    
+    def _slow(self, latency):
+        if self.latency_threshold is None:
+            return False
+        if self.state == 'HALF_OPEN':
+            # A probe must itself be fast enough
+            return latency is not None and latency > self.latency_threshold
+        if len(self.window) < self.min_samples:
+            return False
+        p95 = self.window.percentile(95)
+        return p95 is not None and p95 > self.latency_threshold
+    
+    def record_success(self, latency=None):
+        """Record successful request.
+        
+        Args:
+            latency: Call duration in seconds, for latency tripping and stats
+        """
         with self.lock:
+            self.window.add(latency, ok=True)
+            if self.state == 'HALF_OPEN':
+                self.probes_in_flight = max(0, self.probes_in_flight - 1)
+            
+            if self._slow(latency):
+                self.failure_count = 0
+                self._open(f"p95 latency above {self.latency_threshold:g}s")
+                return
+            
             self.failure_count = 0
             old_state = self.state
             self.state = 'CLOSED'
             
             if old_state != 'CLOSED':
+                # Forget the slow samples that opened the circuit
+                self.window.clear()
+                self.probes_in_flight = 0
                 logger.info(f"[{self.name}] Circuit breaker recovered: {old_state} → CLOSED")
     
     def record_failure(self):
         """Record failed request."""
         with self.lock:
             self.failure_count += 1
-            self.last_failure_time = time.time()
-            old_state = self.state
+            self.window.add(None, ok=False)
             
-            if self.failure_count >= self.failure_threshold:
-                self.state = 'OPEN'
-                logger.warning(
-                    f"[{self.name}] Circuit breaker OPEN after {self.failure_count} failures"
-                )
-            
-            if old_state != self.state:
-                logger.warning(f"[{self.name}] State changed: {old_state} → {self.state}")
+            if self.state == 'HALF_OPEN':
+                self._open("recovery probe failed")
+            elif self.failure_count >= self.failure_threshold:
+                self._open(f"{self.failure_count} failures")
+            else:
+                self.last_failure_time = time.time()
+    
+    def release(self):
+        """Give back a probe slot for a call that ended without an outcome."""
+        with self.lock:
+            if self.state == 'HALF_OPEN':
+                self.probes_in_flight = max(0, self.probes_in_flight - 1)
     
     def can_execute(self):
         """Check if request can be executed.
         
+        A True result in HALF_OPEN reserves a probe slot, released by the
+        following record_success(), record_failure() or release().
+        
         Returns:
             bool: True if request should proceed, False if should fail fast
         """
@@ -72,22 +174,25 @@ class CircuitBreaker:
                 elapsed = time.time() - self.last_failure_time
                 if elapsed > self.recovery_timeout:
                     self.state = 'HALF_OPEN'
+                    self.probes_in_flight = 0
                     logger.info(
                         f"[{self.name}] Attempting recovery: OPEN → HALF_OPEN"
                     )
-                    return True
-                
-                logger.debug(f"[{self.name}] Circuit is OPEN, rejecting request")
-                return False
+                else:
+                    logger.debug(f"[{self.name}] Circuit is OPEN, rejecting request")
+                    return False
             
-            # HALF_OPEN state - allow one request to test
+            # HALF_OPEN state - admit a bounded number of probes
+            if self.probes_in_flight >= self.half_open_max_probes:
+                return False
+            self.probes_in_flight += 1
             return True
     
     def get_state(self):
         """Get current circuit breaker state.
         
         Returns:
-            dict: State information
+            dict: State information, including the rolling latency window
         """
         with self.lock:
             return {
@@ -95,7 +200,10 @@ class CircuitBreaker:
                 "failure_count": self.failure_count,
                 "threshold": self.failure_threshold,
                 "last_failure": self.last_failure_time,
-                "recovery_timeout": self.recovery_timeout
+                "recovery_timeout": self.recovery_timeout,
+                "latency_threshold": self.latency_threshold,
+                "probes_in_flight": self.probes_in_flight,
+                **self.window.summary()
             }
     
     def reset(self):
@@ -104,6 +212,8 @@ class CircuitBreaker:
             self.failure_count = 0
             self.last_failure_time = None
             self.state = 'CLOSED'
+            self.probes_in_flight = 0
+            self.window.clear()
             logger.info(f"[{self.name}] Circuit breaker manually reset")
 
 
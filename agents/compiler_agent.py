@@ -23,9 +23,12 @@ def check_language_support(language):
     return True, None
 
 
-def run_code_with_agent(question_description, code, language, test_input=None):
+def run_code_with_agent(question_description, code, language, test_input=None, on_delta=None):
     """
-    Simulate code execution via LLM. In production, replace with sandboxed runner (e.g., Judge0).
+    Simulate code execution via LLM. Used only when agents.sandbox has no
+    local toolchain for the language.
+    With on_delta, the completion is streamed and on_delta(text) is called
+    with each raw chunk; the final result is parsed the same way.
     Returns dict with either {"output": "..."} or {"error": "..."}.
     """
     print(f"DEBUG: run_code_with_agent called with language={language}", flush=True)
@@ -64,10 +67,14 @@ def run_code_with_agent(question_description, code, language, test_input=None):
     )
     
     try:
-        content = client.chat(
-            messages=[{"role": "system", "content": system}, {"role": "user", "content": user}],
-            max_tokens=400,
-        )
+        messages = [{"role": "system", "content": system}, {"role": "user", "content": user}]
+        if on_delta:
+            content = ""
+            for delta in client.chat_stream(messages=messages, max_tokens=400, agent="compiler"):
+                content += delta
+                on_delta(delta)
+        else:
+            content = client.chat(messages=messages, max_tokens=400, agent="compiler")
         parsed = _json_safe(content)
         if parsed is not None:
             return parsed
@@ -98,3 +105,61 @@ def _json_safe(text):
         return None
     return None
 
+
+class EnvelopeFieldStream:
+    """Incrementally decode the "output"/"error" string of a streamed envelope.
+    
+    The runner answers {"output": "..."} or {"error": "..."}; fed raw
+    completion chunks, feed() returns the newly available characters of that
+    string value so a client can show program output as it is generated.
+    Anything else (code fences, a non-JSON answer) yields nothing; the final
+    result is still parsed from the full content.
+    """
+    
+    _START = re.compile(r'"(output|error)"\s*:\s*"')
+    _ESCAPES = {'"': '"', "\\": "\\", "/": "/", "b": "\b", "f": "\f", "n": "\n", "r": "\r", "t": "\t"}
+    
+    def __init__(self):
+        self.field = None
+        self.done = False
+        self._pending = ""
+    
+    def feed(self, chunk):
+        if self.done:
+            return ""
+        self._pending += chunk
+        if self.field is None:
+            match = self._START.search(self._pending)
+            if not match:
+                return ""
+            self.field = match.group(1)
+            self._pending = self._pending[match.end():]
+        
+        out = []
+        i = 0
+        text = self._pending
+        while i < len(text):
+            char = text[i]
+            if char == '"':
+                self.done = True
+                break
+            if char != "\\":
+                out.append(char)
+                i += 1
+                continue
+            if i + 1 >= len(text):
+                break
+            escape = text[i + 1]
+            if escape == "u":
+                if i + 6 > len(text):
+                    break
+                try:
+                    out.append(chr(int(text[i + 2:i + 6], 16)))
+                except ValueError:
+                    pass
+                i += 6
+                continue
+            out.append(self._ESCAPES.get(escape, escape))
+            i += 2
+        self._pending = "" if self.done else text[i:]
+        return "".join(out)
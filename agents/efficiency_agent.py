@@ -6,10 +6,12 @@ from .groq_client import GroqClient
 logger = logging.getLogger(__name__)
 
 
-def analyze_efficiency(question_description, code):
+def analyze_efficiency(question_description, code, on_delta=None):
     """
     Return JSON: time_complexity, space_complexity, approach_summary,
     improvement_suggestions, optimal_method.
+    With on_delta, the completion is streamed and on_delta(text) is called
+    with each raw chunk before the full response is parsed.
     """
     client = GroqClient()
     system = (
@@ -21,10 +23,14 @@ def analyze_efficiency(question_description, code):
     user = f"Problem:\n{question_description}\nCode:\n{code}"
     
     try:
-        content = client.chat(
-            messages=[{"role": "system", "content": system}, {"role": "user", "content": user}],
-            max_tokens=300,
-        )
+        messages = [{"role": "system", "content": system}, {"role": "user", "content": user}]
+        if on_delta:
+            content = ""
+            for delta in client.chat_stream(messages=messages, max_tokens=300, agent="efficiency"):
+                content += delta
+                on_delta(delta)
+        else:
+            content = client.chat(messages=messages, max_tokens=300, agent="efficiency")
         
         # Multiple extraction strategies
         json_str = None
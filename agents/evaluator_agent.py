@@ -34,6 +34,7 @@ def evaluate_submission(question_description, testcases, code, language):
         content = client.chat(
             messages=[{"role": "system", "content": system}, {"role": "user", "content": user}],
             max_tokens=200,
+            agent="evaluator",
         )
         data = json.loads(content)
         return {
@@ -1,26 +1,121 @@
-"""Thin Groq API client wrapper with timeouts and error handling."""
+"""Thin Groq API client wrapper with timeouts and error handling.
+
+All clients in a process share one pooled requests.Session, so agent calls
+reuse keep-alive connections to api.groq.com instead of paying a TCP+TLS
+handshake each time. Requests are spread across every configured API key
+(see agents.key_pool); a request that is rate limited or fails on one key
+is retried on another, up to GROQ_MAX_ATTEMPTS times. Every POST, retries
+and fallback calls included, first waits for a request of quota from the
+client-side limiter (see agents.rate_limiter), and the model is chosen per
+agent by agents.model_router, which falls back to a faster model while the
+primary is failing or slow.
+"""
 import os
+import json
 import logging
+import threading
+import time
 import requests
+from requests.adapters import HTTPAdapter
+
+from config import (
+    GROQ_POOL_MAXSIZE, GROQ_CONNECT_TIMEOUT, GROQ_READ_TIMEOUT, GROQ_MAX_ATTEMPTS, GROQ_MAX_WAIT_SECONDS
+)
+
+from .key_pool import KeyPool, key_pool
+from .model_router import model_router
+from .rate_limiter import RateLimitExceeded, estimate_tokens, llm_limiter
 
 GROQ_API_URL = "https://api.groq.com/openai/v1/chat/completions"
 logger = logging.getLogger(__name__)
 
+# Worth retrying on another key (or the same key after its cooldown)
+RETRY_STATUSES = {401, 403, 429, 500, 502, 503, 504}
+
+_session = None
+_session_pid = None
+_session_lock = threading.Lock()
+
+
+def get_session():
+    """Return this process's pooled session for Groq requests.
+    
+    Created lazily, and re-created in a forked child so workers never share
+    sockets inherited from the parent.
+    """
+    global _session, _session_pid
+    with _session_lock:
+        if _session is None or _session_pid != os.getpid():
+            session = requests.Session()
+            adapter = HTTPAdapter(pool_connections=1, pool_maxsize=GROQ_POOL_MAXSIZE)
+            session.mount("https://", adapter)
+            session.mount("http://", adapter)
+            _session = session
+            _session_pid = os.getpid()
+        return _session
+
+
+def pool_stats():
+    """Return connection pool counters for this process.
+    
+    Returns:
+        dict: pid, pool_maxsize, connections_created, requests,
+        idle_connections, requests_per_connection
+    """
+    with _session_lock:
+        session = _session if _session_pid == os.getpid() else None
+    
+    created = served = idle = 0
+    if session is not None:
+        pools = session.get_adapter(GROQ_API_URL).poolmanager.pools
+        for key in pools.keys():
+            pool = pools[key]
+            created += pool.num_connections
+            served += pool.num_requests
+            if pool.pool is not None:
+                idle += sum(1 for conn in list(pool.pool.queue) if conn is not None)
+    
+    return {
+        "pid": os.getpid(),
+        "pool_maxsize": GROQ_POOL_MAXSIZE,
+        "connections_created": created,
+        "requests": served,
+        "idle_connections": idle,
+        "requests_per_connection": round(served / created, 2) if created else 0.0
+    }
+
 
 class GroqClient:
     """Simple wrapper for Groq chat completions with comprehensive error handling."""
 
-    def __init__(self, api_key=None):
-        # Allow fallback keys
-        env_key = os.environ.get("GROQ_API_KEY") or os.environ.get("GROQ_API_KEY_FALLBACK")
-        self.api_key = api_key or env_key
+    def __init__(self, api_key=None, pool=None, limiter=None, router=None):
+        """Initialize client.
+        
+        Args:
+            api_key: Use only this key (defaults to the shared pool of all
+                configured keys)
+            pool: KeyPool to draw keys from
+            limiter: RateLimiter gating calls (defaults to the shared one)
+            router: ModelRouter choosing models (defaults to the shared one)
+        """
+        self.pool = pool or (KeyPool([api_key]) if api_key else key_pool)
+        self.limiter = limiter or llm_limiter
+        self.router = router or model_router
+        self.api_key = self.pool.keys[0].key if len(self.pool) else None
         
         if not self.api_key:
             logger.error("GROQ_API_KEY environment variable not set!")
 
-    def chat(self, messages, model="llama-3.3-70b-versatile", temperature=0.1, max_tokens=800):
+    def chat(self, messages, model=None, temperature=0.1, max_tokens=800, agent=None):
         """Query Groq API with error handling.
         
+        Args:
+            messages: Chat messages
+            model: Explicit model; by default the agent's route decides
+            temperature: Sampling temperature
+            max_tokens: Completion limit
+            agent: Agent name ("compiler", "evaluator", ...) for routing
+        
         Returns:
             str: Response content on success
             
@@ -33,20 +128,21 @@ class GroqClient:
             raise RuntimeError(error_msg)
         
         headers = {
-            "Authorization": f"Bearer {self.api_key}",
             "Content-Type": "application/json",
         }
         payload = {
-            "model": model,
             "messages": messages,
             "temperature": temperature,
             "max_tokens": max_tokens,
         }
         
-        try:
-            resp = requests.post(GROQ_API_URL, json=payload, headers=headers, timeout=30)
+        estimated = estimate_tokens(messages, max_tokens)
+        
+        def complete(routed_model):
+            resp = self._post({"model": routed_model, **payload}, headers, tokens=estimated)
             resp.raise_for_status()
             data = resp.json()
+            self.limiter.settle(estimated, (data.get("usage") or {}).get("total_tokens"))
             
             if "choices" not in data or not data["choices"]:
                 error_msg = f"Invalid Groq response: missing choices. Response: {data}"
@@ -55,23 +151,177 @@ class GroqClient:
             
             return data["choices"][0]["message"]["content"]
         
-        except requests.exceptions.Timeout:
-            error_msg = "Groq API request timed out (30s limit)"
-            logger.error(error_msg)
-            raise RuntimeError(error_msg)
+        try:
+            return self.router.call(complete, agent=agent, model=model)
         
-        except requests.exceptions.ConnectionError as err:
-            error_msg = f"Groq API connection error: {err}"
-            logger.error(error_msg)
-            raise RuntimeError(error_msg)
+        except Exception as err:
+            raise RuntimeError(_describe_error(err))
+
+    def chat_stream(self, messages, model=None, temperature=0.1, max_tokens=800, agent=None):
+        """Query Groq API with stream=True, yielding content as it arrives.
+        
+        The response is parsed incrementally as server-sent events; each
+        ``data:`` line carries a chunk whose delta content is yielded.
+        GROQ_READ_TIMEOUT applies between chunks rather than to the whole
+        completion. Only the request is retried (or routed to a fallback
+        model): once content has been yielded, a failure is raised. The
+        router sees the time until the response headers as the call's
+        latency. Arguments are as for chat().
         
-        except requests.exceptions.HTTPError as err:
-            error_msg = f"Groq API HTTP error: {err.response.status_code} - {err.response.text}"
+        Yields:
+            str: Content deltas, which concatenate to what chat() returns
+            
+        Raises:
+            RuntimeError: On API failure, as chat()
+        """
+        if not self.api_key:
+            error_msg = "GROQ_API_KEY not configured"
             logger.error(error_msg)
             raise RuntimeError(error_msg)
         
+        headers = {
+            "Content-Type": "application/json",
+            "Accept": "text/event-stream",
+        }
+        payload = {
+            "messages": messages,
+            "temperature": temperature,
+            "max_tokens": max_tokens,
+            "stream": True,
+        }
+        
+        estimated = estimate_tokens(messages, max_tokens)
+        streamed_chars = 0
+        
+        def open_stream(routed_model):
+            resp = self._post({"model": routed_model, **payload}, headers, stream=True, tokens=estimated)
+            try:
+                resp.raise_for_status()
+            except Exception:
+                resp.close()
+                raise
+            return resp
+        
+        try:
+            with self.router.call(open_stream, agent=agent, model=model) as resp:
+                for data in iter_sse_data(resp):
+                    if data == "[DONE]":
+                        break
+                    chunk = json.loads(data)
+                    if chunk.get("error"):
+                        raise RuntimeError(f"Groq stream error: {chunk['error']}")
+                    for choice in chunk.get("choices") or []:
+                        content = (choice.get("delta") or {}).get("content")
+                        if content:
+                            streamed_chars += len(content)
+                            yield content
+            # Streams carry no usage; count the completion at the estimate's rate
+            self.limiter.settle(estimated, estimated - max_tokens + streamed_chars // 4)
+        
         except Exception as err:
-            error_msg = f"Groq API error: {type(err).__name__}: {err}"
-            logger.error(error_msg, exc_info=True)
-            raise RuntimeError(error_msg)
+            raise RuntimeError(_describe_error(err))
+
+    def _post(self, payload, headers, stream=False, tokens=0):
+        """POST to the API with a pooled key, retrying on another key.
+        
+        Each attempt takes one request of limiter quota, so retries are
+        throttled like first tries. The estimated tokens are taken with the
+        first attempt and given back if no attempt succeeds; on success the
+        caller settles them against the reported usage.
+        
+        Returns:
+            requests.Response: The first response that is not worth retrying,
+            or the last one (the caller raises for its status)
+        """
+        charged = False
+        try:
+            deadline = time.monotonic() + GROQ_MAX_WAIT_SECONDS
+            for attempt in range(1, GROQ_MAX_ATTEMPTS + 1):
+                self.limiter.acquire(0 if charged else tokens)
+                charged = True
+                key = self._acquire_key(deadline)
+                started = time.monotonic()
+                try:
+                    resp = get_session().post(
+                        GROQ_API_URL, json=payload, stream=stream,
+                        headers={**headers, "Authorization": f"Bearer {key.key}"},
+                        timeout=(GROQ_CONNECT_TIMEOUT, GROQ_READ_TIMEOUT)
+                    )
+                except requests.exceptions.ConnectionError:
+                    # Includes connect timeouts; the request never reached the API
+                    self.pool.release(key)
+                    if attempt == GROQ_MAX_ATTEMPTS:
+                        raise
+                    continue
+                except Exception:
+                    self.pool.release(key)
+                    raise
+                
+                self.pool.release(key, resp.status_code, resp.headers, latency=time.monotonic() - started)
+                if resp.status_code not in RETRY_STATUSES or attempt == GROQ_MAX_ATTEMPTS:
+                    if not resp.ok:
+                        self.limiter.settle(tokens, 0)
+                    return resp
+                logger.warning(
+                    f"Groq API returned {resp.status_code} on key {key.label} "
+                    f"(attempt {attempt}/{GROQ_MAX_ATTEMPTS}); retrying"
+                )
+                resp.close()
+        except Exception:
+            if charged:
+                self.limiter.settle(tokens, 0)
+            raise
+
+    def _acquire_key(self, deadline):
+        """Reserve a key, sleeping while every key cools down (until deadline)."""
+        while True:
+            key, wait = self.pool.acquire()
+            if key is not None:
+                return key
+            if time.monotonic() + wait > deadline:
+                raise RateLimitExceeded(
+                    f"All Groq API keys are rate limited; next one is free in {wait:.1f}s"
+                )
+            time.sleep(wait)
+
+
+def iter_sse_data(resp):
+    """Yield the data of each server-sent event in a streamed response.
+    
+    Lines are read as bytes arrive (chunk_size=None); multi-line data fields
+    are joined with newlines per the SSE spec, and comments are skipped.
+    """
+    data_lines = []
+    for line in resp.iter_lines(chunk_size=None, decode_unicode=False):
+        line = line.decode("utf-8")
+        if not line:
+            if data_lines:
+                yield "\n".join(data_lines)
+                data_lines = []
+            continue
+        if line.startswith(":"):
+            continue
+        field, _, value = line.partition(":")
+        if field == "data":
+            data_lines.append(value[1:] if value.startswith(" ") else value)
+    if data_lines:
+        yield "\n".join(data_lines)
+
+
+def _describe_error(err):
+    """Log a failed Groq call and return the message for its RuntimeError."""
+    if isinstance(err, requests.exceptions.ConnectTimeout):
+        error_msg = f"Groq API connection timed out ({GROQ_CONNECT_TIMEOUT:g}s limit)"
+    elif isinstance(err, requests.exceptions.Timeout):
+        error_msg = f"Groq API request timed out ({GROQ_READ_TIMEOUT:g}s limit)"
+    elif isinstance(err, requests.exceptions.ConnectionError):
+        error_msg = f"Groq API connection error: {err}"
+    elif isinstance(err, requests.exceptions.HTTPError):
+        error_msg = f"Groq API HTTP error: {err.response.status_code} - {err.response.text}"
+    else:
+        error_msg = f"Groq API error: {type(err).__name__}: {err}"
+        logger.error(error_msg, exc_info=True)
+        return error_msg
+    logger.error(error_msg)
+    return error_msg
 
@@ -0,0 +1,176 @@
+"""Deterministic test-case judge.
+
+Builds the submission once with agents.sandbox, runs every test case as its
+own sandboxed process (in parallel, JUDGE_WORKERS at a time) and compares
+the output with the expected output under configurable normalisation:
+
+    JUDGE_IGNORE_TRAILING_WHITESPACE  strip trailing spaces and blank lines
+    JUDGE_FLOAT_ABS_TOLERANCE         decimal tokens (with a point or an
+    JUDGE_FLOAT_REL_TOLERANCE         exponent) match within this absolute
+                                      or relative tolerance (both 0 = exact)
+
+Integer tokens are always compared exactly, so a wrong large answer is
+never accepted as "close enough".
+
+Line endings are always normalised. With JUDGE_EARLY_EXIT, test cases not
+yet started when one fails are skipped.
+"""
+import math
+import re
+import logging
+from concurrent.futures import ThreadPoolExecutor, as_completed
+
+from config import (
+    JUDGE_WORKERS, JUDGE_EARLY_EXIT, JUDGE_IGNORE_TRAILING_WHITESPACE, JUDGE_FLOAT_ABS_TOLERANCE,
+    JUDGE_FLOAT_REL_TOLERANCE
+)
+
+from .sandbox import Program
+
+logger = logging.getLogger(__name__)
+
+
+_DECIMAL = re.compile(r"[+-]?(?:\d+\.\d*|\.\d+|\d+(?=[eE]))(?:[eE][+-]?\d+)?")
+_INTEGER = re.compile(r"[+-]?\d+")
+
+
+def normalize_output(text, ignore_trailing_whitespace=True):
+    """Normalise line endings and, optionally, trailing whitespace."""
+    text = str(text if text is not None else "").replace("\r\n", "\n").replace("\r", "\n")
+    if ignore_trailing_whitespace:
+        text = "\n".join(line.rstrip() for line in text.split("\n")).rstrip("\n")
+    return text
+
+
+def _numbers_match(a, b, abs_tolerance, rel_tolerance):
+    """Compare two numeric tokens; tolerance applies only if one is a decimal."""
+    a_decimal, b_decimal = _DECIMAL.fullmatch(a), _DECIMAL.fullmatch(b)
+    if not (a_decimal or b_decimal):
+        return False
+    if not (a_decimal or _INTEGER.fullmatch(a)) or not (b_decimal or _INTEGER.fullmatch(b)):
+        return False
+    x, y = float(a), float(b)
+    if math.isinf(x) or math.isinf(y):
+        return False
+    return math.isclose(x, y, rel_tol=rel_tolerance, abs_tol=abs_tolerance)
+
+
+def outputs_match(actual, expected, ignore_trailing_whitespace=None, abs_tolerance=None, rel_tolerance=None):
+    """Compare program output with the expected output.
+
+    Args:
+        actual: Program stdout
+        expected: Expected output
+        ignore_trailing_whitespace: Defaults to JUDGE_IGNORE_TRAILING_WHITESPACE
+        abs_tolerance: Defaults to JUDGE_FLOAT_ABS_TOLERANCE
+        rel_tolerance: Defaults to JUDGE_FLOAT_REL_TOLERANCE
+
+    Returns:
+        bool
+    """
+    if ignore_trailing_whitespace is None:
+        ignore_trailing_whitespace = JUDGE_IGNORE_TRAILING_WHITESPACE
+    if abs_tolerance is None:
+        abs_tolerance = JUDGE_FLOAT_ABS_TOLERANCE
+    if rel_tolerance is None:
+        rel_tolerance = JUDGE_FLOAT_REL_TOLERANCE
+
+    actual = normalize_output(actual, ignore_trailing_whitespace)
+    expected = normalize_output(expected, ignore_trailing_whitespace)
+    if actual == expected:
+        return True
+    if not (abs_tolerance or rel_tolerance):
+        return False
+
+    # Token-wise, so "0.30000000000000004" matches "0.3"; the whitespace
+    # between tokens (odd positions after the split) must still agree exactly
+    actual_tokens, expected_tokens = re.split(r"(\s+)", actual), re.split(r"(\s+)", expected)
+    if len(actual_tokens) != len(expected_tokens):
+        return False
+    for position, (a, b) in enumerate(zip(actual_tokens, expected_tokens)):
+        if a != b and (position % 2 or not _numbers_match(a, b, abs_tolerance, rel_tolerance)):
+            return False
+    return True
+
+
+def _judge_one(program, index, testcase):
+    result = program.run(testcase.get("input"))
+    verdict = {
+        "index": index,
+        "execution_time": result.get("execution_time"),
+        "peak_memory_kb": result.get("peak_memory_kb"),
+    }
+    if result["status"] != "ok":
+        verdict["verdict"] = result["status"]
+        verdict["error"] = result["error"][:500]
+    elif outputs_match(result["output"], testcase.get("expected_output")):
+        verdict["verdict"] = "passed"
+    else:
+        verdict["verdict"] = "wrong_answer"
+    return verdict
+
+
+def judge_submission(code, language, testcases, early_exit=None, workers=None):
+    """Run code against every test case and compare outputs.
+
+    Args:
+        code: Source code
+        language: Language with an available sandbox toolchain
+        testcases: [{"input": str, "expected_output": str}, ...]
+        early_exit: Skip remaining test cases after the first failure
+            (defaults to JUDGE_EARLY_EXIT)
+        workers: Parallel test-case runs (defaults to JUDGE_WORKERS)
+
+    Returns:
+        dict: {
+            "is_correct": bool,
+            "reason": str,
+            "test_results": [{"index", "verdict", "execution_time",
+                              "peak_memory_kb", "error"?}, ...] in input order,
+                verdict being "passed", "wrong_answer", "runtime_error",
+                "time_limit", "output_limit" or "skipped"
+        }
+    """
+    if early_exit is None:
+        early_exit = JUDGE_EARLY_EXIT
+
+    with Program(code, language) as program:
+        if program.error:
+            return {"is_correct": False, "reason": program.error, "test_results": []}
+
+        results = [None] * len(testcases)
+        with ThreadPoolExecutor(max_workers=max(1, min(workers or JUDGE_WORKERS, len(testcases)))) as pool:
+            futures = {
+                pool.submit(_judge_one, program, index, testcase): index
+                for index, testcase in enumerate(testcases)
+            }
+            for future in as_completed(futures):
+                if future.cancelled():
+                    continue
+                verdict = future.result()
+                results[verdict["index"]] = verdict
+                if early_exit and verdict["verdict"] != "passed":
+                    for pending in futures:
+                        pending.cancel()
+
+    test_results = [
+        result or {"index": index, "verdict": "skipped", "execution_time": None, "peak_memory_kb": None}
+        for index, result in enumerate(results)
+    ]
+    failed = [r for r in test_results if r["verdict"] not in ("passed", "skipped")]
+    if not failed:
+        return {
+            "is_correct": True,
+            "reason": f"All {len(testcases)} test cases passed",
+            "test_results": test_results
+        }
+
+    first = failed[0]
+    if first["verdict"] == "wrong_answer":
+        detail = "Wrong answer"
+    elif first["verdict"] == "runtime_error" and not first["error"].startswith("Runtime error"):
+        detail = f"Runtime error\n{first['error']}"
+    else:
+        detail = first["error"]
+    reason = f"Test case {first['index'] + 1} of {len(testcases)}: {detail}"
+    return {"is_correct": False, "reason": reason, "test_results": test_results}
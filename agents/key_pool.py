@@ -0,0 +1,270 @@
+"""Pool of Groq API keys shared by every client in a process.
+
+Requests are spread over all configured keys (GROQ_API_KEYS, a comma
+separated list, plus GROQ_API_KEY and GROQ_API_KEY_FALLBACK). Each key
+tracks the rate-limit headers of its last response, so the pool prefers the
+key with the fewest calls in flight and the most quota left.
+
+A key answering 429 cools down for its Retry-After (or the matching
+x-ratelimit-reset-* header, or an exponential backoff when neither is
+sent), plus jitter so keys freed at the same moment are not hit by a
+synchronised burst. A key rejected as unauthorised, or whose requests fail
+in transit GROQ_KEY_EJECT_AFTER times in a row, is ejected for
+GROQ_KEY_EJECT_SECONDS. Server errors are left to the per-model circuit
+breakers (agents.model_router): a model that is down says nothing about the
+key.
+"""
+import os
+import random
+import re
+import threading
+import time
+import logging
+from email.utils import parsedate_to_datetime
+
+from config import (
+    GROQ_KEY_EJECT_AFTER, GROQ_KEY_EJECT_SECONDS, GROQ_BACKOFF_BASE_SECONDS,
+    GROQ_BACKOFF_MAX_SECONDS, GROQ_BACKOFF_JITTER
+)
+
+from .circuit_breaker import RollingWindow
+
+logger = logging.getLogger(__name__)
+
+_DURATION_PART = re.compile(r"(\d+(?:\.\d+)?)(ms|h|m|s)")
+_DURATION_UNITS = {"h": 3600.0, "m": 60.0, "s": 1.0, "ms": 0.001}
+
+
+def configured_keys():
+    """Return the API keys configured in the environment, without duplicates."""
+    keys = [k.strip() for k in os.environ.get("GROQ_API_KEYS", "").split(",")]
+    keys += [os.environ.get("GROQ_API_KEY"), os.environ.get("GROQ_API_KEY_FALLBACK")]
+    return list(dict.fromkeys(k for k in keys if k))
+
+
+def parse_duration(value):
+    """Parse a rate-limit duration ("7.66s", "2m59.56s", "120ms" or "30").
+
+    Returns:
+        float or None: Seconds
+    """
+    if value is None:
+        return None
+    value = str(value).strip()
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        pass
+    parts = _DURATION_PART.findall(value)
+    if not parts or "".join(n + u for n, u in parts) != value:
+        return None
+    return sum(float(n) * _DURATION_UNITS[u] for n, u in parts)
+
+
+def parse_retry_after(value):
+    """Parse a Retry-After header (delta seconds or an HTTP date).
+
+    Returns:
+        float or None: Seconds to wait
+    """
+    seconds = parse_duration(value)
+    if seconds is not None or not value:
+        return seconds
+    try:
+        return max(0.0, parsedate_to_datetime(value).timestamp() - time.time())
+    except (TypeError, ValueError):
+        return None
+
+
+def _header_int(headers, name):
+    try:
+        return int(headers.get(name))
+    except (TypeError, ValueError):
+        return None
+
+
+class ApiKey:
+    """State of one key in the pool."""
+
+    def __init__(self, key):
+        self.key = key
+        self.in_flight = 0
+        self.remaining_requests = None
+        self.remaining_tokens = None
+        self.available_at = 0.0
+        self.consecutive_failures = 0
+        self.rate_limited_streak = 0
+        self.ejected = False
+        self.window = RollingWindow()
+
+        self.requests = 0
+        self.failures = 0
+        self.rate_limited = 0
+        self.ejections = 0
+
+    @property
+    def label(self):
+        """Masked key for logs and stats."""
+        return f"...{self.key[-4:]}"
+
+
+class KeyPool:
+    """Thread-safe pool choosing a key for each Groq request."""
+
+    def __init__(self, keys, eject_after=GROQ_KEY_EJECT_AFTER, eject_seconds=GROQ_KEY_EJECT_SECONDS,
+                 backoff_base=GROQ_BACKOFF_BASE_SECONDS, backoff_max=GROQ_BACKOFF_MAX_SECONDS,
+                 jitter=GROQ_BACKOFF_JITTER):
+        """Initialize pool.
+
+        Args:
+            keys: API keys
+            eject_after: Consecutive failures before a key is ejected
+            eject_seconds: How long an ejected key is left out
+            backoff_base: First backoff after a 429 without Retry-After
+            backoff_max: Longest cooldown applied to a key
+            jitter: Extra random fraction (0..jitter) added to each cooldown
+        """
+        self.keys = [ApiKey(key) for key in dict.fromkeys(keys)]
+        self.eject_after = eject_after
+        self.eject_seconds = eject_seconds
+        self.backoff_base = backoff_base
+        self.backoff_max = backoff_max
+        self.jitter = jitter
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self.keys)
+
+    def acquire(self):
+        """Reserve the best key for a request.
+
+        Returns:
+            tuple: (ApiKey, 0.0) when a key can be used now; (None, seconds)
+            until the soonest key cools down when all are cooling down;
+            (None, None) if no keys are configured.
+        """
+        with self._lock:
+            if not self.keys:
+                return None, None
+            now = time.monotonic()
+            ready = [k for k in self.keys if k.available_at <= now]
+            if not ready:
+                return None, min(k.available_at for k in self.keys) - now
+            key = min(ready, key=lambda k: (
+                k.in_flight,
+                -(k.remaining_requests if k.remaining_requests is not None else float("inf")),
+                -(k.remaining_tokens if k.remaining_tokens is not None else float("inf")),
+                k.requests
+            ))
+            if key.ejected:
+                key.ejected = False
+                logger.info(f"Groq key {key.label} restored to the pool")
+            key.in_flight += 1
+            key.requests += 1
+            return key, 0.0
+
+    def release(self, key, status=None, headers=None, latency=None):
+        """Return a key after a request, recording its outcome.
+
+        Args:
+            key: ApiKey from acquire()
+            status: HTTP status code, or None if the request failed in transit
+            headers: Response headers (rate-limit headers are recorded)
+            latency: Seconds until the response arrived
+        """
+        headers = headers or {}
+        with self._lock:
+            key.in_flight = max(0, key.in_flight - 1)
+            key.window.add(latency, ok=status is not None and status < 400)
+            now = time.monotonic()
+
+            remaining_requests = _header_int(headers, "x-ratelimit-remaining-requests")
+            remaining_tokens = _header_int(headers, "x-ratelimit-remaining-tokens")
+            if remaining_requests is not None:
+                key.remaining_requests = remaining_requests
+            if remaining_tokens is not None:
+                key.remaining_tokens = remaining_tokens
+
+            if status is not None and status < 400:
+                key.consecutive_failures = 0
+                key.rate_limited_streak = 0
+                if remaining_requests == 0:
+                    # Quota spent: leave the key alone until its window resets
+                    reset = parse_duration(headers.get("x-ratelimit-reset-requests"))
+                    if reset:
+                        key.available_at = max(key.available_at, now + self._jittered(reset))
+                return
+
+            key.failures += 1
+            if status == 429:
+                # Throttled, not broken: cool down without counting towards ejection
+                key.rate_limited += 1
+                key.rate_limited_streak += 1
+                key.available_at = max(key.available_at, now + self._cooldown(key, headers))
+                return
+            if status in (401, 403):
+                self._eject(key, now, f"HTTP {status}")
+                return
+            if status is not None:
+                # A bad request or a failing model says nothing about the key
+                return
+
+            key.consecutive_failures += 1
+            if key.consecutive_failures >= self.eject_after:
+                self._eject(key, now, f"{key.consecutive_failures} consecutive failures")
+
+    def _cooldown(self, key, headers):
+        delay = parse_retry_after(headers.get("retry-after"))
+        if delay is None:
+            resets = [
+                parse_duration(headers.get(name))
+                for name in ("x-ratelimit-reset-requests", "x-ratelimit-reset-tokens")
+            ]
+            resets = [r for r in resets if r is not None]
+            delay = max(resets) if resets else None
+        if delay is None:
+            delay = self.backoff_base * 2 ** (key.rate_limited_streak - 1)
+        return self._jittered(min(delay, self.backoff_max))
+
+    def _jittered(self, delay):
+        return delay * (1 + random.uniform(0, self.jitter))
+
+    def _eject(self, key, now, reason):
+        key.ejected = True
+        key.ejections += 1
+        key.consecutive_failures = 0
+        key.available_at = max(key.available_at, now + self.eject_seconds)
+        logger.warning(f"Groq key {key.label} ejected for {self.eject_seconds:g}s ({reason})")
+
+    def stats(self):
+        """Return per-key counters for this process.
+
+        Returns:
+            dict: size, available, keys (label, in_flight, remaining_requests,
+            remaining_tokens, cooldown_seconds, ejected, requests, failures,
+            rate_limited, ejections, and rolling samples, p50, p95 and
+            error_rate)
+        """
+        with self._lock:
+            now = time.monotonic()
+            keys = [{
+                "key": k.label,
+                "in_flight": k.in_flight,
+                "remaining_requests": k.remaining_requests,
+                "remaining_tokens": k.remaining_tokens,
+                "cooldown_seconds": round(max(0.0, k.available_at - now), 2),
+                "ejected": k.ejected and k.available_at > now,
+                "requests": k.requests,
+                "failures": k.failures,
+                "rate_limited": k.rate_limited,
+                "ejections": k.ejections,
+                **k.window.summary()
+            } for k in self.keys]
+        return {
+            "size": len(keys),
+            "available": sum(1 for k in keys if k["cooldown_seconds"] == 0),
+            "keys": keys
+        }
+
+
+key_pool = KeyPool(configured_keys())
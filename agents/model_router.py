@@ -0,0 +1,195 @@
+"""Per-agent model routing with latency-aware circuit breaking.
+
+Each agent has a primary model and, optionally, a faster fallback. Every
+model gets its own CircuitBreaker, which opens after consecutive failures
+or when the rolling p95 latency passes GROQ_BREAKER_LATENCY_SECONDS. While
+the primary's circuit is open, or when a call to it fails, the agent's call
+goes to the fallback, so a provider slowdown costs answer quality rather
+than 30-second timeouts. An open circuit admits GROQ_BREAKER_HALF_OPEN_PROBES
+probe calls at a time once GROQ_BREAKER_RECOVERY_SECONDS have passed, and
+the first fast, successful probe closes it again.
+
+Only 5xx responses, timeouts and transport errors count against a model.
+A 4xx (including 429) or running out of quota says nothing about the
+model's health, so it is raised as is: no failure is recorded and the
+fallback is not tried.
+
+Models are configured per agent with GROQ_MODEL_<AGENT> and
+GROQ_FALLBACK_MODEL_<AGENT> (empty to disable the fallback), e.g.
+GROQ_FALLBACK_MODEL_EVALUATOR=llama-3.1-8b-instant.
+"""
+import os
+import threading
+import time
+import logging
+
+import requests
+
+from config import (
+    GROQ_BREAKER_FAILURES, GROQ_BREAKER_RECOVERY_SECONDS, GROQ_BREAKER_LATENCY_SECONDS,
+    GROQ_BREAKER_HALF_OPEN_PROBES, GROQ_BREAKER_MIN_SAMPLES
+)
+
+from .circuit_breaker import CircuitBreaker
+from .rate_limiter import RateLimitExceeded
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_MODEL = "llama-3.3-70b-versatile"
+FAST_MODEL = "llama-3.1-8b-instant"
+
+# Agent -> (primary, fallback or None)
+DEFAULT_ROUTES = {
+    "compiler": (DEFAULT_MODEL, FAST_MODEL),
+    "evaluator": (DEFAULT_MODEL, FAST_MODEL),
+    "efficiency": (DEFAULT_MODEL, FAST_MODEL),
+    # Generated expected outputs become hidden tests that students are graded
+    # against, and generation is not latency sensitive: never degrade it
+    "testcases": (DEFAULT_MODEL, None),
+}
+
+
+def is_model_failure(err):
+    """Whether err says the model is unhealthy rather than that the call was refused."""
+    if isinstance(err, RateLimitExceeded):
+        return False
+    response = getattr(err, "response", None)
+    if isinstance(err, requests.exceptions.HTTPError) and response is not None:
+        return response.status_code >= 500
+    return True
+
+
+def configured_routes():
+    """Return DEFAULT_ROUTES with GROQ_MODEL_* / GROQ_FALLBACK_MODEL_* applied."""
+    routes = {}
+    for agent, (primary, fallback) in DEFAULT_ROUTES.items():
+        suffix = agent.upper()
+        primary = os.environ.get(f"GROQ_MODEL_{suffix}", primary)
+        fallback = os.environ.get(f"GROQ_FALLBACK_MODEL_{suffix}", fallback or "") or None
+        routes[agent] = (primary, fallback if fallback != primary else None)
+    return routes
+
+
+class ModelRouter:
+    """Chooses the model for each call and tracks per-model health."""
+
+    def __init__(self, routes=None, failure_threshold=GROQ_BREAKER_FAILURES,
+                 recovery_timeout=GROQ_BREAKER_RECOVERY_SECONDS,
+                 latency_threshold=GROQ_BREAKER_LATENCY_SECONDS,
+                 half_open_max_probes=GROQ_BREAKER_HALF_OPEN_PROBES,
+                 min_samples=GROQ_BREAKER_MIN_SAMPLES):
+        """Initialize router.
+
+        Args:
+            routes: {agent: (primary, fallback or None)}
+            failure_threshold: Consecutive failures that open a model's circuit
+            recovery_timeout: Seconds an open circuit waits before probing
+            latency_threshold: p95 seconds that open a circuit (0/None: off)
+            half_open_max_probes: Concurrent probes while half open
+            min_samples: Calls before latency can open a circuit
+        """
+        self.routes = routes if routes is not None else configured_routes()
+        self.breaker_options = {
+            "failure_threshold": failure_threshold,
+            "recovery_timeout": recovery_timeout,
+            "latency_threshold": latency_threshold or None,
+            "half_open_max_probes": half_open_max_probes,
+            "min_samples": min_samples
+        }
+
+        self._lock = threading.Lock()
+        self._breakers = {}
+        self.fallbacks = {}
+
+    def breaker(self, model):
+        """Return the circuit breaker for model, creating it on first use."""
+        with self._lock:
+            breaker = self._breakers.get(model)
+            if breaker is None:
+                breaker = self._breakers[model] = CircuitBreaker(
+                    name=f"Groq:{model}", **self.breaker_options
+                )
+            return breaker
+
+    def models_for(self, agent=None, model=None):
+        """Return the models to try, in order, for a call.
+
+        An explicit model is used alone; otherwise the agent's primary and
+        fallback (DEFAULT_MODEL for unknown agents).
+        """
+        if model:
+            return [model]
+        primary, fallback = self.routes.get(agent, (DEFAULT_MODEL, None))
+        return [primary, fallback] if fallback else [primary]
+
+    def call(self, fn, agent=None, model=None):
+        """Run fn(model) on the first healthy model, falling back on failure.
+
+        Args:
+            fn: Callable taking the model name; exceptions for which
+                is_model_failure() holds count as a failure of that model
+            agent: Agent name selecting the route
+            model: Explicit model (no fallback)
+
+        Returns:
+            fn's result
+
+        Raises:
+            A refused call's exception (4xx, quota) straight away, the last
+            model's exception, or RuntimeError if every circuit is open
+        """
+        models = self.models_for(agent, model)
+        last_error = None
+        for candidate in models:
+            breaker = self.breaker(candidate)
+            if not breaker.can_execute():
+                continue
+            started = time.monotonic()
+            try:
+                result = fn(candidate)
+            except Exception as e:
+                if not is_model_failure(e):
+                    breaker.release()
+                    raise
+                breaker.record_failure()
+                last_error = e
+                if candidate != models[-1]:
+                    logger.warning(f"Model {candidate} failed for {agent or 'call'}; trying fallback: {e}")
+                continue
+            breaker.record_success(time.monotonic() - started)
+            if candidate != models[0]:
+                with self._lock:
+                    self.fallbacks[agent] = self.fallbacks.get(agent, 0) + 1
+            return result
+
+        if last_error is not None:
+            raise last_error
+        raise RuntimeError(f"Groq API unavailable: circuit open for {', '.join(models)}")
+
+    def reset(self):
+        """Forget every model's health and the fallback counts."""
+        with self._lock:
+            self._breakers.clear()
+            self.fallbacks.clear()
+
+    def stats(self):
+        """Return routes, per-model breaker state and fallback counts.
+
+        Returns:
+            dict: routes ({agent: {"primary", "fallback"}}), models
+            ({model: CircuitBreaker.get_state()}), fallbacks ({agent: int})
+        """
+        with self._lock:
+            breakers = dict(self._breakers)
+            fallbacks = dict(self.fallbacks)
+        return {
+            "routes": {
+                agent: {"primary": primary, "fallback": fallback}
+                for agent, (primary, fallback) in self.routes.items()
+            },
+            "models": {model: breaker.get_state() for model, breaker in breakers.items()},
+            "fallbacks": fallbacks
+        }
+
+
+model_router = ModelRouter()
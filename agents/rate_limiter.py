@@ -0,0 +1,333 @@
+"""Client-side rate limiting of LLM calls.
+
+Every Groq call first takes one request and its estimated tokens (prompt
+characters / 4 plus max_tokens) from a pair of token buckets that refill at
+GROQ_REQUESTS_PER_MINUTE and GROQ_TOKENS_PER_MINUTE per configured API key.
+Once the response reports actual usage, the unused part of the estimate is
+returned. This keeps us just under the provider's quota instead of bouncing
+off it with bursts of 429s.
+
+With GROQ_LIMITER_BACKEND=file (the default) the bucket levels live in a
+small state file updated under an exclusive flock, so every gunicorn worker
+on the host draws from the same buckets; "memory" keeps them per process.
+Whoever can write the state file can starve or unthrottle every worker, so
+like the build cache it lives in a directory private to the service user
+(created 0700 under its home); while that directory is not a real
+directory owned by this user with no group or other permissions, each
+process falls back to its own buckets.
+
+Calls that cannot proceed wait instead of failing. Waiters are queued per
+tenant (a batch or a student, set with llm_tenant() by the caller) and
+served round-robin, so one batch submitting in bulk cannot starve the rest.
+Each tenant's queue holds at most GROQ_LIMITER_QUEUE_SIZE calls, and no call
+waits longer than GROQ_LIMITER_MAX_WAIT_SECONDS.
+"""
+import contextvars
+import fcntl
+import json
+import os
+import stat
+import threading
+import time
+import logging
+from collections import OrderedDict, deque
+from contextlib import contextmanager
+
+from config import (
+    GROQ_LIMITER_ENABLED, GROQ_LIMITER_BACKEND, GROQ_LIMITER_STATE_PATH, GROQ_REQUESTS_PER_MINUTE,
+    GROQ_TOKENS_PER_MINUTE, GROQ_LIMITER_QUEUE_SIZE, GROQ_LIMITER_MAX_WAIT_SECONDS
+)
+
+logger = logging.getLogger(__name__)
+
+_tenant = contextvars.ContextVar("llm_tenant", default=None)
+
+
+@contextmanager
+def llm_tenant(tenant):
+    """Attribute LLM calls made in this block to tenant (e.g. "batch:<id>").
+
+    Threads started from the block only inherit the tenant when run in a
+    copy of the current context (contextvars.copy_context().run).
+    """
+    token = _tenant.set(tenant)
+    try:
+        yield
+    finally:
+        _tenant.reset(token)
+
+
+def current_tenant():
+    """Return the tenant set by the innermost llm_tenant() block, if any."""
+    return _tenant.get()
+
+
+def estimate_tokens(messages, max_tokens):
+    """Estimate the tokens a chat call will count against the quota."""
+    chars = sum(len(str(message.get("content") or "")) for message in messages)
+    return chars // 4 + max_tokens
+
+
+class RateLimitExceeded(RuntimeError):
+    """Raised when a call cannot be queued or waits too long."""
+
+
+class _MemoryState:
+    """Bucket levels held in this process."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._state = {}
+
+    @contextmanager
+    def transaction(self):
+        with self._lock:
+            yield self._state
+
+
+class _FileState:
+    """Bucket levels in a JSON file shared by every process on the host."""
+
+    def __init__(self, path):
+        self.path = path
+        self.directory = os.path.dirname(os.path.abspath(path))
+        self._fallback = _MemoryState()
+        self._warned = False
+
+    def _is_private(self):
+        """Return True if the state file's directory is a real directory only this user can access."""
+        try:
+            os.makedirs(self.directory, mode=0o700, exist_ok=True)
+            info = os.lstat(self.directory)
+        except OSError:
+            return False
+        return stat.S_ISDIR(info.st_mode) and info.st_uid == os.geteuid() and not info.st_mode & 0o077
+
+    @contextmanager
+    def transaction(self):
+        if not self._is_private():
+            if not self._warned:
+                self._warned = True
+                logger.warning(f"Limiter state directory {self.directory} is not private; using per-process buckets")
+            with self._fallback.transaction() as state:
+                yield state
+            return
+        # Opened per transaction: an flock taken through a descriptor
+        # inherited across fork() would be shared with the parent
+        fd = os.open(self.path, os.O_RDWR | os.O_CREAT | os.O_NOFOLLOW, 0o600)
+        with os.fdopen(fd, "r+") as handle:
+            fcntl.flock(handle, fcntl.LOCK_EX)
+            handle.seek(0)
+            try:
+                state = json.loads(handle.read() or "{}")
+            except ValueError:
+                state = {}
+            yield state
+            handle.seek(0)
+            handle.truncate()
+            handle.write(json.dumps(state))
+            handle.flush()
+
+
+class TokenBucket:
+    """Request and token buckets refilled continuously, one minute deep."""
+
+    def __init__(self, requests_per_minute, tokens_per_minute, state):
+        self.requests_per_minute = requests_per_minute
+        self.tokens_per_minute = tokens_per_minute
+        self.state = state
+
+    def _refill(self, state, now):
+        elapsed = max(0.0, now - state.get("updated", now))
+        state["requests"] = min(
+            self.requests_per_minute,
+            state.get("requests", self.requests_per_minute) + elapsed * self.requests_per_minute / 60
+        )
+        state["tokens"] = min(
+            self.tokens_per_minute,
+            state.get("tokens", self.tokens_per_minute) + elapsed * self.tokens_per_minute / 60
+        )
+        state["updated"] = now
+
+    def try_take(self, tokens):
+        """Take one request and tokens if both buckets hold enough.
+
+        Returns:
+            float: 0.0 if taken, else seconds until both buckets could cover it
+        """
+        # A call larger than the whole bucket waits for a full bucket
+        tokens = min(tokens, self.tokens_per_minute)
+        with self.state.transaction() as state:
+            now = time.time()
+            self._refill(state, now)
+            missing_requests = 1 - state["requests"]
+            missing_tokens = tokens - state["tokens"]
+            if missing_requests <= 0 and missing_tokens <= 0:
+                state["requests"] -= 1
+                state["tokens"] -= tokens
+                return 0.0
+            return max(
+                missing_requests * 60 / self.requests_per_minute,
+                missing_tokens * 60 / self.tokens_per_minute
+            )
+
+    def give_back(self, tokens):
+        """Return unused tokens (negative to charge more than was taken)."""
+        with self.state.transaction() as state:
+            self._refill(state, time.time())
+            state["tokens"] = max(-self.tokens_per_minute, min(self.tokens_per_minute, state["tokens"] + tokens))
+
+    def levels(self):
+        with self.state.transaction() as state:
+            self._refill(state, time.time())
+            return {"requests": round(state["requests"], 2), "tokens": round(state["tokens"], 1)}
+
+
+class _Waiter:
+    __slots__ = ("tenant",)
+
+    def __init__(self, tenant):
+        self.tenant = tenant
+
+
+class RateLimiter:
+    """Token-bucket limiter with a bounded round-robin queue per tenant."""
+
+    def __init__(self, requests_per_minute, tokens_per_minute, backend="memory", state_path=None,
+                 queue_size=GROQ_LIMITER_QUEUE_SIZE, max_wait=GROQ_LIMITER_MAX_WAIT_SECONDS, enabled=True):
+        """Initialize limiter.
+
+        Args:
+            requests_per_minute: Request bucket size and refill rate
+            tokens_per_minute: Token bucket size and refill rate
+            backend: "memory" (per process) or "file" (shared via state_path)
+            state_path: State file for the file backend
+            queue_size: Most calls one tenant may have waiting
+            max_wait: Longest a call waits before RateLimitExceeded
+            enabled: When False, acquire() never waits
+        """
+        state = _FileState(state_path) if backend == "file" else _MemoryState()
+        self.backend = backend
+        self.bucket = TokenBucket(requests_per_minute, tokens_per_minute, state)
+        self.queue_size = queue_size
+        self.max_wait = max_wait
+        self.enabled = enabled
+
+        self._cond = threading.Condition()
+        self._queues = OrderedDict()
+        self.admitted = 0
+        self.waited = 0
+        self.rejected = 0
+        self.timeouts = 0
+
+    def _next(self):
+        # Tenants take turns: the head tenant's oldest waiter goes next
+        for queue in self._queues.values():
+            return queue[0]
+        return None
+
+    def _leave(self, waiter):
+        queue = self._queues[waiter.tenant]
+        queue.remove(waiter)
+        # A served tenant moves to the back of the line
+        self._queues.pop(waiter.tenant)
+        if queue:
+            self._queues[waiter.tenant] = queue
+        self._cond.notify_all()
+
+    def acquire(self, tokens, tenant=None):
+        """Wait for one request and tokens of quota.
+
+        Args:
+            tokens: Estimated tokens for the call
+            tenant: Fair-queue key (defaults to current_tenant())
+
+        Raises:
+            RateLimitExceeded: The tenant's queue is full, or the wait
+                exceeded max_wait
+        """
+        if not self.enabled:
+            return
+        if tenant is None:
+            tenant = current_tenant()
+
+        with self._cond:
+            queue = self._queues.setdefault(tenant, deque())
+            if len(queue) >= self.queue_size:
+                self.rejected += 1
+                if not queue:
+                    self._queues.pop(tenant)
+                raise RateLimitExceeded(f"Too many queued LLM calls for {tenant or 'this worker'}")
+            waiter = _Waiter(tenant)
+            queue.append(waiter)
+
+            deadline = time.monotonic() + self.max_wait
+            waited = False
+            while True:
+                if self._next() is waiter:
+                    wait = self.bucket.try_take(tokens)
+                    if not wait:
+                        self._leave(waiter)
+                        self.admitted += 1
+                        self.waited += waited
+                        return
+                else:
+                    wait = None
+                waited = True
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    self._leave(waiter)
+                    self.timeouts += 1
+                    raise RateLimitExceeded(
+                        f"LLM rate limit: no quota within {self.max_wait:g}s"
+                    )
+                self._cond.wait(min(wait, remaining) if wait is not None else remaining)
+
+    def settle(self, estimated, actual):
+        """Correct the bucket once a call's actual token usage is known."""
+        if self.enabled and actual is not None:
+            self.bucket.give_back(estimated - actual)
+
+    def stats(self):
+        """Return limiter counters for this process.
+
+        Returns:
+            dict: enabled, backend, requests_per_minute, tokens_per_minute,
+            available, queued, tenants_waiting, admitted, waited, rejected,
+            timeouts
+        """
+        with self._cond:
+            queued = sum(len(queue) for queue in self._queues.values())
+            counters = {
+                "queued": queued,
+                "tenants_waiting": len(self._queues),
+                "admitted": self.admitted,
+                "waited": self.waited,
+                "rejected": self.rejected,
+                "timeouts": self.timeouts
+            }
+        try:
+            available = self.bucket.levels()
+        except OSError:
+            available = None
+        return {
+            "enabled": self.enabled,
+            "backend": self.backend,
+            "requests_per_minute": self.bucket.requests_per_minute,
+            "tokens_per_minute": self.bucket.tokens_per_minute,
+            "available": available,
+            **counters
+        }
+
+
+def _create_default_limiter():
+    from .key_pool import key_pool
+    keys = max(1, len(key_pool))
+    return RateLimiter(
+        GROQ_REQUESTS_PER_MINUTE * keys, GROQ_TOKENS_PER_MINUTE * keys,
+        backend=GROQ_LIMITER_BACKEND, state_path=GROQ_LIMITER_STATE_PATH,
+        enabled=GROQ_LIMITER_ENABLED
+    )
+
+
+llm_limiter = _create_default_limiter()
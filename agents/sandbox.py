@@ -0,0 +1,361 @@
+"""Local sandboxed code runner.
+
+Runs student code in a subprocess instead of asking the LLM to simulate it.
+Each run gets a throwaway working directory, a minimal environment, its own
+session (so the whole process group can be killed) and resource limits:
+
+    CPU time        RLIMIT_CPU       SANDBOX_CPU_SECONDS
+    wall clock      killed by timer  SANDBOX_WALL_SECONDS
+    memory          RLIMIT_AS, or the runtime's heap flag for the JVM and
+                    Node, which reserve far more address space than they use
+                                     SANDBOX_MEMORY_MB
+    output size     RLIMIT_FSIZE on the stdout/stderr files
+                                     SANDBOX_OUTPUT_KB
+    processes       RLIMIT_NPROC     SANDBOX_MAX_PROCESSES
+
+Rlimits are not isolation: run as the app's own user, student code could
+read the service's environment (/proc/<ppid>/environ holds the API keys),
+credentials and source, and open network connections. The sandbox is
+therefore only used when one of these is configured, and is_available()
+reports False otherwise so callers fall back to the LLM runner:
+
+    SANDBOX_USER      dedicated unprivileged account the code runs as
+                      (the service must be able to switch to it)
+    SANDBOX_WRAPPER   command prefix providing namespace/seccomp isolation,
+                      e.g. "nsjail --quiet --config /etc/nsjail/judge.cfg --"
+
+RLIMIT_NPROC counts every process of the user, so it is only applied with
+SANDBOX_USER; under the app's own uid it would also count the service's
+workers and JVM threads.
+
+Execution time and peak memory come from the child's rusage. A language
+whose toolchain is not installed is reported by is_available(), and the
+caller falls back to the LLM runner.
+"""
+import os
+import re
+import resource
+import shutil
+import signal
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+import logging
+
+from config import (
+    SANDBOX_ENABLED, SANDBOX_CPU_SECONDS, SANDBOX_WALL_SECONDS, SANDBOX_MEMORY_MB,
+    SANDBOX_OUTPUT_KB, SANDBOX_MAX_PROCESSES, SANDBOX_COMPILE_SECONDS, SANDBOX_USER,
+    SANDBOX_WRAPPER
+)
+
+from .build_cache import BUILD_CACHE_ENABLED, build_cache
+
+logger = logging.getLogger(__name__)
+
+# Compilers get more room than the programs they build
+COMPILE_MEMORY_MB = 1024
+COMPILE_OUTPUT_KB = 64 * 1024  # also caps the size of the built binary
+COMPILE_MAX_PROCESSES = 256
+
+
+def _java_class_name(code):
+    match = re.search(r"public\s+(?:final\s+|abstract\s+)*class\s+(\w+)", code)
+    return match.group(1) if match else "Main"
+
+
+# source: file name (Java's must match the public class)
+# compile/run: argv builders taking (workdir, source_path, code)
+# tools: executables that must be on PATH
+# heap_flag: runtime heap limit used instead of RLIMIT_AS
+TOOLCHAINS = {
+    "python": {
+        "source": lambda code: "main.py",
+        "compile": None,
+        "run": lambda workdir, source, code: [sys.executable, "-I", "-B", source],
+        "tools": [],
+        "heap_flag": False
+    },
+    "c": {
+        "source": lambda code: "main.c",
+        "compile": lambda workdir, source, code: [
+            "gcc", "-O2", "-std=c11", "-o", os.path.join(workdir, "main"), source, "-lm"
+        ],
+        "run": lambda workdir, source, code: [os.path.join(workdir, "main")],
+        "tools": ["gcc"],
+        "heap_flag": False
+    },
+    "cpp": {
+        "source": lambda code: "main.cpp",
+        "compile": lambda workdir, source, code: [
+            "g++", "-O2", "-std=c++17", "-o", os.path.join(workdir, "main"), source
+        ],
+        "run": lambda workdir, source, code: [os.path.join(workdir, "main")],
+        "tools": ["g++"],
+        "heap_flag": False
+    },
+    "java": {
+        "source": lambda code: f"{_java_class_name(code)}.java",
+        "compile": lambda workdir, source, code: ["javac", "-d", workdir, source],
+        "run": lambda workdir, source, code: [
+            "java", f"-Xmx{SANDBOX_MEMORY_MB}m", "-Xss64m", "-XX:+UseSerialGC",
+            "-cp", workdir, _java_class_name(code)
+        ],
+        "tools": ["javac", "java"],
+        "heap_flag": True
+    },
+    "javascript": {
+        "source": lambda code: "main.js",
+        "compile": None,
+        "run": lambda workdir, source, code: [
+            "node", f"--max-old-space-size={SANDBOX_MEMORY_MB}", source
+        ],
+        "tools": ["node"],
+        "heap_flag": True
+    },
+}
+
+_availability = {}
+
+
+def is_isolated():
+    """Return True if runs are isolated from the service (see module docstring)."""
+    if SANDBOX_WRAPPER:
+        return shutil.which(SANDBOX_WRAPPER[0]) is not None
+    return SANDBOX_USER is not None
+
+
+def is_available(language):
+    """Return True if the sandbox is enabled and isolated, and language's toolchain is installed."""
+    language = (language or "").lower()
+    if not SANDBOX_ENABLED or language not in TOOLCHAINS or not is_isolated():
+        return False
+    if language not in _availability:
+        _availability[language] = all(shutil.which(tool) for tool in TOOLCHAINS[language]["tools"])
+    return _availability[language]
+
+
+def _limits(cpu_seconds, memory_mb, output_kb, max_processes):
+    """Return a preexec_fn applying rlimits in the child (syscalls only)."""
+    def apply():
+        resource.setrlimit(resource.RLIMIT_CORE, (0, 0))
+        if cpu_seconds:
+            # The hard limit one second later turns SIGXCPU into SIGKILL
+            resource.setrlimit(resource.RLIMIT_CPU, (cpu_seconds, cpu_seconds + 1))
+        if memory_mb:
+            size = memory_mb * 1024 * 1024
+            resource.setrlimit(resource.RLIMIT_AS, (size, size))
+        if output_kb:
+            size = output_kb * 1024
+            resource.setrlimit(resource.RLIMIT_FSIZE, (size, size))
+        if max_processes and SANDBOX_USER:
+            resource.setrlimit(resource.RLIMIT_NPROC, (max_processes, max_processes))
+    return apply
+
+
+def _execute(argv, workdir, stdin_path, wall_seconds, preexec_fn):
+    """Run argv with stdout/stderr captured to files in workdir.
+
+    Returns:
+        dict: exit_code, signal, timed_out, wall_time, cpu_time,
+            peak_memory_kb, stdout, stderr, output_truncated
+    """
+    stdout_path = os.path.join(workdir, ".stdout")
+    stderr_path = os.path.join(workdir, ".stderr")
+    env = {"PATH": os.environ.get("PATH", "/usr/bin:/bin"), "HOME": workdir, "LANG": "C.UTF-8"}
+
+    with open(stdin_path, "rb") as stdin, open(stdout_path, "wb") as stdout, \
+            open(stderr_path, "wb") as stderr:
+        started = time.monotonic()
+        process = subprocess.Popen(
+            SANDBOX_WRAPPER + argv, cwd=workdir, env=env, stdin=stdin, stdout=stdout, stderr=stderr,
+            start_new_session=True, preexec_fn=preexec_fn, user=SANDBOX_USER, close_fds=True
+        )
+        timed_out = threading.Event()
+
+        def kill():
+            timed_out.set()
+            try:
+                os.killpg(process.pid, signal.SIGKILL)
+            except ProcessLookupError:
+                pass
+
+        timer = threading.Timer(wall_seconds, kill)
+        timer.start()
+        try:
+            _, status, usage = os.wait4(process.pid, 0)
+        finally:
+            timer.cancel()
+        wall_time = time.monotonic() - started
+        process.returncode = os.waitstatus_to_exitcode(status)
+
+    # Reap anything the program left behind in its session
+    try:
+        os.killpg(process.pid, signal.SIGKILL)
+    except (ProcessLookupError, PermissionError):
+        pass
+
+    limit = SANDBOX_OUTPUT_KB * 1024
+    with open(stdout_path, "rb") as f:
+        out = f.read(limit + 1)
+    with open(stderr_path, "rb") as f:
+        err = f.read(limit + 1)
+
+    return {
+        "exit_code": process.returncode if process.returncode >= 0 else None,
+        "signal": -process.returncode if process.returncode < 0 else None,
+        "timed_out": timed_out.is_set(),
+        "wall_time": wall_time,
+        "cpu_time": usage.ru_utime + usage.ru_stime,
+        "peak_memory_kb": usage.ru_maxrss,
+        "stdout": out[:limit].decode("utf-8", errors="replace"),
+        "stderr": err[:limit].decode("utf-8", errors="replace"),
+        "output_truncated": len(out) >= limit
+    }
+
+
+def _describe_failure(result):
+    """Classify a failed run.
+
+    Returns:
+        (str, str): (status, error message shown to students), status being
+            "time_limit", "output_limit" or "runtime_error"
+    """
+    if result["timed_out"]:
+        return "time_limit", f"Time limit exceeded ({SANDBOX_WALL_SECONDS:g}s wall clock)"
+    if result["signal"] == signal.SIGXCPU or (
+            result["signal"] == signal.SIGKILL and result["cpu_time"] >= SANDBOX_CPU_SECONDS):
+        return "time_limit", f"Time limit exceeded ({SANDBOX_CPU_SECONDS}s CPU)"
+    if result["output_truncated"] or result["signal"] == signal.SIGXFSZ:
+        return "output_limit", f"Output limit exceeded ({SANDBOX_OUTPUT_KB}KB)"
+    stderr = result["stderr"].strip()
+    if result["signal"]:
+        name = signal.Signals(result["signal"]).name
+        return "runtime_error", f"Runtime error ({name})" + (f"\n{stderr}" if stderr else "")
+    return "runtime_error", stderr or f"Runtime error (exit code {result['exit_code']})"
+
+
+class Program:
+    """Source compiled once in a private directory, runnable many times.
+
+    Use as a context manager; the directory is removed on exit. After entering,
+    ``error`` holds the compilation error (or None). run() is thread-safe:
+    every run gets its own working directory, so test cases can execute in
+    parallel against one build.
+    """
+
+    def __init__(self, code, language):
+        self.code = code
+        self.language = language.lower()
+        self.toolchain = TOOLCHAINS[self.language]
+        self.error = None
+        self._tmp = None
+
+    def __enter__(self):
+        self._tmp = tempfile.TemporaryDirectory(prefix="sandbox-")
+        self.workdir = self._tmp.name
+        # The sandbox user only needs to read the source and write output
+        os.chmod(self.workdir, 0o755 if SANDBOX_USER else 0o700)
+        self.source = os.path.join(self.workdir, self.toolchain["source"](self.code))
+        with open(self.source, "w", encoding="utf-8") as f:
+            f.write(self.code)
+
+        if self.toolchain["compile"]:
+            self._compile()
+        return self
+
+    def __exit__(self, *exc_info):
+        self._tmp.cleanup()
+
+    def _rundir(self, stdin):
+        rundir = tempfile.mkdtemp(dir=self.workdir)
+        if SANDBOX_USER:
+            os.chmod(rundir, 0o777)
+        stdin_path = os.path.join(rundir, ".stdin")
+        with open(stdin_path, "w", encoding="utf-8") as f:
+            f.write(stdin or "")
+        return rundir, stdin_path
+
+    def _strip_paths(self, text):
+        return text.replace(self.workdir + os.sep, "")
+
+    def _build_key(self):
+        # Placeholders keep the per-build temp paths out of the key
+        argv = self.toolchain["compile"]("{workdir}", "{source}", self.code)
+        return build_cache.make_key(self.language, argv, shutil.which(argv[0]), self.code)
+
+    def _compile(self):
+        key = self._build_key() if BUILD_CACHE_ENABLED else None
+        if key and build_cache.fetch(key, self.workdir):
+            return
+
+        rundir, stdin_path = self._rundir("")
+        heap_flag = self.toolchain["heap_flag"]
+        compiled = _execute(
+            self.toolchain["compile"](self.workdir, self.source, self.code), rundir, stdin_path,
+            SANDBOX_COMPILE_SECONDS,
+            _limits(None, None if heap_flag else COMPILE_MEMORY_MB,
+                    COMPILE_OUTPUT_KB, COMPILE_MAX_PROCESSES if SANDBOX_MAX_PROCESSES else 0)
+        )
+        if compiled["timed_out"]:
+            self.error = "Compilation timed out"
+        elif compiled["exit_code"] != 0:
+            message = self._strip_paths(compiled["stderr"] or compiled["stdout"])
+            self.error = f"Compilation error:\n{message.strip()}"
+        elif key:
+            shutil.rmtree(rundir, ignore_errors=True)
+            source_name = os.path.basename(self.source)
+            artifacts = [
+                entry.name for entry in os.scandir(self.workdir)
+                if entry.is_file() and entry.name != source_name
+            ]
+            build_cache.publish(key, self.workdir, artifacts)
+
+    def run(self, stdin=None):
+        """Run the built program once.
+
+        Returns:
+            dict: {"output": str} or {"error": str}, plus "status" ("ok",
+                "compile_error", "time_limit", "output_limit",
+                "runtime_error"), "execution_time" (seconds), "cpu_time",
+                "peak_memory_kb" and "engine": "local"
+        """
+        if self.error:
+            return {"error": self.error, "status": "compile_error", "engine": "local"}
+
+        rundir, stdin_path = self._rundir(stdin)
+        heap_flag = self.toolchain["heap_flag"]
+        result = _execute(
+            self.toolchain["run"](self.workdir, self.source, self.code), rundir, stdin_path,
+            SANDBOX_WALL_SECONDS,
+            _limits(SANDBOX_CPU_SECONDS, None if heap_flag else SANDBOX_MEMORY_MB,
+                    SANDBOX_OUTPUT_KB, SANDBOX_MAX_PROCESSES)
+        )
+        shutil.rmtree(rundir, ignore_errors=True)
+
+        metrics = {
+            "execution_time": round(result["wall_time"], 4),
+            "cpu_time": round(result["cpu_time"], 4),
+            "peak_memory_kb": result["peak_memory_kb"],
+            "engine": "local"
+        }
+        if result["timed_out"] or result["signal"] or result["exit_code"] != 0 or result["output_truncated"]:
+            status, message = _describe_failure(result)
+            return dict(metrics, status=status, error=self._strip_paths(message))
+        return dict(metrics, status="ok", output=result["stdout"])
+
+
+def run_in_sandbox(code, language, stdin=None):
+    """Compile (if needed) and run code locally under resource limits.
+
+    Args:
+        code: Source code
+        language: One of TOOLCHAINS
+        stdin: Input text (optional)
+
+    Returns:
+        dict: See Program.run()
+    """
+    with Program(code, language) as program:
+        return program.run(stdin)
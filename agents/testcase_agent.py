@@ -44,6 +44,7 @@ def generate_testcases_for_question(description, sample_input, sample_output):
         content = client.chat(
             messages=[{"role": "system", "content": system}, {"role": "user", "content": user}],
             max_tokens=600,
+            agent="testcases",
         )
         
         # Multiple extraction strategies
@@ -1,14 +1,166 @@
-"""Cascading delete service for hierarchical entities."""
+"""Cascading disable/enable/delete service for hierarchical entities.
+
+Cascades are planned rather than walked: every affected document is gathered
+with one flat query per collection (students, batches, questions, notes and
+performance all carry college_id/department_id/batch_id), Firestore writes
+are applied with batched bulk writes, and Firebase Auth updates are fanned
+out over a bounded thread pool.
+"""
+from concurrent.futures import ThreadPoolExecutor
 from models import (
     CollegeModel, DepartmentModel, BatchModel, StudentModel,
-    QuestionModel, NoteModel, PerformanceModel
+    QuestionModel, NoteModel, PerformanceModel, invalidate_hierarchy_cache,
+    is_ancestry_disabled
 )
-from auth import disable_user_firebase, delete_user_firebase
+from auth import disable_user_firebase, enable_user_firebase, delete_user_firebase
+import performance_aggregates
 from utils import audit_log
+from config import FIREBASE_AUTH_WORKERS
+
+
+# Account levels, outermost first: (level, report key, model)
+ACCOUNT_LEVELS = (
+    ("college", "college", CollegeModel),
+    ("department", "departments", DepartmentModel),
+    ("batch", "batches", BatchModel),
+    ("student", "students", StudentModel),
+)
+
+# Content owned by a scope, deleted (never disabled) with it
+CONTENT_COLLECTIONS = (
+    ("questions", QuestionModel),
+    ("notes", NoteModel),
+    ("performance", PerformanceModel),
+)
+
+# Model behind every report key; the root entity is reported under its level
+# name ("college", "department", "batch"), its descendants under plural keys
+MODELS_BY_KEY = {
+    "college": CollegeModel,
+    "department": DepartmentModel,
+    "departments": DepartmentModel,
+    "batch": BatchModel,
+    "batches": BatchModel,
+    "students": StudentModel,
+    "questions": QuestionModel,
+    "notes": NoteModel,
+    "performance": PerformanceModel,
+}
+
+# Report keys whose documents have Firebase Auth accounts
+ACCOUNT_KEYS = {"college", "department", "departments", "batch", "batches", "students"}
+
+# Only these fields are needed to plan a cascade
+PLAN_FIELDS = ["firebase_uid", "is_disabled"]
 
 
 class CascadeService:
-    """Service for cascading deletes across entity hierarchy."""
+    """Service for cascading changes across entity hierarchy."""
+
+    @staticmethod
+    def plan(level, entity_id, include_content=False):
+        """Gather an entity and everything beneath it with flat queries.
+
+        Args:
+            level: "college", "department" or "batch"
+            entity_id: ID of the root entity
+            include_content: Also gather questions, notes and performance
+
+        Returns:
+            dict: Report key -> list of documents (the root entity under its
+            level name, e.g. "college"), or None if the root does not exist
+        """
+        index = [name for name, _, _ in ACCOUNT_LEVELS].index(level)
+        root = ACCOUNT_LEVELS[index][2]().get(entity_id)
+        if not root:
+            return None
+
+        scope = {f"{level}_id": entity_id}
+        plan = {level: [root]}
+        for _, key, model in ACCOUNT_LEVELS[index + 1:]:
+            plan[key] = model().query(select=PLAN_FIELDS, **scope)
+        if include_content:
+            for key, model in CONTENT_COLLECTIONS:
+                plan[key] = model().query(select=PLAN_FIELDS, **scope)
+        return plan
+
+    @staticmethod
+    def execute(plan, write, auth_call, options=None):
+        """Apply a bulk write to every planned document, innermost first.
+
+        Args:
+            plan: Result of plan()
+            write: FirestoreModel bulk method name, e.g. "delete_many"
+            auth_call: Firebase Auth helper applied to each account's UID
+            options: Optional report key -> extra keyword arguments for write
+
+        Returns:
+            dict: Report key -> number of documents written
+        """
+        options = options or {}
+        counts = {}
+        for key in reversed(list(plan)):
+            ids = [doc["id"] for doc in plan[key]]
+            result = getattr(MODELS_BY_KEY[key](), write)(ids, **options.get(key, {}))
+            counts[key] = len(result["succeeded"])
+
+        uids = [
+            doc["firebase_uid"]
+            for key, docs in plan.items() if key in ACCOUNT_KEYS
+            for doc in docs if doc.get("firebase_uid")
+        ]
+        failed = CascadeService._run_auth_calls(auth_call, uids)
+        if failed:
+            print(f"Warning: {auth_call.__name__} failed for {len(failed)} of {len(uids)} users")
+
+        invalidate_hierarchy_cache()
+        return {key: counts[key] for key in plan}
+
+    @staticmethod
+    def _run_auth_calls(auth_call, uids):
+        """Call auth_call(uid) on a bounded thread pool; return the UIDs that failed."""
+        if not uids:
+            return []
+        with ThreadPoolExecutor(max_workers=min(FIREBASE_AUTH_WORKERS, len(uids))) as pool:
+            results = list(pool.map(auth_call, uids))
+        return [uid for uid, ok in zip(uids, results) if not ok]
+
+    @staticmethod
+    def set_disabled_cascade(level, entity_id, disabled):
+        """Disable or enable an entity and every account beneath it.
+
+        Disabling skips descendants that are already disabled. Students'
+        effective_disabled flags are written in the same batched updates;
+        when enabling, they stay set if an ancestor above the root is still
+        disabled.
+
+        Returns:
+            dict: Per-entity count report, or None if the entity does not exist
+        """
+        plan = CascadeService.plan(level, entity_id)
+        if plan is None:
+            return None
+        if disabled:
+            for key in list(plan)[1:]:
+                plan[key] = [doc for doc in plan[key] if not doc.get("is_disabled")]
+            return CascadeService.execute(plan, "delete_many", disable_user_firebase)
+        options = {}
+        if "students" in plan:
+            options["students"] = {"ancestry_disabled": is_ancestry_disabled(plan[level][0])}
+        return CascadeService.execute(plan, "enable_many", enable_user_firebase, options)
+
+    @staticmethod
+    def _delete_scope(level, entity_id):
+        """Hard delete an entity with its accounts, content and performance counters.
+
+        Returns:
+            dict: Per-entity count report, or None if the entity does not exist
+        """
+        plan = CascadeService.plan(level, entity_id, include_content=True)
+        if plan is None:
+            return None
+        performance_aggregates.forget(level, entity_id)
+        return CascadeService.execute(plan, "hard_delete_many", delete_user_firebase)
 
     @staticmethod
     def delete_college_cascade(college_id, user_id):
@@ -17,46 +169,11 @@ class CascadeService:
         - All departments in the college
         - All batches in those departments
         - All students in those batches
-        - All questions for those batches
-        - All notes for those students
-        - All performance records for those students
+        - All questions, notes and performance records in the college
         """
-        college = CollegeModel().get(college_id)
-        if not college:
-            return False, "College not found"
-
-        # Get all departments in this college
-        departments = DepartmentModel().query(college_id=college_id)
-        
-        deleted_count = {
-            "college": 0,
-            "departments": 0,
-            "batches": 0,
-            "students": 0,
-            "questions": 0,
-            "notes": 0,
-            "performance": 0
-        }
-
-        # Delete all departments and their cascades
-        for dept in departments:
-            dept_id = dept.get("id")
-            result = CascadeService.delete_department_cascade(dept_id, user_id, cascade_from_college=True)
-            if result[0]:
-                deleted_count["departments"] += 1
-                deleted_count["batches"] += result[2].get("batches", 0)
-                deleted_count["students"] += result[2].get("students", 0)
-                deleted_count["questions"] += result[2].get("questions", 0)
-                deleted_count["notes"] += result[2].get("notes", 0)
-                deleted_count["performance"] += result[2].get("performance", 0)
-
-        # Delete the college itself
-        CollegeModel().hard_delete(college_id)
-        deleted_count["college"] = 1
-        
-        # Delete Firebase user for college
-        if college.get("firebase_uid"):
-            delete_user_firebase(college.get("firebase_uid"))
+        deleted_count = CascadeService._delete_scope("college", college_id)
+        if deleted_count is None:
+            return False, "College not found", {}
 
         # Audit log
         audit_log(user_id, "delete_college_cascade", "college", college_id, 
@@ -70,54 +187,16 @@ class CascadeService:
         Delete a department and all its dependencies:
         - All batches in the department
         - All students in those batches
-        - All questions for those batches
-        - All notes for those students
-        - All performance records for those students
+        - All questions, notes and performance records in the department
         """
-        dept = DepartmentModel().get(dept_id)
-        if not dept:
+        deleted_count = CascadeService._delete_scope("department", dept_id)
+        if deleted_count is None:
             return False, "Department not found", {}
 
-        # Get all batches in this department
-        batches = BatchModel().query(department_id=dept_id)
-        
-        deleted_count = {
-            "department": 0,
-            "batches": 0,
-            "students": 0,
-            "questions": 0,
-            "notes": 0,
-            "performance": 0
-        }
-
-        # Delete all batches and their cascades
-        for batch in batches:
-            batch_id = batch.get("id")
-            result = CascadeService.delete_batch_cascade(batch_id, user_id, cascade_from_dept=True)
-            if result[0]:
-                deleted_count["batches"] += 1
-                deleted_count["students"] += result[2].get("students", 0)
-                deleted_count["questions"] += result[2].get("questions", 0)
-                deleted_count["notes"] += result[2].get("notes", 0)
-                deleted_count["performance"] += result[2].get("performance", 0)
-
-        # Delete the department itself (only if not cascading from college)
+        # Audit log (a college cascade audits once for everything)
         if not cascade_from_college:
-            DepartmentModel().hard_delete(dept_id)
-            deleted_count["department"] = 1
-            
-            # Delete Firebase user for department
-            if dept.get("firebase_uid"):
-                delete_user_firebase(dept.get("firebase_uid"))
-            
-            # Audit log
             audit_log(user_id, "delete_department_cascade", "department", dept_id, 
                      {"deleted_count": deleted_count})
-        else:
-            # Still mark as deleted but don't audit separately
-            DepartmentModel().hard_delete(dept_id)
-            if dept.get("firebase_uid"):
-                delete_user_firebase(dept.get("firebase_uid"))
 
         return True, "Department and all dependencies deleted successfully", deleted_count
 
@@ -126,74 +205,16 @@ class CascadeService:
         """
         Delete a batch and all its dependencies:
         - All students in the batch
-        - All questions for the batch
-        - All notes for those students
-        - All performance records for those students
+        - All questions, notes and performance records in the batch
         """
-        batch = BatchModel().get(batch_id)
-        if not batch:
+        deleted_count = CascadeService._delete_scope("batch", batch_id)
+        if deleted_count is None:
             return False, "Batch not found", {}
 
-        # Get all students in this batch
-        students = StudentModel().query(batch_id=batch_id)
-        
-        # Get all questions for this batch
-        questions = QuestionModel().query(batch_id=batch_id)
-        
-        deleted_count = {
-            "batch": 0,
-            "students": 0,
-            "questions": 0,
-            "notes": 0,
-            "performance": 0
-        }
-
-        # Delete all students and their related records
-        for student in students:
-            student_id = student.get("id")
-            
-            # Delete notes for this student
-            notes = NoteModel().query(student_id=student_id)
-            for note in notes:
-                NoteModel().hard_delete(note.get("id"))
-                deleted_count["notes"] += 1
-            
-            # Delete performance records for this student
-            performance_records = PerformanceModel().query(student_id=student_id)
-            for perf in performance_records:
-                PerformanceModel().hard_delete(perf.get("id"))
-                deleted_count["performance"] += 1
-            
-            # Delete the student
-            StudentModel().hard_delete(student_id)
-            deleted_count["students"] += 1
-            
-            # Delete Firebase user for student
-            if student.get("firebase_uid"):
-                delete_user_firebase(student.get("firebase_uid"))
-
-        # Delete all questions for this batch
-        for question in questions:
-            QuestionModel().hard_delete(question.get("id"))
-            deleted_count["questions"] += 1
-
-        # Delete the batch itself (only if not cascading from department)
+        # Audit log (a department cascade audits once for everything)
         if not cascade_from_dept:
-            BatchModel().hard_delete(batch_id)
-            deleted_count["batch"] = 1
-            
-            # Delete Firebase user for batch
-            if batch.get("firebase_uid"):
-                delete_user_firebase(batch.get("firebase_uid"))
-            
-            # Audit log
             audit_log(user_id, "delete_batch_cascade", "batch", batch_id, 
                      {"deleted_count": deleted_count})
-        else:
-            # Still mark as deleted but don't audit separately
-            BatchModel().hard_delete(batch_id)
-            if batch.get("firebase_uid"):
-                delete_user_firebase(batch.get("firebase_uid"))
 
         return True, "Batch and all dependencies deleted successfully", deleted_count
 
@@ -216,15 +237,14 @@ class CascadeService:
 
         # Delete all notes for this student
         notes = NoteModel().query(student_id=student_id)
-        for note in notes:
-            NoteModel().hard_delete(note.get("id"))
-            deleted_count["notes"] += 1
+        result = NoteModel().hard_delete_many([note.get("id") for note in notes])
+        deleted_count["notes"] = len(result["succeeded"])
 
-        # Delete all performance records for this student
+        # Take the student out of the performance counters, then delete the records
+        performance_aggregates.forget("student", student_id)
         performance_records = PerformanceModel().query(student_id=student_id)
-        for perf in performance_records:
-            PerformanceModel().hard_delete(perf.get("id"))
-            deleted_count["performance"] += 1
+        result = PerformanceModel().hard_delete_many([perf.get("id") for perf in performance_records])
+        deleted_count["performance"] = len(result["succeeded"])
 
         # Delete the student
         StudentModel().hard_delete(student_id)
@@ -1,6 +1,8 @@
 """Configuration for CODEPRAC 2.0 backend."""
 import os
 import logging
+import shlex
+import tempfile
 from datetime import timedelta
 
 logger = logging.getLogger(__name__)
@@ -24,9 +26,83 @@ FIREBASE_CREDENTIALS_PATH = os.getenv("FIREBASE_CREDENTIALS_PATH", "firebase-key
 # Firestore Configuration
 FIRESTORE_PROJECT_ID = os.getenv("FIRESTORE_PROJECT_ID")
 
+# Storage backend: "firestore" (Google Firestore + Firebase Auth), or the
+# local "memory" / "sqlite" backends for load tests and offline development
+STORAGE_BACKEND = os.getenv("STORAGE_BACKEND", "firestore").lower()
+SQLITE_DB_PATH = os.getenv("SQLITE_DB_PATH", "markmycode.db")
+
 # Groq Configuration
 GROQ_API_KEY = os.getenv("GROQ_API_KEY")
 GROQ_API_KEY_FALLBACK = os.getenv("GROQ_API_KEY_FALLBACK")
+
+# Groq client (agents/groq_client.py): connection pool size per gunicorn
+# worker (should cover concurrent agent calls), timeouts, attempts per request
+# across keys, and the longest a request waits for a rate-limited key
+GROQ_POOL_MAXSIZE = int(os.getenv("GROQ_POOL_MAXSIZE", "16"))
+GROQ_CONNECT_TIMEOUT = float(os.getenv("GROQ_CONNECT_TIMEOUT", "5"))
+GROQ_READ_TIMEOUT = float(os.getenv("GROQ_READ_TIMEOUT", "30"))
+GROQ_MAX_ATTEMPTS = int(os.getenv("GROQ_MAX_ATTEMPTS", "3"))
+GROQ_MAX_WAIT_SECONDS = float(os.getenv("GROQ_MAX_WAIT_SECONDS", "10"))
+
+# API key pool (agents/key_pool.py): keys come from GROQ_API_KEYS (comma
+# separated) plus the two above; failing keys are ejected for a while, and
+# rate-limited keys back off exponentially with jitter
+GROQ_KEY_EJECT_AFTER = int(os.getenv("GROQ_KEY_EJECT_AFTER", "3"))
+GROQ_KEY_EJECT_SECONDS = float(os.getenv("GROQ_KEY_EJECT_SECONDS", "300"))
+GROQ_BACKOFF_BASE_SECONDS = float(os.getenv("GROQ_BACKOFF_BASE_SECONDS", "1"))
+GROQ_BACKOFF_MAX_SECONDS = float(os.getenv("GROQ_BACKOFF_MAX_SECONDS", "60"))
+GROQ_BACKOFF_JITTER = float(os.getenv("GROQ_BACKOFF_JITTER", "0.2"))
+
+# Client-side LLM rate limiting (agents/rate_limiter.py), per API key. The
+# "file" backend shares the buckets between workers through a state file in
+# a directory private to the service user (created 0700)
+GROQ_LIMITER_ENABLED = os.getenv("GROQ_LIMITER_ENABLED", "True") == "True"
+GROQ_LIMITER_BACKEND = os.getenv("GROQ_LIMITER_BACKEND", "file")
+GROQ_LIMITER_STATE_PATH = os.getenv(
+    "GROQ_LIMITER_STATE_PATH",
+    os.path.join(os.path.expanduser("~"), ".cache", "markmycode", "groq-limiter.json")
+)
+GROQ_REQUESTS_PER_MINUTE = float(os.getenv("GROQ_REQUESTS_PER_MINUTE", "30"))
+GROQ_TOKENS_PER_MINUTE = float(os.getenv("GROQ_TOKENS_PER_MINUTE", "12000"))
+GROQ_LIMITER_QUEUE_SIZE = int(os.getenv("GROQ_LIMITER_QUEUE_SIZE", "20"))
+GROQ_LIMITER_MAX_WAIT_SECONDS = float(os.getenv("GROQ_LIMITER_MAX_WAIT_SECONDS", "30"))
+
+# Per-model circuit breakers (agents/model_router.py); models themselves are
+# set per agent with GROQ_MODEL_<AGENT> / GROQ_FALLBACK_MODEL_<AGENT>.
+# A latency of 0 disables latency tripping
+GROQ_BREAKER_FAILURES = int(os.getenv("GROQ_BREAKER_FAILURES", "5"))
+GROQ_BREAKER_RECOVERY_SECONDS = float(os.getenv("GROQ_BREAKER_RECOVERY_SECONDS", "30"))
+GROQ_BREAKER_LATENCY_SECONDS = float(os.getenv("GROQ_BREAKER_LATENCY_SECONDS", "12"))
+GROQ_BREAKER_HALF_OPEN_PROBES = int(os.getenv("GROQ_BREAKER_HALF_OPEN_PROBES", "2"))
+GROQ_BREAKER_MIN_SAMPLES = int(os.getenv("GROQ_BREAKER_MIN_SAMPLES", "10"))
+
+# Local execution (agents/sandbox.py): only used when runs are isolated from
+# the service, as SANDBOX_USER or inside SANDBOX_WRAPPER (a command prefix)
+SANDBOX_ENABLED = os.getenv("SANDBOX_ENABLED", "True") == "True"
+SANDBOX_CPU_SECONDS = int(os.getenv("SANDBOX_CPU_SECONDS", "2"))
+SANDBOX_WALL_SECONDS = float(os.getenv("SANDBOX_WALL_SECONDS", "5"))
+SANDBOX_MEMORY_MB = int(os.getenv("SANDBOX_MEMORY_MB", "256"))
+SANDBOX_OUTPUT_KB = int(os.getenv("SANDBOX_OUTPUT_KB", "64"))
+SANDBOX_MAX_PROCESSES = int(os.getenv("SANDBOX_MAX_PROCESSES", "64"))
+SANDBOX_COMPILE_SECONDS = float(os.getenv("SANDBOX_COMPILE_SECONDS", "20"))
+SANDBOX_USER = os.getenv("SANDBOX_USER") or None
+SANDBOX_WRAPPER = shlex.split(os.getenv("SANDBOX_WRAPPER", ""))
+
+# Compiled submissions (agents/build_cache.py), kept in a directory private
+# to the service user
+BUILD_CACHE_ENABLED = os.getenv("BUILD_CACHE_ENABLED", "True") == "True"
+BUILD_CACHE_DIR = os.getenv(
+    "BUILD_CACHE_DIR", os.path.join(os.path.expanduser("~"), ".cache", "markmycode", "builds")
+)
+BUILD_CACHE_MAX_MB = int(os.getenv("BUILD_CACHE_MAX_MB", "256"))
+
+# Judging test cases locally (agents/judge.py): concurrent test runs, stopping
+# at the first failure, and the tolerances for decimal outputs
+JUDGE_WORKERS = int(os.getenv("JUDGE_WORKERS", str(os.cpu_count() or 2)))
+JUDGE_EARLY_EXIT = os.getenv("JUDGE_EARLY_EXIT", "True") == "True"
+JUDGE_IGNORE_TRAILING_WHITESPACE = os.getenv("JUDGE_IGNORE_TRAILING_WHITESPACE", "True") == "True"
+JUDGE_FLOAT_ABS_TOLERANCE = float(os.getenv("JUDGE_FLOAT_ABS_TOLERANCE", "1e-9"))
+JUDGE_FLOAT_REL_TOLERANCE = float(os.getenv("JUDGE_FLOAT_REL_TOLERANCE", "1e-9"))
  
 # CORS Configuration
 FRONTEND_URL = os.getenv("FRONTEND_URL", "http://localhost:3000")
@@ -43,11 +119,95 @@ RATE_LIMIT_SUBMISSIONS_PER_HOUR = 100
 RATE_LIMIT_API_CALLS_PER_HOUR = 1000
 RATE_LIMIT_CSV_UPLOADS_PER_MINUTE = 1
 
+# Submission pipeline: agent calls run concurrently on a shared executor
+AGENT_EXECUTOR_WORKERS = int(os.getenv("AGENT_EXECUTOR_WORKERS", "16"))
+SUBMISSION_DEADLINE_SECONDS = float(os.getenv("SUBMISSION_DEADLINE_SECONDS", "60"))
+SPECULATIVE_EFFICIENCY = os.getenv("SPECULATIVE_EFFICIENCY", "True") == "True"
+# LLM calls waiting for rate-limit quota are queued fairly per "batch" or "student"
+LLM_FAIR_QUEUE_BY = os.getenv("LLM_FAIR_QUEUE_BY", "batch")
+# POST /api/student/submit queues a job and returns 202 when the request asks
+# for it ({"async": true} or ?async=true), or always when this is True
+SUBMISSIONS_ASYNC_DEFAULT = os.getenv("SUBMISSIONS_ASYNC_DEFAULT", "False") == "True"
+
+# Background jobs (jobs.py): worker threads per process, how often a process
+# touches the jobs it holds, and how long a job may go untouched before it is
+# reported as lost
+JOB_QUEUE_WORKERS = int(os.getenv("JOB_QUEUE_WORKERS", "4"))
+JOB_HEARTBEAT_SECONDS = int(os.getenv("JOB_HEARTBEAT_SECONDS", "60"))
+JOB_STALE_SECONDS = int(os.getenv("JOB_STALE_SECONDS", "600"))
+# A job's SSE stream holds a sync worker, so it ends after a few seconds and
+# the client reconnects (with Last-Event-ID) after JOB_EVENTS_RETRY_MS
+JOB_EVENTS_POLL_SECONDS = float(os.getenv("JOB_EVENTS_POLL_SECONDS", "0.5"))
+JOB_EVENTS_MAX_SECONDS = int(os.getenv("JOB_EVENTS_MAX_SECONDS", "5"))
+JOB_EVENTS_RETRY_MS = int(os.getenv("JOB_EVENTS_RETRY_MS", "1000"))
+
+# Hidden test cases are generated by a background job after a question is
+# saved; failed generations are retried with exponential backoff
+TESTCASE_GENERATION_ATTEMPTS = int(os.getenv("TESTCASE_GENERATION_ATTEMPTS", "3"))
+TESTCASE_GENERATION_RETRY_SECONDS = float(os.getenv("TESTCASE_GENERATION_RETRY_SECONDS", "2"))
+
+# Hidden test cases are stored compressed apart from their question
+# (testcase_store.py); each worker caches the versions its judge has loaded
+TESTCASE_CACHE_MAXSIZE = int(os.getenv("TESTCASE_CACHE_MAXSIZE", "512"))
+TESTCASE_CACHE_TTL_SECONDS = int(os.getenv("TESTCASE_CACHE_TTL_SECONDS", "3600"))
+
+# Bulk question import (question_import.py): rows per file, and how many
+# questions have their test cases generated concurrently (the LLM rate
+# limiter still paces the calls)
+QUESTION_IMPORT_MAX_ROWS = int(os.getenv("QUESTION_IMPORT_MAX_ROWS", "500"))
+QUESTION_IMPORT_WORKERS = int(os.getenv("QUESTION_IMPORT_WORKERS", "4"))
+
 # Constraints
 MAX_CODE_SIZE_KB = 50
 MAX_TESTCASE_SIZE_KB = 10
 MAX_CSV_ROWS = 1000
 
+# Pagination (?limit=&cursor= on list endpoints)
+DEFAULT_PAGE_SIZE = 50
+MAX_PAGE_SIZE = 500
+
+# Streaming list responses (?stream=true): records enriched per chunk
+STREAM_CHUNK_SIZE = 200
+
+# Firestore batching
+FIRESTORE_GET_ALL_CHUNK_SIZE = int(os.getenv("FIRESTORE_GET_ALL_CHUNK_SIZE", "100"))
+# Bulk writes: Firestore caps a WriteBatch at 500 operations
+FIRESTORE_WRITE_BATCH_SIZE = int(os.getenv("FIRESTORE_WRITE_BATCH_SIZE", "500"))
+FIRESTORE_WRITE_WORKERS = int(os.getenv("FIRESTORE_WRITE_WORKERS", "4"))
+FIRESTORE_WRITE_RETRIES = int(os.getenv("FIRESTORE_WRITE_RETRIES", "3"))
+
+# Cascades: concurrent Firebase Auth updates (disable/enable/delete user)
+FIREBASE_AUTH_WORKERS = int(os.getenv("FIREBASE_AUTH_WORKERS", "8"))
+
+# Hierarchy cache (colleges, departments, batches), per worker process
+HIERARCHY_CACHE_TTL_SECONDS = int(os.getenv("HIERARCHY_CACHE_TTL_SECONDS", "60"))
+HIERARCHY_CACHE_MAXSIZE = int(os.getenv("HIERARCHY_CACHE_MAXSIZE", "2048"))
+
+# Student access checks (can_student_access), per worker process
+STUDENT_ACCESS_CACHE_TTL_SECONDS = int(os.getenv("STUDENT_ACCESS_CACHE_TTL_SECONDS", "30"))
+STUDENT_ACCESS_CACHE_MAXSIZE = int(os.getenv("STUDENT_ACCESS_CACHE_MAXSIZE", "10000"))
+
+# Agent result cache (agent_cache.py): in-memory LRU per worker, plus an
+# optional persistent tier shared by workers ("none", "sqlite" or "firestore")
+AGENT_CACHE_ENABLED = os.getenv("AGENT_CACHE_ENABLED", "True") == "True"
+AGENT_CACHE_MAXSIZE = int(os.getenv("AGENT_CACHE_MAXSIZE", "4096"))
+AGENT_CACHE_PERSISTENT = os.getenv("AGENT_CACHE_PERSISTENT", "none").lower()
+AGENT_CACHE_SQLITE_PATH = os.getenv("AGENT_CACHE_SQLITE_PATH", "agent_cache.db")
+# Seconds a result stays cached, per agent; 0 disables caching for that agent
+AGENT_CACHE_TTLS = {
+    "run": int(os.getenv("AGENT_CACHE_TTL_RUN", "86400")),
+    "evaluate": int(os.getenv("AGENT_CACHE_TTL_EVALUATE", "86400")),
+    "efficiency": int(os.getenv("AGENT_CACHE_TTL_EFFICIENCY", "604800")),
+    "testcases": int(os.getenv("AGENT_CACHE_TTL_TESTCASES", "0")),
+}
+# Identical concurrent agent calls share one in-flight request (singleflight.py);
+# the cross-worker mode coordinates gunicorn workers through lock files
+AGENT_SINGLEFLIGHT_CROSS_WORKER = os.getenv("AGENT_SINGLEFLIGHT_CROSS_WORKER", "False") == "True"
+AGENT_SINGLEFLIGHT_LOCK_DIR = os.getenv(
+    "AGENT_SINGLEFLIGHT_LOCK_DIR", os.path.join(tempfile.gettempdir(), "markmycode-singleflight")
+)
+AGENT_SINGLEFLIGHT_WAIT_SECONDS = float(os.getenv("AGENT_SINGLEFLIGHT_WAIT_SECONDS", "60"))
+
 # Collections
 COLLECTION_COLLEGES = "colleges"
 COLLECTION_DEPARTMENTS = "departments"
@@ -58,6 +218,8 @@ COLLECTION_QUESTIONS = "questions"
 COLLECTION_NOTES = "notes"
 COLLECTION_PERFORMANCE = "performance"
 COLLECTION_AUDIT_LOGS = "audit_logs"
+COLLECTION_AGENT_CACHE = "agent_cache"
+COLLECTION_JOBS = "jobs"
 
 
 # ============================================================================
@@ -78,8 +240,9 @@ def validate_configuration():
             "⚠️  GROQ_API_KEY not configured! AI features (code execution, evaluation) will not work."
         )
     
-    # Critical for Firebase
-    if not FIREBASE_CREDENTIALS_PATH or not os.path.exists(FIREBASE_CREDENTIALS_PATH):
+    # Critical for Firebase (not needed by the local storage backends)
+    uses_firebase = STORAGE_BACKEND == "firestore"
+    if uses_firebase and (not FIREBASE_CREDENTIALS_PATH or not os.path.exists(FIREBASE_CREDENTIALS_PATH)):
         warnings.append(
             f"⚠️  Firebase credentials file not found: {FIREBASE_CREDENTIALS_PATH}"
         )
@@ -103,7 +266,7 @@ def validate_configuration():
     ]
     
     for name, value in firebase_required:
-        if not value:
+        if uses_firebase and not value:
             warnings.append(f"⚠️  {name} not set in environment")
     
     # Log warnings
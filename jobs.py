@@ -0,0 +1,201 @@
+"""Background job queue.
+
+Slow work (a submission's agent pipeline, test case generation, bulk
+imports) is queued as a job instead of holding a sync gunicorn worker for
+the whole request. The request stores a job document, hands the job to
+this process's worker pool and returns 202 with the job id; clients poll
+the job (or follow its SSE stream) until it is done.
+
+Job state lives in the ``jobs`` collection of the configured storage
+backend, so any worker can report on a job and the queue needs no service
+beyond the database (with STORAGE_BACKEND=memory or sqlite, none at all).
+Workers are threads in the web process: jobs queued in a worker that
+restarts are lost. A process refreshes ``updated_at`` on every job it holds
+(queued or running) each JOB_HEARTBEAT_SECONDS, so a job untouched for
+JOB_STALE_SECONDS is reported as failed.
+
+Handlers are registered per job kind:
+
+    @job_queue.handler("submission")
+    def run_submission(payload, progress):
+        ...             # progress(value) records optional progress
+        return result   # stored on the job
+"""
+import logging
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timezone
+
+from config import JOB_QUEUE_WORKERS, JOB_HEARTBEAT_SECONDS, JOB_STALE_SECONDS
+from models import JobModel
+
+logger = logging.getLogger(__name__)
+
+def _age_seconds(timestamp):
+    """Seconds since a stored UTC timestamp (Firestore returns aware datetimes)."""
+    if timestamp is None:
+        return 0
+    if timestamp.tzinfo is not None:
+        timestamp = timestamp.astimezone(timezone.utc).replace(tzinfo=None)
+    return (datetime.utcnow() - timestamp).total_seconds()
+
+
+def public_job(job):
+    """Return the fields of a job that are safe to show its owner."""
+    return {
+        "id": job["id"],
+        "kind": job.get("kind"),
+        "status": job.get("status"),
+        "progress": job.get("progress"),
+        "result": job.get("result"),
+        "error": job.get("error"),
+        "created_at": job.get("created_at"),
+        "started_at": job.get("started_at"),
+        "finished_at": job.get("finished_at")
+    }
+
+
+class JobQueue:
+    """Registry of job handlers plus this process's worker pool.
+
+    A job's status moves queued -> running -> done (with ``result``) or
+    failed (with ``error``).
+    """
+
+    def __init__(self, workers=JOB_QUEUE_WORKERS):
+        self.workers = workers
+        self.handlers = {}
+
+        self._executor = None
+        self._executor_pid = None
+        self._lock = threading.Lock()
+        # Jobs this process has queued or is running, kept fresh by heartbeat()
+        self._held = set()
+
+    def handler(self, kind):
+        """Decorator registering the function that runs jobs of kind."""
+        def register(fn):
+            self.handlers[kind] = fn
+            return fn
+        return register
+
+    def _get_executor(self):
+        # Created lazily and re-created in a forked child, like the agent executor
+        with self._lock:
+            if self._executor is None or self._executor_pid != os.getpid():
+                self._executor = ThreadPoolExecutor(
+                    max_workers=self.workers, thread_name_prefix="job"
+                )
+                self._executor_pid = os.getpid()
+                self._held = set()
+                threading.Thread(target=self._heartbeat_loop, name="job-heartbeat", daemon=True).start()
+            return self._executor
+
+    def _heartbeat_loop(self):
+        pid = os.getpid()
+        while self._executor_pid == pid:
+            time.sleep(JOB_HEARTBEAT_SECONDS)
+            try:
+                self.heartbeat()
+            except Exception as e:
+                logger.warning(f"Job heartbeat failed: {e}")
+
+    def heartbeat(self):
+        """Refresh updated_at on the jobs this process holds so they are not reported lost."""
+        with self._lock:
+            job_ids = list(self._held)
+        if job_ids:
+            now = datetime.utcnow()
+            JobModel().update_many({job_id: {"updated_at": now} for job_id in job_ids})
+
+    def submit(self, kind, payload, owner=None, job_id=None):
+        """Queue a job.
+
+        Args:
+            kind: Registered handler name
+            payload: JSON-serialisable handler argument (stored on the job)
+            owner: ID of the user allowed to read the job
+            job_id: ID for the job (default: a new one), so a caller can
+                record it before the job exists
+
+        Returns:
+            str: Job ID
+        """
+        if kind not in self.handlers:
+            raise ValueError(f"No handler registered for job kind '{kind}'")
+        job = {
+            "kind": kind,
+            "owner": owner,
+            "status": "queued",
+            "payload": payload,
+            "progress": None,
+            "result": None,
+            "error": None,
+            "updated_at": datetime.utcnow()
+        }
+        if job_id:
+            JobModel().put(job_id, job)
+        else:
+            job_id = JobModel().create(job)
+        executor = self._get_executor()
+        with self._lock:
+            self._held.add(job_id)
+        executor.submit(self._run, job_id, kind, payload)
+        return job_id
+
+    def _run(self, job_id, kind, payload):
+        try:
+            self._execute(job_id, kind, payload)
+        finally:
+            with self._lock:
+                self._held.discard(job_id)
+
+    def _execute(self, job_id, kind, payload):
+        model = JobModel()
+        model.update(job_id, {
+            "status": "running",
+            "started_at": datetime.utcnow(),
+            "updated_at": datetime.utcnow()
+        })
+        try:
+            result = self.handlers[kind](payload, progress=lambda value: self.report_progress(job_id, value))
+        except Exception as e:
+            logger.error(f"Job {job_id} ({kind}) failed: {e}", exc_info=True)
+            model.update(job_id, {
+                "status": "failed",
+                "error": f"{type(e).__name__}: {e}"[:500],
+                "finished_at": datetime.utcnow(),
+                "updated_at": datetime.utcnow()
+            })
+            return
+        model.update(job_id, {
+            "status": "done",
+            "result": result,
+            "finished_at": datetime.utcnow(),
+            "updated_at": datetime.utcnow()
+        })
+
+    @staticmethod
+    def report_progress(job_id, progress):
+        """Record handler progress."""
+        JobModel().update(job_id, {"progress": progress, "updated_at": datetime.utcnow()})
+
+    @staticmethod
+    def get(job_id):
+        """Fetch a job, reporting jobs lost to a worker restart as failed.
+
+        Returns:
+            dict or None: A lost job also has ``lost`` set
+        """
+        job = JobModel().get(job_id)
+        if job and job.get("status") in ("queued", "running") \
+                and _age_seconds(job.get("updated_at")) > JOB_STALE_SECONDS:
+            job["status"] = "failed"
+            job["error"] = "Job was lost (worker restarted); please retry"
+            job["lost"] = True
+        return job
+
+
+job_queue = JobQueue()
@@ -439,6 +439,22 @@ const Questions = {
         }
     },
 
+    /**
+     * Fetch a question's hidden test cases, then redraw its details
+     */
+    async loadHiddenTestcases(question) {
+        try {
+            const user = Auth.getCurrentUser();
+            const response = await Utils.apiRequest('/' + user.role + '/questions/' + question.id);
+            question.hidden_testcases = response.data?.question?.hidden_testcases || [];
+            if (this.editingId === question.id) {
+                this.showQuestionDetails(question);
+            }
+        } catch (error) {
+            console.error('Load hidden test cases error:', error);
+        }
+    },
+
     /**
      * Show question details
      */
@@ -454,6 +470,12 @@ const Questions = {
         const contentId = prefix + 'QDetailsContent';
         const targetContainer = document.getElementById(contentId) || container;
 
+        // Listings only carry hidden_testcases_count; the cases themselves
+        // come from the question detail endpoint
+        if (!Array.isArray(question.hidden_testcases) && question.hidden_testcases_count) {
+            this.loadHiddenTestcases(question);
+        }
+
         const topicName = this.findTopicNameById(question.topic_id);
         const hiddenTestcases = Array.isArray(question.hidden_testcases) ? question.hidden_testcases : [];
         const hiddenCount = hiddenTestcases.length || 0;
@@ -1,54 +1,536 @@
 """Firestore models and database helpers."""
 from firebase_init import get_db
+from config import (
+    FIRESTORE_GET_ALL_CHUNK_SIZE, HIERARCHY_CACHE_MAXSIZE, HIERARCHY_CACHE_TTL_SECONDS,
+    FIRESTORE_WRITE_BATCH_SIZE, FIRESTORE_WRITE_WORKERS, FIRESTORE_WRITE_RETRIES,
+    STUDENT_ACCESS_CACHE_TTL_SECONDS, STUDENT_ACCESS_CACHE_MAXSIZE
+)
+from cache import TTLCache, MISSING
+from flask import g, has_request_context
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime
+from google.api_core import exceptions as gcp_exceptions
+import time
 import uuid
 
 
+# Firestore's special field path for ordering by document ID
+DOCUMENT_ID_FIELD = "__name__"
+
+# Errors worth retrying a batch commit for; anything else is reported per item
+TRANSIENT_WRITE_ERRORS = (
+    gcp_exceptions.Aborted,
+    gcp_exceptions.DeadlineExceeded,
+    gcp_exceptions.InternalServerError,
+    gcp_exceptions.ResourceExhausted,
+    gcp_exceptions.ServiceUnavailable,
+)
+
+
+# Process-wide cache for colleges, departments and batches. These change
+# rarely but are read on almost every request; entries expire after
+# HIERARCHY_CACHE_TTL_SECONDS so writes made by other workers show up.
+hierarchy_cache = TTLCache(
+    maxsize=HIERARCHY_CACHE_MAXSIZE,
+    ttl=HIERARCHY_CACHE_TTL_SECONDS,
+    name="hierarchy"
+)
+
+
+def invalidate_hierarchy_cache():
+    """Drop every cached college, department and batch in this process."""
+    hierarchy_cache.clear()
+
+
+# Process-wide cache of can_student_access() results, keyed by student ID.
+# StudentModel drops entries on every write to the student.
+access_cache = TTLCache(
+    maxsize=STUDENT_ACCESS_CACHE_MAXSIZE,
+    ttl=STUDENT_ACCESS_CACHE_TTL_SECONDS,
+    name="student_access"
+)
+
+
+def _transactional(db):
+    """google.cloud.firestore.transactional, or the local backend's stand-in."""
+    local = getattr(db, "transactional", None)
+    if local is not None:
+        return local
+    from google.cloud import firestore
+    return firestore.transactional
+
+
+# Request-scoped identity map
+#
+# Every FirestoreModel read made while handling a request is recorded on
+# flask.g, so a document is fetched from Firestore at most once per request
+# no matter how many Model().get() calls the route and helpers make. Writes
+# through the model invalidate the affected entries.
+
+def _identity_map():
+    """Return the identity map for the current request, or None outside one."""
+    if not has_request_context():
+        return None
+    if "identity_map" not in g:
+        g.identity_map = {"docs": {}, "queries": {}}
+    return g.identity_map
+
+
+def _copy_doc(value):
+    """Copy dict/list containers so callers can mutate what they receive.
+    
+    Leaf values are shared; copy.deepcopy would drop the nanosecond part of
+    Firestore timestamps.
+    """
+    if isinstance(value, dict):
+        return {k: _copy_doc(v) for k, v in value.items()}
+    if isinstance(value, list):
+        return [_copy_doc(v) for v in value]
+    return value
+
+
+def _query_key(collection_name, filters):
+    """Build a hashable identity map key for a query, or None if not cacheable."""
+    key = (collection_name, tuple(sorted(filters.items())))
+    try:
+        hash(key)
+    except TypeError:
+        return None
+    return key
+
+
 class FirestoreModel:
     """Base model for Firestore operations."""
     
+    # Optional process-wide TTLCache consulted after the identity map
+    shared_cache = None
+    
     def __init__(self, collection_name):
         self.collection_name = collection_name
         self.db = get_db()
     
+    def _cached_doc(self, imap, doc_id):
+        """Look a document up in the identity map, then the shared cache.
+        
+        Returns:
+            The cached document (None for a cached miss), or MISSING
+        """
+        key = (self.collection_name, doc_id)
+        if imap is not None and key in imap["docs"]:
+            return imap["docs"][key]
+        if self.shared_cache is not None:
+            data = self.shared_cache.get(("doc",) + key)
+            if data is not MISSING:
+                if imap is not None:
+                    imap["docs"][key] = data
+                return data
+        return MISSING
+    
+    def _remember(self, imap, doc_id, data):
+        """Record a read result (or a miss, as None) in the caches."""
+        key = (self.collection_name, doc_id)
+        data = _copy_doc(data)
+        if imap is not None:
+            imap["docs"][key] = data
+        if self.shared_cache is not None:
+            self.shared_cache.set(("doc",) + key, data)
+    
+    def _invalidate(self, *doc_ids):
+        """Drop cached entries after a write to this collection.
+        
+        Any write may change which documents a query matches, so all cached
+        queries for the collection are dropped along with the documents.
+        """
+        imap = _identity_map()
+        if imap is not None:
+            for doc_id in doc_ids:
+                imap["docs"].pop((self.collection_name, doc_id), None)
+            for key in [k for k in imap["queries"] if k[0] == self.collection_name]:
+                del imap["queries"][key]
+        if self.shared_cache is not None:
+            for doc_id in doc_ids:
+                self.shared_cache.invalidate(("doc", self.collection_name, doc_id))
+            self.shared_cache.invalidate_where(
+                lambda k: k[0] == "query" and k[1][0] == self.collection_name
+            )
+    
     def create(self, data):
         """Create document."""
         doc_id = str(uuid.uuid4())
         data["created_at"] = datetime.utcnow()
         self.db.collection(self.collection_name).document(doc_id).set(data)
+        self._invalidate(doc_id)
         return doc_id
     
     def get(self, doc_id):
         """Get document by ID."""
+        imap = _identity_map()
+        cached = self._cached_doc(imap, doc_id)
+        if cached is not MISSING:
+            return _copy_doc(cached)
+        
         doc = self.db.collection(self.collection_name).document(doc_id).get()
+        data = None
         if doc.exists:
             data = doc.to_dict()
             data['id'] = doc.id  # Add the document ID to the data
-            return data
-        return None
+        self._remember(imap, doc_id, data)
+        return data
+    
+    def get_many(self, doc_ids):
+        """Get several documents by ID using batched reads.
+        
+        IDs are de-duplicated and fetched through Firestore's ``get_all`` in
+        chunks of FIRESTORE_GET_ALL_CHUNK_SIZE, so N lookups cost a handful of
+        round trips instead of N.
+        
+        Args:
+            doc_ids: Iterable of document IDs (falsy IDs are skipped)
+        
+        Returns:
+            list: One entry per input ID, in input order; None for missing docs
+        """
+        doc_ids = list(doc_ids)
+        unique_ids = list(dict.fromkeys(doc_id for doc_id in doc_ids if doc_id))
+        collection = self.db.collection(self.collection_name)
+        imap = _identity_map()
+        
+        found = {}
+        for doc_id in unique_ids:
+            cached = self._cached_doc(imap, doc_id)
+            if cached is not MISSING:
+                found[doc_id] = cached
+        unique_ids = [doc_id for doc_id in unique_ids if doc_id not in found]
+        
+        for start in range(0, len(unique_ids), FIRESTORE_GET_ALL_CHUNK_SIZE):
+            chunk = unique_ids[start:start + FIRESTORE_GET_ALL_CHUNK_SIZE]
+            refs = [collection.document(doc_id) for doc_id in chunk]
+            for doc in self.db.get_all(refs):
+                if doc.exists:
+                    found[doc.id] = doc.to_dict() | {"id": doc.id}
+            for doc_id in chunk:
+                self._remember(imap, doc_id, found.get(doc_id))
+        
+        return [_copy_doc(found.get(doc_id)) for doc_id in doc_ids]
     
     def update(self, doc_id, data):
         """Update document."""
         self.db.collection(self.collection_name).document(doc_id).update(data)
+        self._invalidate(doc_id)
+    
+    def update_if(self, doc_id, expected, data):
+        """Update a document only if some of its fields still hold given values.
+        
+        The check and the write run in one transaction, so a write to the
+        checked fields made in between is never overwritten.
+        
+        Args:
+            doc_id: Document ID
+            expected: Dict of field -> value the document must still have
+            data: Fields to update
+        
+        Returns:
+            bool: True if the document matched and was updated
+        """
+        ref = self.db.collection(self.collection_name).document(doc_id)
+        
+        @_transactional(self.db)
+        def apply(transaction):
+            snapshot = ref.get(transaction=transaction)
+            current = snapshot.to_dict() if snapshot.exists else None
+            if current is None or any(current.get(field) != value for field, value in expected.items()):
+                return False
+            transaction.update(ref, data)
+            return True
+        
+        updated = apply(self.db.transaction())
+        self._invalidate(doc_id)
+        return updated
     
     def delete(self, doc_id):
         """Soft delete by setting is_disabled=true."""
         self.db.collection(self.collection_name).document(doc_id).update({"is_disabled": True})
+        self._invalidate(doc_id)
     
     def enable(self, doc_id):
         """Enable by setting is_disabled=false."""
         self.db.collection(self.collection_name).document(doc_id).update({"is_disabled": False})
+        self._invalidate(doc_id)
+    
+    # ------------------------------------------------------------------
+    # Bulk writes
+    #
+    # Operations are grouped into WriteBatches of FIRESTORE_WRITE_BATCH_SIZE
+    # and committed (in parallel when there are several). A batch that fails
+    # with a transient error is retried with exponential backoff; one that
+    # fails for any other reason is replayed one document at a time so the
+    # rest still land and the offending items are reported individually.
+    # Every bulk method returns {"succeeded": [ids], "failed": [{"id", "error"}]}.
+    # ------------------------------------------------------------------
+    
+    def create_many(self, items, parallel=True, ids=None):
+        """Create several documents with batched writes.
+        
+        Args:
+            items: List of document dicts (created_at is set on each)
+            parallel: Commit batches concurrently
+            ids: IDs to create the documents under, in input order
+                (default: new random IDs)
+        
+        Returns:
+            dict: Bulk result; "ids" lists the new IDs in input order
+        """
+        now = datetime.utcnow()
+        ops = []
+        for index, data in enumerate(items):
+            data["created_at"] = now
+            ops.append(("set", ids[index] if ids else str(uuid.uuid4()), data))
+        result = self._bulk_write(ops, parallel)
+        result["ids"] = [doc_id for _, doc_id, _ in ops]
+        return result
+    
+    def set_many(self, docs, parallel=True):
+        """Create or overwrite several documents by ID with batched writes.
+        
+        Args:
+            docs: Dict of doc_id -> full document
+            parallel: Commit batches concurrently
+        
+        Returns:
+            dict: Bulk result
+        """
+        return self._bulk_write([("set", doc_id, data) for doc_id, data in docs.items()], parallel)
     
-    def query(self, **filters):
-        """Query documents by filters."""
+    def update_many(self, updates, parallel=True):
+        """Apply several partial updates with batched writes.
+        
+        Args:
+            updates: Dict of doc_id -> fields to update
+            parallel: Commit batches concurrently
+        
+        Returns:
+            dict: Bulk result
+        """
+        return self._bulk_write(
+            [("update", doc_id, data) for doc_id, data in updates.items()], parallel
+        )
+    
+    def delete_many(self, doc_ids, parallel=True):
+        """Soft delete several documents (is_disabled=true) with batched writes."""
+        return self._bulk_write(
+            [("update", doc_id, {"is_disabled": True}) for doc_id in doc_ids], parallel
+        )
+    
+    def enable_many(self, doc_ids, parallel=True):
+        """Enable several documents (is_disabled=false) with batched writes."""
+        return self._bulk_write(
+            [("update", doc_id, {"is_disabled": False}) for doc_id in doc_ids], parallel
+        )
+    
+    def hard_delete_many(self, doc_ids, parallel=True):
+        """Permanently delete several documents with batched writes."""
+        return self._bulk_write([("delete", doc_id, None) for doc_id in doc_ids], parallel)
+    
+    def _bulk_write(self, ops, parallel):
+        """Commit (kind, doc_id, data) operations in batches and report per item."""
+        ops = list(ops)
+        chunks = [
+            ops[start:start + FIRESTORE_WRITE_BATCH_SIZE]
+            for start in range(0, len(ops), FIRESTORE_WRITE_BATCH_SIZE)
+        ]
+        
+        if parallel and len(chunks) > 1 and FIRESTORE_WRITE_WORKERS > 1:
+            with ThreadPoolExecutor(max_workers=min(FIRESTORE_WRITE_WORKERS, len(chunks))) as pool:
+                outcomes = list(pool.map(self._commit_chunk, chunks))
+        else:
+            outcomes = [self._commit_chunk(chunk) for chunk in chunks]
+        
+        result = {"succeeded": [], "failed": []}
+        for succeeded, failed in outcomes:
+            result["succeeded"].extend(succeeded)
+            result["failed"].extend(failed)
+        
+        if ops:
+            self._invalidate(*[doc_id for _, doc_id, _ in ops])
+        return result
+    
+    def _commit_chunk(self, chunk):
+        """Commit one WriteBatch, retrying transient errors.
+        
+        Returns:
+            tuple: (succeeded_ids, failed_items)
+        """
+        collection = self.db.collection(self.collection_name)
+        for attempt in range(FIRESTORE_WRITE_RETRIES + 1):
+            batch = self.db.batch()
+            for kind, doc_id, data in chunk:
+                self._apply(batch, kind, collection.document(doc_id), data)
+            try:
+                batch.commit()
+                return [doc_id for _, doc_id, _ in chunk], []
+            except TRANSIENT_WRITE_ERRORS as e:
+                if attempt == FIRESTORE_WRITE_RETRIES:
+                    return [], [{"id": doc_id, "error": str(e)} for _, doc_id, _ in chunk]
+                time.sleep(0.2 * 2 ** attempt)
+            except Exception:
+                # A batch is atomic, so one bad item (e.g. updating a missing
+                # document) sinks it; replay singly to isolate the failures.
+                break
+        
+        succeeded, failed = [], []
+        for kind, doc_id, data in chunk:
+            try:
+                self._apply(None, kind, collection.document(doc_id), data)
+                succeeded.append(doc_id)
+            except Exception as e:
+                failed.append({"id": doc_id, "error": str(e)})
+        return succeeded, failed
+    
+    @staticmethod
+    def _apply(batch, kind, ref, data):
+        """Add one operation to batch, or run it directly when batch is None.
+        
+        kind is "set", "merge" (set with merge=True), "update" or "delete".
+        """
+        if batch is None:
+            if kind == "set":
+                ref.set(data)
+            elif kind == "merge":
+                ref.set(data, merge=True)
+            elif kind == "update":
+                ref.update(data)
+            else:
+                ref.delete()
+        elif kind == "set":
+            batch.set(ref, data)
+        elif kind == "merge":
+            batch.set(ref, data, merge=True)
+        elif kind == "update":
+            batch.update(ref, data)
+        else:
+            batch.delete(ref)
+    
+    def query(self, limit=None, order_by=None, start_after=None, select=None, **filters):
+        """Query documents by equality filters.
+        
+        Args:
+            limit: Maximum number of documents to return
+            order_by: Field to sort on, prefixed with "-" for descending.
+                Defaults to document ID when paging with limit/start_after.
+            start_after: Document ID cursor; results begin after this document
+            select: Field names to fetch (projection); "id" is always included
+            **filters: field=value equality filters
+        
+        Returns:
+            list: Matching documents
+        
+        Raises:
+            ValueError: If start_after names a document that does not exist
+        """
+        if limit is not None or order_by or start_after or select:
+            return self._query_page(filters, limit, order_by, start_after, select)
+        
+        imap = _identity_map()
+        key = None
+        if imap is not None or self.shared_cache is not None:
+            key = _query_key(self.collection_name, filters)
+        if key is not None:
+            if imap is not None and key in imap["queries"]:
+                return [_copy_doc(imap["docs"][(self.collection_name, doc_id)])
+                        for doc_id in imap["queries"][key]]
+            if self.shared_cache is not None:
+                cached = self.shared_cache.get(("query", key))
+                if cached is not MISSING:
+                    if imap is not None:
+                        for data in cached:
+                            imap["docs"][(self.collection_name, data["id"])] = data
+                        imap["queries"][key] = [data["id"] for data in cached]
+                    return [_copy_doc(data) for data in cached]
+        
         query = self.db.collection(self.collection_name)
-        for key, value in filters.items():
-            query = query.where(key, "==", value)
+        for field, value in filters.items():
+            query = query.where(field, "==", value)
+        results = [doc.to_dict() | {"id": doc.id} for doc in query.stream()]
+        
+        if key is not None:
+            for data in results:
+                self._remember(imap, data["id"], data)
+            if imap is not None:
+                imap["queries"][key] = [data["id"] for data in results]
+            if self.shared_cache is not None:
+                self.shared_cache.set(("query", key), [_copy_doc(data) for data in results])
+        return results
+
+    def _query_page(self, filters, limit, order_by, start_after, select):
+        """Run a limited/ordered/projected query, bypassing the read caches."""
+        collection = self.db.collection(self.collection_name)
+        query = collection
+        for field, value in filters.items():
+            query = query.where(field, "==", value)
+        
+        direction = "ASCENDING"
+        if order_by:
+            direction = "DESCENDING" if order_by.startswith("-") else "ASCENDING"
+            query = query.order_by(order_by.lstrip("-"), direction=direction)
+        if start_after or limit is not None:
+            # Stable tiebreaker so cursors never skip or repeat documents
+            query = query.order_by(DOCUMENT_ID_FIELD, direction=direction)
+        if start_after:
+            cursor = collection.document(start_after).get()
+            if not cursor.exists:
+                raise ValueError(f"Invalid cursor: {start_after}")
+            query = query.start_after(cursor)
+        if select:
+            query = query.select([field for field in select if field != "id"])
+        if limit is not None:
+            query = query.limit(limit)
+        
         return [doc.to_dict() | {"id": doc.id} for doc in query.stream()]
+    
+    def stream(self, select=None, **filters):
+        """Yield matching documents one at a time as Firestore streams them.
+        
+        Unlike query(), results are never materialised as a list or cached,
+        so memory stays flat for arbitrarily large collections.
+        
+        Args:
+            select: Field names to fetch (projection); "id" is always included
+            **filters: field=value equality filters
+        
+        Yields:
+            dict: Matching documents
+        """
+        query = self.db.collection(self.collection_name)
+        for field, value in filters.items():
+            query = query.where(field, "==", value)
+        if select:
+            query = query.select([field for field in select if field != "id"])
+        for doc in query.stream():
+            yield doc.to_dict() | {"id": doc.id}
+    
+    def query_page(self, limit, cursor=None, order_by=None, select=None, **filters):
+        """Fetch one page of a query.
+        
+        Args:
+            limit: Page size
+            cursor: ID of the last document of the previous page
+            order_by, select, **filters: As for query()
+        
+        Returns:
+            (list, str or None): (documents, cursor for the next page or None)
+        """
+        docs = self.query(
+            limit=limit + 1, order_by=order_by, start_after=cursor, select=select, **filters
+        )
+        if len(docs) > limit:
+            docs = docs[:limit]
+            return docs, docs[-1]["id"]
+        return docs, None
 
     def hard_delete(self, doc_id):
         """Permanently delete a document from the collection."""
         self.db.collection(self.collection_name).document(doc_id).delete()
+        self._invalidate(doc_id)
     
     def query_disabled(self, **filters):
         """Query documents excluding disabled ones."""
@@ -59,6 +541,8 @@ class FirestoreModel:
 class CollegeModel(FirestoreModel):
     """College model."""
     
+    shared_cache = hierarchy_cache
+    
     def __init__(self):
         super().__init__("colleges")
 
@@ -66,6 +550,8 @@ class CollegeModel(FirestoreModel):
 class DepartmentModel(FirestoreModel):
     """Department model."""
     
+    shared_cache = hierarchy_cache
+    
     def __init__(self):
         super().__init__("departments")
 
@@ -73,15 +559,93 @@ class DepartmentModel(FirestoreModel):
 class BatchModel(FirestoreModel):
     """Batch model."""
     
+    shared_cache = hierarchy_cache
+    
     def __init__(self):
         super().__init__("batches")
 
 
 class StudentModel(FirestoreModel):
-    """Student model."""
+    """Student model.
+    
+    Students carry a materialised ``effective_disabled`` flag: true when the
+    student or their batch, department or college is disabled. The writes
+    below and the cascades keep it current, so can_student_access needs a
+    single read.
+    """
+    
+    # Fields effective_disabled depends on
+    ACCESS_FIELDS = ("is_disabled", "batch_id", "department_id", "college_id")
     
     def __init__(self):
         super().__init__("students")
+    
+    def _invalidate(self, *doc_ids):
+        super()._invalidate(*doc_ids)
+        for doc_id in doc_ids:
+            access_cache.invalidate(doc_id)
+    
+    def update(self, doc_id, data):
+        """Update student, recomputing effective_disabled if an access field changes."""
+        if "effective_disabled" not in data and any(field in data for field in self.ACCESS_FIELDS):
+            student = {**(self.get(doc_id) or {}), **data}
+            # A moved student's old ancestors no longer apply; follow the new parent links
+            if "batch_id" in data and "department_id" not in data:
+                student.pop("department_id", None)
+            if ("batch_id" in data or "department_id" in data) and "college_id" not in data:
+                student.pop("college_id", None)
+            data = {
+                **data,
+                "effective_disabled": bool(student.get("is_disabled")) or is_ancestry_disabled(student)
+            }
+        super().update(doc_id, data)
+    
+    @staticmethod
+    def _with_access_flag(data):
+        data.setdefault(
+            "effective_disabled",
+            bool(data.get("is_disabled")) or is_ancestry_disabled(data)
+        )
+        return data
+    
+    def create(self, data):
+        """Create student with its effective_disabled flag."""
+        return super().create(self._with_access_flag(data))
+    
+    def create_many(self, items, parallel=True, ids=None):
+        """Create students with their effective_disabled flags."""
+        return super().create_many([self._with_access_flag(data) for data in items], parallel, ids)
+    
+    def delete(self, doc_id):
+        """Soft delete; the student is then effectively disabled too."""
+        self.update(doc_id, {"is_disabled": True, "effective_disabled": True})
+    
+    def enable(self, doc_id):
+        """Enable; the student stays effectively disabled under a disabled ancestor."""
+        student = self.get(doc_id) or {}
+        self.update(doc_id, {"is_disabled": False, "effective_disabled": is_ancestry_disabled(student)})
+    
+    def delete_many(self, doc_ids, parallel=True):
+        """Soft delete several students with batched writes."""
+        return self.update_many(
+            {doc_id: {"is_disabled": True, "effective_disabled": True} for doc_id in doc_ids},
+            parallel
+        )
+    
+    def enable_many(self, doc_ids, parallel=True, ancestry_disabled=False):
+        """Enable several students with batched writes.
+        
+        Args:
+            doc_ids: Student IDs
+            parallel: Commit batches concurrently
+            ancestry_disabled: Whether an ancestor of these students is still
+                disabled (the cascade knows this once for the whole subtree)
+        """
+        return self.update_many(
+            {doc_id: {"is_disabled": False, "effective_disabled": ancestry_disabled}
+             for doc_id in doc_ids},
+            parallel
+        )
 
 
 class TopicModel(FirestoreModel):
@@ -94,10 +658,45 @@ class TopicModel(FirestoreModel):
 class QuestionModel(FirestoreModel):
     """Question model."""
     
+    # Fields students may see; hidden test cases live in QuestionTestcasesModel
+    STUDENT_FIELDS = [
+        "college_id", "department_id", "batch_id", "topic_id", "title",
+        "description", "language", "sample_input", "sample_output",
+        "open_testcases", "hidden_testcases_count", "testcase_status", "difficulty", "is_active",
+        "created_at"
+    ]
+    
     def __init__(self):
         super().__init__("questions")
 
 
+class QuestionTestcasesModel(FirestoreModel):
+    """Compressed hidden test cases, one document per question version (see testcase_store.py)."""
+    
+    def __init__(self):
+        super().__init__("question_testcases")
+    
+    def put(self, doc_id, data):
+        """Create or overwrite the document with ID doc_id."""
+        data["created_at"] = datetime.utcnow()
+        self.db.collection(self.collection_name).document(doc_id).set(data)
+        self._invalidate(doc_id)
+
+
+class PerformanceProgressModel(FirestoreModel):
+    """Per student and question submission progress (see performance_aggregates.py)."""
+    
+    def __init__(self):
+        super().__init__("performance_progress")
+
+
+class PerformanceAggregateModel(FirestoreModel):
+    """Submission counters per student, question, topic, batch, department and college."""
+    
+    def __init__(self):
+        super().__init__("performance_aggregates")
+
+
 class NoteModel(FirestoreModel):
     """Note model."""
     
@@ -108,8 +707,53 @@ class NoteModel(FirestoreModel):
 class PerformanceModel(FirestoreModel):
     """Performance model."""
     
+    # Fields needed by performance listings; excludes submission_code
+    LIST_FIELDS = [
+        "student_id", "question_id", "batch_id", "department_id", "college_id",
+        "status", "submission_language", "test_results", "efficiency_feedback",
+        "submitted_at", "attempts", "created_at"
+    ]
+    
     def __init__(self):
         super().__init__("performance")
+    
+    def list_records(self, limit=None, cursor=None, **filters):
+        """Fetch performance records for listings, newest first, without submission_code.
+        
+        Each combination of filters the routes use needs its composite index
+        in firestore.indexes.json (deploy with
+        ``firebase deploy --only firestore:indexes``). Firestore leaves out
+        records without a submitted_at timestamp; older ones get it from
+        ``python performance_aggregates.py backfill``.
+        
+        Args:
+            limit: Page size, or None for all matching records
+            cursor: ID of the last record of the previous page
+            **filters: field=value equality filters
+        
+        Returns:
+            (list, str or None): (records, cursor for the next page or None)
+        """
+        if limit:
+            return self.query_page(limit, cursor, order_by="-submitted_at", select=self.LIST_FIELDS, **filters)
+        return self.query(order_by="-submitted_at", select=self.LIST_FIELDS, **filters), None
+    
+    def student_key(self, student_id, student=None, **filters):
+        """Return the student_id value a student's records are stored under.
+        
+        Older records carry the student's Firebase UID instead of the student
+        document ID. The choice is made with a one-record probe that ignores
+        the page cursor, so every page of a listing runs the same query.
+        
+        Args:
+            student_id: Student document ID
+            student: The student document, if already loaded
+            **filters: The listing's other filters
+        """
+        if self.query(limit=1, select=["student_id"], student_id=student_id, **filters):
+            return student_id
+        student = student or StudentModel().get(student_id)
+        return (student or {}).get("firebase_uid") or student_id
 
 
 class AuditLogModel(FirestoreModel):
@@ -119,6 +763,45 @@ class AuditLogModel(FirestoreModel):
         super().__init__("audit_logs")
 
 
+class JobModel(FirestoreModel):
+    """Background job model (see jobs.py)."""
+    
+    def __init__(self):
+        super().__init__("jobs")
+    
+    def put(self, doc_id, data):
+        """Create a job under a caller-chosen ID."""
+        data["created_at"] = datetime.utcnow()
+        self.db.collection(self.collection_name).document(doc_id).set(data)
+        self._invalidate(doc_id)
+    
+    def get(self, doc_id):
+        """Get a job, always from the database.
+        
+        Jobs are updated by worker threads while a request may be polling
+        them, so the request identity map must not pin an old status.
+        """
+        doc = self.db.collection(self.collection_name).document(doc_id).get()
+        if not doc.exists:
+            return None
+        return doc.to_dict() | {"id": doc.id}
+
+
+def commit_writes(writes):
+    """Commit writes to one or more collections atomically in one WriteBatch.
+    
+    Args:
+        writes: List of (model, kind, doc_id, data), kind as for _apply
+    """
+    db = get_db()
+    batch = db.batch()
+    for model, kind, doc_id, data in writes:
+        FirestoreModel._apply(batch, kind, db.collection(model.collection_name).document(doc_id), data)
+    batch.commit()
+    for model, _, doc_id, _ in writes:
+        model._invalidate(doc_id)
+
+
 # Utility functions for role-based access validation
 
 def is_college_disabled(college_id):
@@ -145,206 +828,97 @@ def is_student_disabled(student_id):
     return student and student.get("is_disabled", False)
 
 
-def can_student_access(student_id):
-    """Check if student can access platform (not disabled at any level)."""
-    student = StudentModel().get(student_id)
-    if not student or student.get("is_disabled", False):
-        return False
+def is_ancestry_disabled(doc):
+    """Check if the batch, department or college above a document is disabled.
     
-    batch_id = student.get("batch_id")
-    if is_batch_disabled(batch_id):
-        return False
+    Uses the document's batch_id/department_id/college_id, following parent
+    links for older documents that lack some of them. Missing ancestors
+    count as enabled. Reads go through the hierarchy cache.
     
-    batch = BatchModel().get(batch_id)
-    dept_id = batch.get("department_id")
-    if is_department_disabled(dept_id):
-        return False
+    Args:
+        doc: Student (or batch/department) document
+    
+    Returns:
+        bool: True if any ancestor is disabled
+    """
+    batch = BatchModel().get(doc["batch_id"]) if doc.get("batch_id") else None
+    if batch and batch.get("is_disabled"):
+        return True
     
-    dept = DepartmentModel().get(dept_id)
-    college_id = dept.get("college_id")
-    if is_college_disabled(college_id):
-        return False
+    dept_id = doc.get("department_id") or (batch or {}).get("department_id")
+    dept = DepartmentModel().get(dept_id) if dept_id else None
+    if dept and dept.get("is_disabled"):
+        return True
     
-    return True
+    college_id = doc.get("college_id") or (dept or {}).get("college_id")
+    college = CollegeModel().get(college_id) if college_id else None
+    return bool(college and college.get("is_disabled"))
+
+
+def can_student_access(student_id):
+    """Check if student can access platform (not disabled at any level).
+    
+    Reads the student's materialised effective_disabled flag: one read, or
+    none while access_cache holds the answer. Students written before the
+    flag existed fall back to walking the hierarchy, and the result is
+    stored on the student for next time.
+    """
+    cached = access_cache.get(student_id)
+    if cached is not MISSING:
+        return cached
+    
+    student = StudentModel().get(student_id)
+    if not student:
+        allowed = False
+    elif "effective_disabled" in student:
+        allowed = not student["effective_disabled"]
+    else:
+        disabled = bool(student.get("is_disabled")) or is_ancestry_disabled(student)
+        StudentModel().update(student_id, {"effective_disabled": disabled})
+        allowed = not disabled
+    
+    access_cache.set(student_id, allowed)
+    return allowed
 
 
 # Cascading disable/enable functions
+#
+# These are thin wrappers around CascadeService, which gathers the whole
+# subtree with flat queries, writes it with batched bulk writes and fans the
+# Firebase Auth updates out over a thread pool. Each returns a per-entity
+# count report, or None if the root entity does not exist.
 
 def disable_college_cascade(college_id):
     """Disable a college and all its departments, batches, and students."""
-    from auth import disable_user_firebase
-    
-    # Disable the college
-    college = CollegeModel().get(college_id)
-    if not college:
-        return False
-    
-    CollegeModel().delete(college_id)
-    if college.get("firebase_uid"):
-        disable_user_firebase(college.get("firebase_uid"))
-    
-    # Disable all departments in this college
-    depts = DepartmentModel().query(college_id=college_id, is_disabled=False)
-    for dept in depts:
-        DepartmentModel().delete(dept["id"])
-        if dept.get("firebase_uid"):
-            disable_user_firebase(dept.get("firebase_uid"))
-        
-        # Disable all batches in this department
-        batches = BatchModel().query(department_id=dept["id"], is_disabled=False)
-        for batch in batches:
-            BatchModel().delete(batch["id"])
-            if batch.get("firebase_uid"):
-                disable_user_firebase(batch.get("firebase_uid"))
-            
-            # Disable all students in this batch
-            students = StudentModel().query(batch_id=batch["id"], is_disabled=False)
-            for student in students:
-                StudentModel().delete(student["id"])
-                if student.get("firebase_uid"):
-                    disable_user_firebase(student.get("firebase_uid"))
-    
-    return True
+    from cascade_service import CascadeService
+    return CascadeService.set_disabled_cascade("college", college_id, True)
 
 
 def disable_department_cascade(department_id):
     """Disable a department and all its batches and students."""
-    from auth import disable_user_firebase
-    
-    # Disable the department
-    dept = DepartmentModel().get(department_id)
-    if not dept:
-        return False
-    
-    DepartmentModel().delete(department_id)
-    if dept.get("firebase_uid"):
-        disable_user_firebase(dept.get("firebase_uid"))
-    
-    # Disable all batches in this department
-    batches = BatchModel().query(department_id=department_id, is_disabled=False)
-    for batch in batches:
-        BatchModel().delete(batch["id"])
-        if batch.get("firebase_uid"):
-            disable_user_firebase(batch.get("firebase_uid"))
-        
-        # Disable all students in this batch
-        students = StudentModel().query(batch_id=batch["id"], is_disabled=False)
-        for student in students:
-            StudentModel().delete(student["id"])
-            if student.get("firebase_uid"):
-                disable_user_firebase(student.get("firebase_uid"))
-    
-    return True
+    from cascade_service import CascadeService
+    return CascadeService.set_disabled_cascade("department", department_id, True)
 
 
 def disable_batch_cascade(batch_id):
     """Disable a batch and all its students."""
-    from auth import disable_user_firebase
-    
-    # Disable the batch
-    batch = BatchModel().get(batch_id)
-    if not batch:
-        return False
-    
-    BatchModel().delete(batch_id)
-    if batch.get("firebase_uid"):
-        disable_user_firebase(batch.get("firebase_uid"))
-    
-    # Disable all students in this batch
-    students = StudentModel().query(batch_id=batch_id, is_disabled=False)
-    for student in students:
-        StudentModel().delete(student["id"])
-        if student.get("firebase_uid"):
-            disable_user_firebase(student.get("firebase_uid"))
-    
-    return True
+    from cascade_service import CascadeService
+    return CascadeService.set_disabled_cascade("batch", batch_id, True)
 
 
 def enable_college_cascade(college_id):
     """Enable a college and all its departments, batches, and students."""
-    from auth import enable_user_firebase
-    
-    # Enable the college
-    college = CollegeModel().get(college_id)
-    if not college:
-        return False
-    
-    CollegeModel().enable(college_id)
-    if college.get("firebase_uid"):
-        enable_user_firebase(college.get("firebase_uid"))
-    
-    # Enable all departments in this college
-    depts = DepartmentModel().query(college_id=college_id)
-    for dept in depts:
-        DepartmentModel().enable(dept["id"])
-        if dept.get("firebase_uid"):
-            enable_user_firebase(dept.get("firebase_uid"))
-        
-        # Enable all batches in this department
-        batches = BatchModel().query(department_id=dept["id"])
-        for batch in batches:
-            BatchModel().enable(batch["id"])
-            if batch.get("firebase_uid"):
-                enable_user_firebase(batch.get("firebase_uid"))
-            
-            # Enable all students in this batch
-            students = StudentModel().query(batch_id=batch["id"])
-            for student in students:
-                StudentModel().enable(student["id"])
-                if student.get("firebase_uid"):
-                    enable_user_firebase(student.get("firebase_uid"))
-    
-    return True
+    from cascade_service import CascadeService
+    return CascadeService.set_disabled_cascade("college", college_id, False)
 
 
 def enable_department_cascade(department_id):
     """Enable a department and all its batches and students."""
-    from auth import enable_user_firebase
-    
-    # Enable the department
-    dept = DepartmentModel().get(department_id)
-    if not dept:
-        return False
-    
-    DepartmentModel().enable(department_id)
-    if dept.get("firebase_uid"):
-        enable_user_firebase(dept.get("firebase_uid"))
-    
-    # Enable all batches in this department
-    batches = BatchModel().query(department_id=department_id)
-    for batch in batches:
-        BatchModel().enable(batch["id"])
-        if batch.get("firebase_uid"):
-            enable_user_firebase(batch.get("firebase_uid"))
-        
-        # Enable all students in this batch
-        students = StudentModel().query(batch_id=batch["id"])
-        for student in students:
-            StudentModel().enable(student["id"])
-            if student.get("firebase_uid"):
-                enable_user_firebase(student.get("firebase_uid"))
-    
-    return True
+    from cascade_service import CascadeService
+    return CascadeService.set_disabled_cascade("department", department_id, False)
 
 
 def enable_batch_cascade(batch_id):
     """Enable a batch and all its students."""
-    from auth import enable_user_firebase
-    
-    # Enable the batch
-    batch = BatchModel().get(batch_id)
-    if not batch:
-        return False
-    
-    BatchModel().enable(batch_id)
-    if batch.get("firebase_uid"):
-        enable_user_firebase(batch.get("firebase_uid"))
-    
-    # Enable all students in this batch
-    students = StudentModel().query(batch_id=batch_id)
-    for student in students:
-        StudentModel().enable(student["id"])
-        if student.get("firebase_uid"):
-            enable_user_firebase(student.get("firebase_uid"))
-    
-    return True
+    from cascade_service import CascadeService
+    return CascadeService.set_disabled_cascade("batch", batch_id, False)
@@ -0,0 +1,440 @@
+"""Incrementally maintained performance aggregates.
+
+Every submission updates counters for its student, question, topic, batch,
+department and college in the same batched write that stores its
+performance record, so dashboards read a handful of small documents
+instead of recomputing statistics from the raw performance stream.
+
+Each ``performance_aggregates`` document (ID ``<scope>_<id>``) holds:
+
+    attempts            submissions
+    attempted           distinct (student, question) pairs submitted
+    solves              distinct (student, question) pairs solved
+    solve_seconds       sum over solves of first attempt -> first solve
+    first_solved_at     earliest solve (Unix seconds)
+    last_submission_at  latest submission (Unix seconds)
+
+plus the scope's ancestors (batch_id, department_id, college_id...) so a
+parent's children can be listed with one query. Timestamps are numbers
+because Firestore's Minimum/Maximum transforms only apply to numbers.
+
+Whether a submission is a pair's first attempt or first solve comes from
+its ``performance_progress`` document (ID ``<student_id>_<question_id>``),
+read just before the write. Two simultaneous submissions by one student
+for one question can both count as first; ``rebuild`` recomputes every
+aggregate from the performance records:
+
+    python performance_aggregates.py rebuild
+
+Listings order performance records by submitted_at; records stored
+without it are given one by:
+
+    python performance_aggregates.py backfill
+
+Deleting a student, question, batch, department or college calls
+``forget``, which drops its counters and subtracts its pairs from every
+aggregate they were counted in.
+"""
+import argparse
+import logging
+import sys
+import uuid
+from datetime import datetime, timezone
+
+from google.cloud.firestore_v1.transforms import Increment, Maximum, Minimum
+
+from jobs import job_queue
+from models import (
+    PerformanceModel, PerformanceAggregateModel, PerformanceProgressModel, QuestionModel,
+    commit_writes
+)
+
+logger = logging.getLogger(__name__)
+
+SCOPES = ("student", "question", "topic", "batch", "department", "college")
+# Ancestor fields stored on each scope's counters
+SCOPE_PARENTS = {
+    "student": ("batch_id", "department_id", "college_id"),
+    "question": ("topic_id", "batch_id", "department_id", "college_id"),
+    "topic": ("department_id", "college_id"),
+    "batch": ("department_id", "college_id"),
+    "department": ("college_id",),
+    "college": ()
+}
+# Child scopes listed by summary()
+SCOPE_CHILDREN = {
+    "college": ("department",),
+    "department": ("batch", "topic"),
+    "batch": ("student", "question"),
+}
+COUNTERS = ("attempts", "attempted", "solves", "solve_seconds")
+
+
+def aggregate_id(scope, scope_id):
+    return f"{scope}_{scope_id}"
+
+
+def progress_id(student_id, question_id):
+    return f"{student_id}_{question_id}"
+
+
+def _naive_utc(timestamp):
+    """Firestore returns aware datetimes; records are written naive UTC."""
+    if timestamp is not None and timestamp.tzinfo is not None:
+        return timestamp.astimezone(timezone.utc).replace(tzinfo=None)
+    return timestamp
+
+
+def _timestamp(value):
+    """Return a stored timestamp as naive UTC; ISO strings (older records) are parsed."""
+    if isinstance(value, str):
+        try:
+            value = datetime.fromisoformat(value)
+        except ValueError:
+            return None
+    return _naive_utc(value) if isinstance(value, datetime) else None
+
+
+def _epoch(timestamp):
+    return _naive_utc(timestamp).replace(tzinfo=timezone.utc).timestamp()
+
+
+def _scope_ids(record, topic_id):
+    """Return {scope: id} for the scopes a record counts towards."""
+    ids = {
+        "student": record.get("student_id"),
+        "question": record.get("question_id"),
+        "topic": topic_id,
+        "batch": record.get("batch_id"),
+        "department": record.get("department_id"),
+        "college": record.get("college_id")
+    }
+    return {scope: scope_id for scope, scope_id in ids.items() if scope_id}
+
+
+def _scope_doc(scope, scope_id, record, topic_id):
+    fields = {**record, "topic_id": topic_id}
+    return {
+        "scope": scope,
+        "scope_id": scope_id,
+        **{parent: fields.get(parent) for parent in SCOPE_PARENTS[scope] if fields.get(parent)}
+    }
+
+
+def submission_writes(record, topic_id, progress):
+    """Return the writes that count one submission.
+
+    Args:
+        record: Performance record (student_id, question_id, hierarchy IDs,
+            status, submitted_at)
+        topic_id: The question's topic, or None
+        progress: The pair's performance_progress document, or None
+
+    Returns:
+        list: (model, kind, doc_id, data) writes for models.commit_writes
+    """
+    submitted_at = record["submitted_at"]
+    first_attempt = progress is None
+    new_solve = record.get("status") == "correct" and not (progress or {}).get("solved_at")
+    solve_seconds = 0.0
+    if new_solve and progress and progress.get("first_attempt_at"):
+        solve_seconds = max(0.0, (submitted_at - _naive_utc(progress["first_attempt_at"])).total_seconds())
+
+    pair = {
+        "student_id": record["student_id"],
+        "question_id": record["question_id"],
+        "topic_id": topic_id,
+        "batch_id": record.get("batch_id"),
+        "department_id": record.get("department_id"),
+        "college_id": record.get("college_id"),
+        "attempts": Increment(1),
+        "last_status": record.get("status"),
+        "last_submission_at": submitted_at
+    }
+    counters = {"attempts": Increment(1), "last_submission_at": Maximum(_epoch(submitted_at))}
+    if first_attempt:
+        pair["first_attempt_at"] = submitted_at
+        counters["attempted"] = Increment(1)
+    if new_solve:
+        pair["solved_at"] = submitted_at
+        pair["solve_seconds"] = solve_seconds
+        counters.update({
+            "solves": Increment(1),
+            "solve_seconds": Increment(solve_seconds),
+            "first_solved_at": Minimum(_epoch(submitted_at))
+        })
+
+    writes = [(PerformanceProgressModel(), "merge", progress_id(record["student_id"], record["question_id"]), pair)]
+    for scope, scope_id in _scope_ids(record, topic_id).items():
+        writes.append((
+            PerformanceAggregateModel(), "merge", aggregate_id(scope, scope_id),
+            {**_scope_doc(scope, scope_id, record, topic_id), **counters}
+        ))
+    return writes
+
+
+def record_submission(perf_data, question):
+    """Store a performance record and count it, in one batched write.
+
+    Args:
+        perf_data: Performance record to create (created_at is set)
+        question: The submitted question (for its topic)
+
+    Returns:
+        str: Performance record ID
+    """
+    progress = PerformanceProgressModel().get(progress_id(perf_data["student_id"], perf_data["question_id"]))
+    perf_id = str(uuid.uuid4())
+    perf_data["created_at"] = datetime.utcnow()
+    commit_writes(
+        [(PerformanceModel(), "set", perf_id, perf_data)]
+        + submission_writes(perf_data, question.get("topic_id"), progress)
+    )
+    return perf_id
+
+
+def forget(scope, scope_id):
+    """Take a deleted student, question, batch, department or college out of the counters.
+
+    Its own aggregate, the aggregates beneath it (which carry its ID) and
+    its performance_progress documents are deleted; each deleted pair's
+    counts are subtracted from the other aggregates it was counted in
+    (a deleted student's questions, topic, batch and ancestors).
+    first_solved_at and last_submission_at cannot be subtracted and may
+    still reflect the deleted submissions until the next rebuild.
+
+    Call before the entity's performance records are deleted.
+
+    Returns:
+        dict: {"aggregates": deleted, "progress": deleted, "updated": decremented}
+    """
+    field = f"{scope}_id"
+    pairs = PerformanceProgressModel().query(**{field: scope_id})
+    doomed = {aggregate_id(scope, scope_id)} | {
+        doc["id"] for doc in PerformanceAggregateModel().query(select=["scope"], **{field: scope_id})
+    }
+
+    decrements = {}
+    for pair in pairs:
+        for pair_scope, pair_scope_id in _scope_ids(pair, pair.get("topic_id")).items():
+            doc_id = aggregate_id(pair_scope, pair_scope_id)
+            if doc_id in doomed:
+                continue
+            counts = decrements.setdefault(doc_id, {counter: 0 for counter in COUNTERS})
+            counts["attempts"] += pair.get("attempts", 0)
+            counts["attempted"] += 1
+            if pair.get("solved_at"):
+                counts["solves"] += 1
+                counts["solve_seconds"] += pair.get("solve_seconds", 0)
+
+    updated = PerformanceAggregateModel().update_many({
+        doc_id: {counter: Increment(-value) for counter, value in counts.items() if value}
+        for doc_id, counts in decrements.items()
+    })
+    for item in updated["failed"]:
+        logger.error(f"Failed to update performance_aggregates/{item['id']}: {item['error']}")
+    deleted = PerformanceAggregateModel().hard_delete_many(doomed)
+    progress = PerformanceProgressModel().hard_delete_many([pair["id"] for pair in pairs])
+    return {
+        "aggregates": len(deleted["succeeded"]),
+        "progress": len(progress["succeeded"]),
+        "updated": len(updated["succeeded"])
+    }
+
+
+def format_aggregate(doc):
+    """Return an aggregate document as API data, with derived rates."""
+    attempted = doc.get("attempted", 0)
+    solves = doc.get("solves", 0)
+    first_solved_at = doc.get("first_solved_at")
+    last_submission_at = doc.get("last_submission_at")
+    return {
+        "scope": doc.get("scope"),
+        "id": doc.get("scope_id"),
+        **{parent: doc[parent] for parent in SCOPE_PARENTS.get(doc.get("scope"), ()) if doc.get(parent)},
+        "attempts": doc.get("attempts", 0),
+        "attempted": attempted,
+        "solves": solves,
+        "solve_rate": round(solves / attempted, 4) if attempted else 0.0,
+        "avg_solve_seconds": round(doc.get("solve_seconds", 0) / solves, 1) if solves else None,
+        "first_solved_at": datetime.utcfromtimestamp(first_solved_at) if first_solved_at is not None else None,
+        "last_submission_at": datetime.utcfromtimestamp(last_submission_at) if last_submission_at is not None else None
+    }
+
+
+def combine(docs, scope=None, scope_id=None):
+    """Sum aggregate documents (e.g. every college's) into one."""
+    total = {"scope": scope, "scope_id": scope_id, **{counter: 0 for counter in COUNTERS}}
+    for doc in docs:
+        for counter in COUNTERS:
+            total[counter] += doc.get(counter, 0)
+        for field, pick in (("first_solved_at", min), ("last_submission_at", max)):
+            if doc.get(field) is not None:
+                total[field] = pick(total[field], doc[field]) if total.get(field) is not None else doc[field]
+    return total
+
+
+def summary(scope=None, scope_id=None):
+    """Return the counters of one scope and its child scopes.
+
+    With no scope: totals over every college, plus each college.
+
+    Returns:
+        dict: {"summary": {...}, "<child scope>s": [{...}, ...]}
+    """
+    model = PerformanceAggregateModel()
+    if scope is None:
+        colleges = model.query(scope="college")
+        return {
+            "summary": format_aggregate(combine(colleges)),
+            "colleges": [format_aggregate(doc) for doc in colleges]
+        }
+
+    doc = model.get(aggregate_id(scope, scope_id)) or {"scope": scope, "scope_id": scope_id}
+    data = {"summary": format_aggregate(doc)}
+    for child in SCOPE_CHILDREN.get(scope, ()):
+        data[f"{child}s"] = [
+            format_aggregate(child_doc)
+            for child_doc in model.query(scope=child, **{f"{scope}_id": scope_id})
+        ]
+    return data
+
+
+def rebuild(progress=None):
+    """Recompute every aggregate and progress document from the performance records.
+
+    Returns:
+        dict: {"records", "pairs", "aggregates", "removed"}
+    """
+    fields = ["student_id", "question_id", "batch_id", "department_id", "college_id",
+              "status", "submitted_at", "created_at"]
+    pairs = {}
+    records = 0
+    for record in PerformanceModel().stream(select=fields):
+        submitted_at = _timestamp(record.get("submitted_at")) or _timestamp(record.get("created_at"))
+        if not record.get("student_id") or not record.get("question_id") or submitted_at is None:
+            continue
+        records += 1
+        pairs.setdefault(progress_id(record["student_id"], record["question_id"]), []).append(
+            {**record, "submitted_at": submitted_at}
+        )
+    if progress:
+        progress({"stage": "counting", "records": records, "pairs": len(pairs)})
+
+    question_ids = list({submissions[0]["question_id"] for submissions in pairs.values()})
+    questions = dict(zip(question_ids, QuestionModel().get_many(question_ids)))
+    topics = {question_id: (question or {}).get("topic_id") for question_id, question in questions.items()}
+    # Deleted questions are soft deleted; forget() already took them out
+    pairs = {
+        pair_id: submissions for pair_id, submissions in pairs.items()
+        if not (questions.get(submissions[0]["question_id"]) or {}).get("is_disabled")
+    }
+
+    progress_docs, aggregates = {}, {}
+    for pair_id, submissions in pairs.items():
+        submissions.sort(key=lambda record: record["submitted_at"])
+        first, last = submissions[0], submissions[-1]
+        topic_id = topics.get(first["question_id"])
+        solved = next((record for record in submissions if record.get("status") == "correct"), None)
+        pair = {
+            "student_id": first["student_id"],
+            "question_id": first["question_id"],
+            "topic_id": topic_id,
+            "batch_id": last.get("batch_id"),
+            "department_id": last.get("department_id"),
+            "college_id": last.get("college_id"),
+            "attempts": len(submissions),
+            "last_status": last.get("status"),
+            "first_attempt_at": first["submitted_at"],
+            "last_submission_at": last["submitted_at"]
+        }
+        if solved:
+            pair["solved_at"] = solved["submitted_at"]
+            pair["solve_seconds"] = (solved["submitted_at"] - first["submitted_at"]).total_seconds()
+        progress_docs[pair_id] = pair
+
+        for scope, scope_id in _scope_ids(last, topic_id).items():
+            doc = aggregates.setdefault(
+                aggregate_id(scope, scope_id),
+                {**_scope_doc(scope, scope_id, last, topic_id), **{counter: 0 for counter in COUNTERS}}
+            )
+            doc["attempts"] += len(submissions)
+            doc["attempted"] += 1
+            doc["last_submission_at"] = max(doc.get("last_submission_at") or 0, _epoch(last["submitted_at"]))
+            if solved:
+                solved_at = _epoch(solved["submitted_at"])
+                doc["solves"] += 1
+                doc["solve_seconds"] += pair["solve_seconds"]
+                doc["first_solved_at"] = min(doc.get("first_solved_at") or solved_at, solved_at)
+
+    removed = 0
+    for model, docs in ((PerformanceProgressModel(), progress_docs), (PerformanceAggregateModel(), aggregates)):
+        result = model.set_many(docs)
+        for item in result["failed"]:
+            logger.error(f"Failed to write {model.collection_name}/{item['id']}: {item['error']}")
+        stale = [doc["id"] for doc in model.stream(select=["scope"]) if doc["id"] not in docs]
+        if stale:
+            model.hard_delete_many(stale)
+            removed += len(stale)
+
+    return {"records": records, "pairs": len(progress_docs), "aggregates": len(aggregates), "removed": removed}
+
+
+def backfill_submitted_at():
+    """Give performance records without a submitted_at timestamp one.
+
+    Listings order by submitted_at, and Firestore leaves out documents
+    without the ordered field, so such records were never listed. The
+    timestamp is parsed from an ISO string where one was stored, else
+    taken from created_at; records with neither are counted as skipped.
+
+    Returns:
+        dict: {"records", "updated", "skipped"}
+    """
+    updates, records, skipped = {}, 0, 0
+    for record in PerformanceModel().stream(select=["submitted_at", "created_at"]):
+        records += 1
+        if isinstance(record.get("submitted_at"), datetime):
+            continue
+        submitted_at = _timestamp(record.get("submitted_at")) or _timestamp(record.get("created_at"))
+        if submitted_at is None:
+            skipped += 1
+            continue
+        updates[record["id"]] = {"submitted_at": submitted_at}
+
+    result = PerformanceModel().update_many(updates)
+    for item in result["failed"]:
+        logger.error(f"Failed to backfill performance/{item['id']}: {item['error']}")
+    return {"records": records, "updated": len(result["succeeded"]), "skipped": skipped}
+
+
+@job_queue.handler("performance_rebuild")
+def run_rebuild_job(payload, progress):
+    """Job handler for POST /api/admin/performance/rebuild."""
+    return rebuild(progress)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Maintain performance aggregates")
+    parser.add_argument("command", choices=["rebuild", "backfill"])
+    args = parser.parse_args(argv)
+
+    if args.command == "backfill":
+        result = backfill_submitted_at()
+        print(
+            f"Set submitted_at on {result['updated']} of {result['records']} performance records "
+            f"({result['skipped']} without any timestamp)"
+        )
+        return 0
+
+    result = rebuild()
+    print(
+        f"Rebuilt {result['aggregates']} aggregates and {result['pairs']} progress documents "
+        f"from {result['records']} performance records ({result['removed']} removed)"
+    )
+    return 0
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO)
+    sys.exit(main())
@@ -0,0 +1,389 @@
+"""Bulk question import.
+
+A JSONL (one question object per line) or CSV file of questions is
+imported into one batch in three steps:
+
+1. The whole file is parsed and validated up front; if any row is invalid
+   nothing is written and every problem is reported at once.
+2. The questions are written with batched writes (QuestionModel.create_many);
+   those with explicit hidden test cases are created ready, the rest
+   pending hidden test case generation.
+3. One "question_import" job generates the hidden test cases on a pool of
+   QUESTION_IMPORT_WORKERS threads. Every call runs under the batch's
+   fair-queue tenant, so a large import waits its turn at the LLM rate
+   limiter instead of starving students' submissions. The job's progress
+   ({"total", "done", "ready", "failed"}) is readable at
+   GET /api/batch/jobs/<id> (or /api/admin/jobs/<id>).
+
+Columns / keys: title, description, sample_input, sample_output (required),
+topic_id, difficulty, language (optional). JSONL rows may also carry
+hidden_testcases ([{"input", "expected_output"}]), which are stored
+(see testcase_store.py) instead of being generated.
+
+From the command line (same storage configuration as the app):
+
+    python question_import.py --batch-id <batch_id> questions.jsonl
+"""
+import argparse
+import csv
+import io
+import json
+import logging
+import sys
+import threading
+import uuid
+from concurrent.futures import ThreadPoolExecutor, as_completed
+
+from agents.rate_limiter import llm_tenant
+from config import QUESTION_IMPORT_MAX_ROWS, QUESTION_IMPORT_WORKERS
+from jobs import job_queue
+from models import BatchModel, QuestionModel, TopicModel
+from question_service import QuestionService, generate_and_store_testcases
+import testcase_store
+from utils import error_response, success_response, audit_log
+
+logger = logging.getLogger(__name__)
+
+FORMATS = ("jsonl", "csv")
+IMPORT_FIELDS = (
+    "title", "description", "sample_input", "sample_output",
+    "topic_id", "difficulty", "language"
+)
+DIFFICULTIES = {"easy": "Easy", "medium": "Medium", "hard": "Hard"}
+
+
+def detect_format(filename=None, content=""):
+    """Guess the format from the file extension, else from the content."""
+    name = (filename or "").lower()
+    if name.endswith((".jsonl", ".ndjson", ".json")):
+        return "jsonl"
+    if name.endswith(".csv"):
+        return "csv"
+    return "jsonl" if content.lstrip().startswith("{") else "csv"
+
+
+def read_upload(req):
+    """Read an import from a request: a multipart "file" or JSON {"content", "format"}.
+
+    Returns:
+        tuple: (content, format, error_message)
+    """
+    if "file" in req.files:
+        upload = req.files["file"]
+        try:
+            content = upload.read().decode("utf-8-sig")
+        except UnicodeDecodeError:
+            return None, None, "File must be UTF-8 encoded"
+        fmt = req.form.get("format") or detect_format(upload.filename, content)
+    else:
+        data = req.get_json(silent=True) or {}
+        content = data.get("content")
+        if not isinstance(content, str):
+            return None, None, "Provide a file upload or JSON {\"content\": ..., \"format\": ...}"
+        fmt = data.get("format") or detect_format(content=content)
+    if fmt not in FORMATS:
+        return None, None, f"format must be one of: {', '.join(FORMATS)}"
+    return content, fmt, None
+
+
+def parse_questions(content, fmt):
+    """Parse an import file into rows.
+
+    Args:
+        content (str): File content
+        fmt (str): "jsonl" or "csv"
+
+    Returns:
+        tuple: ([(row_number, dict)], [error strings])
+    """
+    rows, errors = [], []
+    if fmt == "jsonl":
+        for number, line in enumerate(content.splitlines(), start=1):
+            if not line.strip():
+                continue
+            try:
+                row = json.loads(line)
+            except ValueError as e:
+                errors.append(f"Row {number}: invalid JSON ({e.msg})")
+                continue
+            if not isinstance(row, dict):
+                errors.append(f"Row {number}: expected a JSON object")
+                continue
+            rows.append((number, row))
+    else:
+        reader = csv.DictReader(io.StringIO(content))
+        missing = {"title", "description", "sample_input", "sample_output"} - set(reader.fieldnames or [])
+        if missing:
+            return [], [f"CSV is missing columns: {', '.join(sorted(missing))}"]
+        try:
+            for number, row in enumerate(reader, start=2):
+                rows.append((number, {k: v for k, v in row.items() if k in IMPORT_FIELDS and v is not None}))
+        except csv.Error as e:
+            errors.append(f"Row {reader.line_num}: {e}")
+    return rows, errors
+
+
+def _validate_testcases(testcases):
+    if not isinstance(testcases, list) or not testcases:
+        return "hidden_testcases must be a non-empty list"
+    for case in testcases:
+        if not isinstance(case, dict) or not isinstance(case.get("input"), str) \
+                or not isinstance(case.get("expected_output"), str):
+            return "each hidden test case needs string input and expected_output"
+    return None
+
+
+def validate_rows(rows, batch):
+    """Validate every parsed row against the batch.
+
+    Checks required fields, difficulty, topics (must belong to the batch's
+    department), explicit hidden test cases, and duplicate titles within
+    the file and against the batch's existing questions.
+
+    Returns:
+        list: Error strings (empty when the import may proceed)
+    """
+    errors = []
+    if not rows:
+        return ["No questions found in file"]
+    if len(rows) > QUESTION_IMPORT_MAX_ROWS:
+        return [f"Too many questions ({len(rows)}); the limit is {QUESTION_IMPORT_MAX_ROWS} per import"]
+
+    topic_ids = [row.get("topic_id") for _, row in rows]
+    topics = dict(zip(topic_ids, TopicModel().get_many(topic_ids)))
+    existing = {
+        (q.get("title") or "").strip().lower()
+        for q in QuestionModel().query(batch_id=batch["id"], select=["title"])
+    }
+    seen = {}
+
+    for number, row in rows:
+        for field in IMPORT_FIELDS:
+            if row.get(field) is not None and not isinstance(row[field], str):
+                errors.append(f"Row {number}: {field} must be a string")
+                break
+        else:
+            is_valid, error_msg = QuestionService.validate_question_data(row)
+            if not is_valid:
+                errors.append(f"Row {number}: {error_msg}")
+                continue
+
+            difficulty = row.get("difficulty")
+            if difficulty and difficulty.lower() not in DIFFICULTIES:
+                errors.append(f"Row {number}: difficulty must be one of Easy, Medium, Hard")
+
+            topic_id = row.get("topic_id")
+            if topic_id:
+                topic = topics.get(topic_id)
+                if not topic or topic.get("department_id") != batch.get("department_id"):
+                    errors.append(f"Row {number}: topic '{topic_id}' not found in this department")
+
+            if "hidden_testcases" in row:
+                error_msg = _validate_testcases(row["hidden_testcases"])
+                if error_msg:
+                    errors.append(f"Row {number}: {error_msg}")
+
+            title = row["title"].strip().lower()
+            if title in existing:
+                errors.append(f"Row {number}: a question titled '{row['title'].strip()}' already exists in this batch")
+            elif title in seen:
+                errors.append(f"Row {number}: duplicate title (same as row {seen[title]})")
+            seen.setdefault(title, number)
+    return errors
+
+
+def check_file(content, fmt, batch):
+    """Parse and validate an import file.
+
+    Returns:
+        tuple: (rows, errors); rows must not be written unless errors is empty
+    """
+    rows, errors = parse_questions(content, fmt)
+    if rows or not errors:
+        errors += validate_rows(rows, batch)
+    return rows, errors
+
+
+def write_questions(batch, rows):
+    """Write validated rows as questions of batch with batched writes.
+
+    Rows with explicit hidden test cases have them stored through
+    testcase_store first, so each question is created ready in one write;
+    the rest are created pending generation.
+
+    Returns:
+        tuple: (questions written, as dicts with "id"; failed write items)
+    """
+    docs, ids, failed = [], [], []
+    for _, row in rows:
+        doc_id = str(uuid.uuid4())
+        if row.get("difficulty"):
+            row = {**row, "difficulty": DIFFICULTIES[row["difficulty"].lower()]}
+        doc = QuestionService.build_question(batch["college_id"], batch["department_id"], batch["id"], row)
+        if row.get("hidden_testcases"):
+            try:
+                doc.update(testcase_store.save(doc_id, row["hidden_testcases"]))
+            except Exception as e:
+                failed.append({"id": doc_id, "error": str(e)})
+                continue
+            doc.update({"testcase_status": "ready", "testcase_generation": None})
+        docs.append(doc)
+        ids.append(doc_id)
+
+    result = QuestionModel().create_many(docs, ids=ids)
+    failed += result["failed"]
+    failed_ids = {item["id"] for item in result["failed"]}
+    written = [
+        {**doc, "id": doc_id}
+        for doc_id, doc in zip(ids, docs)
+        if doc_id not in failed_ids
+    ]
+    return written, failed
+
+
+def generate_testcases(questions, tenant, workers=None, progress=None):
+    """Generate hidden test cases for pending questions on a bounded pool.
+
+    Args:
+        questions: Question dicts (id, testcase_generation, description,
+            sample_input, sample_output)
+        tenant: Fair-queue tenant the LLM calls are charged to
+        workers: Concurrent generations (default QUESTION_IMPORT_WORKERS)
+        progress: Called with {"total", "done", "ready", "failed"} after each question
+
+    Returns:
+        dict: Final counts plus "errors" ({question_id: error})
+    """
+    counts = {"total": len(questions), "done": 0, "ready": 0, "failed": 0}
+    errors = {}
+    lock = threading.Lock()
+
+    def generate(question):
+        with llm_tenant(tenant):
+            return generate_and_store_testcases(
+                question["id"], question["testcase_generation"], question.get("description", ""),
+                question.get("sample_input", ""), question.get("sample_output", "")
+            )
+
+    if progress:
+        progress(dict(counts))
+    workers = max(1, workers or QUESTION_IMPORT_WORKERS)
+    with ThreadPoolExecutor(max_workers=workers, thread_name_prefix="import") as pool:
+        futures = {pool.submit(generate, question): question["id"] for question in questions}
+        for future in as_completed(futures):
+            try:
+                outcome = future.result()
+            except Exception as e:
+                outcome = {"status": "failed", "error": str(e)}
+            with lock:
+                counts["done"] += 1
+                counts[outcome["status"]] += 1
+                if outcome["status"] == "failed":
+                    errors[futures[future]] = outcome["error"]
+                snapshot = dict(counts)
+            if progress:
+                progress(snapshot)
+    return {**counts, "errors": errors}
+
+
+@job_queue.handler("question_import")
+def run_import_job(payload, progress):
+    """Job handler generating the test cases of an import's pending questions."""
+    questions = [
+        question for question in QuestionModel().get_many(payload["question_ids"])
+        if question and question.get("testcase_status") == "pending" and question.get("testcase_generation")
+    ]
+    return generate_testcases(questions, f"batch:{payload['batch_id']}", progress=progress)
+
+
+def import_questions(batch, content, fmt, owner):
+    """Validate, write and queue test case generation for an import file.
+
+    Args:
+        batch (dict): Target batch (with "id")
+        content (str): File content
+        fmt (str): "jsonl" or "csv"
+        owner (str): User ID that owns the job (and the audit entry)
+
+    Returns:
+        tuple: (response, status_code)
+    """
+    if not batch.get("college_id") or not batch.get("department_id"):
+        return error_response("INCOMPLETE_BATCH", "Batch missing hierarchy information", status_code=400)
+    if batch.get("is_disabled", False):
+        return error_response("FORBIDDEN", "Batch is disabled", status_code=403)
+
+    rows, errors = check_file(content, fmt, batch)
+    if errors:
+        return error_response(
+            "INVALID_IMPORT", f"{len(errors)} problem(s) found; nothing was imported",
+            details={"errors": errors}, status_code=400
+        )
+
+    try:
+        written, failed = write_questions(batch, rows)
+    except Exception as e:
+        return error_response("IMPORT_ERROR", f"Failed to import questions: {str(e)}", status_code=500)
+
+    pending = [q["id"] for q in written if q["testcase_status"] == "pending" and q["testcase_generation"]]
+    job_id = None
+    if pending:
+        job_id = job_queue.submit("question_import", {
+            "batch_id": batch["id"],
+            "question_ids": pending
+        }, owner=owner)
+
+    audit_log(owner, "import_questions", "batch", batch["id"], {
+        "count": len(written), "failed": len(failed), "job_id": job_id
+    })
+    return success_response({
+        "imported": len(written),
+        "question_ids": [q["id"] for q in written],
+        "failed": failed,
+        "pending_testcases": len(pending),
+        "job_id": job_id
+    }, f"Imported {len(written)} questions", status_code=202)
+
+
+def main(argv=None):
+    """Import a file from the command line, generating test cases in-process."""
+    parser = argparse.ArgumentParser(description="Bulk import questions into a batch")
+    parser.add_argument("path", help="JSONL or CSV file")
+    parser.add_argument("--batch-id", required=True)
+    parser.add_argument("--format", choices=FORMATS)
+    parser.add_argument("--workers", type=int)
+    args = parser.parse_args(argv)
+
+    batch = BatchModel().get(args.batch_id)
+    if not batch:
+        print(f"Batch {args.batch_id} not found", file=sys.stderr)
+        return 1
+    with open(args.path, encoding="utf-8-sig") as f:
+        content = f.read()
+    fmt = args.format or detect_format(args.path, content)
+
+    rows, errors = check_file(content, fmt, batch)
+    if errors:
+        for error in errors:
+            print(error, file=sys.stderr)
+        print(f"{len(errors)} problem(s) found; nothing was imported", file=sys.stderr)
+        return 1
+
+    written, failed = write_questions(batch, rows)
+    for item in failed:
+        print(f"Failed to write {item['id']}: {item['error']}", file=sys.stderr)
+    print(f"Imported {len(written)} questions")
+
+    pending = [q for q in written if q["testcase_status"] == "pending" and q["testcase_generation"]]
+    result = generate_testcases(
+        pending, f"batch:{batch['id']}", workers=args.workers,
+        progress=lambda p: print(f"Test cases: {p['done']}/{p['total']} ({p['failed']} failed)")
+    )
+    for question_id, error in result["errors"].items():
+        print(f"{question_id}: {error}", file=sys.stderr)
+    return 1 if failed or result["failed"] else 0
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO)
+    sys.exit(main())
@@ -1,13 +1,31 @@
 """
 Question Management Service Module
 Handles role-aware question creation, retrieval, and management
+
+Hidden test cases are generated in the background: a new question is saved
+with testcase_status "pending" and a "testcases" job stores its hidden
+test cases (in testcase_store, not on the question) and sets the status
+to "ready" (or "failed" once its retries are exhausted). The job's ID is
+the question's testcase_generation token, so a pending question whose job
+was lost with a restarted worker can be found and re-queued
+(QuestionService.reconcile_testcase_generation).
 """
+import logging
+import time
+import uuid
+from datetime import datetime
 
 from models import QuestionModel, TopicModel, BatchModel, DepartmentModel, CollegeModel
 from agent_wrappers import generate_hidden_testcases
+from config import TESTCASE_GENERATION_ATTEMPTS, TESTCASE_GENERATION_RETRY_SECONDS
+from jobs import job_queue
+import performance_aggregates
+import testcase_store
 from utils import error_response, success_response, audit_log
 from flask import jsonify
 
+logger = logging.getLogger(__name__)
+
 
 class QuestionService:
     """Centralized service for question management with role-based access control."""
@@ -239,6 +257,42 @@ class QuestionService:
             request_user.get("uid"), data
         )
     
+    @staticmethod
+    def build_question(college_id, dept_id, batch_id, data):
+        """
+        Build a new question document, pending hidden test case generation.
+        
+        Args:
+            college_id (str): College ID
+            dept_id (str): Department ID
+            batch_id (str): Batch ID
+            data (dict): Validated question data
+            
+        Returns:
+            dict: Question document
+        """
+        return {
+            "college_id": college_id,
+            "department_id": dept_id,
+            "batch_id": batch_id,
+            "topic_id": data.get("topic_id", ""),
+            "title": data.get("title", "").strip(),
+            "description": data.get("description", "").strip(),
+            "language": data.get("language", ""),
+            "sample_input": data.get("sample_input", "").strip(),
+            "sample_output": data.get("sample_output", "").strip(),
+            "open_testcases": [{
+                "input": data.get("sample_input", "").strip(),
+                "expected_output": data.get("sample_output", "").strip()
+            }],
+            "hidden_testcases_count": 0,
+            "testcase_version": None,
+            "testcase_status": "pending",
+            "testcase_generation": uuid.uuid4().hex,
+            "difficulty": data.get("difficulty", "Medium"),
+            "is_active": True
+        }
+    
     @staticmethod
     def _save_question(college_id, dept_id, batch_id, user_uid, data):
         """
@@ -255,35 +309,11 @@ class QuestionService:
             tuple: (response, status_code)
         """
         try:
-            # Generate hidden test cases using AI
-            hidden_testcases = generate_hidden_testcases(
-                data.get("description", ""),
-                data.get("sample_input", ""),
-                data.get("sample_output", "")
-            )
-            
-            # Build question data
-            question_data = {
-                "college_id": college_id,
-                "department_id": dept_id,
-                "batch_id": batch_id,
-                "topic_id": data.get("topic_id", ""),
-                "title": data.get("title", "").strip(),
-                "description": data.get("description", "").strip(),
-                "language": data.get("language", ""),
-                "sample_input": data.get("sample_input", "").strip(),
-                "sample_output": data.get("sample_output", "").strip(),
-                "open_testcases": [{
-                    "input": data.get("sample_input", "").strip(),
-                    "expected_output": data.get("sample_output", "").strip()
-                }],
-                "hidden_testcases": hidden_testcases,
-                "difficulty": data.get("difficulty", "Medium"),
-                "is_active": True
-            }
+            question_data = QuestionService.build_question(college_id, dept_id, batch_id, data)
             
-            # Save to database
+            # Save to database; hidden test cases follow from a background job
             question_id = QuestionModel().create(question_data)
+            job_id = _queue_generation(question_id, question_data, user_uid)
             
             # Log audit
             audit_log(
@@ -293,13 +323,105 @@ class QuestionService:
             
             return success_response({
                 "question_id": question_id,
-                "hidden_testcases_count": len(hidden_testcases),
+                "hidden_testcases_count": 0,
+                "testcase_status": "pending",
+                "testcase_job_id": job_id,
                 "title": question_data["title"]
             }, "Question created successfully", status_code=201)
         
         except Exception as e:
             return error_response("CREATE_ERROR", f"Failed to create question: {str(e)}", status_code=500)
     
+    @staticmethod
+    def enqueue_testcase_generation(question_id, question, owner=None):
+        """Queue (re)generation of a question's hidden test cases.
+        
+        Marks the question pending under a new generation token; a job
+        only stores its result while the question still carries its token,
+        so a superseded or overridden generation is discarded.
+        
+        Args:
+            question_id (str): Question ID
+            question (dict): Question fields (description, sample_input, sample_output)
+            owner (str): User allowed to read the job
+            
+        Returns:
+            str: Job ID
+        """
+        update = _new_generation()
+        QuestionModel().update(question_id, update)
+        return _queue_generation(question_id, {**question, **update}, owner)
+    
+    @staticmethod
+    def reconcile_testcase_generation(question_id, question):
+        """Recover a pending question whose generation job is gone.
+        
+        A job that is missing or lost (see JobQueue.get) is re-queued under
+        a new token; a job that finished without moving the question out of
+        "pending" marks it "failed", so staff can regenerate. The check and
+        the write are one transaction on the old token, so concurrent
+        callers re-queue once.
+        
+        Args:
+            question_id (str): Question ID
+            question (dict): The question as read
+            
+        Returns:
+            str: The new job's ID, or None if nothing was re-queued
+        """
+        if question.get("testcase_status") != "pending":
+            return None
+        generation = question.get("testcase_generation")
+        job = job_queue.get(generation) if generation else None
+        if job and job["status"] in ("queued", "running"):
+            return None
+        
+        expected = {"testcase_status": "pending", "testcase_generation": generation}
+        if job and not job.get("lost"):
+            QuestionModel().update_if(question_id, expected, {
+                "testcase_status": "failed",
+                "testcase_error": job.get("error") or "Test case generation ended without a result"
+            })
+            return None
+        
+        update = _new_generation()
+        if not QuestionModel().update_if(question_id, expected, update):
+            return None
+        logger.warning(f"Re-queueing lost test case generation for question {question_id}")
+        return _queue_generation(question_id, {**question, **update}, None)
+    
+    @staticmethod
+    def regenerate_testcases(request_user, question_id):
+        """
+        Queue regeneration of a question's stored hidden test cases.
+        
+        Args:
+            request_user (dict): Authenticated user data
+            question_id (str): Question ID
+            
+        Returns:
+            tuple: (response, status_code)
+        """
+        question = QuestionModel().get(question_id)
+        if not question:
+            return error_response("NOT_FOUND", "Question not found", status_code=404)
+        
+        role = request_user.get("role")
+        scope = {"college": "college_id", "department": "department_id", "batch": "batch_id"}.get(role)
+        if scope and question.get(scope) != request_user.get(scope):
+            return error_response("NOT_FOUND", "Question not found", status_code=404)
+        
+        job_id = QuestionService.enqueue_testcase_generation(
+            question_id, question, request_user.get("uid")
+        )
+        audit_log(request_user.get("uid"), "regenerate_testcases", "question", question_id)
+        
+        return success_response({
+            "question_id": question_id,
+            "testcase_status": "pending",
+            "testcase_job_id": job_id
+        }, "Test case generation queued", status_code=202)
+    
     @staticmethod
     def get_questions_by_role(request_user):
         """
@@ -374,6 +496,7 @@ class QuestionService:
         
         try:
             QuestionModel().delete(question_id)
+            performance_aggregates.forget("question", question_id)
             audit_log(user_id, "delete_question", "question", question_id, {"title": question.get("title")})
             return success_response(None, "Question deleted successfully")
         except Exception as e:
@@ -438,7 +561,10 @@ class QuestionService:
                 }]
             
             if "hidden_testcases" in data and data.get("hidden_testcases"):
-                update_data["hidden_testcases"] = data.get("hidden_testcases")
+                update_data.update(testcase_store.save(question_id, data.get("hidden_testcases")))
+                # Explicit test cases win over any generation still running
+                update_data["testcase_status"] = "ready"
+                update_data["testcase_generation"] = None
             
             QuestionModel().update(question_id, update_data)
             
@@ -451,3 +577,95 @@ class QuestionService:
         
         except Exception as e:
             return error_response("UPDATE_ERROR", f"Failed to update question: {str(e)}", status_code=500)
+
+
+def _new_generation():
+    """Return the fields marking a question pending under a new generation token."""
+    return {
+        "testcase_status": "pending",
+        "testcase_generation": uuid.uuid4().hex,
+        "testcase_error": None
+    }
+
+
+def _queue_generation(question_id, question, owner):
+    """Submit the job for a question already marked with its generation token.
+    
+    The token is the job's ID (see reconcile_testcase_generation).
+    """
+    return job_queue.submit("testcases", {
+        "question_id": question_id,
+        "generation": question["testcase_generation"],
+        "description": question.get("description", ""),
+        "sample_input": question.get("sample_input", ""),
+        "sample_output": question.get("sample_output", "")
+    }, owner=owner, job_id=question["testcase_generation"])
+
+
+def _store_generation(question_id, generation, update):
+    """Apply a generation's outcome unless the question has moved on.
+    
+    The token check and the write are one transaction, so test cases
+    edited by hand while the job ran are never overwritten.
+    """
+    if not QuestionModel().update_if(question_id, {"testcase_generation": generation}, update):
+        logger.info(f"Discarding superseded test case generation for question {question_id}")
+        return False
+    return True
+
+
+def generate_and_store_testcases(question_id, generation, description, sample_input, sample_output,
+                                  on_attempt=None):
+    """Generate a question's hidden test cases with retries and store the outcome.
+    
+    Args:
+        question_id (str): Question ID
+        generation (str): The question's generation token
+        description, sample_input, sample_output (str): Generator input
+        on_attempt (callable): Called with the attempt number before each try
+        
+    Returns:
+        dict: {"question_id", "status": "ready" | "failed", "count", "error",
+            "stored": False if the question moved on to another generation}
+    """
+    error = None
+    for attempt in range(1, TESTCASE_GENERATION_ATTEMPTS + 1):
+        if on_attempt:
+            on_attempt(attempt)
+        result = generate_hidden_testcases(description, sample_input, sample_output)
+        if result["success"] and result["testcases"]:
+            stored = _store_generation(question_id, generation, {
+                **testcase_store.save(question_id, result["testcases"]),
+                "testcase_status": "ready",
+                "testcase_error": None,
+                "testcases_generated_at": datetime.utcnow()
+            })
+            return {"question_id": question_id, "status": "ready",
+                    "count": len(result["testcases"]), "error": None, "stored": stored}
+        error = result.get("error") or "No test cases generated"
+        logger.warning(
+            f"Test case generation for question {question_id} failed "
+            f"(attempt {attempt}/{TESTCASE_GENERATION_ATTEMPTS}): {error}"
+        )
+        if attempt < TESTCASE_GENERATION_ATTEMPTS:
+            time.sleep(TESTCASE_GENERATION_RETRY_SECONDS * 2 ** (attempt - 1))
+    
+    stored = _store_generation(question_id, generation, {
+        "testcase_status": "failed",
+        "testcase_error": str(error)[:500]
+    })
+    return {"question_id": question_id, "status": "failed", "count": 0,
+            "error": str(error)[:500], "stored": stored}
+
+
+@job_queue.handler("testcases")
+def run_testcase_job(payload, progress):
+    """Job handler generating a question's hidden test cases, with retries."""
+    outcome = generate_and_store_testcases(
+        payload["question_id"], payload["generation"],
+        payload["description"], payload["sample_input"], payload["sample_output"],
+        on_attempt=lambda attempt: progress({"attempt": attempt, "attempts": TESTCASE_GENERATION_ATTEMPTS})
+    )
+    if outcome["status"] == "failed":
+        raise RuntimeError(f"Test case generation failed: {outcome['error']}")
+    return {"question_id": outcome["question_id"], "count": outcome["count"], "stored": outcome["stored"]}
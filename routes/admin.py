@@ -8,17 +8,30 @@ from models import (
     QuestionModel, TopicModel, NoteModel, PerformanceModel, is_college_disabled,
     is_department_disabled, is_batch_disabled,
     disable_college_cascade, disable_department_cascade, disable_batch_cascade,
-    enable_college_cascade, enable_department_cascade, enable_batch_cascade
+    enable_college_cascade, enable_department_cascade, enable_batch_cascade,
+    hierarchy_cache, access_cache
 )
 from question_service import QuestionService
+from testcase_store import hidden_testcases, testcase_cache
+from question_import import import_questions, read_upload
+from jobs import job_queue, public_job
+from performance_aggregates import SCOPES, summary as performance_summary
 from topic_service import TopicService
 from note_service import NoteService
 from cascade_service import CascadeService
 from agent_wrappers import generate_hidden_testcases
+from agents.groq_client import pool_stats as groq_pool_stats
+from agents.key_pool import key_pool as groq_key_pool
+from agents.rate_limiter import llm_limiter
+from agents.model_router import model_router
+from agent_cache import agent_cache
+from agents.build_cache import build_cache
 from utils import (
     validate_email, validate_username, validate_batch_name,
-    error_response, success_response, audit_log
+    error_response, success_response, audit_log, parse_pagination_args,
+    chunked, stream_list_response
 )
+from config import STREAM_CHUNK_SIZE
 
 admin_bp = Blueprint("admin", __name__, url_prefix="/api/admin")
 
@@ -187,10 +200,10 @@ def disable_college(college_id):
     if not college:
         return error_response("NOT_FOUND", "College not found", status_code=404)
     
-    disable_college_cascade(college_id)
-    audit_log(request.user.get("uid"), "disable_college_cascade", "college", college_id)
+    counts = disable_college_cascade(college_id)
+    audit_log(request.user.get("uid"), "disable_college_cascade", "college", college_id, {"counts": counts})
     
-    return success_response(None, "College and all related departments, batches, and students disabled")
+    return success_response({"counts": counts}, "College and all related departments, batches, and students disabled")
 
 
 @admin_bp.route("/colleges/<college_id>/enable", methods=["POST"])
@@ -201,10 +214,10 @@ def enable_college(college_id):
     if not college:
         return error_response("NOT_FOUND", "College not found", status_code=404)
     
-    enable_college_cascade(college_id)
-    audit_log(request.user.get("uid"), "enable_college_cascade", "college", college_id)
+    counts = enable_college_cascade(college_id)
+    audit_log(request.user.get("uid"), "enable_college_cascade", "college", college_id, {"counts": counts})
     
-    return success_response(None, "College and all related departments, batches, and students enabled")
+    return success_response({"counts": counts}, "College and all related departments, batches, and students enabled")
 
 
 @admin_bp.route("/colleges/<college_id>", methods=["DELETE"])
@@ -374,10 +387,10 @@ def disable_department(dept_id):
     if not dept:
         return error_response("NOT_FOUND", "Department not found", status_code=404)
     
-    disable_department_cascade(dept_id)
-    audit_log(request.user.get("uid"), "disable_department_cascade", "department", dept_id)
+    counts = disable_department_cascade(dept_id)
+    audit_log(request.user.get("uid"), "disable_department_cascade", "department", dept_id, {"counts": counts})
     
-    return success_response(None, "Department and all related batches and students disabled")
+    return success_response({"counts": counts}, "Department and all related batches and students disabled")
 
 
 @admin_bp.route("/departments/<dept_id>/enable", methods=["POST"])
@@ -388,10 +401,10 @@ def enable_department(dept_id):
     if not dept:
         return error_response("NOT_FOUND", "Department not found", status_code=404)
     
-    enable_department_cascade(dept_id)
-    audit_log(request.user.get("uid"), "enable_department_cascade", "department", dept_id)
+    counts = enable_department_cascade(dept_id)
+    audit_log(request.user.get("uid"), "enable_department_cascade", "department", dept_id, {"counts": counts})
     
-    return success_response(None, "Department and all related batches and students enabled")
+    return success_response({"counts": counts}, "Department and all related batches and students enabled")
 
 
 # ============================================================================
@@ -556,10 +569,10 @@ def disable_batch(batch_id):
     if not batch:
         return error_response("NOT_FOUND", "Batch not found", status_code=404)
     
-    disable_batch_cascade(batch_id)
-    audit_log(request.user.get("uid"), "disable_batch_cascade", "batch", batch_id)
+    counts = disable_batch_cascade(batch_id)
+    audit_log(request.user.get("uid"), "disable_batch_cascade", "batch", batch_id, {"counts": counts})
     
-    return success_response(None, "Batch and all related students disabled")
+    return success_response({"counts": counts}, "Batch and all related students disabled")
 
 
 @admin_bp.route("/batches/<batch_id>/enable", methods=["POST"])
@@ -570,10 +583,10 @@ def enable_batch(batch_id):
     if not batch:
         return error_response("NOT_FOUND", "Batch not found", status_code=404)
     
-    enable_batch_cascade(batch_id)
-    audit_log(request.user.get("uid"), "enable_batch_cascade", "batch", batch_id)
+    counts = enable_batch_cascade(batch_id)
+    audit_log(request.user.get("uid"), "enable_batch_cascade", "batch", batch_id, {"counts": counts})
     
-    return success_response(None, "Batch and all related students enabled")
+    return success_response({"counts": counts}, "Batch and all related students enabled")
 
 
 @admin_bp.route("/departments/<dept_id>", methods=["DELETE"])
@@ -789,32 +802,60 @@ def create_student():
 @admin_bp.route("/students", methods=["GET"])
 @require_auth(allowed_roles=["admin"])
 def list_students():
-    """List students (optionally filtered by batch)."""
+    """List students (optionally filtered by batch).
+    
+    Paginated with ?limit=&cursor=, or streamed item by item with ?stream=true.
+    """
     batch_id = request.args.get("batch_id")
+    filters = {"batch_id": batch_id} if batch_id else {}
     
-    if batch_id:
-        students = StudentModel().query(batch_id=batch_id)
-    else:
-        students = StudentModel().query()
+    if request.args.get("stream") == "true":
+        def generate():
+            for chunk in chunked(StudentModel().stream(**filters), STREAM_CHUNK_SIZE):
+                _attach_student_names(chunk)
+                yield from chunk
+        return stream_list_response(generate())
     
-    # Pre-fetch lookup maps to avoid N+1 queries
-    # This assumes reasonable dataset size. For huge datasets, pagination + specific lookups would be better.
+    limit, cursor, page_error = parse_pagination_args(request.args)
+    if page_error:
+        return error_response("INVALID_INPUT", page_error)
+    
+    next_cursor = None
+    try:
+        if limit:
+            students, next_cursor = StudentModel().query_page(limit, cursor, **filters)
+        else:
+            students = StudentModel().query(**filters)
+    except ValueError as e:
+        return error_response("INVALID_CURSOR", str(e))
+    
+    _attach_student_names(students)
+    
+    response_data = {"students": students}
+    if limit:
+        response_data["next_cursor"] = next_cursor
+    return success_response(response_data)
+
+
+def _attach_student_names(students):
+    """Remove sensitive fields and attach college/department/batch names in place."""
+    # Batch-fetch only the colleges/departments/batches referenced by these students
     try:
-        colleges = {c['id']: c.get('name', 'Unknown') for c in CollegeModel().query()}
-        departments = {d['id']: d.get('name', 'Unknown') for d in DepartmentModel().query()}
-        batches = {b['id']: b.get('batch_name', 'Unknown') for b in BatchModel().query()}
+        colleges = {c['id']: c.get('name', 'Unknown') for c in CollegeModel().get_many(
+            s.get('college_id') for s in students) if c}
+        departments = {d['id']: d.get('name', 'Unknown') for d in DepartmentModel().get_many(
+            s.get('department_id') for s in students) if d}
+        batches = {b['id']: b.get('batch_name', 'Unknown') for b in BatchModel().get_many(
+            s.get('batch_id') for s in students) if b}
     except Exception as e:
         print(f"Warning: Failed to fetch lookup maps: {e}")
         colleges, departments, batches = {}, {}, {}
 
-    # Remove sensitive fields and attach names
     for student in students:
         student.pop("firebase_uid", None)
         student['college_name'] = colleges.get(student.get('college_id'), student.get('college_id'))
         student['department_name'] = departments.get(student.get('department_id'), student.get('department_id'))
         student['batch_name'] = batches.get(student.get('batch_id'), student.get('batch_id'))
-    
-    return success_response({"students": students})
 
 
 @admin_bp.route("/students/<student_id>", methods=["GET"])
@@ -872,6 +913,40 @@ def enable_student(student_id):
     return success_response(None, "Student enabled")
 
 
+# ============================================================================
+# SYSTEM ENDPOINTS
+# ============================================================================
+
+@admin_bp.route("/system/stats", methods=["GET"])
+@require_auth(allowed_roles=["admin"])
+def get_system_stats():
+    """Get in-process cache and connection pool counters for the worker serving this request."""
+    return success_response({
+        "caches": {
+            "hierarchy": hierarchy_cache.stats(),
+            "student_access": access_cache.stats()
+        },
+        "groq_pool": groq_pool_stats(),
+        "groq_keys": groq_key_pool.stats(),
+        "llm_limiter": llm_limiter.stats(),
+        "model_router": model_router.stats(),
+        "agent_cache": agent_cache.stats(),
+        "build_cache": build_cache.stats(),
+        "testcase_cache": testcase_cache.stats()
+    })
+
+
+@admin_bp.route("/jobs/<job_id>", methods=["GET"])
+@require_auth(allowed_roles=["admin"])
+def get_job(job_id):
+    """Get the status and progress of any background job."""
+    job = job_queue.get(job_id)
+    if not job:
+        return error_response("NOT_FOUND", "Job not found", status_code=404)
+    
+    return success_response(public_job(job))
+
+
 # ============================================================================
 # PERFORMANCE ENDPOINTS
 # ============================================================================
@@ -879,7 +954,15 @@ def enable_student(student_id):
 @admin_bp.route("/performance", methods=["GET"])
 @require_auth(allowed_roles=["admin"])
 def get_performance():
-    """Get performance data (with optional filters)."""
+    """Get performance data (with optional filters).
+    
+    Paginated with ?limit=&cursor=, or streamed item by item with ?stream=true.
+    """
+    stream = request.args.get("stream") == "true"
+    limit, cursor, page_error = parse_pagination_args(request.args)
+    if page_error and not stream:
+        return error_response("INVALID_INPUT", page_error)
+    
     college_id = request.args.get("college_id")
     dept_id = request.args.get("department_id")
     batch_id = request.args.get("batch_id")
@@ -893,85 +976,93 @@ def get_performance():
     if batch_id:
         filters["batch_id"] = batch_id
     
-    # Special handling for student_id to support legacy/mismatched IDs
-    performance = []
-    
-    if student_id:
-        # 1. Try querying by the provided student_id (UUID)
-        filters["student_id"] = student_id
-        performance = PerformanceModel().query(**filters)
+    if stream:
+        if student_id:
+            filters["student_id"] = PerformanceModel().student_key(student_id, **filters)
         
-        # 2. Fallback: If no results found, check if records use Firebase UID
-        if not performance:
-            student = StudentModel().get(student_id)
-            if student and student.get("firebase_uid"):
-                filters["student_id"] = student.get("firebase_uid")
-                performance = PerformanceModel().query(**filters)
-    else:
-        # No specific student, just apply other filters
-        performance = PerformanceModel().query(**filters)
+        def generate():
+            records = PerformanceModel().stream(select=PerformanceModel.LIST_FIELDS, **filters)
+            for chunk in chunked(records, STREAM_CHUNK_SIZE):
+                _enrich_performance(chunk)
+                yield from chunk
+        return stream_list_response(generate())
     
-    # Enrich performance data with Question and Topic details
-    if performance:
-        # 1. Collect Question IDs
-        question_ids = list(set([p.get("question_id") for p in performance if p.get("question_id")]))
-        
-        # 2. Fetch Questions (Batch fetch would be ideal, but looping for now or using a helper if exists)
-        # Assuming no batch_get, so we loop or query. Optimizing by fetching all questions might be heavy if db is large.
-        # But for a single student profile, N is small.
-        # However, listing ALL performance (no student_id) could be huge.
-        # Admin usually filters.
-        
-        # Let's verify we have access to models
-        from models import QuestionModel, TopicModel
-        
-        questions_map = {}
-        # Optimization: If fetching for a single student, N is generic.
-        # If fetching for dashboard (many students), this loop is bad. 
-        # But this endpoint is mostly used with filters.
-        
-        for qid in question_ids:
-            q = QuestionModel().get(qid)
-            if q:
-                questions_map[qid] = q
-                
-        # 3. Collect Topic IDs
-        topic_ids = list(set([q.get("topic_id") for q in questions_map.values() if q.get("topic_id")]))
-        topics_map = {}
-        
-        for tid in topic_ids:
-            t = TopicModel().get(tid)
-            if t:
-                topics_map[tid] = t
-        
-        # 4. Enrich Records
-        for p in performance:
-            qid = p.get("question_id")
-            if qid in questions_map:
-                question = questions_map[qid]
-                p["question_title"] = question.get("title") or question.get("heading") or "Unknown Question"
-                
-                tid = question.get("topic_id")
-                if tid and tid in topics_map:
-                    p["topic_name"] = topics_map[tid].get("name") or topics_map[tid].get("topic_name")
-                else:
-                    p["topic_name"] = "Unknown Topic"
+    try:
+        if student_id:
+            # Older records use the student's Firebase UID
+            filters["student_id"] = PerformanceModel().student_key(student_id, **filters)
+        performance, next_cursor = PerformanceModel().list_records(limit, cursor, **filters)
+    except ValueError as e:
+        return error_response("INVALID_CURSOR", str(e))
+    
+    _enrich_performance(performance)
+
+    response_data = {"performance": performance}
+    if limit:
+        response_data["next_cursor"] = next_cursor
+    return success_response(response_data)
+
+
+def _enrich_performance(performance):
+    """Enrich performance records in place with Question and Topic details."""
+    if not performance:
+        return
+    
+    # 1. Collect Question IDs
+    question_ids = list(set([p.get("question_id") for p in performance if p.get("question_id")]))
+    
+    # 2. Fetch Questions in batched reads
+    questions_map = {q["id"]: q for q in QuestionModel().get_many(question_ids) if q}
+            
+    # 3. Collect Topic IDs and fetch Topics in batched reads
+    topic_ids = list(set([q.get("topic_id") for q in questions_map.values() if q.get("topic_id")]))
+    topics_map = {t["id"]: t for t in TopicModel().get_many(topic_ids) if t}
+    
+    # 4. Enrich Records
+    for p in performance:
+        qid = p.get("question_id")
+        if qid in questions_map:
+            question = questions_map[qid]
+            p["question_title"] = question.get("title") or question.get("heading") or "Unknown Question"
+            
+            tid = question.get("topic_id")
+            if tid and tid in topics_map:
+                p["topic_name"] = topics_map[tid].get("name") or topics_map[tid].get("topic_name")
             else:
-                p["question_title"] = "Unknown Question"
                 p["topic_name"] = "Unknown Topic"
-
-    return success_response({"performance": performance})
+        else:
+            p["question_title"] = "Unknown Question"
+            p["topic_name"] = "Unknown Topic"
 
 
 @admin_bp.route("/performance/summary", methods=["GET"])
 @require_auth(allowed_roles=["admin"])
 def get_performance_summary():
-    """Get aggregated performance summary."""
-    # This is a complex aggregation that could be cached
-    # For now, return a placeholder
-    return success_response({
-        "summary": "Performance aggregation endpoint - implement with Firestore aggregation"
-    })
+    """Get aggregated performance counters.
+    
+    Query params:
+        scope, id: Summarise one college/department/batch/topic/question/student
+            instead of the whole platform
+    """
+    scope = request.args.get("scope")
+    scope_id = request.args.get("id")
+    if scope is None:
+        return success_response(performance_summary())
+    if scope not in SCOPES:
+        return error_response("INVALID_INPUT", f"scope must be one of: {', '.join(SCOPES)}", status_code=400)
+    if not scope_id:
+        return error_response("INVALID_INPUT", "id is required with scope", status_code=400)
+    
+    return success_response(performance_summary(scope, scope_id))
+
+
+@admin_bp.route("/performance/rebuild", methods=["POST"])
+@require_auth(allowed_roles=["admin"])
+def rebuild_performance_aggregates():
+    """Recompute the performance aggregates from the performance records in the background."""
+    job_id = job_queue.submit("performance_rebuild", {}, owner=request.user.get("uid"))
+    audit_log(request.user.get("uid"), "rebuild_performance_aggregates", "job", job_id)
+    return success_response({"job_id": job_id}, "Rebuild started", 202)
 
 
 # ============================================================================
@@ -989,16 +1080,53 @@ def create_question():
     return QuestionService.create_question_by_admin(request.user, data)
 
 
+@admin_bp.route("/questions/import", methods=["POST", "OPTIONS"])
+@require_auth(allowed_roles=["admin"])
+def import_questions_admin():
+    """Bulk import questions into a batch from a JSONL or CSV file.
+    
+    Takes a multipart "file" with a batch_id form field, or JSON
+    {"batch_id", "content", "format"}. Returns 202 with the job generating
+    the hidden test cases (GET /jobs/<job_id>).
+    """
+    if request.method == "OPTIONS":
+        return "", 200
+    
+    batch_id = request.form.get("batch_id") or (request.get_json(silent=True) or {}).get("batch_id")
+    if not batch_id:
+        return error_response("INVALID_INPUT", "batch_id is required", status_code=400)
+    
+    batch = BatchModel().get(batch_id)
+    if not batch:
+        return error_response("NOT_FOUND", "Batch not found", status_code=404)
+    
+    content, fmt, error = read_upload(request)
+    if error:
+        return error_response("INVALID_INPUT", error, status_code=400)
+    
+    return import_questions(batch, content, fmt, request.user.get("uid"))
+
+
 @admin_bp.route("/questions", methods=["GET", "OPTIONS"])
 @require_auth(allowed_roles=["admin"])
 def list_questions():
-    """List all questions (super admin can see everything)."""
+    """List all questions (super admin can see everything), paginated with ?limit=&cursor=."""
     if request.method == "OPTIONS":
         return "", 200
     
+    limit, cursor, page_error = parse_pagination_args(request.args)
+    if page_error:
+        return error_response("INVALID_INPUT", page_error)
+    
     try:
+        if limit:
+            questions, next_cursor = QuestionModel().query_page(limit, cursor)
+            return success_response({"questions": questions, "next_cursor": next_cursor})
+        
         questions = QuestionModel().query()
         return success_response({"questions": questions if questions else []})
+    except ValueError as e:
+        return error_response("INVALID_CURSOR", str(e))
     except Exception as e:
         return error_response("QUERY_ERROR", str(e)), 500
 
@@ -1011,6 +1139,7 @@ def get_question(question_id):
     if not question:
         return error_response("NOT_FOUND", "Question not found", status_code=404)
     
+    question["hidden_testcases"] = hidden_testcases(question)
     return success_response({"question": question})
 
 
@@ -1150,12 +1279,22 @@ def delete_note(note_id):
 @admin_bp.route("/generate-testcases", methods=["POST", "OPTIONS"])
 @require_auth(allowed_roles=["admin"])
 def generate_testcases_admin():
-    """Generate hidden test cases for a question using AI agent (Admin only)."""
+    """Generate hidden test cases for a question using AI agent (Admin only).
+    
+    Returns the generated cases for review. With {"regenerate": true} only
+    question_id is needed: generation is queued and its result stored on
+    the question (202; poll the question's testcase_status).
+    """
     if request.method == "OPTIONS":
         return "", 200
     
     data = request.json or {}
     
+    if data.get("regenerate"):
+        if not data.get("question_id"):
+            return error_response("INVALID_INPUT", "Missing required fields: question_id", status_code=400)
+        return QuestionService.regenerate_testcases(request.user, data["question_id"])
+    
     required = ["question_id", "description", "sample_input", "sample_output"]
     missing = [f for f in required if not data.get(f)]
     if missing:
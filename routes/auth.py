@@ -22,17 +22,23 @@ def login():
         return jsonify({"error": True, "code": "INVALID_INPUT", "message": "email and password are required"}), 400
     
     try:
-        # Verify email/password via Firebase REST API (signInWithPassword)
-        import requests
-        from config import FIREBASE_API_KEY
+        from config import STORAGE_BACKEND
+        if STORAGE_BACKEND == "firestore":
+            # Verify email/password via Firebase REST API (signInWithPassword)
+            import requests
+            from config import FIREBASE_API_KEY
+
+            url = f"https://identitytoolkit.googleapis.com/v1/accounts:signInWithPassword?key={FIREBASE_API_KEY}"
+            resp = requests.post(url, json={"email": data["email"], "password": data["password"], "returnSecureToken": True}, timeout=10)
+            token_info = resp.json() if resp.status_code == 200 else None
+        else:
+            # Local storage backend keeps its own password hashes
+            token_info = get_auth().sign_in_with_password(data["email"], data["password"])
 
-        url = f"https://identitytoolkit.googleapis.com/v1/accounts:signInWithPassword?key={FIREBASE_API_KEY}"
-        resp = requests.post(url, json={"email": data["email"], "password": data["password"], "returnSecureToken": True}, timeout=10)
-        if resp.status_code != 200:
+        if not token_info:
             # Invalid credentials or other auth error
             return jsonify({"error": True, "code": "INVALID_CREDENTIALS", "message": "Invalid email or password"}), 401
 
-        token_info = resp.json()
         uid = token_info.get("localId")
 
         # Get user document from Firestore
@@ -57,6 +63,11 @@ def login():
         if user_data.get("is_disabled"):
             return jsonify({"error": True, "code": "ACCOUNT_DISABLED", "message": "Your account has been disabled"}), 403
 
+        # Students are also locked out when their batch, department or college is disabled
+        student_id = user_data.get("student_id")
+        if user_data.get("role") == "student" and student_id and not can_student_access(student_id):
+            return jsonify({"error": True, "code": "ACCOUNT_DISABLED", "message": "Your account has been disabled"}), 403
+
         # Create JWT token with all user data
         jwt_token = create_jwt_token({
             "firebase_uid": uid,
@@ -109,7 +120,7 @@ def register():
     
     try:
         # Create Firebase user
-        user = firebase_auth.create_user(
+        user = get_auth().create_user(
             email=data["email"],
             password=data["password"],
             display_name=data["name"],
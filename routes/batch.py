@@ -4,11 +4,15 @@ from firebase_init import get_auth, db
 from auth import require_auth, register_user_firebase, disable_user_firebase, enable_user_firebase, get_token_from_request, decode_jwt_token
 from models import StudentModel, BatchModel, QuestionModel, TopicModel, NoteModel, PerformanceModel
 from question_service import QuestionService
+from testcase_store import hidden_testcases
+from performance_aggregates import summary as performance_summary
+from question_import import import_questions, read_upload
+from jobs import job_queue, public_job
 from topic_service import TopicService
 from note_service import NoteService
 from cascade_service import CascadeService
 from agent_wrappers import generate_hidden_testcases
-from utils import validate_email, error_response, success_response, audit_log
+from utils import validate_email, error_response, success_response, audit_log, parse_pagination_args
 import logging
 
 # Configure logging
@@ -432,6 +436,28 @@ def create_question():
     return QuestionService.create_question_by_batch(request.user, data)
 
 
+@batch_bp.route("/questions/import", methods=["POST", "OPTIONS"])
+@require_auth(allowed_roles=["batch"])
+def import_batch_questions():
+    """Bulk import questions from a JSONL or CSV file (multipart "file", or JSON {"content", "format"}).
+    
+    The file is validated as a whole before anything is written. Returns 202
+    with the job generating the hidden test cases (GET /jobs/<job_id>).
+    """
+    if request.method == "OPTIONS":
+        return "", 200
+    
+    batch = BatchModel().get(request.user.get("batch_id") or "")
+    if not batch:
+        return error_response("NOT_FOUND", "Batch not found", status_code=404)
+    
+    content, fmt, error = read_upload(request)
+    if error:
+        return error_response("INVALID_INPUT", error, status_code=400)
+    
+    return import_questions(batch, content, fmt, request.user.get("uid"))
+
+
 @batch_bp.route("/questions", methods=["GET", "OPTIONS"])
 @require_auth(allowed_roles=["batch"])
 def get_questions():
@@ -460,6 +486,7 @@ def get_question_detail(question_id):
     if not question or question.get("batch_id") != batch_id:
         return error_response("NOT_FOUND", "Question not found in your batch", status_code=404)
     
+    question["hidden_testcases"] = hidden_testcases(question)
     return success_response({"question": question})
 
 
@@ -605,7 +632,12 @@ def delete_note(note_id):
 @batch_bp.route("/generate-testcases", methods=["POST", "OPTIONS"])
 @require_auth(allowed_roles=["batch"])
 def generate_testcases():
-    """Generate hidden test cases for a question using AI agent."""
+    """Generate hidden test cases for a question using AI agent.
+    
+    Returns the generated cases for review. With {"regenerate": true} only
+    question_id is needed: generation is queued and its result stored on
+    the question (202; poll the question's testcase_status).
+    """
     if request.method == "OPTIONS":
         return "", 200
     
@@ -615,6 +647,11 @@ def generate_testcases():
     
     data = request.json or {}
     
+    if data.get("regenerate"):
+        if not data.get("question_id"):
+            return error_response("INVALID_INPUT", "Missing required fields: question_id", status_code=400)
+        return QuestionService.regenerate_testcases(request.user, data["question_id"])
+    
     required = ["question_id", "description", "sample_input", "sample_output"]
     missing = [f for f in required if not data.get(f)]
     if missing:
@@ -653,6 +690,21 @@ def generate_testcases():
     
     except Exception as e:
         logger.error(f"Test case generation error: {str(e)}", exc_info=True)
+# ============================================================================
+# JOB ENDPOINTS
+# ============================================================================
+
+@batch_bp.route("/jobs/<job_id>", methods=["GET"])
+@require_auth(allowed_roles=["batch"])
+def get_job(job_id):
+    """Get the status and progress of a background job started by this batch admin."""
+    job = job_queue.get(job_id)
+    if not job or job.get("owner") != request.user.get("uid"):
+        return error_response("NOT_FOUND", "Job not found", status_code=404)
+    
+    return success_response(public_job(job))
+
+
 # ============================================================================
 # PERFORMANCE ENDPOINTS
 # ============================================================================
@@ -660,55 +712,38 @@ def generate_testcases():
 @batch_bp.route("/performance", methods=["GET"])
 @require_auth(allowed_roles=["batch"])
 def get_performance():
-    """Get performance data for students in this batch."""
+    """Get performance data for students in this batch, paginated with ?limit=&cursor=."""
+    limit, cursor, page_error = parse_pagination_args(request.args)
+    if page_error:
+        return error_response("INVALID_INPUT", page_error)
+    
     batch_id = request.user.get("batch_id")
     student_id = request.args.get("student_id")
     
     filters = {"batch_id": batch_id}
     
-    performance = []
-    
-    if student_id:
-        # 1. Verify student belongs to this batch
-        student = StudentModel().get(student_id)
-        if not student or student.get("batch_id") != batch_id:
-             # If student doesn't belong to batch, return empty or error? 
-             # For performance stats, empty is safer/standard.
-             return success_response({"performance": []})
-             
-        # 2. Try querying by the provided student_id (UUID)
-        filters["student_id"] = student_id
-        performance = PerformanceModel().query(**filters)
-        
-        # 3. Fallback: If no results found, check if records use Firebase UID
-        if not performance:
-             if student.get("firebase_uid"):
-                filters["student_id"] = student.get("firebase_uid")
-                performance = PerformanceModel().query(**filters)
-    else:
-        # List all performance for batch
-        performance = PerformanceModel().query(**filters)
+    try:
+        if student_id:
+            # Only students of this batch; older records use the student's Firebase UID
+            student = StudentModel().get(student_id)
+            if not student or student.get("batch_id") != batch_id:
+                return success_response({"performance": []})
+            filters["student_id"] = PerformanceModel().student_key(student_id, student, **filters)
+        performance, next_cursor = PerformanceModel().list_records(limit, cursor, **filters)
+    except ValueError as e:
+        return error_response("INVALID_CURSOR", str(e))
         
     # Enrich performance data with Question and Topic details
     if performance:
         # 1. Collect Question IDs
         question_ids = list(set([p.get("question_id") for p in performance if p.get("question_id")]))
         
-        # 2. Fetch Questions
-        questions_map = {}
-        for qid in question_ids:
-            q = QuestionModel().get(qid)
-            if q:
-                questions_map[qid] = q
+        # 2. Fetch Questions in batched reads
+        questions_map = {q["id"]: q for q in QuestionModel().get_many(question_ids) if q}
                 
-        # 3. Collect Topic IDs
+        # 3. Collect Topic IDs and fetch Topics in batched reads
         topic_ids = list(set([q.get("topic_id") for q in questions_map.values() if q.get("topic_id")]))
-        topics_map = {}
-        
-        for tid in topic_ids:
-            t = TopicModel().get(tid)
-            if t:
-                topics_map[tid] = t
+        topics_map = {t["id"]: t for t in TopicModel().get_many(topic_ids) if t}
         
         # 4. Enrich Records
         for p in performance:
@@ -726,4 +761,14 @@ def get_performance():
                 p["question_title"] = "Unknown Question"
                 p["topic_name"] = "Unknown Topic"
 
-    return success_response({"performance": performance})
+    response_data = {"performance": performance}
+    if limit:
+        response_data["next_cursor"] = next_cursor
+    return success_response(response_data)
+
+
+@batch_bp.route("/performance/summary", methods=["GET"])
+@require_auth(allowed_roles=["batch"])
+def get_performance_summary():
+    """Get aggregated performance counters for this batch and its students and questions."""
+    return success_response(performance_summary("batch", request.user.get("batch_id")))
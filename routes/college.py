@@ -4,8 +4,10 @@ from firebase_init import get_auth, db
 from auth import require_auth, get_token_from_request, decode_jwt_token, disable_user_firebase, enable_user_firebase, register_user_firebase
 from models import DepartmentModel, BatchModel, StudentModel, PerformanceModel, QuestionModel, TopicModel
 from question_service import QuestionService
+from testcase_store import hidden_testcases
+from performance_aggregates import summary as performance_summary
 from cascade_service import CascadeService
-from utils import error_response, success_response, validate_email, validate_username, validate_batch_name, audit_log
+from utils import error_response, success_response, validate_email, validate_username, validate_batch_name, audit_log, parse_pagination_args
 
 college_bp = Blueprint("college", __name__, url_prefix="/api/college")
 
@@ -592,7 +594,11 @@ def delete_student_college(student_id):
 @college_bp.route("/performance", methods=["GET"])
 @require_auth(allowed_roles=["college"])
 def get_performance():
-    """Get performance data for departments under this college."""
+    """Get performance data for departments under this college, paginated with ?limit=&cursor=."""
+    limit, cursor, page_error = parse_pagination_args(request.args)
+    if page_error:
+        return error_response("INVALID_INPUT", page_error)
+    
     college_id = request.user.get("college_id")
     dept_id = request.args.get("department_id")
     batch_id = request.args.get("batch_id")
@@ -604,43 +610,25 @@ def get_performance():
     if batch_id:
         filters["batch_id"] = batch_id
         
-    performance = []
-    
-    if student_id:
-        # 1. Verify student belongs to this college
-        student = StudentModel().get(student_id)
-        if not student or student.get("college_id") != college_id:
-             return success_response({"performance": []})
-             
-        # 2. Try querying by the provided student_id (UUID)
-        filters["student_id"] = student_id
-        performance = PerformanceModel().query(**filters)
-        
-        # 3. Fallback
-        if not performance:
-             if student.get("firebase_uid"):
-                filters["student_id"] = student.get("firebase_uid")
-                performance = PerformanceModel().query(**filters)
-    else:
-        performance = PerformanceModel().query(**filters)
+    try:
+        if student_id:
+            # Only students of this college; older records use the student's Firebase UID
+            student = StudentModel().get(student_id)
+            if not student or student.get("college_id") != college_id:
+                return success_response({"performance": []})
+            filters["student_id"] = PerformanceModel().student_key(student_id, student, **filters)
+        performance, next_cursor = PerformanceModel().list_records(limit, cursor, **filters)
+    except ValueError as e:
+        return error_response("INVALID_CURSOR", str(e))
         
     # Enrich performance data
     if performance:
         question_ids = list(set([p.get("question_id") for p in performance if p.get("question_id")]))
         
-        questions_map = {}
-        for qid in question_ids:
-            q = QuestionModel().get(qid)
-            if q:
-                questions_map[qid] = q
+        questions_map = {q["id"]: q for q in QuestionModel().get_many(question_ids) if q}
                 
         topic_ids = list(set([q.get("topic_id") for q in questions_map.values() if q.get("topic_id")]))
-        topics_map = {}
-        
-        for tid in topic_ids:
-            t = TopicModel().get(tid)
-            if t:
-                topics_map[tid] = t
+        topics_map = {t["id"]: t for t in TopicModel().get_many(topic_ids) if t}
         
         for p in performance:
             qid = p.get("question_id")
@@ -657,7 +645,17 @@ def get_performance():
                 p["question_title"] = "Unknown Question"
                 p["topic_name"] = "Unknown Topic"
 
-    return success_response({"performance": performance})
+    response_data = {"performance": performance}
+    if limit:
+        response_data["next_cursor"] = next_cursor
+    return success_response(response_data)
+
+
+@college_bp.route("/performance/summary", methods=["GET"])
+@require_auth(allowed_roles=["college"])
+def get_performance_summary():
+    """Get aggregated performance counters for this college and its departments."""
+    return success_response(performance_summary("college", request.user.get("college_id")))
 
 
 # ============================================================================
@@ -710,6 +708,7 @@ def get_question(question_id):
     if not question or question.get("college_id") != college_id:
         return error_response("NOT_FOUND", "Question not found in your college"), 404
     
+    question["hidden_testcases"] = hidden_testcases(question)
     return success_response({"question": question})
 
 
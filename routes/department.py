@@ -6,11 +6,14 @@ from models import (
     BatchModel, StudentModel, TopicModel, QuestionModel, NoteModel
 )
 from question_service import QuestionService
+from testcase_store import hidden_testcases
+from performance_aggregates import summary as performance_summary
 from cascade_service import CascadeService
 from agent_wrappers import generate_hidden_testcases
 from utils import (
     error_response, success_response, validate_batch_name, validate_email,
-    validate_username, validate_google_drive_link, parse_csv_students, audit_log
+    validate_username, validate_google_drive_link, parse_csv_students, audit_log,
+    parse_pagination_args
 )
 import secrets
 
@@ -257,6 +260,8 @@ def upload_students():
     
     created_students = []
     errors = []
+    pending = []  # (row, student_data) written together after validation
+    seen_usernames, seen_emails = set(), set()
     
     for idx, student in enumerate(students, start=2):
         try:
@@ -280,7 +285,10 @@ def upload_students():
                 errors.append(f"Row {idx}: batch_id '{csv_batch_id}' doesn't match selected batch '{batch_id}'")
                 continue
             
-            # Check uniqueness
+            # Check uniqueness (within the file too, since writes are deferred)
+            if student["username"] in seen_usernames or student["email"] in seen_emails:
+                errors.append(f"Row {idx}: Duplicate username or email in file")
+                continue
             if StudentModel().query(username=student["username"]):
                 errors.append(f"Row {idx}: Username '{student['username']}' already exists")
                 continue
@@ -306,12 +314,23 @@ def upload_students():
                 "password_reset_required": False
             }
             
-            student_id = StudentModel().create(student_data)
-            created_students.append({"student_id": student_id, "email": student["email"]})
+            seen_usernames.add(student["username"])
+            seen_emails.add(student["email"])
+            pending.append((idx, student_data))
         
         except Exception as e:
             errors.append(f"Row {idx}: Error creating student {student.get('email', 'unknown')}: {str(e)}")
     
+    # Write all validated students with batched writes
+    if pending:
+        result = StudentModel().create_many([student_data for _, student_data in pending])
+        failures = {item["id"]: item["error"] for item in result["failed"]}
+        for (idx, student_data), student_id in zip(pending, result["ids"]):
+            if student_id in failures:
+                errors.append(f"Row {idx}: Error creating student {student_data['email']}: {failures[student_id]}")
+            else:
+                created_students.append({"student_id": student_id, "email": student_data["email"]})
+    
     audit_log(dept_id, "bulk_upload_students", "batch", batch_id, {
         "total": len(students),
         "created": len(created_students),
@@ -629,6 +648,7 @@ def get_question(question_id):
     if not question or question.get("department_id") != dept_id:
         return error_response("NOT_FOUND", "Question not found", status_code=404)
     
+    question["hidden_testcases"] = hidden_testcases(question)
     return success_response({"question": question})
 
 
@@ -721,7 +741,11 @@ def delete_note(note_id):
 @department_bp.route("/performance", methods=["GET"])
 @require_auth(allowed_roles=["department"])
 def get_performance():
-    """Get performance data for students in this department."""
+    """Get performance data for students in this department, paginated with ?limit=&cursor=."""
+    limit, cursor, page_error = parse_pagination_args(request.args)
+    if page_error:
+        return error_response("INVALID_INPUT", page_error)
+    
     from models import PerformanceModel # Ensure imported
     
     dept_id = request.user.get("department_id")
@@ -732,43 +756,25 @@ def get_performance():
     if batch_id:
         filters["batch_id"] = batch_id
     
-    performance = []
-    
-    if student_id:
-        # 1. Verify student belongs to this department
-        student = StudentModel().get(student_id)
-        if not student or student.get("department_id") != dept_id:
-             return success_response({"performance": []})
-             
-        # 2. Try querying by the provided student_id (UUID)
-        filters["student_id"] = student_id
-        performance = PerformanceModel().query(**filters)
-        
-        # 3. Fallback
-        if not performance:
-             if student.get("firebase_uid"):
-                filters["student_id"] = student.get("firebase_uid")
-                performance = PerformanceModel().query(**filters)
-    else:
-        performance = PerformanceModel().query(**filters)
+    try:
+        if student_id:
+            # Only students of this department; older records use the student's Firebase UID
+            student = StudentModel().get(student_id)
+            if not student or student.get("department_id") != dept_id:
+                return success_response({"performance": []})
+            filters["student_id"] = PerformanceModel().student_key(student_id, student, **filters)
+        performance, next_cursor = PerformanceModel().list_records(limit, cursor, **filters)
+    except ValueError as e:
+        return error_response("INVALID_CURSOR", str(e))
         
     # Enrich performance data
     if performance:
         question_ids = list(set([p.get("question_id") for p in performance if p.get("question_id")]))
         
-        questions_map = {}
-        for qid in question_ids:
-            q = QuestionModel().get(qid)
-            if q:
-                questions_map[qid] = q
+        questions_map = {q["id"]: q for q in QuestionModel().get_many(question_ids) if q}
                 
         topic_ids = list(set([q.get("topic_id") for q in questions_map.values() if q.get("topic_id")]))
-        topics_map = {}
-        
-        for tid in topic_ids:
-            t = TopicModel().get(tid)
-            if t:
-                topics_map[tid] = t
+        topics_map = {t["id"]: t for t in TopicModel().get_many(topic_ids) if t}
         
         for p in performance:
             qid = p.get("question_id")
@@ -785,4 +791,14 @@ def get_performance():
                 p["question_title"] = "Unknown Question"
                 p["topic_name"] = "Unknown Topic"
 
-    return success_response({"performance": performance})
+    response_data = {"performance": performance}
+    if limit:
+        response_data["next_cursor"] = next_cursor
+    return success_response(response_data)
+
+
+@department_bp.route("/performance/summary", methods=["GET"])
+@require_auth(allowed_roles=["department"])
+def get_performance_summary():
+    """Get aggregated performance counters for this department and its batches and topics."""
+    return success_response(performance_summary("department", request.user.get("department_id")))
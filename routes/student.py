@@ -6,11 +6,16 @@ from models import (
     CollegeModel, DepartmentModel, can_student_access
 )
 from topic_service import TopicService
-from agent_wrappers import (
-    compile_and_run_code, evaluate_code_against_testcases, get_efficiency_feedback
+from question_service import QuestionService
+from agent_wrappers import compile_and_run_code, get_efficiency_feedback, stream_agent_call
+from submission_service import SubmissionService, fair_queue_tenant, testcases_ready
+from agents.rate_limiter import llm_tenant
+from jobs import job_queue, public_job
+from config import (
+    SUBMISSIONS_ASYNC_DEFAULT, JOB_EVENTS_POLL_SECONDS, JOB_EVENTS_MAX_SECONDS, JOB_EVENTS_RETRY_MS
 )
-from utils import error_response, success_response
-from datetime import datetime
+from utils import error_response, success_response, parse_pagination_args, sse_event, sse_response
+import time
 
 student_bp = Blueprint("student", __name__, url_prefix="/api/student")
 
@@ -125,17 +130,17 @@ def get_questions():
     if topic_id:
         filters["topic_id"] = topic_id
     
-    questions = QuestionModel().query(**filters)
+    # Project away hidden test cases instead of downloading them
+    questions = QuestionModel().query(select=QuestionModel.STUDENT_FIELDS, **filters)
     
     # Check attempts
     student_id = request.user.get("student_id")
-    attempts = PerformanceModel().query(student_id=student_id)
+    attempts = PerformanceModel().query(select=["question_id", "status"], student_id=student_id)
     attempted_ids = {a.get("question_id") for a in attempts}
     solved_ids = {a.get("question_id") for a in attempts if a.get("status") == "correct"}
     
-    # Remove hidden test cases and add flags
+    # Add attempt flags
     for q in questions:
-        q.pop("hidden_testcases", None)
         q["is_attempted"] = q.get("id") in attempted_ids
         q["is_solved"] = q.get("id") in solved_ids
     
@@ -160,8 +165,9 @@ def get_question_detail(question_id):
         print(f'🔍 Question validation failed - question exists: {bool(question)}, batch match: {question.get("batch_id") if question else "N/A"} == {batch_id}')
         return error_response("NOT_FOUND", "Question not found", status_code=404)
     
-    # Remove hidden test cases
-    question.pop("hidden_testcases", None)
+    # Only the metadata students may see (older documents still carry
+    # hidden test cases inline)
+    question = {field: question.get(field) for field in ["id"] + QuestionModel.STUDENT_FIELDS}
     
     print(f'🔍 Returning question: {question}')
     return success_response({"question": question})
@@ -179,17 +185,19 @@ def get_questions_by_topic(topic_id):
         return error_response("NO_BATCH", "Student not assigned to batch", status_code=400)
     
     # Query questions for this topic and batch
-    questions = QuestionModel().query(topic_id=topic_id, batch_id=batch_id)
+    # Project away hidden test cases instead of downloading them
+    questions = QuestionModel().query(
+        select=QuestionModel.STUDENT_FIELDS, topic_id=topic_id, batch_id=batch_id
+    )
     
     # Check attempts
     student_id = request.user.get("student_id")
-    attempts = PerformanceModel().query(student_id=student_id)
+    attempts = PerformanceModel().query(select=["question_id", "status"], student_id=student_id)
     attempted_ids = {a.get("question_id") for a in attempts}
     solved_ids = {a.get("question_id") for a in attempts if a.get("status") == "correct"}
     
-    # Remove hidden test cases and add flags
+    # Add attempt flags
     for q in questions:
-        q.pop("hidden_testcases", None)
         q["is_attempted"] = q.get("id") in attempted_ids
         q["is_solved"] = q.get("id") in solved_ids
     
@@ -214,43 +222,91 @@ def run_code():
     if not batch_id:
         return error_response("NO_BATCH", "Student not assigned to batch", status_code=400)
     
+    data, question, error = _practice_request(batch_id)
+    if error:
+        return error
+    
+    # Compile and run code with sample input
+    with llm_tenant(fair_queue_tenant(request.user)):
+        compile_result = compile_and_run_code(
+            question.get("description"), 
+            data["code"], 
+            data["language"], 
+            data.get("test_input", "")
+        )
+    
+    if not compile_result["success"]:
+        print(f"DEBUG: compile_result (error): {compile_result}", flush=True)
+    return success_response(_run_response_data(compile_result))
+
+
+@student_bp.route("/run/stream", methods=["POST", "OPTIONS"])
+@require_auth(allowed_roles=["student"])
+def run_code_stream():
+    """Run code, streaming output as server-sent events.
+    
+    Same request as /run. Emits "delta" events ({"text"}) with program
+    output as the LLM runner generates it, then one "result" event with the
+    /run response data. Locally executed code emits only the result.
+    """
+    batch_id = request.user.get("batch_id")
+    if not batch_id:
+        return error_response("NO_BATCH", "Student not assigned to batch", status_code=400)
+    
+    data, question, error = _practice_request(batch_id)
+    if error:
+        return error
+    
+    tenant = fair_queue_tenant(request.user)
+    
+    def generate():
+        with llm_tenant(tenant):
+            for event, payload in stream_agent_call(
+                compile_and_run_code, question.get("description"), data["code"],
+                data["language"], data.get("test_input", ""), envelope_field=True
+            ):
+                if event == "delta":
+                    yield sse_event("delta", {"text": payload})
+                else:
+                    yield sse_event("result", _run_response_data(payload))
+    
+    return sse_response(generate())
+
+
+def _practice_request(batch_id):
+    """Validate a run/efficiency request body and load its question.
+    
+    Returns:
+        (dict, dict, None) on success or (None, None, error response)
+    """
     data = request.json or {}
     
     required = ["question_id", "code", "language"]
     if not all(data.get(k) for k in required):
-        return error_response("INVALID_INPUT", f"Required fields: {', '.join(required)}")
-    
-    question_id = data["question_id"]
-    code = data["code"]
-    language = data["language"]
-    test_input = data.get("test_input", "")
+        return None, None, error_response("INVALID_INPUT", f"Required fields: {', '.join(required)}")
     
     # Verify question belongs to student's batch
-    question = QuestionModel().get(question_id)
+    question = QuestionModel().get(data["question_id"])
     if not question or question.get("batch_id") != batch_id:
-        return error_response("NOT_FOUND", "Question not found", status_code=404)
-    
-    # Compile and run code with sample input
-    compile_result = compile_and_run_code(
-        question.get("description"), 
-        code, 
-        language, 
-        test_input
-    )
+        return None, None, error_response("NOT_FOUND", "Question not found", status_code=404)
     
+    return data, question, None
+
+
+def _run_response_data(compile_result):
+    """Build the /run response data from a compile_and_run_code result."""
     if not compile_result["success"]:
-        print(f"DEBUG: compile_result (error): {compile_result}", flush=True)
-        return success_response({
+        return {
             "status": "error",
             "error": compile_result["error"],
             "output": None
-        })
-    
-    return success_response({
+        }
+    return {
         "status": "success",
         "output": compile_result["data"]["output"],
-        "execution_time": compile_result["data"]["execution_time"]
-    })
+        "execution_time": compile_result["data"]["execution_time"],
+        "peak_memory_kb": compile_result["data"]["peak_memory_kb"]
+    }
 
 
 @student_bp.route("/efficiency", methods=["POST", "OPTIONS"])
@@ -266,33 +322,62 @@ def get_code_efficiency():
     if not batch_id:
         return error_response("NO_BATCH", "Student not assigned to batch", status_code=400)
     
-    data = request.json or {}
-    
-    required = ["question_id", "code", "language"]
-    if not all(data.get(k) for k in required):
-        return error_response("INVALID_INPUT", f"Required fields: {', '.join(required)}")
-    
-    question_id = data["question_id"]
-    code = data["code"]
-    language = data["language"]
-    
-    # Verify question belongs to student's batch
-    question = QuestionModel().get(question_id)
-    if not question or question.get("batch_id") != batch_id:
-        return error_response("NOT_FOUND", "Question not found", status_code=404)
+    data, question, error = _practice_request(batch_id)
+    if error:
+        return error
     
     # Analyze efficiency
-    eff_result = get_efficiency_feedback(question.get("description"), code)
+    with llm_tenant(fair_queue_tenant(request.user)):
+        eff_result = get_efficiency_feedback(question.get("description"), data["code"])
     
     if not eff_result["success"]:
         return error_response("ANALYSIS_FAILED", eff_result["error"], status_code=500)
     
     return success_response(eff_result["data"])
 
+
+@student_bp.route("/efficiency/stream", methods=["POST", "OPTIONS"])
+@require_auth(allowed_roles=["student"])
+def get_code_efficiency_stream():
+    """Analyze efficiency, streaming the analysis as server-sent events.
+    
+    Same request as /efficiency. Emits "delta" events ({"text"}) with the
+    raw analysis as it is generated, then either a "result" event with the
+    parsed /efficiency data or an "error" event ({"code", "message"}).
+    """
+    batch_id = request.user.get("batch_id")
+    if not batch_id:
+        return error_response("NO_BATCH", "Student not assigned to batch", status_code=400)
+    
+    data, question, error = _practice_request(batch_id)
+    if error:
+        return error
+    
+    tenant = fair_queue_tenant(request.user)
+    
+    def generate():
+        with llm_tenant(tenant):
+            for event, payload in stream_agent_call(
+                get_efficiency_feedback, question.get("description"), data["code"]
+            ):
+                if event == "delta":
+                    yield sse_event("delta", {"text": payload})
+                elif payload["success"]:
+                    yield sse_event("result", payload["data"])
+                else:
+                    yield sse_event("error", {"code": "ANALYSIS_FAILED", "message": payload["error"]})
+    
+    return sse_response(generate())
+
 @student_bp.route("/submit", methods=["POST", "OPTIONS"])
 @require_auth(allowed_roles=["student"])
 def submit_code():
-    """Submit code for evaluation using AI agents."""
+    """Submit code for evaluation.
+    
+    With {"async": true} (or ?async=true, or SUBMISSIONS_ASYNC_DEFAULT) the
+    submission is queued and 202 is returned with a submission_id to poll
+    at GET /submissions/<id> or follow at /submissions/<id>/events.
+    """
     if request.method == "OPTIONS":
         return "", 200
     
@@ -318,99 +403,108 @@ def submit_code():
     question = QuestionModel().get(question_id)
     if not question or question.get("batch_id") != batch_id:
         return error_response("NOT_FOUND", "Question not found", status_code=404)
-    
-    # Step 1: Compile and run code on sample input
-    compile_result = compile_and_run_code(
-        question.get("description"), 
-        code, 
-        language, 
-        question.get("sample_input")
-    )
-    
-    if not compile_result["success"]:
-        # Store failed submission
-        perf_data = {
-            "student_id": student_id,
-            "question_id": question_id,
-            "batch_id": batch_id,
-            "department_id": department_id,
-            "college_id": college_id,
-            "status": "execution_error",
-            "submission_code": code,
-            "submission_language": language,
-            "test_results": {"total": 0, "passed": 0, "failed": 0},
-            "submitted_at": datetime.utcnow(),
-            "attempts": 1
-        }
-        
-        perf_id = PerformanceModel().create(perf_data)
-        
-        return success_response({
-            "status": "execution_error",
-            "error": compile_result["error"],
-            "performance_id": perf_id
-        }), 200
-    
-    # Step 2: Evaluate against all test cases
-    all_testcases = (
-        question.get("open_testcases", []) +
-        question.get("hidden_testcases", [])
-    )
-    
-    eval_result = evaluate_code_against_testcases(
-        question.get("description"), 
-        code, 
-        language, 
-        all_testcases
-    )
-    
-    is_correct = False
-    eval_reason = "Evaluation failed"
-    
-    if eval_result["success"]:
-        is_correct = eval_result["data"]["is_correct"]
-        eval_reason = eval_result["data"]["reason"]
-    else:
-        eval_reason = eval_result.get("error", "Evaluation failed")
-    
-    # Step 3: If correct, get efficiency feedback
-    efficiency_feedback = None
-    if is_correct:
-        eff_result = get_efficiency_feedback(question.get("description"), code)
-        if eff_result["success"]:
-            efficiency_feedback = eff_result["data"]
-    
-    # Store performance record
-    perf_data = {
+    if not testcases_ready(question):
+        # Re-queue a generation lost with a restarted worker
+        QuestionService.reconcile_testcase_generation(question_id, question)
+        return error_response(
+            "TESTCASES_NOT_READY",
+            "This question is not accepting submissions yet; its test cases are still being prepared",
+            status_code=409
+        )
+    
+    student = {
         "student_id": student_id,
-        "question_id": question_id,
         "batch_id": batch_id,
         "department_id": department_id,
-        "college_id": college_id,
-        "status": "correct" if is_correct else "incorrect",
-        "submission_code": code,
-        "submission_language": language,
-        "test_results": {
-            "is_correct": is_correct,
-            "reason": eval_reason
-        },
-        "efficiency_feedback": efficiency_feedback if efficiency_feedback else None,
-        "submitted_at": datetime.utcnow(),
-        "attempts": 1
+        "college_id": college_id
     }
     
-    perf_id = PerformanceModel().create(perf_data)
+    if _wants_async(data):
+        # Queue the agent pipeline and free this worker immediately
+        submission_id = job_queue.submit("submission", {
+            "student": student,
+            "question_id": question_id,
+            "code": code,
+            "language": language
+        }, owner=student_id)
+        return success_response(
+            {"submission_id": submission_id, "status": "queued"},
+            "Submission queued",
+            status_code=202
+        )
+    
+    result = SubmissionService.submit(student, question, code, language)
+    if result["status"] == "unavailable":
+        return error_response("TESTCASES_UNAVAILABLE", result["error"], status_code=503)
+    return success_response(result)
+
+
+def _wants_async(data):
+    """Return True if the submission should be queued as a job."""
+    flag = request.args.get("async", data.get("async"))
+    if flag is None:
+        return SUBMISSIONS_ASYNC_DEFAULT
+    return flag is True or str(flag).lower() in ("1", "true", "yes")
+
+
+def _owned_submission(submission_id):
+    """Return the student's queued submission job, or None."""
+    job = job_queue.get(submission_id)
+    if not job or job.get("kind") != "submission" or job.get("owner") != request.user.get("student_id"):
+        return None
+    return job
+
+
+@student_bp.route("/submissions/<submission_id>", methods=["GET", "OPTIONS"])
+@require_auth(allowed_roles=["student"])
+def get_submission(submission_id):
+    """Get the status (queued/running/done/failed) and result of a queued submission."""
+    if request.method == "OPTIONS":
+        return "", 200
     
-    response_data = {
-        "status": "correct" if is_correct else "incorrect",
-        "test_results": perf_data["test_results"],
-        "performance_id": perf_id
-    }
+    job = _owned_submission(submission_id)
+    if not job:
+        return error_response("NOT_FOUND", "Submission not found", status_code=404)
     
-    if efficiency_feedback:
-        response_data["efficiency_feedback"] = efficiency_feedback
+    return success_response(public_job(job))
+
+
+@student_bp.route("/submissions/<submission_id>/events", methods=["GET", "OPTIONS"])
+@require_auth(allowed_roles=["student"])
+def stream_submission_events(submission_id):
+    """Server-sent events for a queued submission.
+    
+    Emits a "status" event (id: the status) whenever the status changes.
+    The stream holds a sync worker, so it ends after the "done"/"failed"
+    event or JOB_EVENTS_MAX_SECONDS; the EventSource then reconnects with
+    Last-Event-ID and only hears about newer statuses. Reconnecting after
+    the final event gets 204, which stops the EventSource.
+    """
+    if request.method == "OPTIONS":
+        return "", 200
     
-    return success_response(response_data)
+    job = _owned_submission(submission_id)
+    if not job:
+        return error_response("NOT_FOUND", "Submission not found", status_code=404)
+    
+    last_event_id = request.headers.get("Last-Event-ID")
+    if last_event_id in ("done", "failed") and job["status"] == last_event_id:
+        return "", 204
+    
+    def generate():
+        current = job
+        last_status = last_event_id
+        deadline = time.monotonic() + JOB_EVENTS_MAX_SECONDS
+        while True:
+            if current["status"] != last_status:
+                last_status = current["status"]
+                yield sse_event("status", public_job(current), event_id=last_status, retry=JOB_EVENTS_RETRY_MS)
+            if last_status in ("done", "failed") or time.monotonic() >= deadline:
+                return
+            time.sleep(JOB_EVENTS_POLL_SECONDS)
+            current = job_queue.get(submission_id) or current
+    
+    return sse_response(generate())
 
 
 # ============================================================================
@@ -445,10 +539,14 @@ def get_notes():
 @student_bp.route("/performance", methods=["GET", "OPTIONS"])
 @require_auth(allowed_roles=["student"])
 def get_performance():
-    """Get submission history for student."""
+    """Get submission history for student, paginated with ?limit=&cursor=."""
     if request.method == "OPTIONS":
         return "", 200
     
+    limit, cursor, page_error = parse_pagination_args(request.args)
+    if page_error:
+        return error_response("INVALID_INPUT", page_error)
+    
     student_id = request.user.get("student_id")
     question_id = request.args.get("question_id")
     
@@ -456,15 +554,18 @@ def get_performance():
     if question_id:
         filters["question_id"] = question_id
     
-    performance = PerformanceModel().query(**filters)
+    try:
+        performance, next_cursor = PerformanceModel().list_records(limit, cursor, **filters)
+    except ValueError as e:
+        return error_response("INVALID_CURSOR", str(e))
     
-    # Enriched performance data with question details
-    for p in performance:
-        q = QuestionModel().get(p.get("question_id"))
+    # Enriched performance data with question details (batched reads)
+    questions = QuestionModel().get_many(p.get("question_id") for p in performance)
+    for p, q in zip(performance, questions):
         p["question_title"] = q.get("title") if q else "Unknown Question"
         p["question_difficulty"] = q.get("difficulty") if q else "Medium"
     
-    # Sort by submission time (descending)
-    performance.sort(key=lambda x: x.get("submitted_at"), reverse=True)
-    
-    return success_response({"performance": performance})
+    response_data = {"performance": performance}
+    if limit:
+        response_data["next_cursor"] = next_cursor
+    return success_response(response_data)
@@ -0,0 +1,161 @@
+"""Single-flight coalescing of identical concurrent calls.
+
+When dozens of students run the starter code against the sample input at
+the same moment, every request has the same agent cache key. SingleFlight
+lets the first caller (the leader) make the call while the others wait for
+it and share the result, so a burst costs one LLM request instead of one
+per student.
+
+Within a worker process, callers coalesce through an in-memory table of
+in-flight keys. With cross_worker=True the leader also takes an exclusive
+lock on a per-key file under lock_dir, so leaders in other gunicorn workers
+queue behind it; each one then re-checks the shared (persistent) agent
+cache before calling out. That only saves a call when the result reaches a
+tier every worker reads, so enable AGENT_CACHE_PERSISTENT alongside it.
+"""
+import copy
+import fcntl
+import hashlib
+import logging
+import os
+import threading
+import time
+
+logger = logging.getLogger(__name__)
+
+
+class _Call:
+    def __init__(self):
+        self.done = threading.Event()
+        self.result = None
+        self.error = None
+        self.followers = 0
+
+
+class SingleFlight:
+    """Coalesce concurrent calls that share a key."""
+
+    def __init__(self, cross_worker=False, lock_dir=None, wait_seconds=60):
+        """Initialize coalescer.
+
+        Args:
+            cross_worker: Also coalesce across processes with lock files
+            lock_dir: Directory for lock files (cross_worker only)
+            wait_seconds: Longest a follower waits before calling itself
+        """
+        self.cross_worker = cross_worker
+        self.lock_dir = lock_dir
+        self.wait_seconds = wait_seconds
+
+        self._lock = threading.Lock()
+        self._calls = {}
+        self.leaders = 0
+        self.coalesced = 0
+        self.lock_waits = 0
+
+    def do(self, key, fn, recheck=None):
+        """Call fn() once for all concurrent callers with the same key.
+
+        Args:
+            key: Hashable call identity (e.g. an agent cache key)
+            fn: Zero-argument callable
+            recheck: Optional zero-argument callable run by a leader after
+                it acquires the cross-worker lock; a non-None return value
+                (e.g. a cache hit produced by another worker) is used
+                instead of calling fn()
+
+        Returns:
+            fn()'s result; followers receive a deep copy. An exception raised
+            by the leader's call is re-raised in every follower.
+        """
+        with self._lock:
+            call = self._calls.get(key)
+            if call is None:
+                call = self._calls[key] = _Call()
+                leader = True
+                self.leaders += 1
+            else:
+                call.followers += 1
+                leader = False
+                self.coalesced += 1
+
+        if not leader:
+            if call.done.wait(self.wait_seconds):
+                if call.error is not None:
+                    raise call.error
+                return copy.deepcopy(call.result)
+            logger.warning("Single-flight wait timed out; calling directly")
+            return fn()
+
+        try:
+            call.result = self._lead(key, fn, recheck)
+            return call.result
+        except Exception as e:
+            call.error = e
+            raise
+        finally:
+            with self._lock:
+                self._calls.pop(key, None)
+            call.done.set()
+
+    def _lead(self, key, fn, recheck):
+        if not self.cross_worker:
+            return fn()
+
+        path = os.path.join(self.lock_dir, hashlib.sha256(str(key).encode()).hexdigest() + ".lock")
+        try:
+            os.makedirs(self.lock_dir, exist_ok=True)
+            handle = open(path, "a+")
+        except OSError as e:
+            logger.warning(f"Single-flight lock unavailable, calling directly: {e}")
+            return fn()
+
+        try:
+            if not self._acquire(handle):
+                logger.warning("Single-flight lock wait timed out; calling directly")
+                return fn()
+            if recheck is not None:
+                found = recheck()
+                if found is not None:
+                    return found
+            result = fn()
+            # Later arrivals open a fresh file; anyone already queued on this
+            # one re-checks the shared cache after we release it
+            try:
+                os.unlink(path)
+            except OSError:
+                pass
+            return result
+        finally:
+            handle.close()
+
+    def _acquire(self, handle):
+        deadline = time.monotonic() + self.wait_seconds
+        waited = False
+        while True:
+            try:
+                fcntl.flock(handle, fcntl.LOCK_EX | fcntl.LOCK_NB)
+                return True
+            except BlockingIOError:
+                if not waited:
+                    waited = True
+                    with self._lock:
+                        self.lock_waits += 1
+                if time.monotonic() >= deadline:
+                    return False
+                time.sleep(0.05)
+
+    def stats(self):
+        """Return counters for this process.
+
+        Returns:
+            dict: cross_worker, in_flight, leaders, coalesced, lock_waits
+        """
+        with self._lock:
+            return {
+                "cross_worker": self.cross_worker,
+                "in_flight": len(self._calls),
+                "leaders": self.leaders,
+                "coalesced": self.coalesced,
+                "lock_waits": self.lock_waits
+            }
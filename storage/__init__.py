@@ -0,0 +1,37 @@
+"""Local storage backends that stand in for Firestore and Firebase Auth.
+
+Selected with STORAGE_BACKEND (see config.py and firebase_init.py):
+
+    firestore  Google Cloud Firestore + Firebase Auth (default)
+    memory     in-process dicts, lost on restart
+    sqlite     a SQLite file at SQLITE_DB_PATH, shared by worker processes
+
+Both local backends expose the google-cloud-firestore client API subset
+that models.py and the routes use, so the app runs unchanged without any
+Google services.
+"""
+from storage.auth import LocalAuth
+from storage.documents import Client
+from storage.memory import MemoryStore
+from storage.sqlite import SQLiteStore
+
+LOCAL_BACKENDS = ("memory", "sqlite")
+
+
+def create_backend(backend, sqlite_path=None):
+    """Create a local document client and auth service sharing one store.
+
+    Args:
+        backend: "memory" or "sqlite"
+        sqlite_path: Database file for the sqlite backend
+
+    Returns:
+        tuple: (Client, LocalAuth)
+    """
+    if backend == "memory":
+        store = MemoryStore()
+    elif backend == "sqlite":
+        store = SQLiteStore(sqlite_path)
+    else:
+        raise ValueError(f"Unknown storage backend: {backend}")
+    return Client(store), LocalAuth(store)
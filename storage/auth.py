@@ -0,0 +1,117 @@
+"""Local stand-in for firebase_admin.auth, backed by a document store."""
+import hashlib
+import hmac
+import logging
+import os
+import uuid
+
+from firebase_admin import auth as firebase_auth
+
+logger = logging.getLogger(__name__)
+
+USERS_COLLECTION = "_auth_users"
+
+
+class UserRecord:
+    """The fields of firebase_admin.auth.UserRecord this app reads."""
+
+    def __init__(self, uid, data):
+        self.uid = uid
+        self.email = data.get("email")
+        self.display_name = data.get("display_name")
+        self.disabled = data.get("disabled", False)
+        self.custom_claims = data.get("custom_claims")
+
+
+def _hash_password(password, salt):
+    return hashlib.pbkdf2_hmac("sha256", password.encode(), bytes.fromhex(salt), 100_000).hex()
+
+
+class LocalAuth:
+    """Email/password accounts stored next to the app's documents.
+
+    Implements the firebase_admin.auth calls the app makes, raising the same
+    exception types, plus sign_in_with_password() in place of the Identity
+    Toolkit REST call used by /api/auth/login.
+    """
+
+    def __init__(self, store):
+        self._store = store
+
+    def _get(self, uid):
+        data = self._store.get(USERS_COLLECTION, uid)
+        if data is None:
+            raise firebase_auth.UserNotFoundError(f"No user record found for the provided user ID: {uid}")
+        return data
+
+    def _find_by_email(self, email):
+        for uid, data in self._store.scan(USERS_COLLECTION, {"email": email}):
+            if data.get("email") == email:
+                return uid, data
+        return None, None
+
+    def create_user(self, email=None, password=None, display_name=None, disabled=False, uid=None, **kwargs):
+        if email and self._find_by_email(email)[0]:
+            raise firebase_auth.EmailAlreadyExistsError(
+                f"The user with the provided email already exists ({email})", None, None
+            )
+        uid = uid or uuid.uuid4().hex[:28]
+        data = {"email": email, "display_name": display_name, "disabled": disabled}
+        if password is not None:
+            data["salt"] = os.urandom(16).hex()
+            data["password_hash"] = _hash_password(password, data["salt"])
+        self._store.commit([("set", USERS_COLLECTION, uid, data)])
+        return UserRecord(uid, data)
+
+    def get_user(self, uid):
+        return UserRecord(uid, self._get(uid))
+
+    def get_user_by_email(self, email):
+        uid, data = self._find_by_email(email)
+        if uid is None:
+            raise firebase_auth.UserNotFoundError(f"No user record found for the provided email: {email}")
+        return UserRecord(uid, data)
+
+    def update_user(self, uid, email=None, password=None, display_name=None, disabled=None, **kwargs):
+        data = self._get(uid)
+        if email is not None:
+            data["email"] = email
+        if display_name is not None:
+            data["display_name"] = display_name
+        if disabled is not None:
+            data["disabled"] = disabled
+        if password is not None:
+            data["salt"] = os.urandom(16).hex()
+            data["password_hash"] = _hash_password(password, data["salt"])
+        self._store.commit([("set", USERS_COLLECTION, uid, data)])
+        return UserRecord(uid, data)
+
+    def delete_user(self, uid):
+        self._get(uid)
+        self._store.commit([("delete", USERS_COLLECTION, uid, None)])
+
+    def set_custom_user_claims(self, uid, custom_claims):
+        self._get(uid)
+        self._store.commit([("update", USERS_COLLECTION, uid, {"custom_claims": custom_claims})])
+
+    def verify_id_token(self, id_token, check_revoked=False):
+        raise firebase_auth.InvalidIdTokenError("Firebase ID tokens are not available with a local storage backend")
+
+    def send_password_reset_email(self, email):
+        # No mail server locally; log so the flow can still be exercised
+        self.get_user_by_email(email)
+        logger.info(f"Password reset requested for {email} (local auth, no email sent)")
+
+    def sign_in_with_password(self, email, password):
+        """Check credentials like the Identity Toolkit signInWithPassword call.
+
+        Returns:
+            dict: {"localId", "email", "displayName"} on success, None for
+            unknown users, wrong passwords or disabled accounts
+        """
+        uid, data = self._find_by_email(email)
+        if uid is None or data.get("disabled") or "password_hash" not in data:
+            return None
+        if not hmac.compare_digest(_hash_password(password, data["salt"]), data["password_hash"]):
+            return None
+        return {"localId": uid, "email": email, "displayName": data.get("display_name")}
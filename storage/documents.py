@@ -0,0 +1,421 @@
+"""Firestore-compatible client over a local document store.
+
+Implements the subset of the google-cloud-firestore client API this app
+uses: collections, documents, equality/range filters, ordering, cursors,
+projections, limits, get_all, WriteBatch, transactions and the
+Increment / Maximum / Minimum field transforms. The actual storage is a
+store object (see memory.py and sqlite.py) exposing:
+
+    get(collection, doc_id)      -> dict or None
+    scan(collection, equals)     -> iterable of (doc_id, dict) ordered by ID
+    commit(ops)                  -> apply (kind, collection, doc_id, data)
+                                    operations atomically via apply_op()
+
+``equals`` is a dict of field -> value equality filters the store may use to
+narrow the scan; the query re-checks every filter, so stores are free to
+ignore it.
+
+Transactions are optimistic: the documents a transaction read are
+re-checked ("check" operations) in the same atomic commit as its writes,
+and the commit raises Aborted if any of them changed, which
+``transactional`` retries.
+"""
+import copy
+import uuid
+from datetime import datetime
+
+from google.api_core import exceptions as gcp_exceptions
+from google.cloud.firestore_v1.transforms import Increment, Maximum, Minimum
+
+
+DOCUMENT_ID_FIELD = "__name__"
+ASCENDING = "ASCENDING"
+DESCENDING = "DESCENDING"
+
+
+def _get_path(data, field_path):
+    """Return (found, value) for a dotted field path."""
+    value = data
+    for part in field_path.split("."):
+        if not isinstance(value, dict) or part not in value:
+            return False, None
+        value = value[part]
+    return True, value
+
+
+def _set_path(data, field_path, value):
+    parts = field_path.split(".")
+    for part in parts[:-1]:
+        data = data.setdefault(part, {})
+    data[parts[-1]] = value
+
+
+def _is_number(value):
+    return isinstance(value, (int, float)) and not isinstance(value, bool)
+
+
+def _resolve(existing, value):
+    """Return the value to store for a written field, applying transforms.
+
+    As in Firestore, a transform on a missing or non-numeric field treats
+    it as absent: Increment stores its operand, Maximum/Minimum theirs.
+    """
+    if isinstance(value, (Increment, Maximum, Minimum)):
+        if not _is_number(existing):
+            return value.value
+        if isinstance(value, Increment):
+            return existing + value.value
+        if isinstance(value, Maximum):
+            return max(existing, value.value)
+        return min(existing, value.value)
+    if isinstance(value, dict):
+        return {k: _resolve(existing.get(k) if isinstance(existing, dict) else None, v) for k, v in value.items()}
+    return copy.deepcopy(value)
+
+
+def apply_op(current, kind, data, path=""):
+    """Compute a document's new contents for one write.
+
+    Args:
+        current: Existing document dict, or None
+        kind: "set", "merge", "update", "delete", or "check" (data is
+            the document as a transaction read it; it must be unchanged)
+        data: Written fields (None for delete)
+        path: collection/doc_id, used in error messages
+
+    Returns:
+        dict or None: New document contents (None means deleted)
+
+    Raises:
+        google.api_core.exceptions.NotFound: update of a missing document
+        google.api_core.exceptions.Aborted: failed check
+    """
+    if kind == "check":
+        if current != data:
+            raise gcp_exceptions.Aborted(f"Transaction read of {path} is stale")
+        return current
+    if kind == "delete":
+        return None
+    if kind == "set":
+        return _resolve(None, data)
+    if kind == "update" and current is None:
+        raise gcp_exceptions.NotFound(f"No document to update: {path}")
+
+    new = copy.deepcopy(current) if current is not None else {}
+    for field_path, value in data.items():
+        if kind == "update":
+            _set_path(new, field_path, _resolve(_get_path(new, field_path)[1], value))
+        else:
+            new[field_path] = _resolve(new.get(field_path), value)
+    return new
+
+
+# Firestore orders values of different types by type first
+_TYPE_RANKS = ((type(None), 0), (bool, 1), (int, 2), (float, 2), (datetime, 3), (str, 4), (bytes, 5))
+
+
+def _sort_value(value):
+    for value_type, rank in _TYPE_RANKS:
+        if isinstance(value, value_type):
+            return (rank, value)
+    if isinstance(value, list):
+        return (6, [_sort_value(item) for item in value])
+    return (7, repr(value))
+
+
+def _matches(doc_id, data, field_path, op, value):
+    if field_path == DOCUMENT_ID_FIELD:
+        found, actual = True, doc_id
+    else:
+        found, actual = _get_path(data, field_path)
+    if not found:
+        return False
+
+    if op == "==":
+        return actual == value
+    if op == "!=":
+        return actual != value
+    if op == "in":
+        return actual in value
+    if op == "not-in":
+        return actual not in value
+    if op == "array_contains":
+        return isinstance(actual, list) and value in actual
+    if op == "array_contains_any":
+        return isinstance(actual, list) and any(item in actual for item in value)
+
+    left, right = _sort_value(actual), _sort_value(value)
+    if left[0] != right[0]:
+        return False
+    if op == "<":
+        return left < right
+    if op == "<=":
+        return left <= right
+    if op == ">":
+        return left > right
+    if op == ">=":
+        return left >= right
+    raise ValueError(f"Unsupported filter operator: {op}")
+
+
+class DocumentSnapshot:
+    """Result of reading a document."""
+
+    def __init__(self, reference, data):
+        self.reference = reference
+        self.id = reference.id
+        self._data = data
+        self.exists = data is not None
+
+    def to_dict(self):
+        return copy.deepcopy(self._data) if self._data is not None else None
+
+    def get(self, field_path):
+        found, value = _get_path(self._data or {}, field_path)
+        if not found:
+            raise KeyError(field_path)
+        return copy.deepcopy(value)
+
+
+class DocumentReference:
+    """Reference to a single document."""
+
+    def __init__(self, client, collection_name, doc_id):
+        self._client = client
+        self._collection_name = collection_name
+        self.id = doc_id
+
+    @property
+    def path(self):
+        return f"{self._collection_name}/{self.id}"
+
+    def get(self, field_paths=None, transaction=None):
+        data = self._client._store.get(self._collection_name, self.id)
+        if transaction is not None:
+            transaction._reads[(self._collection_name, self.id)] = copy.deepcopy(data)
+        if data is not None and field_paths is not None:
+            data = _project(data, field_paths)
+        return DocumentSnapshot(self, data)
+
+    def set(self, document_data, merge=False):
+        self._client._store.commit([("merge" if merge else "set", self._collection_name, self.id, document_data)])
+
+    def update(self, field_updates):
+        self._client._store.commit([("update", self._collection_name, self.id, field_updates)])
+
+    def delete(self):
+        self._client._store.commit([("delete", self._collection_name, self.id, None)])
+
+
+def _project(data, field_paths):
+    projected = {}
+    for field_path in field_paths:
+        found, value = _get_path(data, field_path)
+        if found:
+            _set_path(projected, field_path, value)
+    return projected
+
+
+class Query:
+    """Immutable query over one collection."""
+
+    def __init__(self, client, collection_name, filters=(), orders=(),
+                 limit_count=None, cursor=None, fields=None):
+        self._client = client
+        self._collection_name = collection_name
+        self._filters = filters
+        self._orders = orders
+        self._limit = limit_count
+        self._cursor = cursor
+        self._fields = fields
+
+    def _copy(self, **changes):
+        state = dict(
+            filters=self._filters, orders=self._orders, limit_count=self._limit,
+            cursor=self._cursor, fields=self._fields
+        )
+        state.update(changes)
+        return Query(self._client, self._collection_name, **state)
+
+    def where(self, field_path, op_string, value):
+        return self._copy(filters=self._filters + ((field_path, op_string, value),))
+
+    def order_by(self, field_path, direction=ASCENDING):
+        return self._copy(orders=self._orders + ((field_path, direction),))
+
+    def limit(self, count):
+        return self._copy(limit_count=count)
+
+    def start_after(self, document_fields_or_snapshot):
+        return self._copy(cursor=document_fields_or_snapshot)
+
+    def select(self, field_paths):
+        return self._copy(fields=list(field_paths))
+
+    def _order_values(self, doc_id, data, orders):
+        values = []
+        for field_path, _ in orders:
+            if field_path == DOCUMENT_ID_FIELD:
+                values.append(_sort_value(doc_id))
+            else:
+                values.append(_sort_value(_get_path(data, field_path)[1]))
+        return values
+
+    @staticmethod
+    def _is_after(values, cursor_values, orders):
+        for value, cursor_value, (_, direction) in zip(values, cursor_values, orders):
+            if value != cursor_value:
+                return value > cursor_value if direction == ASCENDING else value < cursor_value
+        return False
+
+    def stream(self, transaction=None):
+        equals = {
+            field_path: value for field_path, op, value in self._filters
+            if op == "==" and field_path != DOCUMENT_ID_FIELD
+        }
+        docs = [
+            (doc_id, data)
+            for doc_id, data in self._client._store.scan(self._collection_name, equals)
+            if all(_matches(doc_id, data, *f) for f in self._filters)
+        ]
+
+        # Documents missing an ordered field are excluded, as in Firestore;
+        # ties are broken by document ID in the last order's direction
+        orders = list(self._orders)
+        for field_path, _ in orders:
+            if field_path != DOCUMENT_ID_FIELD:
+                docs = [(doc_id, data) for doc_id, data in docs if _get_path(data, field_path)[0]]
+        if not orders or orders[-1][0] != DOCUMENT_ID_FIELD:
+            orders.append((DOCUMENT_ID_FIELD, orders[-1][1] if orders else ASCENDING))
+        for field_path, direction in reversed(orders):
+            docs.sort(
+                key=lambda item: self._order_values(item[0], item[1], [(field_path, direction)]),
+                reverse=direction == DESCENDING
+            )
+
+        if self._cursor is not None:
+            if isinstance(self._cursor, DocumentSnapshot):
+                cursor_id, cursor_data = self._cursor.id, self._cursor._data or {}
+            else:
+                cursor_id, cursor_data = self._cursor.get(DOCUMENT_ID_FIELD), self._cursor
+            cursor_values = self._order_values(cursor_id, cursor_data, orders)
+            docs = [
+                (doc_id, data) for doc_id, data in docs
+                if self._is_after(self._order_values(doc_id, data, orders), cursor_values, orders)
+            ]
+
+        if self._limit is not None:
+            docs = docs[:self._limit]
+
+        collection = self._client.collection(self._collection_name)
+        for doc_id, data in docs:
+            if self._fields is not None:
+                data = _project(data, self._fields)
+            yield DocumentSnapshot(collection.document(doc_id), data)
+
+    def get(self, transaction=None):
+        return list(self.stream())
+
+
+class CollectionReference(Query):
+    """Reference to a collection; also the root query over it."""
+
+    def __init__(self, client, collection_name):
+        super().__init__(client, collection_name)
+
+    @property
+    def id(self):
+        return self._collection_name
+
+    def document(self, document_id=None):
+        return DocumentReference(self._client, self._collection_name, document_id or uuid.uuid4().hex)
+
+    def add(self, document_data, document_id=None):
+        ref = self.document(document_id)
+        ref.set(document_data)
+        return datetime.utcnow(), ref
+
+
+class WriteBatch:
+    """Collects writes and applies them atomically on commit()."""
+
+    def __init__(self, client):
+        self._client = client
+        self._ops = []
+
+    def set(self, reference, document_data, merge=False):
+        self._ops.append(("merge" if merge else "set", reference._collection_name, reference.id, document_data))
+
+    def update(self, reference, field_updates):
+        self._ops.append(("update", reference._collection_name, reference.id, field_updates))
+
+    def delete(self, reference):
+        self._ops.append(("delete", reference._collection_name, reference.id, None))
+
+    def commit(self):
+        if len(self._ops) > 500:
+            raise gcp_exceptions.InvalidArgument("maximum 500 writes allowed per request")
+        self._client._store.commit(self._ops)
+        self._ops = []
+
+
+class Transaction(WriteBatch):
+    """Writes applied on commit() only if the documents read are unchanged."""
+
+    def __init__(self, client, max_attempts=5):
+        super().__init__(client)
+        self._max_attempts = max_attempts
+        self._reads = {}
+
+    def commit(self):
+        checks = [("check", collection, doc_id, data) for (collection, doc_id), data in self._reads.items()]
+        ops, self._ops, self._reads = self._ops, [], {}
+        self._client._store.commit(checks + ops)
+
+
+def transactional(to_wrap):
+    """Stand-in for google.cloud.firestore.transactional.
+
+    Calls to_wrap(transaction, *args, **kwargs) and commits, running it
+    again (up to the transaction's max_attempts) while the commit is
+    aborted by a concurrent write.
+    """
+    def wrapper(transaction, *args, **kwargs):
+        for attempt in range(1, transaction._max_attempts + 1):
+            transaction._ops, transaction._reads = [], {}
+            result = to_wrap(transaction, *args, **kwargs)
+            try:
+                transaction.commit()
+                return result
+            except gcp_exceptions.Aborted:
+                if attempt == transaction._max_attempts:
+                    raise
+    return wrapper
+
+
+class Client:
+    """Drop-in stand-in for google.cloud.firestore.Client."""
+
+    # models.py uses this in place of google.cloud.firestore.transactional
+    transactional = staticmethod(transactional)
+
+    def __init__(self, store):
+        self._store = store
+
+    def collection(self, collection_name):
+        return CollectionReference(self, collection_name)
+
+    def get_all(self, references, field_paths=None, transaction=None):
+        for reference in references:
+            yield reference.get(field_paths)
+
+    def batch(self):
+        return WriteBatch(self)
+
+    def transaction(self, max_attempts=5):
+        return Transaction(self, max_attempts)
+
+    def close(self):
+        close = getattr(self._store, "close", None)
+        if close:
+            close()
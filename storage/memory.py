@@ -0,0 +1,53 @@
+"""In-process document store (data lives only as long as the process)."""
+import copy
+import threading
+
+from storage.documents import apply_op
+
+
+class MemoryStore:
+    """Thread-safe dict-of-dicts document store.
+
+    Every gunicorn worker gets its own copy, so run a single worker (or use
+    the SQLite store) when the data must be shared.
+    """
+
+    def __init__(self):
+        self._collections = {}
+        self._lock = threading.RLock()
+
+    def get(self, collection, doc_id):
+        with self._lock:
+            data = self._collections.get(collection, {}).get(doc_id)
+            return copy.deepcopy(data)
+
+    def scan(self, collection, equals):
+        with self._lock:
+            docs = self._collections.get(collection, {})
+            matches = [
+                (doc_id, copy.deepcopy(data)) for doc_id, data in docs.items()
+                if all(data.get(field) == value for field, value in equals.items() if "." not in field)
+            ]
+        matches.sort(key=lambda item: item[0])
+        return matches
+
+    def commit(self, ops):
+        with self._lock:
+            # Compute every new state first so a failing op changes nothing
+            pending = {}
+            for kind, collection, doc_id, data in ops:
+                key = (collection, doc_id)
+                current = pending[key] if key in pending else self._collections.get(collection, {}).get(doc_id)
+                pending[key] = apply_op(current, kind, data, f"{collection}/{doc_id}")
+
+            for (collection, doc_id), data in pending.items():
+                docs = self._collections.setdefault(collection, {})
+                if data is None:
+                    docs.pop(doc_id, None)
+                else:
+                    docs[doc_id] = data
+
+    def clear(self):
+        """Drop every collection."""
+        with self._lock:
+            self._collections.clear()
@@ -0,0 +1,120 @@
+"""SQLite document store, shareable between worker processes.
+
+Documents are JSON in a single table keyed by (collection, id). Equality
+filters on top-level fields are pushed down with json_extract so queries
+only decode matching rows.
+"""
+import json
+import os
+import re
+import sqlite3
+import threading
+from datetime import datetime
+
+from storage.documents import apply_op
+
+
+_SIMPLE_FIELD = re.compile(r"^[A-Za-z_][A-Za-z0-9_]*$")
+
+
+def _encode(value):
+    if isinstance(value, datetime):
+        return {"__datetime__": value.isoformat()}
+    if isinstance(value, bytes):
+        return {"__bytes__": value.hex()}
+    raise TypeError(f"Cannot store {type(value).__name__} in SQLite store")
+
+
+def _decode(obj):
+    if "__datetime__" in obj and len(obj) == 1:
+        return datetime.fromisoformat(obj["__datetime__"])
+    if "__bytes__" in obj and len(obj) == 1:
+        return bytes.fromhex(obj["__bytes__"])
+    return obj
+
+
+def _dumps(data):
+    return json.dumps(data, default=_encode, separators=(",", ":"))
+
+
+def _loads(text):
+    return json.loads(text, object_hook=_decode)
+
+
+class SQLiteStore:
+    """Document store in a SQLite database file (WAL mode).
+
+    Connections are per thread and re-opened after fork, so the store is safe
+    to share across gunicorn workers and request threads.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self._local = threading.local()
+        with self._connect() as conn:
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS documents ("
+                " collection TEXT NOT NULL,"
+                " id TEXT NOT NULL,"
+                " data TEXT NOT NULL,"
+                " PRIMARY KEY (collection, id)"
+                ") WITHOUT ROWID"
+            )
+
+    def _connect(self):
+        conn = getattr(self._local, "conn", None)
+        if conn is None or self._local.pid != os.getpid():
+            conn = sqlite3.connect(self.path, timeout=30, isolation_level=None)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = conn
+            self._local.pid = os.getpid()
+        return conn
+
+    def get(self, collection, doc_id):
+        row = self._connect().execute(
+            "SELECT data FROM documents WHERE collection = ? AND id = ?", (collection, doc_id)
+        ).fetchone()
+        return _loads(row[0]) if row else None
+
+    def scan(self, collection, equals):
+        sql = "SELECT id, data FROM documents WHERE collection = ?"
+        params = [collection]
+        for field, value in equals.items():
+            if _SIMPLE_FIELD.match(field) and isinstance(value, (str, int, float)):
+                sql += " AND json_extract(data, ?) = ?"
+                params.extend([f'$."{field}"', value])
+        sql += " ORDER BY id"
+        for doc_id, data in self._connect().execute(sql, params):
+            yield doc_id, _loads(data)
+
+    def commit(self, ops):
+        conn = self._connect()
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            pending = {}
+            for kind, collection, doc_id, data in ops:
+                key = (collection, doc_id)
+                current = pending[key] if key in pending else self.get(collection, doc_id)
+                pending[key] = apply_op(current, kind, data, f"{collection}/{doc_id}")
+
+            for (collection, doc_id), data in pending.items():
+                if data is None:
+                    conn.execute(
+                        "DELETE FROM documents WHERE collection = ? AND id = ?", (collection, doc_id)
+                    )
+                else:
+                    conn.execute(
+                        "INSERT OR REPLACE INTO documents (collection, id, data) VALUES (?, ?, ?)",
+                        (collection, doc_id, _dumps(data))
+                    )
+            conn.execute("COMMIT")
+        except BaseException:
+            conn.execute("ROLLBACK")
+            raise
+
+    def close(self):
+        conn = getattr(self._local, "conn", None)
+        if conn is not None:
+            conn.close()
+            self._local.conn = None
@@ -0,0 +1,269 @@
+"""Submission evaluation service.
+
+The agent calls behind a submission are independent Groq round trips, so
+they run concurrently on a process-wide executor instead of one after
+another: the sample-input run and the full evaluation start together, and
+efficiency analysis starts speculatively alongside them. Its result is
+discarded (or the call cancelled if it has not started) when the verdict is
+not "correct". Every submission has a deadline, so a slow agent cannot pin
+a gunicorn worker past SUBMISSION_DEADLINE_SECONDS.
+"""
+import contextvars
+import logging
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, TimeoutError as FutureTimeoutError
+from datetime import datetime
+
+from agent_wrappers import (
+    compile_and_run_code, evaluate_code_against_testcases, get_efficiency_feedback
+)
+from agents.rate_limiter import llm_tenant
+from config import (
+    AGENT_EXECUTOR_WORKERS, SUBMISSION_DEADLINE_SECONDS, SPECULATIVE_EFFICIENCY, LLM_FAIR_QUEUE_BY
+)
+from jobs import job_queue
+from models import QuestionModel
+from performance_aggregates import record_submission
+import testcase_store
+
+logger = logging.getLogger(__name__)
+
+_executor = None
+_executor_pid = None
+_executor_lock = threading.Lock()
+
+
+def get_agent_executor():
+    """Return the shared executor for agent calls.
+
+    Created lazily and re-created in a forked child, since worker threads do
+    not survive fork().
+    """
+    global _executor, _executor_pid
+    with _executor_lock:
+        if _executor is None or _executor_pid != os.getpid():
+            _executor = ThreadPoolExecutor(
+                max_workers=AGENT_EXECUTOR_WORKERS, thread_name_prefix="agent"
+            )
+            _executor_pid = os.getpid()
+        return _executor
+
+
+def fair_queue_tenant(student):
+    """Return the rate limiter's fair-queue key for a student's LLM calls."""
+    if LLM_FAIR_QUEUE_BY == "student":
+        return f"student:{student.get('student_id')}"
+    return f"batch:{student.get('batch_id')}"
+
+
+def testcases_ready(question):
+    """Return True if a question's hidden test cases are in place for grading.
+
+    Questions from before background generation carry no testcase_status.
+    """
+    return question.get("testcase_status") in (None, "ready")
+
+
+def collect_testcases(question):
+    """Return a question's open and hidden test cases as one list.
+
+    Hidden test cases are loaded from testcase_store (cached per worker);
+    this is the only place students' requests read them.
+
+    Raises:
+        LookupError: If the hidden test cases are still pending or failed,
+            so a submission is never graded against the sample alone
+    """
+    if not testcases_ready(question):
+        raise LookupError(f"Hidden test cases of question {question['id']} are {question['testcase_status']}")
+    return list(question.get("open_testcases") or []) + testcase_store.hidden_testcases(question)
+
+
+class SubmissionService:
+    """Service for evaluating student submissions."""
+
+    @staticmethod
+    def evaluate(question, code, language, deadline_seconds=None):
+        """Run, evaluate and (if correct) analyse a submission concurrently.
+
+        Args:
+            question: Question document
+            code: Submitted source code
+            language: Programming language
+            deadline_seconds: Overall budget (defaults to SUBMISSION_DEADLINE_SECONDS)
+
+        Returns:
+            dict: {
+                "status": "execution_error" | "correct" | "incorrect" | "unavailable",
+                "error": str or None (execution_error, or unavailable when the
+                    hidden test cases cannot be loaded and nothing was run),
+                "reason": str (evaluation reason),
+                "test_results": list of per-test verdicts (see agents.judge),
+                "efficiency_feedback": dict or None
+            }
+        """
+        # Before anything is spawned, so a missing test case blob leaves no job behind
+        try:
+            testcases = collect_testcases(question)
+        except LookupError as e:
+            logger.error(f"Cannot grade submission: {e}")
+            return {
+                "status": "unavailable",
+                "error": "This question's test cases are unavailable; please try again later",
+                "reason": None,
+                "test_results": [],
+                "efficiency_feedback": None
+            }
+
+        deadline = time.monotonic() + (deadline_seconds or SUBMISSION_DEADLINE_SECONDS)
+        executor = get_agent_executor()
+        description = question.get("description")
+
+        def spawn(fn, *args):
+            # Each call gets its own copy of the context, so the caller's
+            # llm_tenant() applies on the executor thread
+            return executor.submit(contextvars.copy_context().run, fn, *args)
+
+        def wait(future, timeout_message):
+            try:
+                return future.result(timeout=max(0.0, deadline - time.monotonic()))
+            except FutureTimeoutError:
+                future.cancel()
+                logger.warning(f"Submission deadline exceeded: {timeout_message}")
+                return {"success": False, "error": timeout_message, "data": None}
+
+        run_future = spawn(
+            compile_and_run_code, description, code, language, question.get("sample_input")
+        )
+        eval_future = spawn(
+            evaluate_code_against_testcases, description, code, language, testcases
+        )
+        efficiency_future = None
+        if SPECULATIVE_EFFICIENCY:
+            efficiency_future = spawn(get_efficiency_feedback, description, code)
+
+        compile_result = wait(run_future, "Code execution timed out")
+        if not compile_result["success"]:
+            eval_future.cancel()
+            if efficiency_future:
+                efficiency_future.cancel()
+            return {
+                "status": "execution_error",
+                "error": compile_result["error"],
+                "reason": None,
+                "test_results": [],
+                "efficiency_feedback": None
+            }
+
+        eval_result = wait(eval_future, "Evaluation timed out")
+        if eval_result["success"]:
+            is_correct = eval_result["data"]["is_correct"]
+            reason = eval_result["data"]["reason"]
+            test_results = eval_result["data"].get("test_results") or []
+        else:
+            is_correct = False
+            reason = eval_result.get("error") or "Evaluation failed"
+            test_results = []
+
+        efficiency_feedback = None
+        if is_correct:
+            if efficiency_future is None:
+                efficiency_future = spawn(get_efficiency_feedback, description, code)
+            eff_result = wait(efficiency_future, "Efficiency analysis timed out")
+            if eff_result["success"]:
+                efficiency_feedback = eff_result["data"]
+        elif efficiency_future:
+            # Speculative analysis is only useful for correct solutions
+            efficiency_future.cancel()
+
+        return {
+            "status": "correct" if is_correct else "incorrect",
+            "error": None,
+            "reason": reason,
+            "test_results": test_results,
+            "efficiency_feedback": efficiency_feedback
+        }
+
+    @staticmethod
+    def submit(student, question, code, language):
+        """Evaluate a submission and store its performance record.
+
+        Args:
+            student: {"student_id", "batch_id", "department_id", "college_id"}
+            question: Question document
+            code: Submitted source code
+            language: Programming language
+
+        Returns:
+            dict: Response data for the student: status, performance_id and
+                either error (execution_error) or test_results and, for
+                correct solutions, efficiency_feedback. An "unavailable"
+                outcome is returned with its error and not recorded.
+        """
+        # Run, evaluate and analyse concurrently under one deadline
+        with llm_tenant(fair_queue_tenant(student)):
+            outcome = SubmissionService.evaluate(question, code, language)
+
+        if outcome["status"] == "unavailable":
+            return {"status": "unavailable", "error": outcome["error"]}
+
+        perf_data = {
+            "student_id": student["student_id"],
+            "question_id": question["id"],
+            "batch_id": student["batch_id"],
+            "department_id": student.get("department_id"),
+            "college_id": student.get("college_id"),
+            "submission_code": code,
+            "submission_language": language,
+            "submitted_at": datetime.utcnow(),
+            "attempts": 1
+        }
+
+        if outcome["status"] == "execution_error":
+            # Store failed submission
+            perf_data["status"] = "execution_error"
+            perf_data["test_results"] = {"total": 0, "passed": 0, "failed": 0}
+            perf_id = record_submission(perf_data, question)
+            return {
+                "status": "execution_error",
+                "error": outcome["error"],
+                "performance_id": perf_id
+            }
+
+        is_correct = outcome["status"] == "correct"
+        efficiency_feedback = outcome["efficiency_feedback"]
+        perf_data["status"] = outcome["status"]
+        perf_data["test_results"] = {
+            "is_correct": is_correct,
+            "reason": outcome["reason"],
+            "cases": outcome["test_results"]
+        }
+        perf_data["efficiency_feedback"] = efficiency_feedback if efficiency_feedback else None
+        perf_id = record_submission(perf_data, question)
+
+        response_data = {
+            "status": outcome["status"],
+            "test_results": perf_data["test_results"],
+            "performance_id": perf_id
+        }
+        if efficiency_feedback:
+            response_data["efficiency_feedback"] = efficiency_feedback
+        return response_data
+
+
+@job_queue.handler("submission")
+def run_submission_job(payload, progress):
+    """Job handler for submissions queued by POST /api/student/submit."""
+    question = QuestionModel().get(payload["question_id"])
+    if not question:
+        raise LookupError("Question no longer exists")
+    if not testcases_ready(question):
+        raise LookupError("Question is not accepting submissions yet")
+    result = SubmissionService.submit(
+        payload["student"], question, payload["code"], payload["language"]
+    )
+    if result["status"] == "unavailable":
+        raise LookupError(result["error"])
+    return result
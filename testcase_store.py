@@ -0,0 +1,202 @@
+"""Compressed storage for hidden test cases, apart from their question.
+
+Hidden test cases used to live inline on the question document, so every
+read of a question (listings, detail pages, the editor) downloaded them.
+They are now stored zlib-compressed in the ``question_testcases``
+collection, one document per question version, and the question carries
+only metadata:
+
+    testcase_version         content hash of the stored test cases
+    hidden_testcases_count   number of hidden test cases
+
+Versions are content addressed, so a blob never changes once written and
+each worker can cache the versions its judge has loaded
+(TESTCASE_CACHE_MAXSIZE entries) without ever serving stale test cases.
+A replaced version is left in place for in-flight submissions that read
+the question before the update; ``prune`` removes unreferenced versions
+once they are old.
+
+Questions written before this store keep their inline ``hidden_testcases``
+until migrated:
+
+    python testcase_store.py migrate
+    python testcase_store.py prune
+"""
+import argparse
+import hashlib
+import json
+import logging
+import sys
+import zlib
+from datetime import datetime, timedelta, timezone
+
+from cache import TTLCache, MISSING
+from config import TESTCASE_CACHE_MAXSIZE, TESTCASE_CACHE_TTL_SECONDS
+from models import QuestionModel, QuestionTestcasesModel
+
+logger = logging.getLogger(__name__)
+
+ENCODING = "zlib+json"
+# Firestore documents are limited to 1 MiB
+MAX_BLOB_BYTES = 900 * 1024
+# Replaced versions younger than this are kept for in-flight submissions
+PRUNE_GRACE = timedelta(hours=1)
+
+testcase_cache = TTLCache(
+    maxsize=TESTCASE_CACHE_MAXSIZE, ttl=TESTCASE_CACHE_TTL_SECONDS, name="hidden_testcases"
+)
+
+
+def inline_testcases(question):
+    """Return test cases stored inline on an older question document.
+
+    Some store the generator's {"success", "error", "testcases"} wrapper
+    rather than a plain list.
+    """
+    hidden = question.get("hidden_testcases") or []
+    if isinstance(hidden, dict):
+        hidden = hidden.get("testcases") or []
+    return list(hidden)
+
+
+def encode(testcases):
+    """Return (version, compressed blob) for a list of test cases."""
+    payload = json.dumps(testcases, sort_keys=True, separators=(",", ":")).encode("utf-8")
+    return hashlib.sha256(payload).hexdigest()[:16], zlib.compress(payload, 6)
+
+
+def decode(blob):
+    """Inverse of encode()'s blob."""
+    return json.loads(zlib.decompress(blob).decode("utf-8"))
+
+
+def blob_id(question_id, version):
+    """Document ID of a question's test cases at version."""
+    return f"{question_id}_{version}"
+
+
+def save(question_id, testcases):
+    """Store a question's hidden test cases.
+
+    Args:
+        question_id (str): Question ID
+        testcases (list): [{"input", "expected_output"}]
+
+    Returns:
+        dict: Fields to write on the question: testcase_version,
+        hidden_testcases_count, and hidden_testcases=None to drop any
+        inline copy an older document still carries
+    """
+    testcases = list(testcases or [])
+    version, blob = encode(testcases)
+    if len(blob) > MAX_BLOB_BYTES:
+        raise ValueError(f"Hidden test cases are too large ({len(blob)} bytes compressed)")
+    QuestionTestcasesModel().put(blob_id(question_id, version), {
+        "question_id": question_id,
+        "version": version,
+        "encoding": ENCODING,
+        "count": len(testcases),
+        "data": blob
+    })
+    testcase_cache.set((question_id, version), testcases)
+    return {"testcase_version": version, "hidden_testcases_count": len(testcases), "hidden_testcases": None}
+
+
+def load(question_id, version):
+    """Load a stored version of a question's test cases, through the worker cache.
+
+    Returns:
+        list or None: Test cases (treat as read-only), None if the version is missing
+    """
+    key = (question_id, version)
+    cached = testcase_cache.get(key)
+    if cached is not MISSING:
+        return cached
+    doc = QuestionTestcasesModel().get(blob_id(question_id, version))
+    if not doc:
+        return None
+    testcases = decode(doc["data"])
+    testcase_cache.set(key, testcases)
+    return testcases
+
+
+def hidden_testcases(question):
+    """Return a question's hidden test cases, wherever they are stored.
+
+    Raises:
+        LookupError: If the question references a version that is missing,
+            so a submission is never graded against the open cases alone
+    """
+    version = question.get("testcase_version")
+    if not version:
+        return inline_testcases(question)
+    testcases = load(question["id"], version)
+    if testcases is None:
+        raise LookupError(f"Hidden test cases {version} of question {question['id']} are missing")
+    return list(testcases)
+
+
+def migrate(page_size=200):
+    """Move inline hidden test cases of existing questions into the store.
+
+    Returns:
+        int: Questions migrated
+    """
+    migrated = 0
+    cursor = None
+    while True:
+        questions, cursor = QuestionModel().query_page(page_size, cursor)
+        updates = {
+            question["id"]: save(question["id"], inline_testcases(question))
+            for question in questions
+            if question.get("hidden_testcases") is not None and not question.get("testcase_version")
+        }
+        if updates:
+            result = QuestionModel().update_many(updates)
+            for item in result["failed"]:
+                logger.error(f"Failed to migrate question {item['id']}: {item['error']}")
+            migrated += len(result["succeeded"])
+        if not cursor:
+            return migrated
+
+
+def prune(grace=PRUNE_GRACE):
+    """Delete stored versions no question references any more.
+
+    Returns:
+        int: Versions deleted
+    """
+    cutoff = datetime.utcnow() - grace
+    current = {
+        (question["id"], question.get("testcase_version"))
+        for question in QuestionModel().stream(select=["testcase_version"])
+    }
+    stale = []
+    for doc in QuestionTestcasesModel().stream(select=["question_id", "version", "created_at"]):
+        created = doc.get("created_at")
+        if created is None or (doc.get("question_id"), doc.get("version")) in current:
+            continue
+        if created.tzinfo is not None:
+            created = created.astimezone(timezone.utc).replace(tzinfo=None)
+        if created < cutoff:
+            stale.append(doc["id"])
+    if stale:
+        QuestionTestcasesModel().hard_delete_many(stale)
+    return len(stale)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Maintain stored hidden test cases")
+    parser.add_argument("command", choices=["migrate", "prune"])
+    args = parser.parse_args(argv)
+
+    if args.command == "migrate":
+        print(f"Migrated {migrate()} questions")
+    else:
+        print(f"Deleted {prune()} unreferenced test case versions")
+    return 0
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO)
+    sys.exit(main())
@@ -0,0 +1,32 @@
+"""Shared pytest setup.
+
+Tests run against the in-process storage backend, so importing the app
+needs no Firebase credentials or network access.
+"""
+import os
+import sys
+
+os.environ.setdefault("STORAGE_BACKEND", "memory")
+# Limiter tests build their own; the shared one would throttle the suite
+os.environ.setdefault("GROQ_LIMITER_ENABLED", "False")
+
+# Modules live at the repository root
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+
+import pytest
+
+
+@pytest.fixture(autouse=True)
+def clear_process_caches():
+    """Per-process caches must not leak documents between tests."""
+    import models
+    from agent_cache import agent_cache
+    from agents.model_router import model_router
+    from testcase_store import testcase_cache
+    models.hierarchy_cache.clear()
+    models.access_cache.clear()
+    agent_cache.clear()
+    model_router.reset()
+    testcase_cache.clear()
+    yield
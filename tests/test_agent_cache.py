@@ -0,0 +1,92 @@
+import agent_wrappers
+from agent_cache import AgentResultCache, PersistentTier, make_key, normalize_code
+from storage import create_backend
+
+
+def make_cache(tmp_path=None, **ttls):
+    persistent = None
+    if tmp_path is not None:
+        client, _ = create_backend("sqlite", str(tmp_path / "agent_cache.db"))
+        persistent = PersistentTier(client, "sqlite")
+    return AgentResultCache(ttls=ttls or {"run": 60, "evaluate": 60, "efficiency": 60}, persistent=persistent)
+
+
+def patch_run_agent(monkeypatch, cache, result=None):
+    calls = []
+
+    def run(description, code, language, test_input, on_delta=None):
+        calls.append(code)
+        return result or {"output": "3"}
+
+    monkeypatch.setattr(agent_wrappers, "agent_cache", cache)
+    monkeypatch.setattr(agent_wrappers, "sandbox_available", lambda language: False)
+    monkeypatch.setattr(agent_wrappers, "run_code_with_agent", run)
+    return calls
+
+
+def test_key_ignores_formatting_but_not_indentation():
+    base = make_key("run", code=normalize_code("for i in x:\n    print(i)\n"))
+
+    assert make_key("run", code=normalize_code("for i in x:  \r\n    print(i)\r\n\r\n")) == base
+    assert make_key("run", code=normalize_code("for i in x:\nprint(i)")) != base
+    assert make_key("efficiency", code=normalize_code("for i in x:\n    print(i)")) != base
+
+
+def test_repeated_run_is_served_from_cache(monkeypatch):
+    cache = make_cache()
+    calls = patch_run_agent(monkeypatch, cache)
+
+    first = agent_wrappers.compile_and_run_code("Add", "print(3)\n", "python", "1 2")
+    second = agent_wrappers.compile_and_run_code("Add", "print(3)", "Python", "1 2\n")
+    agent_wrappers.compile_and_run_code("Add", "print(3)", "python", "2 2")
+
+    assert first == second and first["data"]["output"] == "3"
+    assert len(calls) == 2
+    assert cache.stats()["agents"]["run"]["memory_hits"] == 1
+    assert cache.stats()["agents"]["run"]["hit_rate"] == round(1 / 3, 4)
+
+
+def test_failures_are_not_cached(monkeypatch):
+    cache = make_cache()
+    calls = patch_run_agent(monkeypatch, cache, {"error": "Groq API execution error: 503"})
+
+    agent_wrappers.compile_and_run_code("Add", "print(3)", "python")
+    agent_wrappers.compile_and_run_code("Add", "print(3)", "python")
+
+    assert len(calls) == 2
+    assert cache.stats()["agents"]["run"]["stores"] == 0
+
+
+def test_zero_ttl_disables_agent(monkeypatch):
+    cache = make_cache(run=0)
+    calls = patch_run_agent(monkeypatch, cache)
+
+    agent_wrappers.compile_and_run_code("Add", "print(3)", "python")
+    agent_wrappers.compile_and_run_code("Add", "print(3)", "python")
+
+    assert len(calls) == 2
+
+
+def test_persistent_tier_shared_across_workers(tmp_path, monkeypatch):
+    calls = patch_run_agent(monkeypatch, make_cache(tmp_path))
+    agent_wrappers.compile_and_run_code("Add", "print(3)", "python")
+
+    # A second worker has a cold memory tier but sees the same file
+    other_worker = make_cache(tmp_path)
+    monkeypatch.setattr(agent_wrappers, "agent_cache", other_worker)
+    result = agent_wrappers.compile_and_run_code("Add", "print(3)", "python")
+
+    assert result["data"]["output"] == "3"
+    assert len(calls) == 1
+    assert other_worker.stats()["agents"]["run"]["persistent_hits"] == 1
+
+
+def test_cached_results_are_copies(monkeypatch):
+    cache = make_cache()
+    monkeypatch.setattr(agent_wrappers, "agent_cache", cache)
+    monkeypatch.setattr(agent_wrappers, "analyze_efficiency",
+                        lambda description, code, on_delta=None: {"time_complexity": "O(n)", "space_complexity": "O(1)"})
+
+    agent_wrappers.get_efficiency_feedback("Sum", "x")["data"]["time_complexity"] = "mutated"
+
+    assert agent_wrappers.get_efficiency_feedback("Sum", "x")["data"]["time_complexity"] == "O(n)"
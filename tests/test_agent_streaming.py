@@ -0,0 +1,85 @@
+import json
+
+import pytest
+
+import agent_wrappers
+from agents import sandbox
+from app import app
+from auth import create_jwt_token
+from models import QuestionModel
+
+
+def parse_events(body):
+    events = []
+    for block in body.strip().split("\n\n"):
+        event, data = block.split("\n")
+        events.append((event[len("event: "):], json.loads(data[len("data: "):])))
+    return events
+
+
+@pytest.fixture
+def client():
+    token = create_jwt_token({"role": "student", "student_id": "student-1", "batch_id": "batch-1"})
+    client = app.test_client()
+    client.environ_base["HTTP_AUTHORIZATION"] = f"Bearer {token}"
+    return client
+
+
+@pytest.fixture
+def question_id():
+    return QuestionModel().create({"batch_id": "batch-1", "description": "Echo"})
+
+
+def test_run_stream_forwards_decoded_output(client, question_id, monkeypatch):
+    def run(description, code, language, test_input, on_delta):
+        for chunk in ['{"output": "he', 'llo\\n', 'world"}']:
+            on_delta(chunk)
+        return {"output": "hello\nworld"}
+
+    monkeypatch.setattr(agent_wrappers, "sandbox_available", lambda language: False)
+    monkeypatch.setattr(agent_wrappers, "run_code_with_agent", run)
+
+    rv = client.post("/api/student/run/stream", json={
+        "question_id": question_id, "code": "echo", "language": "java"
+    })
+
+    assert rv.mimetype == "text/event-stream"
+    events = parse_events(rv.get_data(as_text=True))
+    assert "".join(data["text"] for event, data in events if event == "delta") == "hello\nworld"
+    assert events[-1] == ("result", {
+        "status": "success", "output": "hello\nworld", "execution_time": 0.0, "peak_memory_kb": None
+    })
+
+
+def test_run_stream_local_execution_sends_only_result(client, question_id, monkeypatch):
+    monkeypatch.setattr(sandbox, "SANDBOX_WRAPPER", ["env"])
+    rv = client.post("/api/student/run/stream", json={
+        "question_id": question_id, "code": "print(input())", "language": "python", "test_input": "hi"
+    })
+
+    events = parse_events(rv.get_data(as_text=True))
+    assert [event for event, _ in events] == ["result"]
+    assert events[0][1]["output"] == "hi\n"
+
+
+def test_efficiency_stream(client, question_id, monkeypatch):
+    def analyze(description, code, on_delta):
+        on_delta('{"time_complexity": "O(n)", ')
+        on_delta('"space_complexity": "O(1)"}')
+        return {"time_complexity": "O(n)", "space_complexity": "O(1)"}
+
+    monkeypatch.setattr(agent_wrappers, "analyze_efficiency", analyze)
+
+    rv = client.post("/api/student/efficiency/stream", json={
+        "question_id": question_id, "code": "x", "language": "python"
+    })
+
+    events = parse_events(rv.get_data(as_text=True))
+    assert [event for event, _ in events] == ["delta", "delta", "result"]
+    assert events[-1][1]["time_complexity"] == "O(n)"
+
+
+def test_stream_validates_before_streaming(client):
+    rv = client.post("/api/student/run/stream", json={"question_id": "missing", "code": "x", "language": "python"})
+
+    assert rv.status_code == 404
@@ -0,0 +1,90 @@
+import os
+import shutil
+import time
+
+import pytest
+
+from agents import sandbox
+from agents.build_cache import BuildCache
+from agents.judge import judge_submission
+
+C_ADD = '#include <stdio.h>\nint main(){int a,b;scanf("%d %d",&a,&b);printf("%d",a+b);return 0;}'
+
+
+@pytest.fixture
+def cache(tmp_path, monkeypatch):
+    cache = BuildCache(str(tmp_path / "builds"), max_bytes=10 * 1024 * 1024)
+    monkeypatch.setattr(sandbox, "build_cache", cache)
+    return cache
+
+
+def write_files(path, **files):
+    os.makedirs(path, exist_ok=True)
+    for name, content in files.items():
+        with open(os.path.join(path, name), "w") as f:
+            f.write(content)
+
+
+@pytest.mark.skipif(not shutil.which("gcc"), reason="gcc not installed")
+def test_unchanged_source_compiles_once(cache):
+    testcases = [{"input": f"{i} 1", "expected_output": str(i + 1)} for i in range(5)]
+
+    assert judge_submission(C_ADD, "c", testcases)["is_correct"]
+    assert sandbox.run_in_sandbox(C_ADD, "c", "2 3")["output"] == "5"
+    assert sandbox.run_in_sandbox(C_ADD + "\n// edited", "c", "2 3")["output"] == "5"
+
+    stats = cache.stats()
+    assert (stats["hits"], stats["misses"], stats["publishes"]) == (1, 2, 2)
+
+
+@pytest.mark.skipif(not shutil.which("gcc"), reason="gcc not installed")
+def test_compile_errors_are_not_cached(cache):
+    assert sandbox.run_in_sandbox("int main(){ retur 0; }", "c")["status"] == "compile_error"
+    assert cache.stats()["publishes"] == 0
+
+
+def test_publish_is_atomic_and_first_writer_wins(cache, tmp_path):
+    write_files(tmp_path / "a", main="first")
+    write_files(tmp_path / "b", main="second")
+
+    cache.publish("k", str(tmp_path / "a"), ["main"])
+    cache.publish("k", str(tmp_path / "b"), ["main"])
+
+    dest = tmp_path / "dest"
+    dest.mkdir()
+    assert cache.fetch("k", str(dest))
+    assert (dest / "main").read_text() == "first"
+    assert os.listdir(cache.root) == ["k"]
+
+
+def test_shared_directory_is_not_trusted(cache, tmp_path):
+    write_files(tmp_path / "src", main="binary")
+    cache.publish("k", str(tmp_path / "src"), ["main"])
+    assert os.stat(cache.root).st_mode & 0o777 == 0o700
+
+    os.chmod(cache.root, 0o777)
+    dest = tmp_path / "dest"
+    dest.mkdir()
+
+    assert not cache.fetch("k", str(dest))
+    assert os.listdir(dest) == []
+    cache.publish("other", str(tmp_path / "src"), ["main"])
+    assert os.listdir(cache.root) == ["k"]
+
+
+def test_lru_eviction(tmp_path):
+    cache = BuildCache(str(tmp_path / "builds"), max_bytes=250)
+    for key in ("old", "used", "new"):
+        write_files(tmp_path / key, main="x" * 100)
+
+    cache.publish("old", str(tmp_path / "old"), ["main"])
+    cache.publish("used", str(tmp_path / "used"), ["main"])
+    past = time.time() - 60
+    os.utime(os.path.join(cache.root, "old"), (past, past))
+    os.utime(os.path.join(cache.root, "used"), (past - 1, past - 1))
+    # A hit makes "used" the most recently used entry
+    assert cache.fetch("used", str(tmp_path / "new"))
+    cache.publish("new", str(tmp_path / "new"), ["main"])
+
+    assert sorted(os.listdir(cache.root)) == ["new", "used"]
+    assert cache.stats()["evictions"] == 1
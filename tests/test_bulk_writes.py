@@ -0,0 +1,122 @@
+import threading
+
+from google.api_core import exceptions as gcp_exceptions
+
+import models
+from models import StudentModel
+
+
+class FakeRef:
+    def __init__(self, db, doc_id):
+        self.db = db
+        self.id = doc_id
+
+    def set(self, data):
+        self.db.store[self.id] = dict(data)
+
+    def update(self, data):
+        if self.id not in self.db.store:
+            raise gcp_exceptions.NotFound(f"No document to update: {self.id}")
+        self.db.store[self.id].update(data)
+
+    def delete(self):
+        self.db.store.pop(self.id, None)
+
+
+class FakeBatch:
+    def __init__(self, db):
+        self.db = db
+        self.ops = []
+
+    def set(self, ref, data):
+        self.ops.append((ref.set, data))
+
+    def update(self, ref, data):
+        self.ops.append((ref.update, data))
+
+    def delete(self, ref):
+        self.ops.append((ref.delete, None))
+
+    def commit(self):
+        with self.db.lock:
+            self.db.commits += 1
+            if self.db.transient_failures:
+                self.db.transient_failures -= 1
+                raise gcp_exceptions.ServiceUnavailable("try again")
+            # Atomic: validate every update before applying anything
+            for method, data in self.ops:
+                ref = method.__self__
+                if method.__name__ == "update" and ref.id not in self.db.store:
+                    raise gcp_exceptions.NotFound(f"No document to update: {ref.id}")
+            for method, data in self.ops:
+                method(data) if data is not None else method()
+
+
+class FakeCollection:
+    def __init__(self, db):
+        self.db = db
+
+    def document(self, doc_id):
+        return FakeRef(self.db, doc_id)
+
+
+class FakeDB:
+    def __init__(self, store=None):
+        self.store = store or {}
+        self.commits = 0
+        self.transient_failures = 0
+        self.lock = threading.Lock()
+
+    def collection(self, name):
+        return FakeCollection(self)
+
+    def batch(self):
+        return FakeBatch(self)
+
+
+def test_create_many_commits_in_batches(monkeypatch):
+    db = FakeDB()
+    monkeypatch.setattr(models, "get_db", lambda: db)
+    monkeypatch.setattr(models, "FIRESTORE_WRITE_BATCH_SIZE", 10)
+
+    result = StudentModel().create_many([{"username": f"u{i}"} for i in range(25)])
+
+    assert db.commits == 3
+    assert len(result["ids"]) == 25
+    assert result["succeeded"] == result["ids"]
+    assert result["failed"] == []
+    assert db.store[result["ids"][7]]["username"] == "u7"
+    assert "created_at" in db.store[result["ids"][0]]
+
+
+def test_transient_failures_are_retried(monkeypatch):
+    db = FakeDB({"s1": {}, "s2": {}})
+    db.transient_failures = 2
+    monkeypatch.setattr(models, "get_db", lambda: db)
+    monkeypatch.setattr(models.time, "sleep", lambda seconds: None)
+
+    result = StudentModel().delete_many(["s1", "s2"])
+
+    assert result["succeeded"] == ["s1", "s2"]
+    assert db.commits == 3
+    assert db.store["s1"]["is_disabled"] is True
+
+
+def test_failed_batch_reports_per_item(monkeypatch):
+    db = FakeDB({"s1": {}, "s3": {}})
+    monkeypatch.setattr(models, "get_db", lambda: db)
+
+    result = StudentModel().update_many({"s1": {"x": 1}, "missing": {"x": 2}, "s3": {"x": 3}})
+
+    assert result["succeeded"] == ["s1", "s3"]
+    assert [item["id"] for item in result["failed"]] == ["missing"]
+    assert db.store["s3"]["x"] == 3
+
+
+def test_hard_delete_many(monkeypatch):
+    db = FakeDB({"s1": {}, "s2": {}, "s3": {}})
+    monkeypatch.setattr(models, "get_db", lambda: db)
+
+    StudentModel().hard_delete_many(["s1", "s3"])
+
+    assert list(db.store) == ["s2"]
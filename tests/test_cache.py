@@ -0,0 +1,81 @@
+import cache
+from cache import TTLCache, MISSING
+
+
+def test_ttl_cache_expires_and_counts(monkeypatch):
+    now = [1000.0]
+    monkeypatch.setattr(cache.time, "monotonic", lambda: now[0])
+
+    c = TTLCache(maxsize=10, ttl=5, name="test")
+    c.set("a", None)
+    assert c.get("a") is None
+    now[0] += 6
+    assert c.get("a") is MISSING
+
+    stats = c.stats()
+    assert stats["hits"] == 1
+    assert stats["misses"] == 1
+    assert stats["hit_rate"] == 0.5
+
+
+def test_ttl_cache_evicts_least_recently_used():
+    c = TTLCache(maxsize=2, ttl=60)
+    c.set("a", 1)
+    c.set("b", 2)
+    c.get("a")
+    c.set("c", 3)
+
+    assert c.get("b") is MISSING
+    assert c.get("a") == 1
+    assert c.stats()["evictions"] == 1
+
+
+def test_invalidate_where():
+    c = TTLCache()
+    c.set(("doc", "colleges", "c1"), {"id": "c1"})
+    c.set(("doc", "batches", "b1"), {"id": "b1"})
+    c.invalidate_where(lambda k: k[1] == "colleges")
+
+    assert c.get(("doc", "colleges", "c1")) is MISSING
+    assert c.get(("doc", "batches", "b1")) == {"id": "b1"}
+
+
+def test_hierarchy_models_share_reads_across_requests(monkeypatch):
+    import models
+    from models import CollegeModel
+
+    reads = []
+
+    class Snapshot:
+        exists = True
+        id = "c1"
+
+        def to_dict(self):
+            return {"name": "College"}
+
+    class Ref:
+        def get(self):
+            reads.append(1)
+            return Snapshot()
+
+        def update(self, data):
+            pass
+
+    class Collection:
+        def document(self, doc_id):
+            return Ref()
+
+    class DB:
+        def collection(self, name):
+            return Collection()
+
+    monkeypatch.setattr(models, "get_db", lambda: DB())
+    models.hierarchy_cache.clear()
+
+    assert CollegeModel().get("c1")["name"] == "College"
+    assert CollegeModel().get("c1")["name"] == "College"
+    assert len(reads) == 1
+
+    CollegeModel().update("c1", {"name": "Renamed"})
+    CollegeModel().get("c1")
+    assert len(reads) == 2
@@ -0,0 +1,136 @@
+import models
+import cascade_service
+from cascade_service import CascadeService
+
+
+class FakeSnapshot:
+    def __init__(self, doc_id, data):
+        self.id = doc_id
+        self._data = data
+        self.exists = data is not None
+
+    def to_dict(self):
+        return dict(self._data)
+
+
+class FakeRef:
+    def __init__(self, docs, doc_id):
+        self.docs = docs
+        self.id = doc_id
+
+    def get(self):
+        return FakeSnapshot(self.id, self.docs.get(self.id))
+
+    def update(self, data):
+        self.docs[self.id].update(data)
+
+    def delete(self):
+        self.docs.pop(self.id, None)
+
+
+class FakeQuery:
+    def __init__(self, db, name, filters=()):
+        self.db = db
+        self.name = name
+        self.filters = filters
+
+    def where(self, field, op, value):
+        return FakeQuery(self.db, self.name, self.filters + ((field, value),))
+
+    def select(self, fields):
+        return self
+
+    def document(self, doc_id):
+        return FakeRef(self.db.collections.setdefault(self.name, {}), doc_id)
+
+    def stream(self):
+        self.db.queries.append(self.name)
+        for doc_id, data in list(self.db.collections.get(self.name, {}).items()):
+            if all(data.get(f) == v for f, v in self.filters):
+                yield FakeSnapshot(doc_id, data)
+
+
+class FakeBatch:
+    def __init__(self, db):
+        self.db = db
+        self.ops = []
+
+    def update(self, ref, data):
+        self.ops.append(lambda: ref.update(data))
+
+    def delete(self, ref):
+        self.ops.append(ref.delete)
+
+    def commit(self):
+        self.db.commits += 1
+        for op in self.ops:
+            op()
+
+
+class FakeDB:
+    def __init__(self, collections):
+        self.collections = collections
+        self.queries = []
+        self.commits = 0
+
+    def collection(self, name):
+        return FakeQuery(self, name)
+
+    def batch(self):
+        return FakeBatch(self)
+
+
+def make_college():
+    students = {
+        f"s{i}": {"college_id": "c1", "department_id": f"d{i % 2}", "batch_id": f"b{i % 4}",
+                  "firebase_uid": f"uid-s{i}", "is_disabled": i == 0}
+        for i in range(8)
+    }
+    return {
+        "colleges": {"c1": {"name": "C", "firebase_uid": "uid-c1"}},
+        "departments": {f"d{i}": {"college_id": "c1", "firebase_uid": f"uid-d{i}"} for i in range(2)},
+        "batches": {f"b{i}": {"college_id": "c1", "department_id": f"d{i % 2}"} for i in range(4)},
+        "students": students,
+        "questions": {"q1": {"college_id": "c1", "batch_id": "b0"}},
+        "notes": {},
+        "performance": {"p1": {"college_id": "c1", "student_id": "s1"},
+                        "p2": {"college_id": "other", "student_id": "x"}},
+    }
+
+
+def test_disable_college_uses_flat_queries(monkeypatch):
+    db = FakeDB(make_college())
+    monkeypatch.setattr(models, "get_db", lambda: db)
+    disabled = []
+    monkeypatch.setattr(cascade_service, "disable_user_firebase", lambda uid: disabled.append(uid) or True)
+
+    counts = models.disable_college_cascade("c1")
+
+    assert counts == {"college": 1, "departments": 2, "batches": 4, "students": 7}
+    # One query per collection, no matter how many batches or students
+    assert sorted(db.queries) == ["batches", "departments", "students"]
+    assert all(s["is_disabled"] for s in db.collections["students"].values())
+    assert "uid-s0" not in disabled
+    assert sorted(disabled) == sorted(["uid-c1", "uid-d0", "uid-d1"] + [f"uid-s{i}" for i in range(1, 8)])
+
+
+def test_delete_department_removes_scope_only(monkeypatch):
+    db = FakeDB(make_college())
+    monkeypatch.setattr(models, "get_db", lambda: db)
+    monkeypatch.setattr(cascade_service, "delete_user_firebase", lambda uid: True)
+    monkeypatch.setattr(cascade_service, "audit_log", lambda *args, **kwargs: None)
+
+    ok, _, counts = CascadeService.delete_department_cascade("d1", "admin")
+
+    assert ok
+    assert counts == {"department": 1, "batches": 2, "students": 4,
+                      "questions": 0, "notes": 0, "performance": 0}
+    assert sorted(db.collections["students"]) == ["s0", "s2", "s4", "s6"]
+    assert sorted(db.collections["departments"]) == ["d0"]
+
+
+def test_missing_root_returns_none(monkeypatch):
+    monkeypatch.setattr(models, "get_db", lambda: FakeDB({}))
+
+    assert models.enable_batch_cascade("missing") is None
+    assert CascadeService.delete_college_cascade("missing", "admin") == (False, "College not found", {})
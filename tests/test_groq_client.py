@@ -0,0 +1,85 @@
+import json
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+
+from agents import groq_client
+from agents.groq_client import GroqClient
+
+
+class ChatHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+
+    def do_POST(self):
+        request = json.loads(self.rfile.read(int(self.headers["Content-Length"])))
+        if request.get("stream"):
+            return self.stream()
+        body = json.dumps({"choices": [{"message": {"content": "hi"}}]}).encode()
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def stream(self):
+        self.send_response(200)
+        self.send_header("Content-Type", "text/event-stream")
+        self.send_header("Transfer-Encoding", "chunked")
+        self.end_headers()
+        events = [": keep-alive"] + [
+            "data: " + json.dumps({"choices": [{"delta": {"content": piece}}]})
+            for piece in ['{"out', 'put": "3', '\\n"}']
+        ] + ["data: [DONE]"]
+        for event in events:
+            data = (event + "\n\n").encode()
+            self.wfile.write(b"%x\r\n%s\r\n" % (len(data), data))
+            self.wfile.flush()
+        self.wfile.write(b"0\r\n\r\n")
+
+    def log_message(self, *args):
+        pass
+
+
+@pytest.fixture
+def server(monkeypatch):
+    httpd = ThreadingHTTPServer(("127.0.0.1", 0), ChatHandler)
+    thread = threading.Thread(target=httpd.serve_forever, daemon=True)
+    thread.start()
+    monkeypatch.setattr(groq_client, "GROQ_API_URL", f"http://127.0.0.1:{httpd.server_port}/chat")
+    monkeypatch.setattr(groq_client, "_session", None)
+    yield httpd
+    httpd.shutdown()
+
+
+def test_clients_share_keep_alive_connection(server):
+    for _ in range(3):
+        assert GroqClient(api_key="test").chat([{"role": "user", "content": "hi"}]) == "hi"
+
+    stats = groq_client.pool_stats()
+    assert stats["connections_created"] == 1
+    assert stats["requests"] == 3
+    assert stats["idle_connections"] == 1
+
+
+def test_session_is_recreated_after_fork(server, monkeypatch):
+    parent = groq_client.get_session()
+    assert groq_client.get_session() is parent
+
+    monkeypatch.setattr(groq_client.os, "getpid", lambda: -1)
+    assert groq_client.get_session() is not parent
+
+
+def test_chat_stream_yields_deltas(server):
+    deltas = list(GroqClient(api_key="test").chat_stream([{"role": "user", "content": "run"}]))
+
+    assert deltas == ['{"out', 'put": "3', '\\n"}']
+    assert json.loads("".join(deltas)) == {"output": "3\n"}
+
+
+def test_chat_stream_reports_http_errors(monkeypatch):
+    monkeypatch.setattr(groq_client, "GROQ_API_URL", "http://127.0.0.1:9/chat")
+    monkeypatch.setattr(groq_client, "_session", None)
+
+    with pytest.raises(RuntimeError, match="Groq API connection error"):
+        list(GroqClient(api_key="test").chat_stream([{"role": "user", "content": "run"}]))
@@ -0,0 +1,84 @@
+import shutil
+import time
+
+import pytest
+
+import agent_wrappers
+from agents import sandbox
+from agents.judge import judge_submission, outputs_match
+
+ADD = "a, b = map(int, input().split())\nprint(a + b)"
+TESTCASES = [{"input": f"{i} {i}", "expected_output": str(2 * i)} for i in range(6)]
+
+
+def test_output_normalisation():
+    assert outputs_match("3 \r\n4\n\n", "3\n4")
+    assert not outputs_match("3 \n4", "3\n4", ignore_trailing_whitespace=False)
+    assert outputs_match("0.30000000000000004", "0.3")
+    assert not outputs_match("0.31", "0.3")
+    assert not outputs_match("0.30000000000000004", "0.3", abs_tolerance=0, rel_tolerance=0)
+    assert not outputs_match("1 2", "1\n2")
+
+
+def test_integers_are_compared_exactly():
+    assert not outputs_match("1000001", "1000000")
+    assert not outputs_match("123456789012345679", "123456789012345678")
+    assert not outputs_match("0.0000001", "0")
+    assert outputs_match("2.50000000001", "2.5")
+    assert outputs_match("3", "3.0")
+
+
+def test_all_passed_with_per_test_verdicts():
+    result = judge_submission(ADD, "python", TESTCASES)
+
+    assert result["is_correct"] is True
+    assert [r["verdict"] for r in result["test_results"]] == ["passed"] * 6
+    assert all(r["execution_time"] > 0 for r in result["test_results"])
+
+
+def test_wrong_answer_reports_first_failure():
+    testcases = TESTCASES + [{"input": "1 1", "expected_output": "3"}]
+
+    result = judge_submission(ADD, "python", testcases, early_exit=False)
+
+    assert result["is_correct"] is False
+    assert result["reason"] == "Test case 7 of 7: Wrong answer"
+    assert result["test_results"][6]["verdict"] == "wrong_answer"
+
+
+def test_early_exit_skips_pending_cases():
+    code = "import time\nn = int(input())\nif n: time.sleep(0.5)\nprint(n)"
+    testcases = [{"input": "0", "expected_output": "1"}] + [
+        {"input": "1", "expected_output": "1"} for _ in range(7)
+    ]
+
+    started = time.monotonic()
+    result = judge_submission(code, "python", testcases, early_exit=True, workers=1)
+
+    assert result["test_results"][0]["verdict"] == "wrong_answer"
+    assert {r["verdict"] for r in result["test_results"][1:]} <= {"passed", "skipped"}
+    assert "skipped" in [r["verdict"] for r in result["test_results"]]
+    assert time.monotonic() - started < 2
+
+
+def test_runtime_error_verdict():
+    result = judge_submission("print(1 // int(input()))", "python", [{"input": "0", "expected_output": ""}])
+
+    assert result["test_results"][0]["verdict"] == "runtime_error"
+    assert "ZeroDivisionError" in result["reason"]
+
+
+@pytest.mark.skipif(not shutil.which("g++"), reason="g++ not installed")
+def test_compile_error_is_not_correct():
+    result = judge_submission("int main() { return }", "cpp", TESTCASES)
+
+    assert result["is_correct"] is False
+    assert result["reason"].startswith("Compilation error:")
+
+
+def test_wrapper_returns_test_results(monkeypatch):
+    monkeypatch.setattr(sandbox, "SANDBOX_WRAPPER", ["env"])
+    result = agent_wrappers.evaluate_code_against_testcases("Add", ADD, "python", TESTCASES[:2])
+
+    assert result["data"]["is_correct"] is True
+    assert len(result["data"]["test_results"]) == 2
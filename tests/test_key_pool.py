@@ -0,0 +1,184 @@
+import json
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+
+from agents import groq_client, key_pool
+from agents.groq_client import GroqClient
+from agents.key_pool import KeyPool, parse_duration
+from agents.rate_limiter import RateLimiter
+
+
+class KeyedHandler(BaseHTTPRequestHandler):
+    """Answers each key with the next queued (status, headers), else 200."""
+    protocol_version = "HTTP/1.1"
+    scripts = {}
+    seen = []
+
+    def do_POST(self):
+        self.rfile.read(int(self.headers["Content-Length"]))
+        key = self.headers["Authorization"].split()[-1]
+        self.seen.append(key)
+        queued = self.scripts.get(key) or []
+        status, headers = queued.pop(0) if queued else (200, {})
+        body = json.dumps({"choices": [{"message": {"content": key}}]}).encode()
+        self.send_response(status)
+        for name, value in headers.items():
+            self.send_header(name, value)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, *args):
+        pass
+
+
+@pytest.fixture
+def server(monkeypatch):
+    KeyedHandler.scripts = {}
+    KeyedHandler.seen = []
+    httpd = ThreadingHTTPServer(("127.0.0.1", 0), KeyedHandler)
+    thread = threading.Thread(target=httpd.serve_forever, daemon=True)
+    thread.start()
+    monkeypatch.setattr(groq_client, "GROQ_API_URL", f"http://127.0.0.1:{httpd.server_port}/chat")
+    monkeypatch.setattr(groq_client, "_session", None)
+    yield KeyedHandler
+    httpd.shutdown()
+
+
+def ask(client):
+    return client.chat([{"role": "user", "content": "hi"}])
+
+
+def test_requests_are_spread_across_keys(server):
+    client = GroqClient(pool=KeyPool(["key-a", "key-b"]))
+
+    answers = [ask(client) for _ in range(4)]
+
+    assert sorted(answers) == ["key-a", "key-a", "key-b", "key-b"]
+
+
+def test_rate_limited_key_cools_down_and_request_moves_on(server):
+    pool = KeyPool(["key-a", "key-b"], jitter=0)
+    server.scripts["key-a"] = [(429, {"Retry-After": "30"})]
+    client = GroqClient(pool=pool)
+
+    assert ask(client) == "key-b"
+    assert ask(client) == "key-b"
+    assert server.seen == ["key-a", "key-b", "key-b"]
+
+    stats = {k["key"]: k for k in pool.stats()["keys"]}
+    assert stats["...ey-a"]["rate_limited"] == 1
+    assert 29 < stats["...ey-a"]["cooldown_seconds"] <= 30
+    assert not stats["...ey-a"]["ejected"]
+    assert pool.stats()["available"] == 1
+
+
+def test_every_attempt_takes_a_request_of_quota(server):
+    server.scripts["key-a"] = [(429, {"Retry-After": "30"})]
+    limiter = RateLimiter(30, 100000)
+    client = GroqClient(pool=KeyPool(["key-a", "key-b"], jitter=0), limiter=limiter)
+
+    assert ask(client) == "key-b"
+
+    assert limiter.stats()["admitted"] == 2
+    assert 27.9 < limiter.stats()["available"]["requests"] < 28.1
+
+
+def test_single_key_waits_for_retry_after(server):
+    server.scripts["key-a"] = [(429, {"Retry-After": "0.3"})]
+    client = GroqClient(pool=KeyPool(["key-a"], jitter=0))
+
+    started = time.monotonic()
+    assert ask(client) == "key-a"
+    assert time.monotonic() - started >= 0.3
+
+
+def test_rate_limit_beyond_max_wait_fails_fast(server, monkeypatch):
+    monkeypatch.setattr(groq_client, "GROQ_MAX_WAIT_SECONDS", 1)
+    server.scripts["key-a"] = [(429, {"Retry-After": "60"})]
+    client = GroqClient(pool=KeyPool(["key-a"]))
+
+    with pytest.raises(RuntimeError, match="rate limited"):
+        ask(client)
+
+
+def test_unauthorised_key_is_ejected(server):
+    pool = KeyPool(["key-a", "key-b"], eject_seconds=300)
+    server.scripts["key-a"] = [(401, {})]
+    client = GroqClient(pool=pool)
+
+    assert ask(client) == "key-b"
+    stats = {k["key"]: k for k in pool.stats()["keys"]}
+    assert stats["...ey-a"]["ejected"]
+    assert stats["...ey-a"]["ejections"] == 1
+
+
+def test_bad_request_is_not_retried(server):
+    server.scripts["key-a"] = [(400, {})]
+    client = GroqClient(pool=KeyPool(["key-a", "key-b"]))
+
+    with pytest.raises(RuntimeError, match="HTTP error: 400"):
+        ask(client)
+    assert server.seen == ["key-a"]
+
+
+def test_key_failing_repeatedly_is_ejected_then_restored(monkeypatch):
+    now = [1000.0]
+    monkeypatch.setattr(key_pool.time, "monotonic", lambda: now[0])
+    pool = KeyPool(["key-a"], eject_after=3, eject_seconds=60)
+
+    for _ in range(3):
+        key, wait = pool.acquire()
+        pool.release(key)
+
+    assert pool.acquire() == (None, 60.0)
+    now[0] += 61
+    key, wait = pool.acquire()
+    assert key.key == "key-a" and wait == 0.0
+    assert not key.ejected
+
+
+def test_exhausted_quota_parks_key_until_reset(monkeypatch):
+    now = [1000.0]
+    monkeypatch.setattr(key_pool.time, "monotonic", lambda: now[0])
+    pool = KeyPool(["key-a", "key-b"], jitter=0)
+
+    key, _ = pool.acquire()
+    pool.release(key, 200, {
+        "x-ratelimit-remaining-requests": "0",
+        "x-ratelimit-reset-requests": "2m0.5s"
+    })
+
+    assert pool.acquire()[0].key != key.key
+    assert pool.stats()["keys"][0]["cooldown_seconds"] == 120.5
+
+
+def test_prefers_key_with_more_remaining_quota():
+    pool = KeyPool(["key-a", "key-b"])
+    a, _ = pool.acquire()
+    pool.release(a, 200, {"x-ratelimit-remaining-requests": "5"})
+    b, _ = pool.acquire()
+    pool.release(b, 200, {"x-ratelimit-remaining-requests": "900"})
+
+    assert pool.acquire()[0].key == "key-b"
+
+
+def test_parse_duration():
+    assert parse_duration("7.66s") == pytest.approx(7.66)
+    assert parse_duration("2m59.56s") == pytest.approx(179.56)
+    assert parse_duration("1h2m") == 3720
+    assert parse_duration("120ms") == pytest.approx(0.12)
+    assert parse_duration("30") == 30
+    assert parse_duration("soon") is None
+
+
+def test_configured_keys_merges_env(monkeypatch):
+    monkeypatch.setenv("GROQ_API_KEYS", "k1, k2,,k1")
+    monkeypatch.setenv("GROQ_API_KEY", "k2")
+    monkeypatch.setenv("GROQ_API_KEY_FALLBACK", "k3")
+
+    assert key_pool.configured_keys() == ["k1", "k2", "k3"]
@@ -0,0 +1,64 @@
+import models
+from models import QuestionModel
+
+
+class FakeSnapshot:
+    def __init__(self, doc_id, data):
+        self.id = doc_id
+        self._data = data
+        self.exists = data is not None
+
+    def to_dict(self):
+        return dict(self._data)
+
+
+class FakeRef:
+    def __init__(self, store, doc_id):
+        self.store = store
+        self.id = doc_id
+
+
+class FakeCollection:
+    def __init__(self, store):
+        self.store = store
+
+    def document(self, doc_id):
+        return FakeRef(self.store, doc_id)
+
+
+class FakeDB:
+    def __init__(self, store):
+        self.store = store
+        self.get_all_calls = []
+
+    def collection(self, name):
+        return FakeCollection(self.store)
+
+    def get_all(self, refs):
+        self.get_all_calls.append([r.id for r in refs])
+        # Firestore does not guarantee ordering of get_all results
+        for ref in reversed(refs):
+            yield FakeSnapshot(ref.id, self.store.get(ref.id))
+
+
+def test_get_many_dedupes_chunks_and_preserves_order(monkeypatch):
+    store = {f"q{i}": {"title": f"Q{i}"} for i in range(5)}
+    db = FakeDB(store)
+    monkeypatch.setattr(models, "get_db", lambda: db)
+    monkeypatch.setattr(models, "FIRESTORE_GET_ALL_CHUNK_SIZE", 2)
+
+    result = QuestionModel().get_many(["q3", "missing", "q1", "q3", None, "q0", "q4"])
+
+    assert [r and r["id"] for r in result] == ["q3", None, "q1", "q3", None, "q0", "q4"]
+    assert result[0]["title"] == "Q3"
+    # Duplicates are fetched once and each chunk holds at most two refs
+    assert sum(len(c) for c in db.get_all_calls) == 5
+    assert all(len(c) <= 2 for c in db.get_all_calls)
+
+
+def test_get_many_empty_input_makes_no_calls(monkeypatch):
+    db = FakeDB({})
+    monkeypatch.setattr(models, "get_db", lambda: db)
+
+    assert QuestionModel().get_many([]) == []
+    assert db.get_all_calls == []
@@ -0,0 +1,96 @@
+from flask import Flask
+
+import models
+from models import StudentModel
+
+
+class FakeSnapshot:
+    def __init__(self, doc_id, data):
+        self.id = doc_id
+        self._data = data
+        self.exists = data is not None
+
+    def to_dict(self):
+        return dict(self._data)
+
+
+class FakeDocRef:
+    def __init__(self, db, doc_id):
+        self.db = db
+        self.id = doc_id
+
+    def get(self):
+        self.db.reads += 1
+        return FakeSnapshot(self.id, self.db.store.get(self.id))
+
+    def update(self, data):
+        self.db.store[self.id].update(data)
+
+
+class FakeQuery:
+    def __init__(self, db, filters=()):
+        self.db = db
+        self.filters = filters
+
+    def where(self, field, op, value):
+        return FakeQuery(self.db, self.filters + ((field, value),))
+
+    def stream(self):
+        self.db.queries += 1
+        for doc_id, data in self.db.store.items():
+            if all(data.get(f) == v for f, v in self.filters):
+                yield FakeSnapshot(doc_id, data)
+
+
+class FakeCollection(FakeQuery):
+    def document(self, doc_id):
+        return FakeDocRef(self.db, doc_id)
+
+
+class FakeDB:
+    def __init__(self, store):
+        self.store = store
+        self.reads = 0
+        self.queries = 0
+
+    def collection(self, name):
+        return FakeCollection(self)
+
+
+def test_reads_are_shared_within_a_request(monkeypatch):
+    db = FakeDB({"s1": {"batch_id": "b1", "is_disabled": False}})
+    monkeypatch.setattr(models, "get_db", lambda: db)
+    app = Flask(__name__)
+
+    with app.test_request_context():
+        first = StudentModel().get("s1")
+        first["batch_id"] = "mutated"
+        second = StudentModel().get("s1")
+        assert second["batch_id"] == "b1"
+        assert StudentModel().get("missing") is None
+        assert StudentModel().get("missing") is None
+        assert db.reads == 2
+
+        StudentModel().query(batch_id="b1")
+        StudentModel().query(batch_id="b1")
+        assert db.queries == 1
+
+        # Writes invalidate the document and cached queries for the collection
+        StudentModel().delete("s1")
+        assert StudentModel().get("s1")["is_disabled"] is True
+        StudentModel().query(batch_id="b1")
+        assert db.reads == 3
+        assert db.queries == 2
+
+    with app.test_request_context():
+        StudentModel().get("s1")
+        assert db.reads == 4
+
+
+def test_no_caching_outside_request(monkeypatch):
+    db = FakeDB({"s1": {"batch_id": "b1"}})
+    monkeypatch.setattr(models, "get_db", lambda: db)
+
+    StudentModel().get("s1")
+    StudentModel().get("s1")
+    assert db.reads == 2
@@ -0,0 +1,173 @@
+import json
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+import requests
+
+from agents import groq_client
+from agents.circuit_breaker import CircuitBreaker
+from agents.groq_client import GroqClient
+from agents.key_pool import KeyPool
+from agents.model_router import ModelRouter, configured_routes
+from agents.rate_limiter import RateLimitExceeded
+
+
+def test_breaker_opens_on_p95_latency():
+    breaker = CircuitBreaker(failure_threshold=5, latency_threshold=1.0, min_samples=3)
+
+    breaker.record_success(0.2)
+    breaker.record_success(2.5)
+    assert breaker.get_state()["state"] == "CLOSED"
+    breaker.record_success(3.0)
+
+    state = breaker.get_state()
+    assert state["state"] == "OPEN"
+    assert state["p95"] == 3.0
+    assert not breaker.can_execute()
+
+
+def test_half_open_admits_bounded_probes():
+    breaker = CircuitBreaker(failure_threshold=1, recovery_timeout=0, half_open_max_probes=2)
+    breaker.record_failure()
+
+    assert breaker.can_execute()
+    assert breaker.can_execute()
+    assert not breaker.can_execute()
+    assert breaker.get_state()["state"] == "HALF_OPEN"
+
+    breaker.record_success(0.1)
+    assert breaker.get_state()["state"] == "CLOSED"
+    assert breaker.can_execute()
+
+
+def test_failed_or_slow_probe_reopens():
+    breaker = CircuitBreaker(failure_threshold=3, recovery_timeout=0, latency_threshold=1.0)
+    for _ in range(3):
+        breaker.record_failure()
+
+    assert breaker.can_execute()
+    breaker.record_failure()
+    assert breaker.get_state()["state"] == "OPEN"
+
+    assert breaker.can_execute()
+    breaker.record_success(5.0)
+    assert breaker.get_state()["state"] == "OPEN"
+
+
+def test_router_falls_back_when_primary_fails():
+    router = ModelRouter(routes={"evaluator": ("big", "small")}, failure_threshold=2)
+    calls = []
+
+    def fn(model):
+        calls.append(model)
+        if model == "big":
+            raise RuntimeError("503")
+        return model
+
+    assert router.call(fn, agent="evaluator") == "small"
+    assert router.call(fn, agent="evaluator") == "small"
+    # The primary's circuit is now open, so it is skipped
+    assert router.call(fn, agent="evaluator") == "small"
+
+    assert calls == ["big", "small", "big", "small", "small"]
+    stats = router.stats()
+    assert stats["models"]["big"]["state"] == "OPEN"
+    assert stats["fallbacks"] == {"evaluator": 3}
+
+
+def http_error(status):
+    response = requests.Response()
+    response.status_code = status
+    return requests.exceptions.HTTPError(f"{status} error", response=response)
+
+
+def test_refused_calls_do_not_trip_the_breaker():
+    router = ModelRouter(routes={"evaluator": ("big", "small")}, failure_threshold=1)
+    calls = []
+
+    def fn(model):
+        calls.append(model)
+        if errors:
+            raise errors.pop(0)
+        return model
+
+    for error in (http_error(429), http_error(400), RateLimitExceeded("All Groq API keys are rate limited")):
+        errors = [error]
+        with pytest.raises(type(error)):
+            router.call(fn, agent="evaluator")
+
+    assert calls == ["big", "big", "big"]
+    assert router.stats()["models"]["big"]["state"] == "CLOSED"
+    assert router.stats()["fallbacks"] == {}
+
+    errors = [http_error(503)]
+    calls.clear()
+    assert router.call(fn, agent="evaluator") == "small"
+    assert calls == ["big", "small"]
+    assert router.stats()["models"]["big"]["state"] == "OPEN"
+
+
+def test_router_without_fallback_reports_open_circuit():
+    router = ModelRouter(routes={"testcases": ("big", None)}, failure_threshold=1)
+
+    with pytest.raises(RuntimeError, match="boom"):
+        router.call(lambda model: (_ for _ in ()).throw(RuntimeError("boom")), agent="testcases")
+    with pytest.raises(RuntimeError, match="circuit open for big"):
+        router.call(lambda model: model, agent="testcases")
+
+
+def test_explicit_model_is_used_alone():
+    router = ModelRouter(routes={"evaluator": ("big", "small")})
+
+    assert router.models_for("evaluator", model="other") == ["other"]
+    assert router.models_for("unknown") == ["llama-3.3-70b-versatile"]
+
+
+def test_routes_from_environment(monkeypatch):
+    monkeypatch.setenv("GROQ_MODEL_EVALUATOR", "big")
+    monkeypatch.setenv("GROQ_FALLBACK_MODEL_EVALUATOR", "small")
+    monkeypatch.setenv("GROQ_FALLBACK_MODEL_COMPILER", "")
+
+    routes = configured_routes()
+
+    assert routes["evaluator"] == ("big", "small")
+    assert routes["compiler"][1] is None
+    assert routes["testcases"][1] is None
+
+
+class ModelHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+
+    def do_POST(self):
+        model = json.loads(self.rfile.read(int(self.headers["Content-Length"])))["model"]
+        status = 503 if model == "big" else 200
+        body = json.dumps({"choices": [{"message": {"content": model}}]}).encode()
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, *args):
+        pass
+
+
+def test_client_routes_agent_call_to_fallback(monkeypatch):
+    httpd = ThreadingHTTPServer(("127.0.0.1", 0), ModelHandler)
+    threading.Thread(target=httpd.serve_forever, daemon=True).start()
+    monkeypatch.setattr(groq_client, "GROQ_API_URL", f"http://127.0.0.1:{httpd.server_port}/chat")
+    monkeypatch.setattr(groq_client, "_session", None)
+    monkeypatch.setattr(groq_client, "GROQ_MAX_ATTEMPTS", 1)
+    pool = KeyPool(["key-a"])
+    router = ModelRouter(routes={"evaluator": ("big", "small")})
+    try:
+        client = GroqClient(pool=pool, router=router)
+        assert client.chat([{"role": "user", "content": "hi"}], agent="evaluator") == "small"
+    finally:
+        httpd.shutdown()
+
+    assert router.stats()["models"]["big"]["failure_count"] == 1
+    # A failing model does not count against the key
+    assert not pool.stats()["keys"][0]["ejected"]
+    assert pool.stats()["keys"][0]["samples"] == 2
@@ -0,0 +1,177 @@
+import uuid
+from datetime import datetime, timedelta
+
+import models
+import performance_aggregates
+from app import app
+from auth import create_jwt_token
+from models import PerformanceModel, StudentModel
+from utils import parse_pagination_args
+from config import DEFAULT_PAGE_SIZE, MAX_PAGE_SIZE
+
+
+def test_parse_pagination_args():
+    assert parse_pagination_args({}) == (None, None, None)
+    assert parse_pagination_args({"limit": "20"}) == (20, None, None)
+    assert parse_pagination_args({"cursor": "abc"}) == (DEFAULT_PAGE_SIZE, "abc", None)
+    assert parse_pagination_args({"limit": "x"})[2] == "limit must be an integer"
+    assert parse_pagination_args({"limit": str(MAX_PAGE_SIZE + 1)})[2] is not None
+    assert parse_pagination_args({"limit": "0"})[2] is not None
+
+
+class Snapshot:
+    def __init__(self, doc_id, data):
+        self.id = doc_id
+        self._data = data
+        self.exists = data is not None
+
+    def to_dict(self):
+        return dict(self._data)
+
+
+class Query:
+    """Tiny in-memory stand-in for a Firestore query, ordered by document ID."""
+
+    def __init__(self, store, filters=(), after=None, fields=None, count=None):
+        self.store = store
+        self.filters = filters
+        self.after = after
+        self.fields = fields
+        self.count = count
+
+    def _copy(self, **changes):
+        state = dict(filters=self.filters, after=self.after, fields=self.fields, count=self.count)
+        state.update(changes)
+        return Query(self.store, **state)
+
+    def where(self, field, op, value):
+        return self._copy(filters=self.filters + ((field, value),))
+
+    def order_by(self, field, direction="ASCENDING"):
+        assert field == models.DOCUMENT_ID_FIELD
+        return self
+
+    def start_after(self, snapshot):
+        return self._copy(after=snapshot.id)
+
+    def select(self, fields):
+        return self._copy(fields=fields)
+
+    def limit(self, count):
+        return self._copy(count=count)
+
+    def document(self, doc_id):
+        store = self.store
+
+        class Ref:
+            def get(self):
+                return Snapshot(doc_id, store.get(doc_id))
+
+        return Ref()
+
+    def stream(self):
+        results = []
+        for doc_id in sorted(self.store):
+            data = self.store[doc_id]
+            if self.after is not None and doc_id <= self.after:
+                continue
+            if not all(data.get(f) == v for f, v in self.filters):
+                continue
+            if self.fields is not None:
+                data = {k: v for k, v in data.items() if k in self.fields}
+            results.append(Snapshot(doc_id, data))
+        return results[:self.count] if self.count is not None else results
+
+
+class DB:
+    def __init__(self, store):
+        self.store = store
+
+    def collection(self, name):
+        return Query(self.store)
+
+
+def test_query_page_walks_all_pages(monkeypatch):
+    store = {f"s{i}": {"batch_id": "b1", "username": f"u{i}", "secret": "x"} for i in range(5)}
+    store["other"] = {"batch_id": "b2"}
+    monkeypatch.setattr(models, "get_db", lambda: DB(store))
+
+    seen = []
+    cursor = None
+    while True:
+        page, cursor = StudentModel().query_page(2, cursor, select=["username"], batch_id="b1")
+        seen.extend(page)
+        if cursor is None:
+            break
+
+    assert [s["id"] for s in seen] == ["s0", "s1", "s2", "s3", "s4"]
+    assert all(set(s) == {"id", "username"} for s in seen)
+
+
+def test_query_rejects_unknown_cursor(monkeypatch):
+    monkeypatch.setattr(models, "get_db", lambda: DB({}))
+
+    try:
+        StudentModel().query(limit=5, start_after="missing")
+    except ValueError as e:
+        assert "Invalid cursor" in str(e)
+    else:
+        raise AssertionError("expected ValueError")
+
+
+def walk_performance(path, token):
+    client = app.test_client()
+    headers = {"Authorization": f"Bearer {token}"}
+    seen, cursor = [], None
+    while True:
+        url = f"{path}&limit=2" + (f"&cursor={cursor}" if cursor else "")
+        data = client.get(url, headers=headers).get_json()["data"]
+        seen.extend(p["submitted_at"] for p in data["performance"])
+        cursor = data.get("next_cursor")
+        if not cursor:
+            return seen
+
+
+def test_performance_pages_are_newest_first():
+    tag = uuid.uuid4().hex
+    start = datetime(2026, 3, 1)
+    # Shuffled submission times, so document ID order says nothing about recency
+    for minutes in (3, 0, 4, 1, 2):
+        PerformanceModel().create({"student_id": f"s-{tag}", "batch_id": f"b-{tag}",
+                                   "submitted_at": start + timedelta(minutes=minutes)})
+    token = create_jwt_token({"role": "student", "student_id": f"s-{tag}", "batch_id": f"b-{tag}"})
+
+    seen = walk_performance("/api/student/performance?x=1", token)
+
+    assert len(seen) == 5
+    assert seen == sorted(seen, reverse=True)
+
+
+def test_firebase_uid_fallback_pages_one_query():
+    tag = uuid.uuid4().hex
+    student_id = StudentModel().create({"batch_id": f"b-{tag}", "firebase_uid": f"uid-{tag}"})
+    for minutes in range(5):
+        PerformanceModel().create({"student_id": f"uid-{tag}", "batch_id": f"b-{tag}",
+                                   "submitted_at": datetime(2026, 3, 1) + timedelta(minutes=minutes)})
+    token = create_jwt_token({"uid": "admin-1", "role": "admin"})
+
+    seen = walk_performance(f"/api/admin/performance?student_id={student_id}", token)
+
+    assert len(seen) == 5 == len(set(seen))
+
+
+def test_records_without_submitted_at_are_listed_once_backfilled():
+    student_id = f"s-{uuid.uuid4().hex}"
+    dated = PerformanceModel().create({"student_id": student_id, "submitted_at": datetime(2026, 3, 1)})
+    undated = PerformanceModel().create({"student_id": student_id})
+    legacy = PerformanceModel().create({"student_id": student_id, "submitted_at": "2026-03-02T09:30:00"})
+
+    # Firestore sorts strings after timestamps and drops records without the field
+    assert [r["id"] for r in PerformanceModel().list_records(student_id=student_id)[0]] == [legacy, dated]
+    result = performance_aggregates.backfill_submitted_at()
+
+    assert result["updated"] >= 2
+    records = PerformanceModel().list_records(student_id=student_id)[0]
+    # created_at is now, so the undated record sorts first
+    assert [r["id"] for r in records] == [undated, legacy, dated]
+    assert PerformanceModel().get(legacy)["submitted_at"] == datetime(2026, 3, 2, 9, 30)
@@ -0,0 +1,215 @@
+import time
+import uuid
+from datetime import datetime, timedelta
+
+import pytest
+from google.cloud.firestore_v1.transforms import Increment, Maximum, Minimum
+
+import performance_aggregates
+from app import app
+from auth import create_jwt_token
+from models import PerformanceAggregateModel, PerformanceModel, PerformanceProgressModel, QuestionModel
+from performance_aggregates import aggregate_id, progress_id, record_submission, summary
+from question_service import QuestionService
+from storage.documents import apply_op
+from submission_service import SubmissionService
+
+
+@pytest.fixture
+def tree():
+    """Unique IDs for one college/department/batch and two students and questions."""
+    tag = uuid.uuid4().hex[:8]
+    college_id, dept_id, batch_id = f"college-{tag}", f"dept-{tag}", f"batch-{tag}"
+    topic_id = f"topic-{tag}"
+    questions = [
+        QuestionModel().get(QuestionModel().create({"batch_id": batch_id, "topic_id": topic_id, "title": f"Q{n}"}))
+        for n in range(2)
+    ]
+    students = [
+        {"student_id": f"student-{tag}-{n}", "batch_id": batch_id, "department_id": dept_id, "college_id": college_id}
+        for n in range(2)
+    ]
+    return {"college": college_id, "department": dept_id, "batch": batch_id, "topic": topic_id,
+            "questions": questions, "students": students}
+
+
+@pytest.fixture
+def judge(monkeypatch):
+    """Fake evaluation returning the next queued status."""
+    outcomes = []
+
+    def evaluate(question, code, language):
+        status = outcomes.pop(0)
+        if status == "execution_error":
+            return {"status": status, "error": "SyntaxError"}
+        return {"status": status, "reason": "", "test_results": [], "efficiency_feedback": None}
+
+    monkeypatch.setattr(SubmissionService, "evaluate", staticmethod(evaluate))
+    return outcomes
+
+
+def submit(judge, student, question, status):
+    judge.append(status)
+    return SubmissionService.submit(student, question, "print(1)", "python")
+
+
+def aggregate(scope, scope_id):
+    return PerformanceAggregateModel().get(aggregate_id(scope, scope_id))
+
+
+def record(tree, student, question, status, submitted_at):
+    return record_submission({
+        **student, "question_id": question["id"], "status": status, "submitted_at": submitted_at
+    }, question)
+
+
+def test_submit_counts_towards_every_scope(tree, judge):
+    student, question = tree["students"][0], tree["questions"][0]
+
+    result = submit(judge, student, question, "incorrect")
+
+    assert PerformanceModel().get(result["performance_id"])["status"] == "incorrect"
+    for scope in ("student", "question", "topic", "batch", "department", "college"):
+        scope_id = {"student": student["student_id"], "question": question["id"]}.get(scope, tree.get(scope))
+        doc = aggregate(scope, scope_id)
+        assert (doc["attempts"], doc["attempted"], doc.get("solves", 0)) == (1, 1, 0), scope
+    assert aggregate("question", question["id"])["topic_id"] == tree["topic"]
+    assert aggregate("batch", tree["batch"])["college_id"] == tree["college"]
+
+
+def test_repeat_solves_are_not_double_counted(tree, judge):
+    students, questions = tree["students"], tree["questions"]
+
+    submit(judge, students[0], questions[0], "execution_error")
+    submit(judge, students[0], questions[0], "correct")
+    submit(judge, students[0], questions[0], "correct")
+    submit(judge, students[0], questions[1], "incorrect")
+    submit(judge, students[1], questions[0], "correct")
+
+    batch = aggregate("batch", tree["batch"])
+    assert (batch["attempts"], batch["attempted"], batch["solves"]) == (5, 3, 2)
+    student = aggregate("student", students[0]["student_id"])
+    assert (student["attempts"], student["attempted"], student["solves"]) == (4, 2, 1)
+    question = aggregate("question", questions[0]["id"])
+    assert (question["attempts"], question["attempted"], question["solves"]) == (4, 2, 2)
+
+
+def test_solve_time_and_first_solve(tree):
+    students, question = tree["students"], tree["questions"][0]
+    start = datetime(2026, 1, 5, 9, 0)
+
+    record(tree, students[0], question, "incorrect", start)
+    record(tree, students[0], question, "correct", start + timedelta(minutes=10))
+    record(tree, students[1], question, "correct", start + timedelta(minutes=2))
+
+    data = summary("question", question["id"])["summary"]
+    assert data["solves"] == 2
+    assert data["solve_rate"] == 1.0
+    # 600s for the first student, 0s for the second who solved first time
+    assert data["avg_solve_seconds"] == 300.0
+    assert data["first_solved_at"] == start + timedelta(minutes=2)
+    assert data["last_submission_at"] == start + timedelta(minutes=10)
+
+
+def test_summary_endpoints_are_scoped(tree, judge):
+    submit(judge, tree["students"][0], tree["questions"][0], "correct")
+    submit(judge, tree["students"][1], tree["questions"][1], "incorrect")
+    client = app.test_client()
+
+    def get(path, claims):
+        token = create_jwt_token({"uid": "user-1", **claims})
+        return client.get(path, headers={"Authorization": f"Bearer {token}"})
+
+    college = get("/api/college/performance/summary", {"role": "college", "college_id": tree["college"]})
+    department = get("/api/department/performance/summary", {"role": "department", "department_id": tree["department"]})
+    batch = get("/api/batch/performance/summary", {"role": "batch", "batch_id": tree["batch"]}).get_json()["data"]
+    admin = get("/api/admin/performance/summary", {"role": "admin"}).get_json()["data"]
+    scoped = get(f"/api/admin/performance/summary?scope=batch&id={tree['batch']}", {"role": "admin"})
+
+    assert college.get_json()["data"]["summary"]["solves"] == 1
+    assert [d["id"] for d in college.get_json()["data"]["departments"]] == [tree["department"]]
+    assert [t["id"] for t in department.get_json()["data"]["topics"]] == [tree["topic"]]
+    assert batch["summary"]["attempts"] == 2
+    assert sorted(s["id"] for s in batch["students"]) == sorted(s["student_id"] for s in tree["students"])
+    assert len(batch["questions"]) == 2
+    assert scoped.get_json()["data"] == batch
+    assert tree["college"] in [c["id"] for c in admin["colleges"]]
+    assert admin["summary"]["attempts"] >= 2
+    assert get("/api/admin/performance/summary?scope=planet&id=x", {"role": "admin"}).status_code == 400
+    assert get("/api/batch/performance/summary", {"role": "student", "batch_id": tree["batch"]}).status_code == 403
+
+
+def test_rebuild_reproduces_live_counters(tree, judge):
+    students, questions = tree["students"], tree["questions"]
+    submit(judge, students[0], questions[0], "incorrect")
+    submit(judge, students[0], questions[0], "correct")
+    submit(judge, students[1], questions[1], "correct")
+    ids = [("batch", tree["batch"]), ("topic", tree["topic"]), ("student", students[0]["student_id"])]
+    live = {key: summary(*key)["summary"] for key in ids}
+
+    PerformanceAggregateModel().hard_delete_many([aggregate_id("batch", tree["batch"])])
+    PerformanceAggregateModel().update(aggregate_id("topic", tree["topic"]), {"solves": 99})
+    result = performance_aggregates.rebuild()
+
+    assert result["records"] >= 3
+    for key in ids:
+        assert summary(*key)["summary"] == live[key], key
+
+
+def test_rebuild_job_endpoint():
+    client = app.test_client()
+    token = create_jwt_token({"uid": "admin-1", "role": "admin"})
+    headers = {"Authorization": f"Bearer {token}"}
+
+    rv = client.post("/api/admin/performance/rebuild", headers=headers)
+
+    assert rv.status_code == 202
+    job_id = rv.get_json()["data"]["job_id"]
+    for _ in range(500):
+        job = client.get(f"/api/admin/jobs/{job_id}", headers=headers).get_json()["data"]
+        if job["status"] in ("done", "failed"):
+            break
+        time.sleep(0.01)
+    assert job["status"] == "done"
+    assert job["kind"] == "performance_rebuild"
+
+
+def test_storage_applies_field_transforms():
+    doc = apply_op(None, "merge", {"n": Increment(2), "hi": Maximum(5), "lo": Minimum(5), "name": "x"})
+    assert doc == {"n": 2, "hi": 5, "lo": 5, "name": "x"}
+    doc = apply_op(doc, "merge", {"n": Increment(1), "hi": Maximum(3), "lo": Minimum(3)})
+    assert doc == {"n": 3, "hi": 5, "lo": 3, "name": "x"}
+    assert apply_op(doc, "update", {"n": Increment(-3)})["n"] == 0
+
+
+def test_deleted_entities_leave_the_counters(tree, judge):
+    students, questions = tree["students"], tree["questions"]
+    submit(judge, students[0], questions[0], "correct")
+    submit(judge, students[1], questions[0], "incorrect")
+    submit(judge, students[1], questions[1], "incorrect")
+
+    performance_aggregates.forget("student", students[0]["student_id"])
+
+    assert aggregate("student", students[0]["student_id"]) is None
+    assert PerformanceProgressModel().get(progress_id(students[0]["student_id"], questions[0]["id"])) is None
+    question = aggregate("question", questions[0]["id"])
+    assert (question["attempts"], question["attempted"], question["solves"]) == (1, 1, 0)
+    batch = aggregate("batch", tree["batch"])
+    assert (batch["attempts"], batch["attempted"], batch["solves"], batch["solve_seconds"]) == (2, 2, 0, 0)
+
+    with app.app_context():
+        QuestionService.delete_question({"role": "admin", "uid": "admin-1"}, questions[1]["id"])
+
+    assert aggregate("question", questions[1]["id"]) is None
+    assert aggregate("student", students[1]["student_id"])["attempts"] == 1
+    performance_aggregates.rebuild()
+    assert aggregate("student", students[1]["student_id"])["attempts"] == 1
+
+    performance_aggregates.forget("batch", tree["batch"])
+
+    for scope, scope_id in (("batch", tree["batch"]), ("question", questions[0]["id"]),
+                            ("student", students[1]["student_id"])):
+        assert aggregate(scope, scope_id) is None, scope
+    for scope in ("topic", "department", "college"):
+        assert aggregate(scope, tree[scope])["attempted"] == 0, scope
+    assert PerformanceProgressModel().query(batch_id=tree["batch"]) == []
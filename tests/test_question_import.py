@@ -0,0 +1,207 @@
+import io
+import json
+import threading
+import time
+
+import pytest
+
+import question_import
+import question_service
+from agents.rate_limiter import current_tenant
+from app import app
+from auth import create_jwt_token
+from models import BatchModel, QuestionModel, TopicModel
+from testcase_store import hidden_testcases
+
+CASES = [{"input": "1 2", "expected_output": "3"}]
+
+
+def question(title, **extra):
+    return {
+        "title": title,
+        "description": f"Solve the {title} problem for the given input.",
+        "sample_input": "1 2",
+        "sample_output": "3",
+        **extra
+    }
+
+
+def jsonl(*rows):
+    return "\n".join(json.dumps(row) for row in rows)
+
+
+@pytest.fixture
+def batch():
+    batch_id = BatchModel().create({"department_id": "dept-1", "college_id": "college-1", "name": "B1"})
+    return BatchModel().get(batch_id)
+
+
+@pytest.fixture
+def batch_headers(batch):
+    token = create_jwt_token({
+        "uid": "batch-admin", "role": "batch", "batch_id": batch["id"],
+        "department_id": "dept-1", "college_id": "college-1"
+    })
+    return {"Authorization": f"Bearer {token}"}
+
+
+@pytest.fixture
+def generator(monkeypatch):
+    """Fake generator recording concurrency and the tenant of each call."""
+    state = {"active": 0, "peak": 0, "tenants": [], "fail": set()}
+    lock = threading.Lock()
+
+    def generate(description, sample_input, sample_output):
+        with lock:
+            state["active"] += 1
+            state["peak"] = max(state["peak"], state["active"])
+            state["tenants"].append(current_tenant())
+        time.sleep(0.02)
+        with lock:
+            state["active"] -= 1
+        if any(title in description for title in state["fail"]):
+            return {"success": False, "error": "Groq API error: 503", "testcases": []}
+        return {"success": True, "error": None, "testcases": CASES}
+
+    monkeypatch.setattr(question_service, "generate_hidden_testcases", generate)
+    monkeypatch.setattr(question_service, "TESTCASE_GENERATION_RETRY_SECONDS", 0)
+    return state
+
+
+def wait_for_job(client, headers, job_id, prefix="/api/batch"):
+    for _ in range(500):
+        job = client.get(f"{prefix}/jobs/{job_id}", headers=headers).get_json()["data"]
+        if job["status"] in ("done", "failed"):
+            return job
+        time.sleep(0.01)
+    raise AssertionError(f"job never finished: {job}")
+
+
+def test_import_writes_questions_and_generates_testcases(batch, batch_headers, generator, monkeypatch):
+    monkeypatch.setattr(question_import, "QUESTION_IMPORT_WORKERS", 2)
+    client = app.test_client()
+    rows = [question(f"Problem {i}") for i in range(6)]
+
+    rv = client.post("/api/batch/questions/import", headers=batch_headers, json={
+        "content": jsonl(*rows), "format": "jsonl"
+    })
+
+    assert rv.status_code == 202
+    data = rv.get_json()["data"]
+    assert data["imported"] == 6
+    assert data["pending_testcases"] == 6
+    job = wait_for_job(client, batch_headers, data["job_id"])
+    assert job["status"] == "done"
+    assert job["progress"] == {"total": 6, "done": 6, "ready": 6, "failed": 0}
+    questions = QuestionModel().query(batch_id=batch["id"])
+    assert sorted(q["title"] for q in questions) == sorted(r["title"] for r in rows)
+    assert all(q["testcase_status"] == "ready" and hidden_testcases(q) == CASES for q in questions)
+    assert generator["peak"] <= 2
+    assert set(generator["tenants"]) == {f"batch:{batch['id']}"}
+
+
+def test_invalid_row_rejects_whole_file(batch, batch_headers, generator):
+    TopicModel().create({"department_id": "other-dept", "name": "Graphs"})
+    other_topic = TopicModel().query(department_id="other-dept")[0]["id"]
+    content = "\n".join([
+        json.dumps(question("Fine")),
+        json.dumps({"title": "No description"}),
+        "{not json",
+        json.dumps(question("Fine")),
+        json.dumps(question("Topic", topic_id=other_topic))
+    ])
+
+    rv = app.test_client().post("/api/batch/questions/import", headers=batch_headers, json={"content": content})
+
+    assert rv.status_code == 400
+    errors = rv.get_json()["details"]["errors"]
+    assert errors[0].startswith("Row 3: invalid JSON")
+    assert any(e.startswith("Row 2: Missing required field: description") for e in errors)
+    assert any(e.startswith("Row 4: duplicate title (same as row 1)") for e in errors)
+    assert any(e.startswith("Row 5: topic") for e in errors)
+    assert QuestionModel().query(batch_id=batch["id"]) == []
+
+
+def test_validation_reports_every_row(batch, batch_headers, generator):
+    QuestionModel().create({"batch_id": batch["id"], **question("Existing")})
+    content = jsonl(
+        question("Existing"),
+        question("Hard one", difficulty="Impossible"),
+        question("Topic", topic_id="missing-topic")
+    )
+
+    rv = app.test_client().post("/api/batch/questions/import", headers=batch_headers, json={"content": content})
+
+    assert rv.status_code == 400
+    errors = rv.get_json()["details"]["errors"]
+    assert len(errors) == 3
+    assert "already exists" in errors[0]
+    assert errors[1].startswith("Row 2: difficulty")
+    assert errors[2].startswith("Row 3: topic 'missing-topic'")
+
+
+def test_csv_upload_and_explicit_testcases(batch, batch_headers, generator, monkeypatch):
+    csv_content = (
+        "title,description,sample_input,sample_output,difficulty\n"
+        "Sum,\"Read two integers\nand print their sum.\",1 2,3,Easy\n"
+    )
+
+    rv = app.test_client().post(
+        "/api/batch/questions/import", headers=batch_headers,
+        data={"file": (io.BytesIO(csv_content.encode()), "questions.csv")},
+        content_type="multipart/form-data"
+    )
+
+    assert rv.status_code == 202
+    question_id = rv.get_json()["data"]["question_ids"][0]
+    assert QuestionModel().get(question_id)["description"] == "Read two integers\nand print their sum."
+
+    # Explicit test cases are stored first, so the question is created ready in one write
+    monkeypatch.setattr(QuestionModel, "update_many", lambda *a, **k: pytest.fail("second write"))
+    rv = app.test_client().post("/api/batch/questions/import", headers=batch_headers, json={
+        "content": jsonl(question("Manual", hidden_testcases=CASES, difficulty="hard"))
+    })
+    data = rv.get_json()["data"]
+    assert data["pending_testcases"] == 0 and data["job_id"] is None
+    manual = QuestionModel().get(data["question_ids"][0])
+    assert manual["testcase_status"] == "ready"
+    assert manual["difficulty"] == "Hard"
+    assert hidden_testcases(manual) == CASES
+
+
+def test_failed_generations_are_counted(batch, batch_headers, generator):
+    generator["fail"].add("Broken")
+    client = app.test_client()
+
+    rv = client.post("/api/batch/questions/import", headers=batch_headers, json={
+        "content": jsonl(question("Working"), question("Broken"))
+    })
+    job = wait_for_job(client, batch_headers, rv.get_json()["data"]["job_id"])
+
+    assert job["result"]["ready"] == 1
+    assert job["result"]["failed"] == 1
+    assert list(job["result"]["errors"].values()) == ["Groq API error: 503"]
+
+
+def test_job_is_only_visible_to_its_owner(batch, batch_headers, generator):
+    client = app.test_client()
+    job_id = client.post("/api/batch/questions/import", headers=batch_headers, json={
+        "content": jsonl(question("Mine"))
+    }).get_json()["data"]["job_id"]
+    other = create_jwt_token({"uid": "someone-else", "role": "batch", "batch_id": "b2"})
+    admin = create_jwt_token({"uid": "admin-1", "role": "admin"})
+
+    assert client.get(f"/api/batch/jobs/{job_id}", headers={"Authorization": f"Bearer {other}"}).status_code == 404
+    job = wait_for_job(client, {"Authorization": f"Bearer {admin}"}, job_id, prefix="/api/admin")
+    assert job["kind"] == "question_import"
+
+
+def test_cli_imports_file(batch, generator, tmp_path, capsys):
+    path = tmp_path / "questions.jsonl"
+    path.write_text(jsonl(question("One"), question("Two")))
+
+    assert question_import.main(["--batch-id", batch["id"], str(path)]) == 0
+
+    assert "Test cases: 2/2 (0 failed)" in capsys.readouterr().out
+    questions = QuestionModel().query(batch_id=batch["id"])
+    assert {q["testcase_status"] for q in questions} == {"ready"}
@@ -0,0 +1,196 @@
+import threading
+import time
+import uuid
+
+import pytest
+
+import question_service
+from testcase_store import hidden_testcases
+from app import app
+from auth import create_jwt_token
+from jobs import job_queue
+from models import BatchModel, JobModel, QuestionModel
+from question_service import QuestionService
+
+CASES = [{"input": "1 2", "expected_output": "3"}, {"input": "5 5", "expected_output": "10"}]
+QUESTION = {
+    "title": "Sum",
+    "description": "Read two integers and print their sum.",
+    "sample_input": "1 2",
+    "sample_output": "3"
+}
+
+
+@pytest.fixture
+def batch_headers():
+    batch_id = BatchModel().create({"department_id": "dept-1", "college_id": "college-1", "name": "B1"})
+    token = create_jwt_token({
+        "uid": "batch-admin", "role": "batch", "batch_id": batch_id,
+        "department_id": "dept-1", "college_id": "college-1"
+    })
+    return {"Authorization": f"Bearer {token}"}
+
+
+@pytest.fixture
+def generator(monkeypatch):
+    """Fake generator: blocks until released, then returns its queued results."""
+    gate = threading.Event()
+    results = []
+    calls = []
+
+    def generate(description, sample_input, sample_output):
+        calls.append(description)
+        gate.wait(5)
+        if results:
+            return results.pop(0)
+        return {"success": True, "error": None, "testcases": CASES}
+
+    monkeypatch.setattr(question_service, "generate_hidden_testcases", generate)
+    monkeypatch.setattr(question_service, "TESTCASE_GENERATION_RETRY_SECONDS", 0)
+    generator = type("Generator", (), {"gate": gate, "results": results, "calls": calls})
+    yield generator
+    gate.set()
+
+
+def wait_for_status(question_id, status):
+    for _ in range(200):
+        question = QuestionModel().get(question_id)
+        if question.get("testcase_status") == status:
+            return question
+        time.sleep(0.01)
+    raise AssertionError(f"question never reached {status}: {question.get('testcase_status')}")
+
+
+def test_question_is_saved_before_testcases_are_generated(batch_headers, generator):
+    client = app.test_client()
+
+    started = time.monotonic()
+    rv = client.post("/api/batch/questions", headers=batch_headers, json=QUESTION)
+
+    assert rv.status_code == 201
+    assert time.monotonic() - started < 1
+    data = rv.get_json()["data"]
+    assert data["testcase_status"] == "pending"
+    assert QuestionModel().get(data["question_id"])["hidden_testcases_count"] == 0
+
+    generator.gate.set()
+    question = wait_for_status(data["question_id"], "ready")
+    assert hidden_testcases(question) == CASES
+
+
+def test_generation_is_retried_then_marked_failed(batch_headers, generator):
+    generator.gate.set()
+    generator.results.extend([{"success": False, "error": "Groq API error: 503", "testcases": []}] * 3)
+
+    rv = app.test_client().post("/api/batch/questions", headers=batch_headers, json=QUESTION)
+    question = wait_for_status(rv.get_json()["data"]["question_id"], "failed")
+
+    assert len(generator.calls) == 3
+    assert "503" in question["testcase_error"]
+
+
+def test_generation_succeeds_on_retry(batch_headers, generator):
+    generator.gate.set()
+    generator.results.append({"success": False, "error": "Groq API error: 503", "testcases": []})
+
+    rv = app.test_client().post("/api/batch/questions", headers=batch_headers, json=QUESTION)
+    question = wait_for_status(rv.get_json()["data"]["question_id"], "ready")
+
+    assert len(generator.calls) == 2
+    assert hidden_testcases(question) == CASES
+
+
+def test_regenerate_endpoint_queues_job(batch_headers, generator):
+    client = app.test_client()
+    generator.gate.set()
+    question_id = client.post("/api/batch/questions", headers=batch_headers, json=QUESTION).get_json()["data"]["question_id"]
+    wait_for_status(question_id, "ready")
+    generator.results.append({"success": True, "error": None, "testcases": CASES[:1]})
+
+    rv = client.post("/api/batch/generate-testcases", headers=batch_headers, json={
+        "question_id": question_id, "regenerate": True
+    })
+
+    assert rv.status_code == 202
+    assert rv.get_json()["data"]["testcase_job_id"]
+    for _ in range(200):
+        if hidden_testcases(QuestionModel().get(question_id)) == CASES[:1]:
+            break
+        time.sleep(0.01)
+    assert QuestionModel().get(question_id)["testcase_status"] == "ready"
+    assert hidden_testcases(QuestionModel().get(question_id)) == CASES[:1]
+
+
+def test_explicit_testcases_override_running_generation(batch_headers, generator):
+    client = app.test_client()
+    question_id = client.post("/api/batch/questions", headers=batch_headers, json=QUESTION).get_json()["data"]["question_id"]
+    manual = [{"input": "0 0", "expected_output": "0"}]
+
+    rv = client.put(f"/api/batch/questions/{question_id}", headers=batch_headers, json={"hidden_testcases": manual})
+    assert rv.status_code == 200
+    generator.gate.set()
+    time.sleep(0.2)
+
+    question = QuestionModel().get(question_id)
+    assert question["testcase_status"] == "ready"
+    assert hidden_testcases(question) == manual
+
+
+def test_regenerate_is_scoped_to_own_batch(batch_headers, generator):
+    question_id = QuestionModel().create({"batch_id": "other-batch", **QUESTION})
+
+    rv = app.test_client().post("/api/batch/generate-testcases", headers=batch_headers, json={
+        "question_id": question_id, "regenerate": True
+    })
+
+    assert rv.status_code == 404
+
+
+def test_students_cannot_submit_until_testcases_are_ready(generator):
+    question_id = QuestionModel().create({"batch_id": "b-pending", **QUESTION, "testcase_status": "pending"})
+    token = create_jwt_token({"role": "student", "student_id": "s-pending", "batch_id": "b-pending"})
+    headers = {"Authorization": f"Bearer {token}"}
+    client = app.test_client()
+
+    detail = client.get(f"/api/student/questions/{question_id}", headers=headers).get_json()["data"]["question"]
+    rv = client.post("/api/student/submit", headers=headers, json={
+        "question_id": question_id, "code": "print(3)", "language": "python"
+    })
+
+    assert detail["testcase_status"] == "pending"
+    assert rv.status_code == 409
+    assert rv.get_json()["code"] == "TESTCASES_NOT_READY"
+
+
+def test_lost_generation_job_is_requeued(batch_headers, generator):
+    client = app.test_client()
+    question_id = client.post("/api/batch/questions", headers=batch_headers, json=QUESTION).get_json()["data"]["question_id"]
+    lost = QuestionModel().get(question_id)["testcase_generation"]
+    # The worker restarted: the job document is gone with the queue
+    JobModel().hard_delete(lost)
+    token = create_jwt_token({"role": "student", "student_id": "s-lost", "batch_id": QuestionModel().get(question_id)["batch_id"]})
+    headers = {"Authorization": f"Bearer {token}"}
+
+    rv = client.post("/api/student/submit", headers=headers, json={
+        "question_id": question_id, "code": "print(3)", "language": "python"
+    })
+
+    assert rv.status_code == 409
+    requeued = QuestionModel().get(question_id)["testcase_generation"]
+    assert requeued != lost
+    assert JobModel().get(requeued)["kind"] == "testcases"
+    generator.gate.set()
+    question = wait_for_status(question_id, "ready")
+    assert hidden_testcases(question) == CASES
+
+
+def test_finished_job_does_not_leave_question_pending(generator):
+    generation = job_queue.submit("testcases", {"question_id": "none"}, job_id=uuid.uuid4().hex)
+    question_id = QuestionModel().create({**QUESTION, "testcase_status": "pending", "testcase_generation": generation})
+    for _ in range(200):
+        if job_queue.get(generation)["status"] == "failed":
+            break
+        time.sleep(0.01)
+
+    assert QuestionService.reconcile_testcase_generation(question_id, QuestionModel().get(question_id)) is None
+    assert QuestionModel().get(question_id)["testcase_status"] == "failed"
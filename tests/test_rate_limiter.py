@@ -0,0 +1,160 @@
+import json
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+
+from agent_wrappers import stream_agent_call
+from agents import groq_client
+from agents.groq_client import GroqClient
+from agents.key_pool import KeyPool
+from agents.rate_limiter import RateLimiter, RateLimitExceeded, current_tenant, llm_tenant
+
+
+def drain(limiter):
+    with limiter.bucket.state.transaction() as state:
+        state.update(requests=0.0, tokens=0.0, updated=time.time())
+
+
+def test_request_bucket_blocks_then_times_out():
+    limiter = RateLimiter(2, 10000, max_wait=0.2)
+
+    limiter.acquire(10)
+    limiter.acquire(10)
+    started = time.monotonic()
+    with pytest.raises(RateLimitExceeded, match="no quota"):
+        limiter.acquire(10)
+
+    assert time.monotonic() - started >= 0.2
+    assert limiter.stats()["timeouts"] == 1
+
+
+def test_settle_returns_unused_tokens():
+    limiter = RateLimiter(100, 100, max_wait=0.1)
+
+    limiter.acquire(80)
+    with pytest.raises(RateLimitExceeded):
+        limiter.acquire(50)
+    limiter.settle(80, 20)
+    limiter.acquire(50)
+
+
+def test_waiting_calls_are_served_round_robin_by_tenant():
+    limiter = RateLimiter(600, 100000, max_wait=5)
+    drain(limiter)
+    order = []
+
+    def call(tenant, name):
+        limiter.acquire(1, tenant=tenant)
+        order.append(name)
+
+    threads = []
+    for tenant, name in [("batch:a", "a1"), ("batch:a", "a2"), ("batch:a", "a3"), ("batch:b", "b1")]:
+        thread = threading.Thread(target=call, args=(tenant, name))
+        thread.start()
+        threads.append(thread)
+        time.sleep(0.01)
+    for thread in threads:
+        thread.join()
+
+    assert order == ["a1", "b1", "a2", "a3"]
+    assert limiter.stats()["waited"] == 4
+
+
+def test_full_tenant_queue_rejects_immediately():
+    limiter = RateLimiter(60, 100000, queue_size=1, max_wait=0.5)
+    drain(limiter)
+    waiter = threading.Thread(target=lambda: pytest.raises(RateLimitExceeded, limiter.acquire, 1, "batch:a"))
+    waiter.start()
+    time.sleep(0.05)
+
+    started = time.monotonic()
+    with pytest.raises(RateLimitExceeded, match="Too many queued"):
+        limiter.acquire(1, tenant="batch:a")
+    assert time.monotonic() - started < 0.1
+    waiter.join()
+    assert limiter.stats()["rejected"] == 1
+
+
+def test_file_backend_is_shared_between_limiters(tmp_path):
+    path = str(tmp_path / "limiter.json")
+    worker_a = RateLimiter(2, 10000, backend="file", state_path=path, max_wait=0.1)
+    worker_b = RateLimiter(2, 10000, backend="file", state_path=path, max_wait=0.1)
+
+    worker_a.acquire(10)
+    worker_b.acquire(10)
+    with pytest.raises(RateLimitExceeded):
+        worker_a.acquire(10)
+    assert worker_b.stats()["available"]["requests"] < 1
+
+
+def test_shared_state_directory_is_not_trusted(tmp_path):
+    shared = tmp_path / "shared"
+    shared.mkdir(mode=0o777)
+    shared.chmod(0o777)
+    path = str(shared / "limiter.json")
+    worker_a = RateLimiter(1, 10000, backend="file", state_path=path, max_wait=0.1)
+    worker_b = RateLimiter(1, 10000, backend="file", state_path=path, max_wait=0.1)
+
+    worker_a.acquire(10)
+    worker_b.acquire(10)
+
+    assert not (shared / "limiter.json").exists()
+
+
+def test_disabled_limiter_never_waits():
+    limiter = RateLimiter(1, 1, max_wait=0.1, enabled=False)
+    for _ in range(5):
+        limiter.acquire(1000)
+
+
+class UsageHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+
+    def do_POST(self):
+        self.rfile.read(int(self.headers["Content-Length"]))
+        body = json.dumps({
+            "choices": [{"message": {"content": "ok"}}],
+            "usage": {"total_tokens": 100}
+        }).encode()
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, *args):
+        pass
+
+
+def test_chat_charges_actual_usage(monkeypatch):
+    httpd = ThreadingHTTPServer(("127.0.0.1", 0), UsageHandler)
+    threading.Thread(target=httpd.serve_forever, daemon=True).start()
+    monkeypatch.setattr(groq_client, "GROQ_API_URL", f"http://127.0.0.1:{httpd.server_port}/chat")
+    monkeypatch.setattr(groq_client, "_session", None)
+    limiter = RateLimiter(30, 6000)
+    try:
+        client = GroqClient(pool=KeyPool(["key-a"]), limiter=limiter)
+        assert client.chat([{"role": "user", "content": "hi"}], max_tokens=800) == "ok"
+    finally:
+        httpd.shutdown()
+
+    # 800 tokens were reserved (max_tokens) but only 100 stay charged
+    available = limiter.stats()["available"]
+    assert available["requests"] < 30
+    assert available["tokens"] > 5800
+
+
+def test_streamed_agent_call_keeps_callers_tenant():
+    seen = []
+
+    def wrapper(on_delta=None):
+        seen.append(current_tenant())
+        return {"success": True, "error": None, "data": None}
+
+    with llm_tenant("batch:b1"):
+        events = list(stream_agent_call(wrapper))
+
+    assert events[-1][0] == "result"
+    assert seen == ["batch:b1"]
@@ -0,0 +1,88 @@
+import resource
+import shutil
+
+import pytest
+
+import agent_wrappers
+from agents import sandbox
+from agents.sandbox import run_in_sandbox
+
+
+def test_python_runs_locally_with_metrics():
+    result = run_in_sandbox("print(sum(map(int, input().split())))", "python", "1 2")
+
+    assert result["output"] == "3\n"
+    assert result["engine"] == "local"
+    assert result["execution_time"] > 0
+    assert result["peak_memory_kb"] > 0
+
+
+def test_runtime_error_reports_stderr():
+    result = run_in_sandbox("raise ValueError('bad input')", "python")
+
+    assert "ValueError: bad input" in result["error"]
+    assert "sandbox-" not in result["error"]
+
+
+@pytest.mark.skipif(not shutil.which("gcc"), reason="gcc not installed")
+def test_c_compiles_and_runs():
+    ok = run_in_sandbox('#include <stdio.h>\nint main(){int a,b;scanf("%d %d",&a,&b);printf("%d",a+b);}', "c", "4 5")
+    broken = run_in_sandbox("int main(){ retur 0; }", "c")
+
+    assert ok["output"] == "9"
+    assert broken["error"].startswith("Compilation error:")
+    assert "main.c" in broken["error"]
+
+
+def test_cpu_limit(monkeypatch):
+    monkeypatch.setattr(sandbox, "SANDBOX_CPU_SECONDS", 1)
+
+    result = run_in_sandbox("while True: pass", "python")
+
+    assert result["error"] == "Time limit exceeded (1s CPU)"
+
+
+def test_wall_clock_limit(monkeypatch):
+    monkeypatch.setattr(sandbox, "SANDBOX_WALL_SECONDS", 0.5)
+
+    result = run_in_sandbox("import time; time.sleep(30)", "python")
+
+    assert result["error"] == "Time limit exceeded (0.5s wall clock)"
+    assert result["execution_time"] < 2
+
+
+def test_memory_and_output_limits(monkeypatch):
+    monkeypatch.setattr(sandbox, "SANDBOX_OUTPUT_KB", 4)
+
+    assert "MemoryError" in run_in_sandbox("x = bytearray(2 * 1024 ** 3)", "python")["error"]
+    assert run_in_sandbox("while True: print('x' * 100)", "python")["error"] == "Output limit exceeded (4KB)"
+
+
+def test_process_limit_only_applies_to_a_separate_user():
+    code = "import resource; print(resource.getrlimit(resource.RLIMIT_NPROC))"
+
+    assert run_in_sandbox(code, "python")["output"] == f"{resource.getrlimit(resource.RLIMIT_NPROC)}\n"
+
+
+def test_unisolated_sandbox_is_not_used(monkeypatch):
+    monkeypatch.setattr(sandbox, "SANDBOX_USER", None)
+    monkeypatch.setattr(sandbox, "SANDBOX_WRAPPER", [])
+    monkeypatch.setattr(agent_wrappers, "run_code_with_agent",
+                        lambda description, code, language, test_input, on_delta=None: {"output": "simulated"})
+
+    assert not sandbox.is_available("python")
+    assert agent_wrappers.compile_and_run_code("Echo", "print('real')", "python")["data"]["engine"] == "llm"
+
+
+def test_wrapper_falls_back_to_llm_without_toolchain(monkeypatch):
+    # env stands in for an isolation wrapper such as nsjail
+    monkeypatch.setattr(sandbox, "SANDBOX_WRAPPER", ["env"])
+    monkeypatch.setattr(sandbox, "_availability", {"java": False})
+    monkeypatch.setattr(agent_wrappers, "run_code_with_agent",
+                        lambda description, code, language, test_input, on_delta=None: {"output": "simulated"})
+
+    java = agent_wrappers.compile_and_run_code("Echo", "class Main {}", "java")
+    python = agent_wrappers.compile_and_run_code("Echo", "print('real')", "python")
+
+    assert java["data"]["engine"] == "llm" and java["data"]["output"] == "simulated"
+    assert python["data"]["engine"] == "local" and python["data"]["output"] == "real\n"
@@ -0,0 +1,89 @@
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+
+import agent_wrappers
+from agent_cache import AgentResultCache
+from singleflight import SingleFlight
+
+
+def test_concurrent_callers_share_one_call():
+    flight = SingleFlight()
+    calls = []
+
+    def slow():
+        calls.append(1)
+        time.sleep(0.2)
+        return {"output": "3"}
+
+    with ThreadPoolExecutor(max_workers=10) as pool:
+        results = list(pool.map(lambda _: flight.do("k", slow), range(10)))
+
+    assert len(calls) == 1
+    assert all(r == {"output": "3"} for r in results)
+    # Followers get their own copies
+    assert len({id(r) for r in results}) == 10
+    assert flight.stats()["coalesced"] == 9
+
+
+def test_leader_error_reaches_followers():
+    flight = SingleFlight()
+    started = threading.Event()
+
+    def failing():
+        started.set()
+        time.sleep(0.1)
+        raise RuntimeError("Groq down")
+
+    with ThreadPoolExecutor(max_workers=2) as pool:
+        leader = pool.submit(flight.do, "k", failing)
+        started.wait()
+        follower = pool.submit(flight.do, "k", lambda: "unused")
+        for future in (leader, follower):
+            with pytest.raises(RuntimeError, match="Groq down"):
+                future.result()
+
+
+def test_cross_worker_lock_serialises_leaders(tmp_path):
+    # Two SingleFlight instances stand in for two gunicorn workers
+    shared = {}
+    calls = []
+
+    def compute():
+        calls.append(1)
+        time.sleep(0.2)
+        shared["k"] = "result"
+        return "result"
+
+    workers = [SingleFlight(cross_worker=True, lock_dir=str(tmp_path)) for _ in range(2)]
+    with ThreadPoolExecutor(max_workers=2) as pool:
+        futures = [pool.submit(w.do, "k", compute, lambda: shared.get("k")) for w in workers]
+        assert [f.result() for f in futures] == ["result", "result"]
+
+    assert len(calls) == 1
+    assert sum(w.stats()["lock_waits"] for w in workers) == 1
+
+
+def test_burst_of_identical_runs_makes_one_agent_call(monkeypatch):
+    cache = AgentResultCache(ttls={"run": 0})
+    calls = []
+
+    def run(description, code, language, test_input, on_delta=None):
+        calls.append(1)
+        time.sleep(0.2)
+        return {"output": "3"}
+
+    monkeypatch.setattr(agent_wrappers, "agent_cache", cache)
+    monkeypatch.setattr(agent_wrappers, "sandbox_available", lambda language: False)
+    monkeypatch.setattr(agent_wrappers, "run_code_with_agent", run)
+
+    with ThreadPoolExecutor(max_workers=8) as pool:
+        results = list(pool.map(
+            lambda _: agent_wrappers.compile_and_run_code("Add", "print(3)", "java", "1 2"), range(8)
+        ))
+
+    # Coalesced even though run results are not cached (TTL 0)
+    assert len(calls) == 1
+    assert all(r["data"]["output"] == "3" for r in results)
@@ -0,0 +1,125 @@
+from datetime import datetime
+
+import pytest
+from firebase_admin import auth as firebase_auth
+from google.api_core import exceptions as gcp_exceptions
+
+import models
+from models import StudentModel, PerformanceModel
+from storage import create_backend
+
+
+@pytest.fixture(params=["memory", "sqlite"])
+def backend(request, tmp_path, monkeypatch):
+    db, auth = create_backend(request.param, str(tmp_path / "test.db"))
+    monkeypatch.setattr(models, "get_db", lambda: db)
+    yield db, auth
+    db.close()
+
+
+def test_model_crud_and_queries(backend):
+    ids = [StudentModel().create({"batch_id": "b1" if i % 2 else "b2", "n": i}) for i in range(6)]
+
+    assert StudentModel().get(ids[3])["n"] == 3
+    assert isinstance(StudentModel().get(ids[3])["created_at"], datetime)
+    assert sorted(s["n"] for s in StudentModel().query(batch_id="b1")) == [1, 3, 5]
+
+    StudentModel().update(ids[3], {"n": 30})
+    assert StudentModel().get(ids[3])["n"] == 30
+
+    StudentModel().hard_delete(ids[3])
+    assert StudentModel().get(ids[3]) is None
+    assert StudentModel().get_many([ids[0], ids[3]])[1] is None
+
+
+def test_pagination_ordering_and_projection(backend):
+    for i in range(5):
+        PerformanceModel().create({"student_id": "s1", "attempts": i, "submission_code": "x"})
+
+    seen, cursor = [], None
+    while True:
+        page, cursor = PerformanceModel().query_page(2, cursor, select=["attempts"], student_id="s1")
+        seen.extend(page)
+        if cursor is None:
+            break
+    assert sorted(p["attempts"] for p in seen) == [0, 1, 2, 3, 4]
+    assert all(set(p) == {"id", "attempts"} for p in seen)
+
+    top = PerformanceModel().query(order_by="-attempts", limit=2)
+    assert [p["attempts"] for p in top] == [4, 3]
+
+
+def test_batches_are_atomic(backend):
+    db, _ = backend
+    sid = StudentModel().create({"n": 1})
+
+    batch = db.batch()
+    batch.update(db.collection("students").document(sid), {"n": 2})
+    batch.update(db.collection("students").document("missing"), {"n": 3})
+    with pytest.raises(gcp_exceptions.NotFound):
+        batch.commit()
+    assert StudentModel().get(sid)["n"] == 1
+
+    result = StudentModel().update_many({sid: {"n": 2}, "missing": {"n": 3}})
+    assert result["succeeded"] == [sid]
+    assert StudentModel().get(sid)["n"] == 2
+
+
+def test_update_if_rechecks_what_it_read(backend, monkeypatch):
+    db, _ = backend
+    question_id = models.QuestionModel().create({"testcase_generation": "g1"})
+    reference_type = type(db.collection("questions").document(question_id))
+    original_get = reference_type.get
+    edits = []
+
+    def racing_get(self, field_paths=None, transaction=None):
+        snapshot = original_get(self, field_paths, transaction)
+        if not edits:
+            # A manual edit lands between the job's read and its write
+            edits.append(True)
+            self.update({"testcase_generation": None})
+        return snapshot
+
+    monkeypatch.setattr(reference_type, "get", racing_get)
+    assert models.QuestionModel().update_if(
+        question_id, {"testcase_generation": "g1"}, {"testcase_status": "ready"}
+    ) is False
+    monkeypatch.setattr(reference_type, "get", original_get)
+
+    assert "testcase_status" not in models.QuestionModel().get(question_id)
+    assert models.QuestionModel().update_if(question_id, {"testcase_generation": None}, {"testcase_status": "ready"})
+
+
+def test_local_auth(backend):
+    _, auth = backend
+    user = auth.create_user(email="a@x.edu", password="secret12", display_name="A")
+
+    assert auth.sign_in_with_password("a@x.edu", "secret12")["localId"] == user.uid
+    assert auth.sign_in_with_password("a@x.edu", "wrong") is None
+    with pytest.raises(firebase_auth.EmailAlreadyExistsError):
+        auth.create_user(email="a@x.edu", password="other1")
+
+    auth.update_user(user.uid, disabled=True)
+    assert auth.sign_in_with_password("a@x.edu", "secret12") is None
+
+    auth.delete_user(user.uid)
+    with pytest.raises(firebase_auth.UserNotFoundError):
+        auth.get_user(user.uid)
+
+
+def test_app_runs_on_local_backend():
+    from app import app
+    from auth import create_jwt_token
+
+    client = app.test_client()
+    token = create_jwt_token({"role": "admin", "uid": "admin-1"})
+    rv = client.post(
+        "/api/admin/colleges",
+        json={"name": "Local College", "email": "local@college.edu", "password": "secret12"},
+        headers={"Authorization": f"Bearer {token}"}
+    )
+    assert rv.status_code == 201
+
+    rv = client.post("/api/auth/login", json={"email": "local@college.edu", "password": "secret12"})
+    assert rv.status_code == 200
+    assert rv.get_json()["data"]["user"]["role"] == "college"
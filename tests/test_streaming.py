@@ -0,0 +1,88 @@
+import json
+
+from flask import Flask
+
+import models
+from models import StudentModel
+from utils import chunked, stream_list_response
+
+
+def test_chunked():
+    assert list(chunked(range(5), 2)) == [[0, 1], [2, 3], [4]]
+    assert list(chunked([], 3)) == []
+
+
+def test_stream_list_response_pulls_items_lazily():
+    app = Flask(__name__)
+    produced = []
+
+    def items():
+        for i in range(3):
+            produced.append(i)
+            yield {"n": i}
+
+    with app.test_request_context():
+        response = stream_list_response(items(), message="ok")
+        assert produced == []
+        body = "".join(response.response)
+
+    assert response.mimetype == "application/json"
+    assert json.loads(body) == {"error": False, "message": "ok", "data": {"items": [{"n": 0}, {"n": 1}, {"n": 2}]}}
+
+
+def test_stream_list_response_empty():
+    app = Flask(__name__)
+    with app.test_request_context():
+        body = "".join(stream_list_response(iter(())).response)
+    assert json.loads(body)["data"] == {"items": []}
+
+
+class FakeSnapshot:
+    def __init__(self, doc_id, data):
+        self.id = doc_id
+        self._data = data
+
+    def to_dict(self):
+        return dict(self._data)
+
+
+class FakeQuery:
+    def __init__(self, store, filters=(), fields=None):
+        self.store = store
+        self.filters = filters
+        self.fields = fields
+
+    def where(self, field, op, value):
+        return FakeQuery(self.store, self.filters + ((field, value),), self.fields)
+
+    def select(self, fields):
+        return FakeQuery(self.store, self.filters, fields)
+
+    def stream(self):
+        for doc_id, data in self.store.items():
+            if all(data.get(f) == v for f, v in self.filters):
+                if self.fields is not None:
+                    data = {k: v for k, v in data.items() if k in self.fields}
+                yield FakeSnapshot(doc_id, data)
+
+
+class FakeDB:
+    def __init__(self, store):
+        self.store = store
+
+    def collection(self, name):
+        return FakeQuery(self.store)
+
+
+def test_model_stream_filters_and_projects(monkeypatch):
+    store = {
+        "s1": {"batch_id": "b1", "username": "a", "firebase_uid": "x"},
+        "s2": {"batch_id": "b2", "username": "b"},
+        "s3": {"batch_id": "b1", "username": "c"},
+    }
+    monkeypatch.setattr(models, "get_db", lambda: FakeDB(store))
+
+    stream = StudentModel().stream(select=["id", "username"], batch_id="b1")
+
+    assert next(stream) == {"id": "s1", "username": "a"}
+    assert list(stream) == [{"id": "s3", "username": "c"}]
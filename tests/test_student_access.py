@@ -0,0 +1,155 @@
+import pytest
+
+import models
+import cascade_service
+from models import StudentModel, can_student_access
+
+
+class FakeSnapshot:
+    def __init__(self, doc_id, data):
+        self.id = doc_id
+        self._data = data
+        self.exists = data is not None
+
+    def to_dict(self):
+        return dict(self._data)
+
+
+class FakeRef:
+    def __init__(self, db, docs, doc_id):
+        self.db = db
+        self.docs = docs
+        self.id = doc_id
+
+    def get(self):
+        self.db.reads += 1
+        return FakeSnapshot(self.id, self.docs.get(self.id))
+
+    def set(self, data):
+        self.docs[self.id] = dict(data)
+
+    def update(self, data):
+        self.docs[self.id].update(data)
+
+
+class FakeQuery:
+    def __init__(self, db, name, filters=()):
+        self.db = db
+        self.name = name
+        self.filters = filters
+
+    def where(self, field, op, value):
+        return FakeQuery(self.db, self.name, self.filters + ((field, value),))
+
+    def select(self, fields):
+        return self
+
+    def document(self, doc_id):
+        return FakeRef(self.db, self.db.collections.setdefault(self.name, {}), doc_id)
+
+    def stream(self):
+        for doc_id, data in list(self.db.collections.get(self.name, {}).items()):
+            if all(data.get(f) == v for f, v in self.filters):
+                yield FakeSnapshot(doc_id, data)
+
+
+class FakeBatch:
+    def __init__(self):
+        self.ops = []
+
+    def update(self, ref, data):
+        self.ops.append((ref, data))
+
+    def commit(self):
+        for ref, data in self.ops:
+            ref.update(data)
+
+
+class FakeDB:
+    def __init__(self, collections):
+        self.collections = collections
+        self.reads = 0
+
+    def collection(self, name):
+        return FakeQuery(self, name)
+
+    def batch(self):
+        return FakeBatch()
+
+
+@pytest.fixture
+def db(monkeypatch):
+    db = FakeDB({
+        "colleges": {"c1": {}},
+        "departments": {"d1": {"college_id": "c1"}},
+        "batches": {"b1": {"college_id": "c1", "department_id": "d1"}},
+        "students": {},
+    })
+    monkeypatch.setattr(models, "get_db", lambda: db)
+    monkeypatch.setattr(cascade_service, "disable_user_firebase", lambda uid: True)
+    monkeypatch.setattr(cascade_service, "enable_user_firebase", lambda uid: True)
+    models.hierarchy_cache.clear()
+    models.access_cache.clear()
+    return db
+
+
+def test_access_check_is_one_read_then_cached(db):
+    student_id = StudentModel().create({"batch_id": "b1", "department_id": "d1", "college_id": "c1"})
+    assert db.collections["students"][student_id]["effective_disabled"] is False
+
+    db.reads = 0
+    assert can_student_access(student_id) is True
+    assert db.reads == 1
+    assert can_student_access(student_id) is True
+    assert db.reads == 1
+
+    StudentModel().delete(student_id)
+    assert can_student_access(student_id) is False
+
+
+def test_legacy_student_is_backfilled(db):
+    db.collections["batches"]["b1"]["is_disabled"] = True
+    db.collections["students"]["s1"] = {"batch_id": "b1"}
+
+    assert can_student_access("s1") is False
+    assert db.collections["students"]["s1"]["effective_disabled"] is True
+
+
+def test_cascades_keep_flag_current(db):
+    db.collections["students"] = {
+        f"s{i}": {"batch_id": "b1", "department_id": "d1", "college_id": "c1",
+                  "is_disabled": False, "effective_disabled": False}
+        for i in range(3)
+    }
+    students = db.collections["students"]
+
+    models.disable_department_cascade("d1")
+    assert all(s["effective_disabled"] for s in students.values())
+
+    # Enabling the batch alone leaves students blocked by the disabled department
+    models.enable_batch_cascade("b1")
+    assert all(not s["is_disabled"] and s["effective_disabled"] for s in students.values())
+    assert can_student_access("s0") is False
+
+    models.enable_department_cascade("d1")
+    assert not any(s["effective_disabled"] for s in students.values())
+    assert can_student_access("s0") is True
+
+
+def test_moving_a_student_recomputes_the_flag(db):
+    db.collections["departments"]["d2"] = {"college_id": "c1", "is_disabled": True}
+    db.collections["batches"]["b2"] = {"college_id": "c1", "department_id": "d2"}
+    student_id = StudentModel().create({"batch_id": "b1", "department_id": "d1", "college_id": "c1"})
+    assert can_student_access(student_id) is True
+
+    StudentModel().update(student_id, {"batch_id": "b2"})
+    assert db.collections["students"][student_id]["effective_disabled"] is True
+    assert can_student_access(student_id) is False
+
+    StudentModel().update(student_id, {"batch_id": "b1", "department_id": "d1", "college_id": "c1"})
+    assert can_student_access(student_id) is True
+
+    StudentModel().update(student_id, {"is_disabled": True})
+    assert can_student_access(student_id) is False
+    StudentModel().update(student_id, {"username": "renamed"})
+    assert db.collections["students"][student_id]["effective_disabled"] is True
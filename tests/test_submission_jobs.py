@@ -0,0 +1,149 @@
+import threading
+import time
+from datetime import datetime, timedelta
+
+import pytest
+
+import submission_service
+from app import app
+from auth import create_jwt_token
+from config import JOB_STALE_SECONDS
+from jobs import JobQueue
+from models import JobModel, QuestionModel, PerformanceModel
+
+
+def student_headers(student_id, batch_id="batch-1"):
+    token = create_jwt_token({"role": "student", "student_id": student_id, "batch_id": batch_id})
+    return {"Authorization": f"Bearer {token}"}
+
+
+@pytest.fixture
+def question_id():
+    return QuestionModel().create({"batch_id": "batch-1", "description": "Add two numbers"})
+
+
+@pytest.fixture
+def release(monkeypatch):
+    """Hold evaluations until the test sets the event."""
+    gate = threading.Event()
+
+    def evaluate(question, code, language):
+        gate.wait(5)
+        return {"status": "correct", "error": None, "reason": "ok",
+                "test_results": [], "efficiency_feedback": None}
+
+    monkeypatch.setattr(submission_service.SubmissionService, "evaluate", staticmethod(evaluate))
+    yield gate
+    gate.set()
+
+
+def wait_for(client, submission_id, headers, status):
+    for _ in range(100):
+        job = client.get(f"/api/student/submissions/{submission_id}", headers=headers).get_json()["data"]
+        if job["status"] == status:
+            return job
+        time.sleep(0.02)
+    raise AssertionError(f"submission never reached {status}: {job}")
+
+
+def test_async_submission_returns_202_and_completes(question_id, release):
+    client = app.test_client()
+    headers = student_headers("student-1")
+
+    started = time.monotonic()
+    rv = client.post("/api/student/submit", headers=headers, json={
+        "question_id": question_id, "code": "print(3)", "language": "python", "async": True
+    })
+
+    assert rv.status_code == 202
+    assert time.monotonic() - started < 1
+    submission_id = rv.get_json()["data"]["submission_id"]
+    assert wait_for(client, submission_id, headers, "running")["result"] is None
+
+    release.set()
+    job = wait_for(client, submission_id, headers, "done")
+    assert job["result"]["status"] == "correct"
+    assert PerformanceModel().get(job["result"]["performance_id"])["student_id"] == "student-1"
+
+
+def test_submission_status_is_private(question_id, release):
+    client = app.test_client()
+    rv = client.post("/api/student/submit?async=true", headers=student_headers("student-1"), json={
+        "question_id": question_id, "code": "print(3)", "language": "python"
+    })
+    submission_id = rv.get_json()["data"]["submission_id"]
+
+    rv = client.get(f"/api/student/submissions/{submission_id}", headers=student_headers("student-2"))
+    assert rv.status_code == 404
+
+
+def test_submission_events_stream_until_done(question_id, release):
+    client = app.test_client()
+    headers = student_headers("student-1")
+    rv = client.post("/api/student/submit", headers=headers, json={
+        "question_id": question_id, "code": "print(3)", "language": "python", "async": True
+    })
+    submission_id = rv.get_json()["data"]["submission_id"]
+    release.set()
+
+    body = client.get(f"/api/student/submissions/{submission_id}/events", headers=headers).get_data(as_text=True)
+
+    events = [block for block in body.split("\n\n") if block]
+    assert all(block.startswith("event: status\ndata: ") for block in events)
+    assert '"status":"done"' in events[-1].replace(" ", "")
+
+
+def test_submission_events_resume_from_last_event_id(question_id, release, monkeypatch):
+    monkeypatch.setattr("routes.student.JOB_EVENTS_MAX_SECONDS", 0.2)
+    client = app.test_client()
+    headers = student_headers("student-1")
+    rv = client.post("/api/student/submit", headers=headers, json={
+        "question_id": question_id, "code": "print(3)", "language": "python", "async": True
+    })
+    submission_id = rv.get_json()["data"]["submission_id"]
+    url = f"/api/student/submissions/{submission_id}/events"
+    wait_for(client, submission_id, headers, "running")
+
+    first = client.get(url, headers=headers).get_data(as_text=True)
+    resumed = client.get(url, headers={**headers, "Last-Event-ID": "running"}).get_data(as_text=True)
+    release.set()
+    wait_for(client, submission_id, headers, "done")
+    finished = client.get(url, headers={**headers, "Last-Event-ID": "running"}).get_data(as_text=True)
+
+    assert "id: running\n" in first and "retry: " in first
+    assert resumed == ""
+    assert "id: done\n" in finished
+    assert client.get(url, headers={**headers, "Last-Event-ID": "done"}).status_code == 204
+
+
+def test_queued_jobs_are_not_reported_lost():
+    queue = JobQueue(workers=1)
+    gate = threading.Event()
+    queue.handler("wait")(lambda payload, progress: gate.wait(5))
+    running = queue.submit("wait", {})
+    queued = queue.submit("wait", {})
+    stale = datetime.utcnow() - timedelta(seconds=JOB_STALE_SECONDS + 60)
+    JobModel().update(queued, {"updated_at": stale})
+
+    assert queue.get(queued)["status"] == "failed"
+    queue.heartbeat()
+    assert queue.get(queued)["status"] == "queued"
+
+    gate.set()
+    for _ in range(100):
+        if queue.get(queued)["status"] == "done":
+            break
+        time.sleep(0.02)
+    assert queue.get(running)["status"] == "done"
+    assert queue.get(queued)["status"] == "done"
+    assert queue._held == set()
+
+
+def test_sync_submission_still_supported(question_id, release):
+    release.set()
+    rv = app.test_client().post("/api/student/submit", headers=student_headers("student-1"), json={
+        "question_id": question_id, "code": "print(3)", "language": "python"
+    })
+
+    assert rv.status_code == 200
+    assert rv.get_json()["data"]["status"] == "correct"
@@ -0,0 +1,107 @@
+import threading
+import time
+
+import submission_service
+from submission_service import SubmissionService, collect_testcases
+
+
+QUESTION = {
+    "description": "Add two numbers",
+    "sample_input": "1 2",
+    "open_testcases": [{"input": "1 2", "expected_output": "3"}],
+    "hidden_testcases": {"success": True, "error": None,
+                         "testcases": [{"input": "2 2", "expected_output": "4"}]},
+}
+
+
+def patch_agents(monkeypatch, delay=0.2, correct=True, run_ok=True):
+    calls = []
+
+    def run(description, code, language, test_input):
+        calls.append("run")
+        time.sleep(delay)
+        if not run_ok:
+            return {"success": False, "error": "SyntaxError", "data": None}
+        return {"success": True, "error": None, "data": {"output": "3"}}
+
+    def evaluate(description, code, language, testcases):
+        calls.append(("evaluate", len(testcases)))
+        time.sleep(delay)
+        return {"success": True, "error": None, "data": {"is_correct": correct, "reason": "ok"}}
+
+    def efficiency(description, code):
+        calls.append("efficiency")
+        time.sleep(delay)
+        return {"success": True, "error": None, "data": {"time_complexity": "O(1)"}}
+
+    monkeypatch.setattr(submission_service, "compile_and_run_code", run)
+    monkeypatch.setattr(submission_service, "evaluate_code_against_testcases", evaluate)
+    monkeypatch.setattr(submission_service, "get_efficiency_feedback", efficiency)
+    return calls
+
+
+def test_collect_testcases_accepts_wrapped_hidden_testcases():
+    assert len(collect_testcases(QUESTION)) == 2
+    assert collect_testcases({"hidden_testcases": [{"input": "", "expected_output": ""}]}) != []
+
+
+def test_agent_calls_overlap(monkeypatch):
+    calls = patch_agents(monkeypatch, delay=0.3)
+
+    started = time.monotonic()
+    outcome = SubmissionService.evaluate(QUESTION, "print(3)", "python")
+    elapsed = time.monotonic() - started
+
+    assert outcome["status"] == "correct"
+    assert outcome["efficiency_feedback"] == {"time_complexity": "O(1)"}
+    assert ("evaluate", 2) in calls
+    # Three 0.3s calls finish in roughly the time of one
+    assert elapsed < 0.75
+
+
+def test_incorrect_verdict_discards_efficiency(monkeypatch):
+    patch_agents(monkeypatch, delay=0.05, correct=False)
+
+    outcome = SubmissionService.evaluate(QUESTION, "print(4)", "python")
+
+    assert outcome["status"] == "incorrect"
+    assert outcome["efficiency_feedback"] is None
+
+
+def test_execution_error(monkeypatch):
+    patch_agents(monkeypatch, delay=0.01, run_ok=False)
+
+    outcome = SubmissionService.evaluate(QUESTION, "print(", "python")
+
+    assert outcome == {"status": "execution_error", "error": "SyntaxError",
+                       "reason": None, "test_results": [], "efficiency_feedback": None}
+
+
+def test_deadline_bounds_latency(monkeypatch):
+    release = threading.Event()
+    patch_agents(monkeypatch, delay=0.01)
+
+    def hung_evaluate(description, code, language, testcases):
+        release.wait(5)
+        return {"success": True, "error": None, "data": {"is_correct": True, "reason": "late"}}
+
+    monkeypatch.setattr(submission_service, "evaluate_code_against_testcases", hung_evaluate)
+
+    started = time.monotonic()
+    outcome = SubmissionService.evaluate(QUESTION, "print(3)", "python", deadline_seconds=0.2)
+    release.set()
+
+    assert time.monotonic() - started < 1
+    assert outcome["status"] == "incorrect"
+    assert outcome["reason"] == "Evaluation timed out"
+
+
+def test_missing_testcases_spawn_nothing(monkeypatch):
+    calls = patch_agents(monkeypatch, delay=0)
+    question = {**QUESTION, "id": "q-missing", "testcase_version": "v-gone", "hidden_testcases": None}
+
+    outcome = SubmissionService.evaluate(question, "print(3)", "python")
+
+    assert outcome["status"] == "unavailable"
+    assert outcome["error"]
+    assert calls == []
@@ -0,0 +1,104 @@
+import uuid
+from datetime import timedelta
+
+import pytest
+
+import testcase_store
+from app import app
+from auth import create_jwt_token
+from models import QuestionModel, QuestionTestcasesModel
+from submission_service import collect_testcases
+from testcase_store import hidden_testcases, testcase_cache
+
+CASES = [{"input": f"{n} {n}", "expected_output": str(2 * n) * 50} for n in range(40)]
+
+
+def new_question(batch_id="batch-1", **extra):
+    return QuestionModel().create({
+        "batch_id": batch_id, "title": "Sum", "description": "Add two numbers",
+        "open_testcases": [{"input": "1 2", "expected_output": "3"}], **extra
+    })
+
+
+def stored_question(testcases=CASES, batch_id="batch-1"):
+    question_id = new_question(batch_id)
+    QuestionModel().update(question_id, testcase_store.save(question_id, testcases))
+    return QuestionModel().get(question_id)
+
+
+def test_saved_testcases_are_compressed_and_versioned_by_content():
+    question = stored_question()
+
+    blob = QuestionTestcasesModel().get(testcase_store.blob_id(question["id"], question["testcase_version"]))
+    assert blob["count"] == len(CASES) == question["hidden_testcases_count"]
+    assert isinstance(blob["data"], bytes)
+    assert len(blob["data"]) < len(str(CASES)) / 4
+    assert question["hidden_testcases"] is None
+    assert testcase_store.save(question["id"], list(CASES))["testcase_version"] == question["testcase_version"]
+
+
+def test_judge_loads_once_per_worker(monkeypatch):
+    question = stored_question()
+    testcase_cache.clear()
+    reads = []
+    original_get = QuestionTestcasesModel.get
+    monkeypatch.setattr(QuestionTestcasesModel, "get", lambda self, doc_id: reads.append(doc_id) or original_get(self, doc_id))
+
+    assert collect_testcases(question)[1:] == CASES
+    assert collect_testcases(question)[1:] == CASES
+    assert len(reads) == 1
+
+
+def test_inline_testcases_of_older_questions_still_load():
+    assert hidden_testcases({"hidden_testcases": CASES[:2]}) == CASES[:2]
+    assert hidden_testcases({"hidden_testcases": {"success": True, "testcases": CASES[:1]}}) == CASES[:1]
+
+
+def test_missing_version_is_an_error_not_an_empty_list():
+    with pytest.raises(LookupError):
+        hidden_testcases({"id": "q-1", "testcase_version": "0123456789abcdef"})
+
+
+def test_student_views_carry_only_metadata():
+    batch_id = f"batch-{uuid.uuid4().hex}"
+    question = stored_question(batch_id=batch_id)
+    client = app.test_client()
+    student = create_jwt_token({"role": "student", "student_id": "student-1", "batch_id": batch_id})
+    batch = create_jwt_token({"uid": "batch-admin", "role": "batch", "batch_id": batch_id})
+
+    listing = client.get("/api/student/questions", headers={"Authorization": f"Bearer {student}"}).get_json()["data"]
+    detail = client.get(f"/api/student/questions/{question['id']}", headers={"Authorization": f"Bearer {student}"})
+    staff = client.get(f"/api/batch/questions/{question['id']}", headers={"Authorization": f"Bearer {batch}"})
+
+    for data in (listing["questions"][0], detail.get_json()["data"]["question"]):
+        assert data["hidden_testcases_count"] == len(CASES)
+        assert "hidden_testcases" not in data
+        assert "testcase_version" not in data
+    assert staff.get_json()["data"]["question"]["hidden_testcases"] == CASES
+
+
+def test_migrate_moves_inline_testcases():
+    legacy = new_question(hidden_testcases=CASES[:3])
+    current = stored_question()["id"]
+
+    assert testcase_store.migrate(page_size=1) >= 1
+
+    question = QuestionModel().get(legacy)
+    assert question["hidden_testcases"] is None
+    assert question["hidden_testcases_count"] == 3
+    assert hidden_testcases(question) == CASES[:3]
+    assert QuestionModel().get(current)["hidden_testcases_count"] == len(CASES)
+
+
+def test_prune_keeps_current_and_recent_versions():
+    question = stored_question(CASES[:1])
+    old_version = question["testcase_version"]
+    QuestionModel().update(question["id"], testcase_store.save(question["id"], CASES[:2]))
+
+    old_blob = testcase_store.blob_id(question["id"], old_version)
+
+    testcase_store.prune()
+    assert QuestionTestcasesModel().get(old_blob) is not None
+    assert testcase_store.prune(grace=timedelta(0)) >= 1
+    assert QuestionTestcasesModel().get(old_blob) is None
+    assert hidden_testcases(QuestionModel().get(question["id"])) == CASES[:2]
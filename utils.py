@@ -1,9 +1,12 @@
 """Utility functions for CODEPRAC 2.0."""
 import csv
 import io
+import json
 import re
 from datetime import datetime
-from flask import jsonify
+from itertools import islice
+from flask import jsonify, current_app, Response, stream_with_context
+from config import DEFAULT_PAGE_SIZE, MAX_PAGE_SIZE
 
 
 def validate_email(email):
@@ -98,6 +101,36 @@ def parse_csv_students(csv_file):
         return None, f"CSV parsing error: {str(e)}"
 
 
+def parse_pagination_args(args):
+    """Parse ?limit=&cursor= query parameters.
+    
+    Args:
+        args: request.args
+    
+    Returns:
+        (limit, cursor, None) on success, where limit is None when the
+        request is not paginated; (None, None, error_message) on failure
+    """
+    cursor = args.get("cursor") or None
+    raw_limit = args.get("limit")
+    
+    if raw_limit is None and cursor is None:
+        return None, None, None
+    
+    if raw_limit is None:
+        return DEFAULT_PAGE_SIZE, cursor, None
+    
+    try:
+        limit = int(raw_limit)
+    except ValueError:
+        return None, None, "limit must be an integer"
+    
+    if limit < 1 or limit > MAX_PAGE_SIZE:
+        return None, None, f"limit must be between 1 and {MAX_PAGE_SIZE}"
+    
+    return limit, cursor, None
+
+
 def error_response(code, message, details=None, status_code=400):
     """Create standardized error response."""
     response = {
@@ -122,6 +155,74 @@ def success_response(data=None, message="Success", status_code=200):
     return jsonify(response), status_code
 
 
+def chunked(iterable, size):
+    """Yield successive lists of up to size items from any iterable."""
+    iterator = iter(iterable)
+    while True:
+        chunk = list(islice(iterator, size))
+        if not chunk:
+            return
+        yield chunk
+
+
+def stream_list_response(items, message="Success", status_code=200):
+    """Create a success response that serializes a list incrementally.
+    
+    Writes the standard envelope as
+    {"error": false, "message": ..., "data": {"items": [...]}} one item at a
+    time, so peak memory does not depend on how many items the generator
+    produces. The generator runs inside the request context.
+    
+    Args:
+        items: Iterable (ideally a generator) of JSON-serializable dicts
+        message: Envelope message
+        status_code: HTTP status code
+    
+    Returns:
+        Flask streaming Response
+    """
+    def generate():
+        yield '{"error": false, "message": %s, "data": {"items": [' % json.dumps(message)
+        separator = ""
+        for item in items:
+            yield separator + current_app.json.dumps(item)
+            separator = ","
+        yield "]}}"
+    
+    return Response(
+        stream_with_context(generate()),
+        status=status_code,
+        mimetype="application/json"
+    )
+
+
+def sse_event(event, data, event_id=None, retry=None):
+    """Format one server-sent event whose data is JSON.
+    
+    A reconnecting EventSource sends the last event_id back as the
+    Last-Event-ID header; retry (milliseconds) sets its reconnect delay.
+    """
+    message = f"event: {event}\ndata: {current_app.json.dumps(data)}\n"
+    if event_id is not None:
+        message += f"id: {event_id}\n"
+    if retry is not None:
+        message += f"retry: {retry}\n"
+    return message + "\n"
+
+
+def sse_response(events):
+    """Create a text/event-stream response from a generator of sse_event() strings.
+    
+    The generator runs inside the request context. Proxy buffering is
+    disabled so each event reaches the client as soon as it is yielded.
+    """
+    return Response(
+        stream_with_context(events),
+        mimetype="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+
+
 def audit_log(admin_id, action, target_type, target_id, details=None):
     """Create audit log entry."""
     from models import AuditLogModel